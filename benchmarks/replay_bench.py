@@ -0,0 +1,294 @@
+"""
+Бенчмарк мастер-агента на записанном корпусе запросов.
+
+Скрипт поднимает локальную заглушку OpenAI API и HTTP-API инструментов
+(см. benchmarks/stub_server.py), направляет на нее клиентов через переменные
+окружения и прогоняет корпус с заданной параллельностью через прямой вызов
+MasterAgent.process_query и через Flask-эндпоинт /api/chat.
+
+Примеры запуска:
+    python -m benchmarks.replay_bench --concurrency 8 --iterations 5
+    python -m benchmarks.replay_bench --write-baseline
+    python -m benchmarks.replay_bench --mode flask --stub-latency-ms 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable
+
+# Добавляем корень проекта в путь для импорта
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.stub_server import StubCorpus, StubServer
+
+DATA_DIR = os.path.join(ROOT_DIR, "benchmarks", "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIR, "corpus.json")
+DEFAULT_BASELINE = os.path.join(DATA_DIR, "baseline.json")
+
+# Метрики и направление "лучше": True — чем больше, тем лучше
+COMPARED_METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "tokens_per_request": False,
+    "rss_peak_mb": False,
+}
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """
+    Возвращает перцентиль отсортированного списка в миллисекундах.
+
+    Args:
+        ordered: Отсортированные длительности в секундах
+        p: Перцентиль от 0 до 1
+
+    Returns:
+        Значение перцентиля в миллисекундах
+    """
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(p * len(ordered)))
+    return round(ordered[index] * 1000, 2)
+
+
+def _rss_peak_mb() -> float:
+    """
+    Возвращает пиковый RSS процесса в мегабайтах.
+
+    Returns:
+        Пиковый RSS
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak *= 1024
+    return round(peak / (1024 * 1024), 1)
+
+
+def _token_count() -> int:
+    """
+    Возвращает суммарное количество токенов, учтенное модулем метрик.
+
+    Returns:
+        Количество входных и выходных токенов
+    """
+    from utils import metrics
+
+    counters = metrics.COUNTERS
+    return counters.get("tokens_input", 0) + counters.get("tokens_output", 0)
+
+
+def run_load(call: Callable[[str], Any], queries: List[str], concurrency: int,
+             trace_memory: bool = False) -> Dict[str, Any]:
+    """
+    Прогоняет запросы с заданной параллельностью и собирает показатели.
+
+    Args:
+        call: Функция, обрабатывающая один запрос
+        queries: Список запросов
+        concurrency: Количество параллельных исполнителей
+        trace_memory: Замерять пик памяти Python-кучи через tracemalloc
+
+    Returns:
+        Словарь с пропускной способностью, перцентилями, памятью и токенами
+    """
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def timed(query: str) -> None:
+        started = time.perf_counter()
+        try:
+            call(query)
+        except Exception as e:
+            errors.append(str(e))
+        latencies.append(time.perf_counter() - started)
+
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    tokens_before = _token_count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, queries))
+    wall = time.perf_counter() - started
+    tokens = _token_count() - tokens_before
+
+    result = {
+        "requests": len(queries),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(queries) / wall, 2) if wall else 0.0,
+        "tokens_per_request": round(tokens / len(queries), 1) if queries else 0.0,
+        "rss_peak_mb": _rss_peak_mb(),
+    }
+
+    ordered = sorted(latencies)
+    for name, p in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        result[name] = _percentile(ordered, p)
+
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["python_heap_peak_mb"] = round(peak / (1024 * 1024), 1)
+
+    return result
+
+
+def direct_caller() -> Callable[[str], Any]:
+    """
+    Возвращает функцию прямого вызова MasterAgent.process_query.
+
+    Returns:
+        Функция обработки запроса
+    """
+    from master_agent import get_master_agent
+
+    agent = get_master_agent()
+    return lambda query: agent.process_query(query, raise_errors=True)
+
+
+def flask_caller() -> Callable[[str], Any]:
+    """
+    Возвращает функцию вызова эндпоинта /api/chat через тестовый клиент Flask.
+
+    Каждый поток получает собственный клиент (и, соответственно, собственную сессию).
+
+    Returns:
+        Функция обработки запроса
+    """
+    import threading
+    from web.app import app
+
+    local = threading.local()
+
+    def call(query: str) -> Any:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        response = client.post("/api/chat", json={"message": query})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        # История сессии не должна расти от итерации к итерации
+        client.post("/api/clear-history")
+        return response.get_json()
+
+    return call
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                          tolerance: float) -> List[str]:
+    """
+    Сравнивает результаты с базовой линией и печатает разницу.
+
+    Args:
+        results: Текущие результаты по режимам
+        baseline: Результаты базовой линии по режимам
+        tolerance: Допустимое относительное ухудшение (0.1 = 10%)
+
+    Returns:
+        Список описаний регрессий
+    """
+    regressions = []
+    for mode, current in results.items():
+        base = baseline.get(mode)
+        if not base:
+            print(f"[{mode}] нет данных в базовой линии")
+            continue
+        print(f"[{mode}] сравнение с базовой линией:")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            marker = "REGRESSION" if worse > tolerance else "ok"
+            print(f"  {metric:20s} {old:>10} -> {new:>10} ({change:+.1%}) {marker}")
+            if worse > tolerance:
+                regressions.append(f"{mode}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Точка входа бенчмарка.
+
+    Args:
+        argv: Аргументы командной строки
+
+    Returns:
+        Код возврата (1 при регрессии относительно базовой линии)
+    """
+    parser = argparse.ArgumentParser(description="Replay-бенчмарк мастер-агента zAI")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Файл корпуса запросов")
+    parser.add_argument("--mode", choices=["direct", "flask", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=5, help="Сколько раз прогнать корпус")
+    parser.add_argument("--warmup", type=int, default=1, help="Прогревочные прогоны корпуса")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="Искусственная задержка ответов модели")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Замерять пик Python-кучи через tracemalloc (замедляет прогон)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Файл базовой линии")
+    parser.add_argument("--write-baseline", action="store_true",
+                        help="Сохранить результаты как новую базовую линию")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Допустимое ухудшение относительно базовой линии")
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args(argv)
+
+    corpus = StubCorpus.load(args.corpus)
+    server = StubServer(corpus, latency_ms=args.stub_latency_ms).start()
+    os.environ.update(server.environment())
+
+    # Экспорт трассировок Agents SDK идет в сеть, а бенчмарк должен работать офлайн
+    from agents import set_tracing_disabled
+    set_tracing_disabled(True)
+
+    queries = list(corpus.queries) * args.iterations
+    modes = ["direct", "flask"] if args.mode == "both" else [args.mode]
+    callers = {"direct": direct_caller, "flask": flask_caller}
+
+    results = {}
+    try:
+        for mode in modes:
+            call = callers[mode]()
+            for _ in range(args.warmup):
+                run_load(call, list(corpus.queries), args.concurrency)
+            results[mode] = run_load(call, queries, args.concurrency, args.trace_memory)
+            print(f"[{mode}] {json.dumps(results[mode], ensure_ascii=False)}")
+    finally:
+        server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена в {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Обнаружены регрессии:\n  " + "\n  ".join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
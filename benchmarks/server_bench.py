@@ -0,0 +1,223 @@
+"""
+Бенчмарк пропускной способности веб-сервера: сервер разработки против production.
+
+Скрипт поднимает заглушку OpenAI API и HTTP-API инструментов (см.
+benchmarks/stub_server.py), запускает run_web.py в отдельном процессе в
+каждом из режимов и нагружает его настоящими HTTP-запросами: /api/chat по
+записанному корпусу и /api/tools (готовый снимок реестра). Базы задач и
+сессий создаются во временном каталоге.
+
+Примеры запуска:
+    python -m benchmarks.server_bench
+    python -m benchmarks.server_bench --modes production --workers 4 --threads 8
+    python -m benchmarks.server_bench --endpoint tools --concurrency 32 --stub-latency-ms 50
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from typing import Dict, List, Any, Callable, Optional
+
+# Добавляем корень проекта в путь для импорта
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.stub_server import StubCorpus, StubServer
+from benchmarks.replay_bench import DEFAULT_CORPUS, run_load
+
+# Показатели, выводимые в сравнении режимов
+REPORTED_METRICS = ("requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, environment: Dict[str, str], workers: int, threads: int,
+                 timeout: float = 60.0) -> subprocess.Popen:
+    """
+    Запускает run_web.py и ждет, пока сервер начнет принимать соединения.
+
+    Args:
+        mode: Режим сервера (dev или production)
+        port: Порт сервера
+        environment: Переменные окружения процесса
+        workers: Рабочие процессы (production)
+        threads: Потоки на процесс (production)
+        timeout: Максимальное время ожидания запуска (сек)
+
+    Returns:
+        Процесс сервера
+
+    Raises:
+        RuntimeError: Если сервер не запустился
+    """
+    command = [sys.executable, os.path.join(ROOT_DIR, "run_web.py"), "--mode", mode,
+               "--workers", str(workers), "--threads", str(threads)]
+    env = dict(os.environ, **environment, HOST="127.0.0.1", PORT=str(port), DEBUG="false", LOG_LEVEL="WARNING")
+    # Отдельная группа процессов: сигнал остановки получают главный и рабочие процессы
+    # Вывод сервера пишется во временный файл: непрочитанный канал мог бы заблокировать сервер
+    output = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=output,
+                               stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            output.seek(0)
+            raise RuntimeError(f"Сервер ({mode}) завершился при запуске:\n{output.read().decode()[-2000:]}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f"Сервер ({mode}) не запустился за {timeout:.0f} с")
+
+
+def stop_server(process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """
+    Плавно останавливает сервер (SIGTERM), при зависании — принудительно.
+
+    Args:
+        process: Процесс сервера
+        timeout: Время на плавную остановку (сек)
+    """
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def http_caller(port: int, endpoint: str) -> Callable[[str], Any]:
+    """
+    Возвращает функцию HTTP-запроса к серверу.
+
+    Каждый поток держит свое соединение keep-alive и свою cookie сессии.
+
+    Args:
+        port: Порт сервера
+        endpoint: "chat" (POST /api/chat с очисткой истории) или "tools" (GET /api/tools)
+
+    Returns:
+        Функция обработки запроса
+    """
+    local = threading.local()
+
+    def request(method: str, path: str, body: Optional[Dict[str, Any]] = None) -> bytes:
+        connection = getattr(local, "connection", None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            local.cookie = None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if local.cookie:
+            headers["Cookie"] = local.cookie
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Сервер закрыл соединение: повторяем по новому
+            connection.close()
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+        payload = response.read()
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            local.cookie = cookie.split(";", 1)[0]
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}")
+        return payload
+
+    def call(query: str) -> Any:
+        if endpoint == "tools":
+            return request("GET", "/api/tools")
+        result = request("POST", "/api/chat", {"message": query})
+        # История сессии не должна расти от итерации к итерации
+        request("POST", "/api/clear-history", {})
+        return result
+
+    return call
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Точка входа бенчмарка.
+
+    Args:
+        argv: Аргументы командной строки
+
+    Returns:
+        Код возврата
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк веб-сервера zAI: dev против production")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Файл корпуса запросов")
+    parser.add_argument("--modes", nargs="+", choices=["dev", "production"], default=["dev", "production"])
+    parser.add_argument("--endpoint", choices=["chat", "tools", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Рабочие процессы production-сервера (по умолчанию как WEB_WORKERS)")
+    parser.add_argument("--threads", type=int, default=8, help="Потоки на рабочий процесс")
+    parser.add_argument("--concurrency", type=int, default=16, help="Параллельные клиенты")
+    parser.add_argument("--iterations", type=int, default=5, help="Сколько раз прогнать корпус (chat)")
+    parser.add_argument("--requests", type=int, default=2000, help="Количество запросов (tools)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="Искусственная задержка ответов модели")
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args(argv)
+
+    corpus = StubCorpus.load(args.corpus)
+    stub = StubServer(corpus, latency_ms=args.stub_latency_ms).start()
+    endpoints = ["chat", "tools"] if args.endpoint == "both" else [args.endpoint]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory(prefix="zai-server-bench-") as state_dir:
+                environment = dict(stub.environment(),
+                                   JOBS_DB_PATH=os.path.join(state_dir, "jobs.db"),
+                                   SESSION_STORE_PATH=os.path.join(state_dir, "sessions.db"))
+                port = _free_port()
+                process = start_server(mode, port, environment, args.workers, args.threads)
+                try:
+                    for endpoint in endpoints:
+                        call = http_caller(port, endpoint)
+                        warmup = list(corpus.queries) if endpoint == "chat" else [""] * args.concurrency
+                        run_load(call, warmup, args.concurrency)
+                        queries = (list(corpus.queries) * args.iterations if endpoint == "chat"
+                                   else [""] * args.requests)
+                        measured = run_load(call, queries, args.concurrency)
+                        name = f"{mode}/{endpoint}"
+                        results[name] = {metric: measured[metric] for metric in REPORTED_METRICS}
+                        print(f"[{name}] {json.dumps(results[name], ensure_ascii=False)}")
+                finally:
+                    stop_server(process)
+    finally:
+        stub.stop()
+
+    if "dev" in args.modes and "production" in args.modes:
+        for endpoint in endpoints:
+            dev, production = results[f"dev/{endpoint}"], results[f"production/{endpoint}"]
+            if dev["throughput_rps"]:
+                print(f"{endpoint}: production/dev = "
+                      f"{production['throughput_rps'] / dev['throughput_rps']:.2f}x по пропускной способности")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
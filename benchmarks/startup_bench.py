@@ -0,0 +1,164 @@
+"""
+Бенчмарк времени запуска: импорт модулей и создание мастер-агента.
+
+Каждый замер выполняется в отдельном процессе с `python -X importtime`,
+чтобы учитывать холодный импорт. Скрипт печатает самые дорогие модули
+и завершается с кодом 1, если медианное время превышает бюджет.
+
+Примеры запуска:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --target web.app --budget-ms 400
+    python -m benchmarks.startup_bench --construct --budget-ms 2500
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any, Tuple
+
+# Корень проекта — рабочий каталог замеряемого процесса
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет времени запуска по умолчанию (мс)
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "300"))
+
+# Переменные окружения, достаточные для импорта без настоящих ключей
+STUB_ENV = {
+    "OPENAI_API_KEY": "startup-bench",
+    "SEC_API_KEY": "startup-bench",
+    "BOT_DB_API_KEY": "startup-bench",
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Разбирает вывод `-X importtime`.
+
+    Args:
+        stderr: Вывод процесса в stderr
+
+    Returns:
+        Список кортежей (модуль, собственное время мкс, накопленное время мкс)
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # Строка заголовка
+            continue
+        # Отступ имени модуля отражает вложенность импорта
+        rows.append((fields[2][1:].rstrip(), self_us, cumulative_us))
+    return rows
+
+
+def measure_once(target: str, construct: bool) -> Dict[str, Any]:
+    """
+    Выполняет один холодный замер в отдельном процессе.
+
+    Args:
+        target: Импортируемый модуль
+        construct: Дополнительно создать мастер-агента
+
+    Returns:
+        Словарь с временем процесса и разбором importtime
+    """
+    code = f"import {target}"
+    if construct:
+        code += "\nimport master_agent\nmaster_agent.get_master_agent()"
+
+    env = dict(os.environ)
+    for key, value in STUB_ENV.items():
+        env.setdefault(key, value)
+
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"Процесс завершился с кодом {completed.returncode}:\n{completed.stderr[-2000:]}")
+
+    rows = parse_importtime(completed.stderr)
+    import_us = sum(self_us for _, self_us, _ in rows)
+    return {"wall_ms": wall_ms, "import_ms": import_us / 1000, "rows": rows}
+
+
+def top_modules(rows: List[Tuple[str, int, int]], limit: int) -> List[Tuple[str, float, float]]:
+    """
+    Возвращает модули с наибольшим накопленным временем импорта верхнего уровня.
+
+    Args:
+        rows: Разобранный вывод importtime
+        limit: Количество модулей
+
+    Returns:
+        Список (модуль, собственное мс, накопленное мс)
+    """
+    # Модули верхнего уровня в выводе importtime не имеют отступа
+    top_level = [row for row in rows if not row[0].startswith(" ")]
+    top_level.sort(key=lambda row: row[2], reverse=True)
+    return [(name, self_us / 1000, cumulative_us / 1000) for name, self_us, cumulative_us in top_level[:limit]]
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Точка входа бенчмарка.
+
+    Args:
+        argv: Аргументы командной строки
+
+    Returns:
+        Код возврата (1 при превышении бюджета)
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк времени запуска zAI")
+    parser.add_argument("--target", default="master_agent", help="Импортируемый модуль")
+    parser.add_argument("--construct", action="store_true", help="Также создать мастер-агента")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Сколько модулей показать")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Бюджет медианного времени импорта (мс)")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once(args.target, args.construct) for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    wall_ms = statistics.median(run["wall_ms"] for run in runs)
+    heaviest = top_modules(runs[-1]["rows"], args.top)
+    within_budget = import_ms <= args.budget_ms
+
+    if args.json:
+        print(json.dumps({
+            "target": args.target,
+            "construct": args.construct,
+            "import_ms": round(import_ms, 1),
+            "process_wall_ms": round(wall_ms, 1),
+            "budget_ms": args.budget_ms,
+            "within_budget": within_budget,
+            "top_modules": [{"module": n, "self_ms": round(s, 1), "cumulative_ms": round(c, 1)}
+                            for n, s, c in heaviest],
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"Цель: {args.target}{' + создание агента' if args.construct else ''}, прогонов: {args.runs}")
+        print(f"Медиана импорта: {import_ms:.1f} мс, медиана процесса: {wall_ms:.1f} мс, бюджет: {args.budget_ms:.0f} мс")
+        print(f"{'модуль':50s} {'собств., мс':>12s} {'накопл., мс':>12s}")
+        for name, self_ms, cumulative_ms in heaviest:
+            print(f"{name:50s} {self_ms:12.1f} {cumulative_ms:12.1f}")
+        print("В пределах бюджета" if within_budget else "ПРЕВЫШЕН БЮДЖЕТ")
+
+    return 0 if within_budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
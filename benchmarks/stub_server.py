@@ -0,0 +1,376 @@
+"""
+Локальная заглушка OpenAI API и HTTP-API инструментов для бенчмарков.
+
+Сервер отвечает детерминированно по записанному корпусу: для каждого запроса
+пользователя корпус хранит последовательность ходов модели (вызовы инструментов
+и финальный ответ), а также ответы поискового API и API базы данных бота.
+Сетевые обращения наружу не выполняются.
+"""
+
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Обертка постраничного запроса из tools/db_access_tools_ai.py
+_PAGINATED_QUERY = re.compile(r"^SELECT \* FROM \((.*)\) AS page LIMIT (\d+) OFFSET (\d+)$", re.DOTALL)
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка количества токенов (≈4 символа на токен).
+
+    Args:
+        text: Текст
+
+    Returns:
+        Оценка количества токенов
+    """
+    return max(1, len(text) // 4)
+
+
+def _content_text(content: Any) -> str:
+    """
+    Извлекает текст из поля content сообщения Responses/Chat API.
+
+    Args:
+        content: Строка или список частей контента
+
+    Returns:
+        Текст сообщения
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+class StubCorpus:
+    """Корпус записанных ответов модели и инструментов."""
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Инициализирует корпус.
+
+        Args:
+            data: Содержимое файла корпуса
+        """
+        self.queries = {item["query"]: item for item in data.get("queries", [])}
+        self.search = data.get("search", {})
+        self.db_query = data.get("db_query", {})
+        self.db_schema = data.get("db_schema", {})
+        self.chat_completions = data.get("chat_completions", {})
+        self.default_response = data.get("default_response", "Готово.")
+
+    @classmethod
+    def load(cls, path: str) -> "StubCorpus":
+        """
+        Загружает корпус из JSON-файла.
+
+        Args:
+            path: Путь к файлу корпуса
+
+        Returns:
+            Экземпляр корпуса
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def model_turn(self, input_items: List[Any]) -> Dict[str, Any]:
+        """
+        Определяет ход модели по входным данным Responses API.
+
+        Номер хода равен количеству результатов инструментов после
+        последнего сообщения пользователя.
+
+        Args:
+            input_items: Поле input запроса
+
+        Returns:
+            Ход из корпуса: {"tool_calls": [...]} или {"text": "..."}
+        """
+        if isinstance(input_items, str):
+            input_items = [{"role": "user", "content": input_items}]
+
+        query = ""
+        turn = 0
+        for item in input_items:
+            if item.get("role") == "user":
+                query = _content_text(item.get("content"))
+                turn = 0
+            elif item.get("type") == "function_call_output":
+                turn += 1
+
+        entry = self.queries.get(query)
+        if entry is None:
+            return {"text": self.default_response}
+
+        turns = entry.get("turns", [])
+        if turn < len(turns):
+            return turns[turn]
+        return {"text": entry.get("response", self.default_response)}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP-запросов заглушки."""
+
+    server_version = "zAIStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("stub: " + format, *args)
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _delay(self) -> None:
+        latency = self.server.latency_seconds
+        if latency:
+            time.sleep(latency)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        corpus = self.server.corpus
+
+        if parsed.path.endswith("/search"):
+            query = parse_qs(parsed.query).get("q", [""])[0]
+            self._send_json(corpus.search.get(query, {"organic_results": []}))
+        elif parsed.path.endswith("/api/schema"):
+            self._send_json(corpus.db_schema)
+        else:
+            self._send_json({"error": f"Unknown path {parsed.path}"}, status=404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = self._read_json()
+
+        if path.endswith("/responses"):
+            self._delay()
+            self._send_json(self.server.build_response(payload))
+        elif path.endswith("/chat/completions"):
+            self._delay()
+            self._send_json(self.server.build_chat_completion(payload))
+        elif path.endswith("/api/query"):
+            self._send_json(self.server.build_db_result(payload))
+        elif path.endswith("/api/execute"):
+            self._send_json({"success": True, "rows_affected": 0})
+        else:
+            self._send_json({"error": f"Unknown path {path}"}, status=404)
+
+
+class StubServer(ThreadingHTTPServer):
+    """Многопоточный HTTP-сервер заглушки, работающий в фоновом потоке."""
+
+    daemon_threads = True
+
+    def __init__(self, corpus: StubCorpus, latency_ms: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Создает сервер заглушки.
+
+        Args:
+            corpus: Корпус записанных ответов
+            latency_ms: Искусственная задержка ответов модели в миллисекундах
+            host: Адрес для прослушивания
+            port: Порт (0 — выбрать свободный)
+        """
+        super().__init__((host, port), _StubHandler)
+        self.corpus = corpus
+        self.latency_seconds = latency_ms / 1000.0
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_id(self, prefix: str) -> str:
+        with self._counter_lock:
+            self._counter += 1
+            return f"{prefix}_{self._counter:08d}"
+
+    def build_response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Формирует ответ в формате OpenAI Responses API.
+
+        Args:
+            payload: Тело запроса /v1/responses
+
+        Returns:
+            Объект Response
+        """
+        input_items = payload.get("input", [])
+        turn = self.corpus.model_turn(input_items)
+
+        output = []
+        output_text = ""
+        if turn.get("tool_calls"):
+            for call in turn["tool_calls"]:
+                arguments = call.get("arguments", {})
+                call_id = "call_" + hashlib.sha1(
+                    json.dumps([call["name"], arguments], sort_keys=True).encode("utf-8")
+                ).hexdigest()[:16]
+                output.append({
+                    "type": "function_call",
+                    "id": self._next_id("fc"),
+                    "call_id": call_id,
+                    "name": call["name"],
+                    "arguments": json.dumps(arguments, ensure_ascii=False),
+                    "status": "completed",
+                })
+                output_text += output[-1]["arguments"]
+        else:
+            output_text = turn.get("text", self.corpus.default_response)
+            output.append({
+                "type": "message",
+                "id": self._next_id("msg"),
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": output_text, "annotations": []}],
+            })
+
+        input_tokens = _estimate_tokens(json.dumps(input_items, ensure_ascii=False))
+        output_tokens = _estimate_tokens(output_text)
+
+        return {
+            "id": self._next_id("resp"),
+            "object": "response",
+            "created_at": 0,
+            "status": "completed",
+            "model": payload.get("model", "stub"),
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    def handle_error(self, request, client_address) -> None:
+        """
+        Не печатает ошибки соединений, закрытых клиентом досрочно (потоковое чтение с лимитом).
+        """
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def build_db_result(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Формирует ответ API базы бота, применяя LIMIT/OFFSET постраничной обертки.
+
+        Args:
+            payload: Тело запроса /api/query
+
+        Returns:
+            Объект с массивом results
+        """
+        query = payload.get("query", "")
+        match = _PAGINATED_QUERY.match(query)
+        if not match:
+            return self.corpus.db_query.get(query, {"results": []})
+
+        limit, offset = int(match.group(2)), int(match.group(3))
+        result = dict(self.corpus.db_query.get(match.group(1).strip(), {"results": []}))
+        rows = result.get("results", [])
+        result["results"] = rows[offset:offset + limit]
+        return result
+
+    def build_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Формирует ответ в формате OpenAI Chat Completions API.
+
+        Args:
+            payload: Тело запроса /v1/chat/completions
+
+        Returns:
+            Объект ChatCompletion
+        """
+        messages = payload.get("messages", [])
+        query = _content_text(messages[-1].get("content")) if messages else ""
+        text = self.corpus.chat_completions.get(query, self.corpus.default_response)
+
+        prompt_tokens = _estimate_tokens(json.dumps(messages, ensure_ascii=False))
+        completion_tokens = _estimate_tokens(text)
+
+        return {
+            "id": self._next_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": 0,
+            "model": payload.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def start(self) -> "StubServer":
+        """
+        Запускает сервер в фоновом потоке.
+
+        Returns:
+            Этот же сервер
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="zai-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Останавливает сервер.
+        """
+        self.shutdown()
+        self.server_close()
+
+    def environment(self) -> Dict[str, str]:
+        """
+        Возвращает переменные окружения, направляющие клиентов на заглушку.
+
+        Returns:
+            Словарь переменных окружения
+        """
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "stub-openai-key",
+            "SEC_API_KEY": "stub-sec-key",
+            "SERPAPI_KEY": "stub-serpapi-key",
+            "SERPAPI_URL": f"{self.base_url}/search",
+            "BOT_DB_API_URL": f"{self.base_url}/api",
+            "BOT_DB_API_KEY": "stub-bot-db-key",
+            "SECRET_KEY": "stub-secret-key",
+            # Процессы, запущенные с этим окружением, не экспортируют трассировки в сеть
+            "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        }
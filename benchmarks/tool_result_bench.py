@@ -0,0 +1,227 @@
+"""
+Бенчмарк передачи результатов инструментов: JSON-строки против ToolResult.
+
+Прежняя цепочка воспроизводится дословно: ответ агента разбирается
+json.loads в query_agent и снова сериализуется json.dumps(indent=2) в
+ask_specialized_agent; chat_with_model сериализует ответ с отступами.
+Новая цепочка — настоящие инструменты с ToolResult и однократной
+компактной сериализацией на границе с моделью (to_model_output). Обе
+цепочки проходят через одну и ту же обертку реестра (метрики, событие
+tool_call), поэтому разница — только стоимость передачи результата.
+
+Для каждого сценария печатаются время на вызов, объем памяти, выделяемой
+за вызов (пик tracemalloc), и размер строки, которую получает модель.
+
+Примеры запуска:
+    python -m benchmarks.tool_result_bench
+    python -m benchmarks.tool_result_bench --calls 50000 --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Dict, List, Any, Callable
+
+# Добавляем корень проекта в путь для импорта
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.startup_bench import STUB_ENV
+
+# Бенчмарк не обращается к API: ключей-заглушек достаточно для импорта config
+for key, value in STUB_ENV.items():
+    os.environ.setdefault(key, value)
+
+from utils.logging_config import setup_logging
+
+# Записи tool_call не должны попадать в замер вывода
+setup_logging(level="ERROR", force=True)
+
+from tools import agent_framework
+from tools.agent_framework import AGENTS_REGISTRY, AgentInfo, ask_specialized_agent
+from tools.registry import _instrument
+from tools.results import ToolResult, to_model_output
+
+# Имя агента-заглушки, регистрируемого на время бенчмарка
+BENCH_AGENT = "bench_agent"
+
+
+def sample_payload() -> Dict[str, Any]:
+    """
+    Возвращает ответ агента типичного размера (текст и табличные данные).
+
+    Returns:
+        Словарь ответа
+    """
+    return {
+        "success": True,
+        "response": ("Выручка компании за квартал выросла на 12% год к году, операционная маржа "
+                     "составила 31%. Основной вклад дал сегмент облачных сервисов. ") * 4,
+        "data": {
+            "ticker": "MSFT",
+            "period": "2024-Q3",
+            "metrics": [{"name": f"metric_{i}", "value": i * 1.5, "unit": "млн $"} for i in range(20)],
+        },
+        "sources": [f"https://www.sec.gov/Archives/edgar/data/{i}/filing.htm" for i in range(5)],
+    }
+
+
+def legacy_query_agent(func: Callable[[str], Any], query: str) -> Dict[str, Any]:
+    """Прежний query_agent: строковый ответ агента разбирается json.loads."""
+    result = func(query)
+    if isinstance(result, dict):
+        return result
+    if isinstance(result, str):
+        try:
+            return json.loads(result)
+        except json.JSONDecodeError:
+            return {"success": True, "response": result}
+    return {"success": True, "response": str(result)}
+
+
+def build_scenarios() -> Dict[str, Dict[str, Callable[[], Any]]]:
+    """
+    Строит пары вызовов (legacy, typed) для каждого сценария.
+
+    Returns:
+        Сценарий -> {"legacy": вызов, "typed": вызов}; вызов возвращает то, что получает модель
+    """
+    payload = sample_payload()
+    payload_json = json.dumps(payload, ensure_ascii=False)
+    agents = {
+        "agent_dict": lambda query: dict(payload),
+        "agent_json": lambda query: payload_json,
+    }
+
+    scenarios = {}
+    for name, agent_func in agents.items():
+        def legacy_ask_specialized_agent(agent_name: str, query: str, agent_func=agent_func) -> str:
+            return json.dumps(legacy_query_agent(agent_func, query), indent=2)
+
+        legacy_ask_specialized_agent.__name__ = "ask_specialized_agent"
+        legacy_tool = _instrument(legacy_ask_specialized_agent)
+
+        def typed(agent_func=agent_func) -> Any:
+            AGENTS_REGISTRY[BENCH_AGENT].func = agent_func
+            return to_model_output(ask_specialized_agent(BENCH_AGENT, "Выручка MSFT за квартал"))
+
+        scenarios[name] = {
+            "legacy": lambda tool=legacy_tool: tool(BENCH_AGENT, "Выручка MSFT за квартал"),
+            "typed": typed,
+        }
+
+    # chat_with_model: форма ответа модели без сетевого вызова
+    def legacy_chat_with_model(query: str) -> str:
+        return json.dumps({"model": "gpt-4o", "response": payload["response"],
+                           "usage": {"total_tokens": 512, "prompt_tokens": 128, "completion_tokens": 384}},
+                          ensure_ascii=False, indent=2)
+
+    def typed_chat_with_model(query: str) -> ToolResult:
+        return ToolResult({"model": "gpt-4o", "response": payload["response"],
+                           "usage": {"total_tokens": 512, "prompt_tokens": 128, "completion_tokens": 384}})
+
+    legacy_chat_with_model.__name__ = typed_chat_with_model.__name__ = "chat_with_model"
+    legacy_chat = _instrument(legacy_chat_with_model)
+    typed_chat = _instrument(typed_chat_with_model)
+    scenarios["chat_with_model"] = {
+        "legacy": lambda: legacy_chat("Что такое EBITDA?"),
+        "typed": lambda: to_model_output(typed_chat("Что такое EBITDA?")),
+    }
+    return scenarios
+
+
+def measure(call: Callable[[], Any], calls: int, alloc_calls: int) -> Dict[str, float]:
+    """
+    Замеряет время и выделение памяти на вызов.
+
+    Args:
+        call: Вызов инструмента
+        calls: Количество вызовов для замера времени
+        alloc_calls: Количество вызовов для замера памяти
+
+    Returns:
+        Показатели: us_per_call, alloc_bytes_per_call, output_bytes
+    """
+    output = call()
+    for _ in range(min(calls, 1000)):
+        call()
+
+    started = time.process_time()
+    for _ in range(calls):
+        call()
+    cpu = time.process_time() - started
+
+    tracemalloc.start()
+    peaks = 0
+    for _ in range(alloc_calls):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        call()
+        peaks += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        "us_per_call": round(cpu / calls * 1e6, 2),
+        "alloc_bytes_per_call": round(peaks / alloc_calls),
+        "output_bytes": len(output.encode("utf-8")),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Точка входа бенчмарка.
+
+    Args:
+        argv: Аргументы командной строки
+
+    Returns:
+        Код возврата (1, если модель получает разные данные в двух цепочках)
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк передачи результатов инструментов zAI")
+    parser.add_argument("--calls", type=int, default=20000, help="Вызовов на замер времени")
+    parser.add_argument("--alloc-calls", type=int, default=2000, help="Вызовов на замер памяти")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    AGENTS_REGISTRY[BENCH_AGENT] = AgentInfo(BENCH_AGENT, agent_framework.__name__, "query")
+    AGENTS_REGISTRY[BENCH_AGENT].is_initialized = True
+
+    results: Dict[str, Dict[str, Any]] = {}
+    consistent = True
+    try:
+        for name, pair in build_scenarios().items():
+            # Модель должна получить те же данные, меняется только форма записи
+            if json.loads(pair["legacy"]()) != json.loads(pair["typed"]()):
+                print(f"[{name}] результаты цепочек различаются")
+                consistent = False
+            legacy = measure(pair["legacy"], args.calls, args.alloc_calls)
+            typed = measure(pair["typed"], args.calls, args.alloc_calls)
+            results[name] = {
+                "legacy": legacy,
+                "typed": typed,
+                "cpu_speedup": round(legacy["us_per_call"] / typed["us_per_call"], 2) if typed["us_per_call"] else None,
+                "alloc_saved_bytes": legacy["alloc_bytes_per_call"] - typed["alloc_bytes_per_call"],
+                "output_saved_bytes": legacy["output_bytes"] - typed["output_bytes"],
+            }
+    finally:
+        AGENTS_REGISTRY.pop(BENCH_AGENT, None)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for name, result in results.items():
+            legacy, typed = result["legacy"], result["typed"]
+            print(f"{name}:")
+            print(f"  время       {legacy['us_per_call']:>9.2f} -> {typed['us_per_call']:>9.2f} мкс/вызов "
+                  f"({result['cpu_speedup']}x)")
+            print(f"  память      {legacy['alloc_bytes_per_call']:>9} -> {typed['alloc_bytes_per_call']:>9} байт/вызов")
+            print(f"  для модели  {legacy['output_bytes']:>9} -> {typed['output_bytes']:>9} байт")
+
+    return 0 if consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 """ Configuration settings for the Investment AI Agent. """
 
 import os
+import logging
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из .env файла
@@ -18,6 +19,20 @@ if not SEC_API_KEY:
 
 SEC_EDGAR_USER_AGENT = os.getenv("SEC_EDGAR_USER_AGENT", "InvestmentAIAgent default@example.com")
 
+# Search API settings
+SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+
+# Telegram bot database API settings
+BOT_DB_API_URL = os.getenv("BOT_DB_API_URL", "http://194.87.250.225:5001/api")
+BOT_DB_API_KEY = os.getenv("BOT_DB_API_KEY")  # required, checked by validate_config()
+BOT_DB_PAGE_SIZE = int(os.getenv("BOT_DB_PAGE_SIZE", "100"))  # rows per query_bot_database page
+BOT_DB_MAX_BYTES = int(os.getenv("BOT_DB_MAX_BYTES", "65536"))  # serialized row bytes returned to the model per page
+BOT_DB_AGGREGATE_MAX_ROWS = int(os.getenv("BOT_DB_AGGREGATE_MAX_ROWS", "100000"))  # rows scanned for local aggregates
+BOT_DB_SCHEMA_TTL = int(os.getenv("BOT_DB_SCHEMA_TTL", "3600"))  # seconds before the cached schema is refetched
+BOT_DB_SCHEMA_CACHE_PATH = os.getenv("BOT_DB_SCHEMA_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "bot_db_schema.json"))
+
 # Model settings
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
 DEFAULT_TEMPERATURE = float(os.getenv("DEFAULT_TEMPERATURE", "0.2"))
@@ -29,20 +44,170 @@ MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))  # Maximum number of retries fo
 RETRY_DELAY = int(os.getenv("RETRY_DELAY", "1"))  # Initial delay between retries in seconds
 RATE_LIMIT_DELAY = int(os.getenv("RATE_LIMIT_DELAY", "5"))  # Delay when hitting rate limits in seconds
 
+# Shared OpenAI client: connection pool and process-wide rate limits (0 = unlimited)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "32"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+
 # Other configuration parameters
 CACHE_EXPIRY = int(os.getenv("CACHE_EXPIRY", "3600"))  # Cache expiry time in seconds (1 hour)
 
+# get_system_status health thresholds: a component is "degraded" when its error rate over the recent
+# window reaches STATUS_ERROR_RATE (after at least STATUS_MIN_CALLS calls), "saturated" when its busy
+# share reaches STATUS_SATURATION, and the job queue is "backlogged" at STATUS_QUEUE_DEPTH queued jobs.
+# STATUS_LAG_MS bounds the p95 tool thread wait and event loop lag
+STATUS_ERROR_RATE = float(os.getenv("STATUS_ERROR_RATE", "0.5"))
+STATUS_MIN_CALLS = int(os.getenv("STATUS_MIN_CALLS", "5"))
+STATUS_SATURATION = float(os.getenv("STATUS_SATURATION", "0.9"))
+STATUS_QUEUE_DEPTH = int(os.getenv("STATUS_QUEUE_DEPTH", "20"))
+STATUS_LAG_MS = float(os.getenv("STATUS_LAG_MS", "500"))
+
+# Request coalescing (single-flight): identical concurrent queries share one computation.
+# The window (seconds) additionally shares a finished result with late arrivals.
+# Keys cover the query and the whole conversation history, so only identical conversations
+# (e.g. new sessions asking the same first question) share a result across users.
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0"))
+TOOL_COALESCE_WINDOW = float(os.getenv("TOOL_COALESCE_WINDOW", "5"))  # shared across sessions; error results are not reused
+
+# Speculative prefetch: start cheap idempotent tools suggested by the local classifier
+# in parallel with the first model call (prefetch_* metrics show the hit rate)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Search prefetch is opt-in: it is a paid SerpAPI call that only pays off when the model
+# searches with the user's wording unchanged
+PREFETCH_SEARCH = os.getenv("PREFETCH_SEARCH", "false").lower() in ("1", "true", "yes")
+
+# Tool schema manifest (cached function_tool schemas, rebuilt when a tool signature changes)
+TOOL_MANIFEST_PATH = os.getenv("TOOL_MANIFEST_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "tool_manifest.json"))
+
+# Local embedding service (utils/embeddings.py): "auto"/"model" use sentence-transformers when installed,
+# "hashing" always uses the offline hashing vectorizer
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))  # wait for concurrent requests
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.db"))
+EMBEDDING_MEMORY_CACHE = int(os.getenv("EMBEDDING_MEMORY_CACHE", "4096"))  # vectors kept in memory
+
+# Knowledge base for lookup_information (documents in KB_DOCS_DIR, vector index in KB_INDEX_DIR)
+KB_DOCS_DIR = os.getenv("KB_DOCS_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "knowledge", "docs"))
+KB_INDEX_DIR = os.getenv("KB_INDEX_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "knowledge"))
+KB_REFRESH_INTERVAL = float(os.getenv("KB_REFRESH_INTERVAL", "60"))  # seconds between checks for changed documents
+KB_MIN_SCORE = float(os.getenv("KB_MIN_SCORE", "0.2"))  # cosine similarity below which keyword search is used
+KB_ANN_MIN_ENTRIES = int(os.getenv("KB_ANN_MIN_ENTRIES", "2048"))  # below this size search is exact
+KB_ANN_PROBES = int(os.getenv("KB_ANN_PROBES", "8"))  # clusters scanned per approximate search
+
+# Filings (10-Q/10-K PDFs) and their persistent page/section indexes
+FILINGS_DIR = os.getenv("FILINGS_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "downloaded_filings"))
+FILINGS_INDEX_DIR = os.getenv("FILINGS_INDEX_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "filings"))
+FILING_PAGE_CACHE = int(os.getenv("FILING_PAGE_CACHE", "256"))  # decoded pages kept in memory across filings
+FILING_MAX_CHARS = int(os.getenv("FILING_MAX_CHARS", "20000"))  # text returned to the model per call
+FILING_DIFF_MAX_CHARS = int(os.getenv("FILING_DIFF_MAX_CHARS", "6000"))  # changed paragraph text per filing diff
+
+# Open positions (trades.db) and the price store used to mark them to market.
+# PRICE_FEED: "snapshots" reads CSV/Parquet files from PRICES_DIR, "stub" is an in-memory feed for local runs
+TRADES_DB_PATH = os.getenv("TRADES_DB_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "trades.db"))
+PRICES_DIR = os.getenv("PRICES_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "prices"))
+PRICE_FEED = os.getenv("PRICE_FEED", "snapshots").lower()
+TRADES_IMPORT_BATCH = int(os.getenv("TRADES_IMPORT_BATCH", "5000"))  # rows per transaction in bulk imports
+
+# Background job queue (long-running analyses submitted via /api/jobs)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A running job is owned by a process for JOB_LEASE_SECONDS and the lease is renewed while it runs;
+# only jobs whose owner process is gone or whose lease expired are requeued (e.g. not during a USR2 reload)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# An SSE job stream (/api/jobs/<id>?stream=1) holds a server thread; after this many seconds
+# it ends with a "timeout" event and the browser continues by polling
+JOB_STREAM_MAX_SECONDS = float(os.getenv("JOB_STREAM_MAX_SECONDS", "60"))
+
+# Web interface settings
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5000"))
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+
+# Serving mode for run_web.py: "dev" runs Flask's development server, "production" a pre-fork
+# gunicorn server (gthread workers) with the app, tool registry and agent preloaded before fork.
+# OPENAI_RPM/OPENAI_TPM stay process-wide limits: each worker gets an equal share
+SERVER_MODE = os.getenv("SERVER_MODE", "dev").lower()
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(min(4, os.cpu_count() or 1))))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))  # request threads per worker
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", "300"))  # seconds before a silent worker is restarted
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "60"))  # drain time for in-flight requests on reload/stop
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", "5"))  # idle keep-alive seconds; gunicorn's default 2s stalled reused connections
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "0"))  # recycle a worker after N requests (0 = never)
+# Flask session signing key. Required in production mode: every worker and every re-exec'd master
+# (USR2) must share it, otherwise sessions break between workers and on each reload.
+# In dev mode a random per-process key is used when unset
+SECRET_KEY = os.getenv("SECRET_KEY")
+
+# HTTP response compression (gzip, or brotli when the brotli package is installed) and static asset caching.
+# Static files get content-hash URLs that are cached for STATIC_MAX_AGE and are precompressed at startup
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # smaller dynamic responses are sent as is
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))  # gzip level 1-9 for dynamic responses
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+# Logging (utils/logging_config.py): records go through a bounded queue to a background writer thread.
+# LOG_STYLE: "json" writes one compact JSON object per line, "text" uses LOG_FORMAT.
+# LOG_SAMPLE_RATES: "<event or logger>=<fraction kept>" for high-volume records below WARNING
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+LOG_STYLE = os.getenv("LOG_STYLE", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped, never waited on
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "httpx=0.1,tool_call=0.1")
+
+# Chat session histories (web/session_store.py): older turns are compressed, and sessions over
+# the global memory budget are moved to SESSION_STORE_PATH until the user returns
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "sessions.db"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+SESSION_RECENT_MESSAGES = int(os.getenv("SESSION_RECENT_MESSAGES", "6"))  # newest messages kept uncompressed
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024)))  # memory budget per session
+SESSION_MEMORY_BUDGET = int(os.getenv("SESSION_MEMORY_BUDGET", str(64 * 1024 * 1024)))  # all sessions in memory
+SESSION_DISK_TTL = float(os.getenv("SESSION_DISK_TTL", str(7 * 24 * 3600)))  # seconds evicted sessions are kept
+
+# Admin endpoints (/api/admin/*, /api/debug/*): X-Admin-Token must match; if unset, the endpoints are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Hot reload log shared by server processes: a reload done by one worker is recorded here and
+# applied by every other worker before its next request (checked at most every RELOAD_CHECK_INTERVAL seconds)
+RELOAD_LOG_PATH = os.getenv("RELOAD_LOG_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "reloads.db"))
+RELOAD_CHECK_INTERVAL = float(os.getenv("RELOAD_CHECK_INTERVAL", "1"))
+
 # Дополнительная проверка критически важных переменных
 def validate_config():
     """Проверяет, что все критически важные переменные заданы."""
-    required_vars = ["OPENAI_API_KEY", "SEC_API_KEY"]
+    required_vars = ["OPENAI_API_KEY", "SEC_API_KEY", "BOT_DB_API_KEY"]
     missing_vars = [var for var in required_vars if not globals().get(var)]
     
     if missing_vars:
         raise ValueError(f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
     
-    print("✅ Конфигурация проверена успешно")
-
-# Выполняем проверку при импорте модуля
-if __name__ != "__main__":
-    validate_config()
\ No newline at end of file
+    problems = []
+    if LOG_STYLE not in ("json", "text"):
+        problems.append(f"LOG_STYLE={LOG_STYLE} (ожидается json или text)")
+    if SERVER_MODE not in ("dev", "production"):
+        problems.append(f"SERVER_MODE={SERVER_MODE} (ожидается dev или production)")
+    if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+        problems.append(f"LOG_LEVEL={LOG_LEVEL} не является уровнем логирования")
+    for name in ("WEB_WORKERS", "WEB_THREADS", "WEB_TIMEOUT", "JOB_WORKERS"):
+        if globals()[name] < 1:
+            problems.append(f"{name}={globals()[name]} должно быть не меньше 1")
+    if not 0 < PORT < 65536:
+        problems.append(f"PORT={PORT} вне допустимого диапазона")
+    if problems:
+        raise ValueError(f"Некорректные настройки: {'; '.join(problems)}")
+    
+    logging.getLogger(__name__).info("Конфигурация проверена успешно")
\ No newline at end of file
@@ -0,0 +1,294 @@
+"""
+Сравнение двух отчетов одной компании по разделам.
+
+Для каждого раздела отчета один раз вычисляются хэши: всего раздела и
+каждого абзаца (строки таблицы считаются отдельными абзацами). Хэши
+сохраняются рядом с индексом отчета, поэтому сравнение сводится к сверке
+хэшей: совпавшие разделы пропускаются, а для измененных сопоставляются
+последовательности хэшей абзацев. Текст читается только для абзацев,
+которые действительно изменились.
+
+Абзацы сопоставляются по тексту без чисел и дат: абзац, в котором поменялись
+только цифры (новый отчетный период), считается обновлением показателей
+и не попадает в список текстовых изменений.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Any, Optional, Tuple
+
+from config import FILINGS_INDEX_DIR, FILING_DIFF_MAX_CHARS
+from filings.reader import FilingReader, FilingError, get_filing_library
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Версия формата хэшей; при изменении нормализации хэши вычисляются заново
+HASHES_VERSION = 1
+
+# Максимальная длина одного абзаца в сводке изменений
+MAX_PARAGRAPH_CHARS = 400
+
+# Числа и даты отчетного периода маскируются при сравнении абзацев
+_NUMBER_RE = re.compile(r"(?:(?:january|february|march|april|may|june|july|august|september|october|november|december)"
+                        r"\s+\d{1,2},?\s+)?\d[\d,.]*", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"[.:;!?][\"”')]?$")
+# Строка таблицы: две последние ячейки — числа (или прочерки)
+_TABLE_ROW_RE = re.compile(r"(?:\(?\$?\s?[\d,.]*\d%?\)?|—|-)\s+(?:\$\s?)?(?:\(?[\d,.]*\d%?\)?|—|-)$")
+_SKIP_LINE_RE = re.compile(r"^(?:\d{0,3}\s*table of contents|\d{1,3}|page \d+)$", re.IGNORECASE)
+
+
+def _paragraphs(text: str) -> List[str]:
+    """
+    Делит текст раздела на нормализованные абзацы.
+
+    Строки PDF объединяются до конца предложения; строка, которая
+    заканчивается двумя числами, — строка таблицы и образует отдельный абзац.
+    Колонтитулы и номера страниц пропускаются.
+
+    Args:
+        text: Текст раздела
+
+    Returns:
+        Список абзацев
+    """
+    paragraphs: List[str] = []
+    current: List[str] = []
+    for raw_line in text.splitlines():
+        line = re.sub(r"\s+", " ", raw_line.replace("\xa0", " ").replace("’", "'")).strip()
+        if not line or _SKIP_LINE_RE.match(line):
+            continue
+        current.append(line)
+        if _SENTENCE_END_RE.search(line) or _TABLE_ROW_RE.search(line):
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _section_key(section: Dict[str, Any]) -> str:
+    return f"{section['part']}.{section['item']}"
+
+
+def _section_label(section: Dict[str, Any]) -> str:
+    return f"Part {section['part']} Item {section['item']}. {section['title']}"
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= MAX_PARAGRAPH_CHARS else text[:MAX_PARAGRAPH_CHARS - 1] + "…"
+
+
+class SectionHashes:
+    """Хэши разделов и абзацев отчетов с кэшем в памяти и на диске."""
+
+    def __init__(self, index_dir: str = FILINGS_INDEX_DIR):
+        """
+        Инициализирует кэш.
+
+        Args:
+            index_dir: Каталог индексов отчетов
+        """
+        self.index_dir = index_dir
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, reader: FilingReader) -> Dict[str, Any]:
+        """
+        Возвращает хэши разделов отчета, при необходимости вычислив их.
+
+        Args:
+            reader: Читатель отчета
+
+        Returns:
+            Словарь: ключ раздела ("I.2") -> {"hash", "paragraphs": [[хэш без чисел, хэш текста], ...]}
+        """
+        hashes = self._cache.get(reader.digest)
+        metrics.record_cache("filing_section_hashes", hit=hashes is not None)
+        if hashes is not None:
+            return hashes
+
+        path = os.path.join(self.index_dir, f"{reader.digest}.sections.json")
+        hashes = self._load(path)
+        if hashes is None:
+            hashes = self._compute(reader)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": HASHES_VERSION, "sections": hashes}, f)
+            os.replace(temp_path, path)
+
+        with self._lock:
+            self._cache[reader.digest] = hashes
+        return hashes
+
+    @staticmethod
+    def _load(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Section hashes {path} are corrupted and will be rebuilt: {str(e)}")
+            return None
+        return data["sections"] if data.get("version") == HASHES_VERSION else None
+
+    @staticmethod
+    def _compute(reader: FilingReader) -> Dict[str, Any]:
+        hashes = {}
+        for section in reader.sections:
+            paragraphs = _paragraphs(reader.section_text(section))
+            hashes[_section_key(section)] = {
+                "hash": _hash("\n".join(paragraphs)),
+                "paragraphs": [[_hash(_NUMBER_RE.sub("#", text)), _hash(text)] for text in paragraphs],
+            }
+        metrics.increment("filing_section_hashes_built")
+        return hashes
+
+
+_section_hashes = SectionHashes()
+
+
+def _diff_section(old_reader: FilingReader, new_reader: FilingReader, old_section: Dict[str, Any],
+                  new_section: Dict[str, Any], old_hashes: Dict[str, Any], new_hashes: Dict[str, Any],
+                  budget: int) -> Dict[str, Any]:
+    """
+    Сравнивает абзацы раздела двух отчетов по хэшам.
+
+    Args:
+        old_reader: Читатель более раннего отчета
+        new_reader: Читатель более позднего отчета
+        old_section: Раздел раннего отчета
+        new_section: Раздел позднего отчета
+        old_hashes: Хэши раздела раннего отчета
+        new_hashes: Хэши раздела позднего отчета
+        budget: Максимум символов текста абзацев в сводке
+
+    Returns:
+        Сводка изменений раздела
+    """
+    old_masked = [masked for masked, _ in old_hashes["paragraphs"]]
+    new_masked = [masked for masked, _ in new_hashes["paragraphs"]]
+    matcher = SequenceMatcher(None, old_masked, new_masked, autojunk=False)
+
+    figures_updated = 0
+    removed_positions: List[int] = []
+    added_positions: List[int] = []
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            figures_updated += sum(
+                1 for offset in range(old_end - old_start)
+                if old_hashes["paragraphs"][old_start + offset][1] != new_hashes["paragraphs"][new_start + offset][1])
+        else:
+            removed_positions.extend(range(old_start, old_end))
+            added_positions.extend(range(new_start, new_end))
+
+    summary = {
+        "section": _section_label(new_section),
+        "status": "changed",
+        "similarity": round(matcher.ratio(), 3),
+        "paragraphs_added": len(added_positions),
+        "paragraphs_removed": len(removed_positions),
+        "figures_updated": figures_updated,
+    }
+    if not added_positions and not removed_positions:
+        return summary
+
+    # Текст читается только для измененных абзацев; бюджет делится между добавленными и удаленными
+    old_paragraphs = _paragraphs(old_reader.section_text(old_section)) if removed_positions else []
+    new_paragraphs = _paragraphs(new_reader.section_text(new_section)) if added_positions else []
+    for key, positions, paragraphs in (("added", added_positions, new_paragraphs),
+                                       ("removed", removed_positions, old_paragraphs)):
+        texts, used = [], 0
+        limit = budget // 2 if added_positions and removed_positions else budget
+        for position in positions:
+            text = _clip(paragraphs[position])
+            if used + len(text) > limit:
+                break
+            texts.append(text)
+            used += len(text)
+        summary[key] = texts
+        summary[f"{key}_truncated"] = len(texts) < len(positions)
+    return summary
+
+
+def diff_filings(old_name: str, new_name: str, section: Optional[str] = None,
+                 max_chars: int = FILING_DIFF_MAX_CHARS) -> Dict[str, Any]:
+    """
+    Сравнивает два отчета одной компании по разделам.
+
+    Порядок отчетов определяется отчетной датой: изменения описываются
+    от более раннего отчета к более позднему.
+
+    Args:
+        old_name: Имя файла одного отчета
+        new_name: Имя файла другого отчета
+        section: Сравнить только один раздел (обозначение как в read_filing_section)
+        max_chars: Максимум символов текста абзацев в результате
+
+    Returns:
+        Сводка: неизменные разделы, добавленные/удаленные разделы и изменения по абзацам
+
+    Raises:
+        FilingError: Если отчеты не найдены, относятся к разным компаниям или раздела нет
+    """
+    library = get_filing_library()
+    old_reader, new_reader = library.get_reader(old_name), library.get_reader(new_name)
+    if old_reader.index["ticker"] != new_reader.index["ticker"]:
+        raise FilingError(f"Отчеты относятся к разным компаниям: "
+                          f"{old_reader.index['ticker']} и {new_reader.index['ticker']}")
+    if (old_reader.index.get("period_end") or "") > (new_reader.index.get("period_end") or ""):
+        old_reader, new_reader = new_reader, old_reader
+
+    old_sections = {_section_key(item): item for item in old_reader.sections}
+    new_sections = {_section_key(item): item for item in new_reader.sections}
+    keys = list(new_sections) + [key for key in old_sections if key not in new_sections]
+    if section is not None:
+        found = new_reader.find_section(section) or old_reader.find_section(section)
+        if found is None:
+            raise FilingError(f"Раздел '{section}' не найден")
+        keys = [_section_key(found)]
+
+    result = {
+        "ticker": new_reader.index["ticker"],
+        "old": {"file": old_reader.index["file"], "period_end": old_reader.index.get("period_end")},
+        "new": {"file": new_reader.index["file"], "period_end": new_reader.index.get("period_end")},
+        "unchanged": [],
+        "changes": [],
+    }
+    if old_reader.digest == new_reader.digest:
+        result["unchanged"] = [_section_label(new_sections[key]) for key in keys if key in new_sections]
+        return result
+
+    old_hashes, new_hashes = _section_hashes.get(old_reader), _section_hashes.get(new_reader)
+    changed: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+    for key in keys:
+        old_section, new_section = old_sections.get(key), new_sections.get(key)
+        if old_section is None or new_section is None:
+            present = new_section or old_section
+            result["changes"].append({"section": _section_label(present),
+                                      "status": "added" if old_section is None else "removed"})
+        elif old_hashes[key]["hash"] == new_hashes[key]["hash"]:
+            result["unchanged"].append(_section_label(new_section))
+        else:
+            changed.append((key, old_section, new_section))
+
+    # Бюджет текста делится между разделами, где изменился не только цифровой материал
+    with_text = sum(1 for key, _, _ in changed
+                    if [masked for masked, _ in old_hashes[key]["paragraphs"]] !=
+                    [masked for masked, _ in new_hashes[key]["paragraphs"]])
+    budget = max_chars // max(1, with_text)
+    for key, old_section, new_section in changed:
+        result["changes"].append(_diff_section(old_reader, new_reader, old_section, new_section,
+                                               old_hashes[key], new_hashes[key], budget))
+    return result
@@ -0,0 +1,808 @@
+"""
+Хранилище числовых показателей отчетности (ticker / период / показатель).
+
+Строки отчета о прибылях, баланса и отчета о движении денежных средств
+извлекаются один раз: из inline XBRL (файлы .htm в каталоге отчетов),
+а для PDF — разбором таблиц на страницах финансовой отчетности.
+Показатели хранятся по столбцам в массивах numpy, отсортированных по
+составному ключу, поэтому запрос сводится к searchsorted без чтения текста.
+
+Колонки сохраняются в файл .npz в каталоге индексов и строятся заново,
+только когда меняется набор отчетов.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from datetime import date, datetime
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from config import FILINGS_DIR, FILINGS_INDEX_DIR
+from filings.reader import FilingLibrary, FilingError, get_filing_library, _file_digest
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Версия формата хранилища; при изменении разбора показатели извлекаются заново
+FACTS_VERSION = 1
+
+# Показатели: название -> (единица измерения, моментный показатель баланса)
+CONCEPTS = {
+    "revenue": ("USD", False),
+    "cost_of_revenue": ("USD", False),
+    "gross_profit": ("USD", False),
+    "operating_income": ("USD", False),
+    "net_income": ("USD", False),
+    "eps_basic": ("USD/share", False),
+    "eps_diluted": ("USD/share", False),
+    "cash": ("USD", True),
+    "total_assets": ("USD", True),
+    "total_liabilities": ("USD", True),
+    "total_equity": ("USD", True),
+    "operating_cash_flow": ("USD", False),
+    "investing_cash_flow": ("USD", False),
+    "financing_cash_flow": ("USD", False),
+    "capex": ("USD", False),
+    "free_cash_flow": ("USD", False),
+    "gross_margin": ("ratio", False),
+    "operating_margin": ("ratio", False),
+    "net_margin": ("ratio", False),
+}
+
+# Синонимы, которыми показатели обычно запрашивают
+CONCEPT_ALIASES = {
+    "revenues": "revenue",
+    "sales": "revenue",
+    "total revenue": "revenue",
+    "cost of revenue": "cost_of_revenue",
+    "cogs": "cost_of_revenue",
+    "gross profit": "gross_profit",
+    "operating income": "operating_income",
+    "operating profit": "operating_income",
+    "net income": "net_income",
+    "net profit": "net_income",
+    "eps": "eps_diluted",
+    "cash and cash equivalents": "cash",
+    "assets": "total_assets",
+    "liabilities": "total_liabilities",
+    "equity": "total_equity",
+    "operating cash flow": "operating_cash_flow",
+    "capital expenditures": "capex",
+    "fcf": "free_cash_flow",
+    "free cash flow": "free_cash_flow",
+    "gross margin": "gross_margin",
+    "operating margin": "operating_margin",
+    "net margin": "net_margin",
+}
+
+# Элементы US GAAP в inline XBRL -> показатель (знак: capex в таблицах отрицательный)
+XBRL_CONCEPTS = {
+    "us-gaap:revenues": ("revenue", 1),
+    "us-gaap:revenuefromcontractwithcustomerexcludingassessedtax": ("revenue", 1),
+    "us-gaap:salesrevenuenet": ("revenue", 1),
+    "us-gaap:costofrevenue": ("cost_of_revenue", 1),
+    "us-gaap:costofgoodsandservicessold": ("cost_of_revenue", 1),
+    "us-gaap:grossprofit": ("gross_profit", 1),
+    "us-gaap:operatingincomeloss": ("operating_income", 1),
+    "us-gaap:netincomeloss": ("net_income", 1),
+    "us-gaap:earningspersharebasic": ("eps_basic", 1),
+    "us-gaap:earningspersharediluted": ("eps_diluted", 1),
+    "us-gaap:cashandcashequivalentsatcarryingvalue": ("cash", 1),
+    "us-gaap:assets": ("total_assets", 1),
+    "us-gaap:liabilities": ("total_liabilities", 1),
+    "us-gaap:stockholdersequity": ("total_equity", 1),
+    "us-gaap:netcashprovidedbyusedinoperatingactivities": ("operating_cash_flow", 1),
+    "us-gaap:netcashprovidedbyusedininvestingactivities": ("investing_cash_flow", 1),
+    "us-gaap:netcashprovidedbyusedinfinancingactivities": ("financing_cash_flow", 1),
+    "us-gaap:paymentstoacquirepropertyplantandequipment": ("capex", -1),
+}
+
+# Заголовки таблиц отчетности: тип отчета -> шаблон всей строки заголовка
+_STATEMENT_TITLES = {
+    "balance": re.compile(r"^(?:condensed\s+)?consolidated\s+balance\s+sheets?$", re.IGNORECASE),
+    "income": re.compile(r"^(?:condensed\s+)?consolidated\s+statements?\s+of\s+(?:operations|income|earnings)$",
+                         re.IGNORECASE),
+    "cash_flow": re.compile(r"^(?:condensed\s+)?consolidated\s+statements?\s+of\s+cash\s+flows$", re.IGNORECASE),
+}
+
+# Строки таблиц: тип отчета -> [(показатель, шаблон подписи строки)]; берется первое совпадение
+_ROW_PATTERNS = {
+    "income": [
+        ("revenue", re.compile(r"^(?:total\s+)?(?:net\s+)?(?:revenues?|sales)$")),
+        ("cost_of_revenue", re.compile(r"^(?:total\s+)?cost\s+of\s+(?:revenues?|sales)$")),
+        ("gross_profit", re.compile(r"^gross\s+profit$")),
+        ("operating_income", re.compile(r"^(?:(?:income|loss|income\s+\(loss\))\s+from\s+operations|operating\s+income(?:\s+\(loss\))?)$")),
+        ("net_income", re.compile(r"^net\s+income(?:\s+\(loss\))?$")),
+        ("eps_basic", re.compile(r"^basic(?:\s+net\s+income\s+per\s+share|\s+earnings\s+per\s+share)?$")),
+        ("eps_diluted", re.compile(r"^diluted(?:\s+net\s+income\s+per\s+share|\s+earnings\s+per\s+share)?$")),
+    ],
+    "balance": [
+        ("cash", re.compile(r"^cash\s+and\s+cash\s+equivalents$")),
+        ("total_assets", re.compile(r"^total\s+assets$")),
+        ("total_liabilities", re.compile(r"^total\s+liabilities$")),
+        ("total_equity", re.compile(r"^total\s+(?:stockholders|shareholders)'?\s+equity$")),
+    ],
+    "cash_flow": [
+        ("operating_cash_flow", re.compile(r"^net\s+cash\s+[a-z()\s]*(?:provided|used)[a-z()\s]*\soperating\s+activities$")),
+        ("investing_cash_flow", re.compile(r"^net\s+cash\s+[a-z()\s]*(?:provided|used)[a-z()\s]*\sinvesting\s+activities$")),
+        ("financing_cash_flow", re.compile(r"^net\s+cash\s+[a-z()\s]*(?:provided|used)[a-z()\s]*\sfinancing\s+activities$")),
+        ("capex", re.compile(r"^purchases\s+of\s+property(?:,\s+plant)?\s+and\s+equipment\b")),
+    ],
+}
+
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december")
+_HEADER_TOKEN_RE = re.compile(
+    r"(?P<duration>(?P<months>three|six|nine|twelve)\s+months\s+ended)"
+    r"|(?P<monthday>(?P<month>" + "|".join(_MONTHS) + r")\s+(?P<day>\d{1,2}))"
+    r"|(?P<year>\b(?:19|20)\d{2}\b)",
+    re.IGNORECASE)
+_DURATION_MONTHS = {"three": 3, "six": 6, "nine": 9, "twelve": 12}
+_VALUE_RE = re.compile(r"^\([\d,]*\d(?:\.\d+)?\)$|^-?[\d,]*\d(?:\.\d+)?$|^[—–-]$")
+_NOTE_RE = re.compile(r"\s*\((?:note|notes)\s+[\d,\s]+\)", re.IGNORECASE)
+_PERIOD_SPEC_RE = re.compile(r"^(?:(q[1-4])|(h[12])|(9m|ytd9)|(fy))\s*[-']?\s*((?:19|20)\d{2})$", re.IGNORECASE)
+_QUARTER_ENDS = {1: (3, 31), 2: (6, 30), 3: (9, 30), 4: (12, 31)}
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _normalize_label(label: str) -> str:
+    label = _NOTE_RE.sub("", label.replace("\xa0", " ").replace("’", "'"))
+    label = re.sub(r"\s+", " ", label).strip(" :$").lower()
+    return label
+
+
+def _parse_value(token: str) -> float:
+    if token in ("—", "–", "-"):
+        return 0.0
+    negative = token.startswith("(") or token.startswith("-")
+    value = float(token.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+
+def _split_row(line: str) -> Tuple[str, List[float]]:
+    """
+    Делит строку таблицы на подпись и числа справа.
+    """
+    tokens = line.replace("$", " ").split()
+    values: List[str] = []
+    while tokens and _VALUE_RE.match(tokens[-1]):
+        values.append(tokens.pop())
+    return " ".join(tokens), [_parse_value(token) for token in reversed(values)]
+
+
+def _header_columns(header: str, statement: str, period_end: Optional[str]) -> List[Tuple[date, int]]:
+    """
+    Определяет периоды столбцов таблицы по заголовку.
+
+    Годы в заголовке задают число столбцов; "Three/Nine Months Ended" делят
+    их на группы слева направо, даты "September 30" относятся к годам по
+    порядку или ко всей группе.
+
+    Args:
+        header: Текст между названием таблицы и первой строкой с числами
+        statement: Тип отчета
+        period_end: Отчетная дата документа (если в заголовке нет месяца)
+
+    Returns:
+        Список (дата окончания периода, длительность в месяцах; 0 — на дату)
+    """
+    durations: List[int] = []
+    monthdays: List[Tuple[int, int]] = []
+    years: List[int] = []
+    for match in _HEADER_TOKEN_RE.finditer(header):
+        if match.group("duration"):
+            durations.append(_DURATION_MONTHS[match.group("months").lower()])
+        elif match.group("monthday"):
+            monthdays.append((_MONTHS.index(match.group("month").lower()) + 1, int(match.group("day"))))
+        else:
+            years.append(int(match.group("year")))
+
+    if not years:
+        return []
+    if not monthdays and period_end:
+        reported = date.fromisoformat(period_end)
+        monthdays = [(reported.month, reported.day)]
+    if not monthdays:
+        return []
+    if statement != "balance" and not durations:
+        return []
+
+    columns = []
+    group_size = max(1, len(years) // max(1, len(durations)))
+    for position, year in enumerate(years):
+        group = min(position // group_size, max(0, len(durations) - 1))
+        if len(monthdays) == len(years):
+            month, day = monthdays[position]
+        elif len(monthdays) == len(durations):
+            month, day = monthdays[group]
+        else:
+            month, day = monthdays[0]
+        duration = 0 if statement == "balance" else durations[group]
+        try:
+            columns.append((date(year, month, day), duration))
+        except ValueError:
+            return []
+    return columns
+
+
+def _parse_statement(text: str, statement: str, period_end: Optional[str]) -> List[Tuple[str, date, int, float]]:
+    """
+    Извлекает показатели из таблицы отчетности на странице.
+
+    Args:
+        text: Текст страницы, начиная со строки после названия таблицы
+        statement: Тип отчета (income, balance, cash_flow)
+        period_end: Отчетная дата документа
+
+    Returns:
+        Список (показатель, дата окончания периода, длительность, значение)
+    """
+    lines = [line.replace("\xa0", " ").strip() for line in text.splitlines()]
+    scale = 1.0
+    header: List[str] = []
+    columns: List[Tuple[date, int]] = []
+    facts: List[Tuple[str, date, int, float]] = []
+    seen = set()
+    context = ""
+    pending = ""
+
+    for line in lines:
+        if not line:
+            continue
+        label, values = _split_row(line)
+
+        if not columns:
+            lowered = line.lower()
+            if "in thousands" in lowered:
+                scale = 1e3
+            elif "in millions" in lowered:
+                scale = 1e6
+            elif "in billions" in lowered:
+                scale = 1e9
+            if len(values) < 2 or not label:
+                header.append(line)
+                continue
+            columns = _header_columns(" ".join(header), statement, period_end)
+            if not columns:
+                return []
+
+        if len(values) < len(columns):
+            # Строка без чисел: подзаголовок группы или начало многострочной подписи
+            if line[:1].islower() and pending:
+                pending = f"{pending} {line}"
+            else:
+                pending = line
+            context = _normalize_label(pending)
+            continue
+
+        if label[:1].islower() and pending:
+            label = f"{pending} {label}"
+        pending = ""
+
+        name = _normalize_label(label)
+        per_share = ("per share" in context or "per share" in name) and "weighted average" not in context
+        for concept, pattern in _ROW_PATTERNS[statement]:
+            if concept in seen or not pattern.match(name):
+                continue
+            # "Basic"/"Diluted" без пояснения — только внутри блока прибыли на акцию
+            if concept.startswith("eps_") and not per_share:
+                continue
+            seen.add(concept)
+            factor = 1.0 if concept.startswith("eps_") else scale
+            for (end, duration), value in zip(columns, values[-len(columns):]):
+                facts.append((concept, end, duration, value * factor))
+            break
+
+    return facts
+
+
+def _statement_pages(reader) -> Dict[str, int]:
+    """
+    Находит страницы таблиц отчетности: название таблицы — отдельная строка
+    в начале страницы (строки оглавления заканчиваются номером страницы).
+    """
+    pages: Dict[str, int] = {}
+    for number in range(reader.page_count):
+        for line in reader.get_page(number).splitlines()[:8]:
+            line = re.sub(r"\s+", " ", line).strip()
+            for statement, pattern in _STATEMENT_TITLES.items():
+                if statement not in pages and pattern.match(line):
+                    pages[statement] = number
+        if len(pages) == len(_STATEMENT_TITLES):
+            break
+    return pages
+
+
+def extract_table_facts(reader) -> List[Tuple[str, date, int, float]]:
+    """
+    Извлекает показатели из таблиц отчетности PDF.
+
+    Args:
+        reader: FilingReader отчета
+
+    Returns:
+        Список (показатель, дата окончания периода, длительность, значение)
+    """
+    facts = []
+    for statement, page in _statement_pages(reader).items():
+        text = reader.get_page(page)
+        lines = text.splitlines()
+        for position, line in enumerate(lines):
+            if _STATEMENT_TITLES[statement].match(re.sub(r"\s+", " ", line).strip()):
+                facts.extend(_parse_statement("\n".join(lines[position + 1:]), statement,
+                                              reader.index.get("period_end")))
+                break
+    return facts
+
+
+class _InlineXBRLParser(HTMLParser):
+    """Собирает числовые факты ix:nonFraction и контексты периодов из inline XBRL."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.contexts: Dict[str, Tuple[Optional[str], Optional[str], bool]] = {}
+        self.facts: List[Dict[str, Any]] = []
+        self.ticker: Optional[str] = None
+        self._context: Optional[Dict[str, Any]] = None
+        self._field: Optional[str] = None
+        self._fact: Optional[Dict[str, Any]] = None
+        self._fact_depth = 0
+        self._ticker_depth = 0
+        self._ticker_text = ""
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = tag.split(":")[-1]
+        if self._fact is not None:
+            self._fact_depth += 1
+        if self._ticker_depth:
+            self._ticker_depth += 1
+
+        if tag == "ix:nonfraction" and self._fact is None:
+            self._fact = {key: attrs.get(key) or "" for key in ("name", "contextref", "scale", "sign", "format")}
+            self._fact["text"] = ""
+            self._fact_depth = 1
+        elif tag == "ix:nonnumeric" and (attrs.get("name") or "").lower() == "dei:tradingsymbol":
+            self._ticker_depth = 1
+            self._ticker_text = ""
+        elif name == "context":
+            self._context = {"id": attrs.get("id"), "start": None, "end": None, "dimensional": False}
+        elif self._context is not None and name in ("startdate", "enddate", "instant"):
+            self._field = name
+        elif self._context is not None and name == "segment":
+            self._context["dimensional"] = True
+
+    def handle_endtag(self, tag):
+        name = tag.split(":")[-1]
+        if self._fact is not None:
+            self._fact_depth -= 1
+            if self._fact_depth == 0:
+                self.facts.append(self._fact)
+                self._fact = None
+        if self._ticker_depth:
+            self._ticker_depth -= 1
+            if self._ticker_depth == 0 and self.ticker is None:
+                self.ticker = self._ticker_text.strip().upper() or None
+        if name == "context" and self._context is not None:
+            context = self._context
+            self.contexts[context["id"]] = (context["start"], context["end"], context["dimensional"])
+            self._context = None
+        self._field = None
+
+    def handle_data(self, data):
+        if self._fact is not None:
+            self._fact["text"] += data
+        if self._ticker_depth:
+            self._ticker_text += data
+        if self._context is not None and self._field:
+            value = data.strip()
+            if self._field == "startdate":
+                self._context["start"] = value
+            else:
+                self._context["end"] = value
+
+
+def extract_ixbrl_facts(path: str) -> Tuple[Optional[str], List[Tuple[str, date, int, float]]]:
+    """
+    Извлекает показатели из документа inline XBRL.
+
+    Учитываются только контексты без измерений (итоги по компании в целом).
+
+    Args:
+        path: Путь к файлу .htm
+
+    Returns:
+        Кортеж (тикер из dei:TradingSymbol или None, список показателей)
+    """
+    parser = _InlineXBRLParser()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for block in iter(lambda: f.read(1 << 20), ""):
+            parser.feed(block)
+    parser.close()
+
+    facts = []
+    seen = set()
+    for fact in parser.facts:
+        mapped = XBRL_CONCEPTS.get(fact["name"].lower())
+        context = parser.contexts.get(fact["contextref"])
+        if mapped is None or context is None or context[2] or not context[1]:
+            continue
+        concept, sign = mapped
+        text = fact["text"].strip()
+        try:
+            value = 0.0 if "zero" in fact["format"] or text in ("", "—", "-") else float(re.sub(r"[^\d.]", "", text))
+            value *= 10 ** int(fact["scale"] or 0)
+        except ValueError:
+            continue
+        if fact["sign"] == "-":
+            value = -value
+
+        end = date.fromisoformat(context[1][:10])
+        duration = 0
+        if context[0]:
+            start = date.fromisoformat(context[0][:10])
+            duration = max(1, round((end - start).days / 30.44))
+        key = (concept, end, duration)
+        if key not in seen:
+            seen.add(key)
+            facts.append((concept, end, duration, value * sign))
+    return parser.ticker, facts
+
+
+def _add_derived(facts: List[Tuple[str, date, int, float]]) -> List[Tuple[str, date, int, float]]:
+    """
+    Добавляет расчетные показатели: валовую прибыль (если ее нет в отчете),
+    свободный денежный поток и маржинальность.
+    """
+    values = {(concept, end, duration): value for concept, end, duration, value in facts}
+    derived = []
+    periods = {(end, duration) for _, end, duration, _ in facts if duration}
+    for end, duration in periods:
+        def get(concept):
+            return values.get((concept, end, duration))
+
+        revenue, cost = get("revenue"), get("cost_of_revenue")
+        gross = get("gross_profit")
+        if gross is None and revenue is not None and cost is not None:
+            gross = revenue - cost
+            derived.append(("gross_profit", end, duration, gross))
+        operating_cash, capex = get("operating_cash_flow"), get("capex")
+        if operating_cash is not None and capex is not None:
+            derived.append(("free_cash_flow", end, duration, operating_cash + capex))
+        if revenue:
+            for concept, numerator in (("gross_margin", gross), ("operating_margin", get("operating_income")),
+                                       ("net_margin", get("net_income"))):
+                if numerator is not None:
+                    derived.append((concept, end, duration, numerator / revenue))
+    return facts + derived
+
+
+def parse_period(spec: str) -> Tuple[date, Optional[int]]:
+    """
+    Разбирает обозначение периода.
+
+    Поддерживаются календарные кварталы ("Q3 2024"), полугодие ("H1 2024"),
+    девять месяцев ("9M 2024"), год ("FY 2024") и дата ("2024-09-30").
+
+    Args:
+        spec: Обозначение периода
+
+    Returns:
+        Кортеж (дата окончания, длительность в месяцах или None для даты)
+
+    Raises:
+        ValueError: Если обозначение не распознано
+    """
+    text = spec.strip()
+    match = _PERIOD_SPEC_RE.match(text)
+    if match:
+        quarter, half, nine, _, year = match.groups()
+        year = int(year)
+        if quarter:
+            month, day = _QUARTER_ENDS[int(quarter[1])]
+            return date(year, month, day), 3
+        if half:
+            return (date(year, 6, 30), 6) if half[1] == "1" else (date(year, 12, 31), 6)
+        if nine:
+            return date(year, 9, 30), 9
+        return date(year, 12, 31), 12
+    try:
+        return date.fromisoformat(text), None
+    except ValueError:
+        raise ValueError(f"Период '{spec}' не распознан: используйте Q1-Q4 YYYY, H1/H2 YYYY, 9M YYYY, FY YYYY или YYYY-MM-DD")
+
+
+def resolve_concept(name: str) -> str:
+    """
+    Приводит название показателя к ключу CONCEPTS.
+
+    Raises:
+        ValueError: Если показатель неизвестен
+    """
+    key = re.sub(r"\s+", " ", name.strip().lower().replace("-", " "))
+    if key.replace(" ", "_") in CONCEPTS:
+        return key.replace(" ", "_")
+    if key in CONCEPT_ALIASES:
+        return CONCEPT_ALIASES[key]
+    raise ValueError(f"Неизвестный показатель '{name}'. Доступные: {', '.join(CONCEPTS)}")
+
+
+class FactStore:
+    """
+    Показатели всех отчетов в виде столбцов numpy.
+
+    Строки отсортированы по ключу (тикер, показатель, длительность, дата),
+    упакованному в int64; для одного ключа хранится значение из самого
+    позднего отчета (в нем учтены пересчеты прошлых периодов).
+    """
+
+    # Допуск по дате окончания периода: финансовые кварталы некоторых компаний заканчиваются не в последний день месяца
+    DATE_TOLERANCE_DAYS = 7
+
+    def __init__(self, library: Optional[FilingLibrary] = None, filings_dir: str = FILINGS_DIR,
+                 index_dir: str = FILINGS_INDEX_DIR):
+        """
+        Инициализирует хранилище.
+
+        Args:
+            library: Каталог PDF-отчетов (по умолчанию общий)
+            filings_dir: Каталог отчетов (PDF и .htm с inline XBRL)
+            index_dir: Каталог для файла хранилища
+        """
+        self._library = library
+        self.filings_dir = filings_dir
+        self.index_dir = index_dir
+        self._signature: Optional[str] = None
+        self._lock = threading.Lock()
+        self._set_columns({})
+
+    @property
+    def library(self) -> FilingLibrary:
+        if self._library is None:
+            self._library = get_filing_library()
+        return self._library
+
+    def _set_columns(self, data: Dict[str, np.ndarray]) -> None:
+        self.tickers: List[str] = [str(item) for item in data.get("tickers", [])]
+        self.concepts: List[str] = [str(item) for item in data.get("concepts", [])]
+        self.filings: List[str] = [str(item) for item in data.get("filings", [])]
+        self.keys: np.ndarray = data.get("keys", np.empty(0, dtype=np.int64))
+        self.values: np.ndarray = data.get("values", np.empty(0, dtype=np.float64))
+        self.filing_ids: np.ndarray = data.get("filing_ids", np.empty(0, dtype=np.int32))
+        self._ticker_codes = {ticker: code for code, ticker in enumerate(self.tickers)}
+        self._concept_codes = {concept: code for code, concept in enumerate(self.concepts)}
+
+    @staticmethod
+    def _pack(ticker: np.ndarray, concept: np.ndarray, duration: np.ndarray, day: np.ndarray) -> np.ndarray:
+        return ((ticker.astype(np.int64) * 256 + concept) * 16 + duration) * 100000 + day
+
+    def _sources(self) -> List[Tuple[str, str]]:
+        """
+        Возвращает отчеты каталога: (имя файла, тип) для PDF и inline XBRL.
+        """
+        sources = [(name, "pdf") for name in self.library.list_files()]
+        if os.path.isdir(self.filings_dir):
+            sources += [(name, "ixbrl") for name in sorted(os.listdir(self.filings_dir))
+                        if name.lower().endswith((".htm", ".html", ".xhtml"))]
+        return sources
+
+    def _current_signature(self, sources: List[Tuple[str, str]]) -> str:
+        digest = hashlib.sha256(f"v{FACTS_VERSION}".encode())
+        for name, _ in sources:
+            stat = os.stat(os.path.join(self.filings_dir, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime}".encode())
+        return digest.hexdigest()[:16]
+
+    def refresh(self) -> bool:
+        """
+        Приводит хранилище в соответствие с каталогом отчетов.
+
+        Returns:
+            True, если набор отчетов изменился и хранилище было перестроено или загружено
+        """
+        sources = self._sources()
+        signature = self._current_signature(sources)
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            if signature == self._signature:
+                return False
+            path = os.path.join(self.index_dir, f"facts-{signature}.npz")
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    self._set_columns({key: data[key] for key in data.files})
+            except (OSError, ValueError, KeyError):
+                self._set_columns(self._build(sources))
+                self._save(path)
+            self._signature = signature
+        return True
+
+    def _extract(self, name: str, kind: str) -> Tuple[Optional[str], Optional[str], List[Tuple[str, date, int, float]]]:
+        """
+        Извлекает показатели одного отчета: (тикер, отчетная дата, показатели).
+        """
+        if kind == "ixbrl":
+            ticker, facts = extract_ixbrl_facts(os.path.join(self.filings_dir, name))
+            ticker = ticker or re.split(r"[_\-]", name)[0].upper()
+            period_end = max((end for _, end, _, _ in facts), default=None)
+            return ticker, period_end.isoformat() if period_end else None, facts
+        reader = self.library.get_reader(name)
+        return reader.index["ticker"], reader.index.get("period_end"), extract_table_facts(reader)
+
+    def _build(self, sources: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+        """
+        Извлекает показатели из всех отчетов и собирает отсортированные столбцы.
+        """
+        started = datetime.now()
+        tickers: Dict[str, int] = {}
+        concepts = {concept: code for code, concept in enumerate(CONCEPTS)}
+        filings: List[str] = []
+        rows: List[Tuple[int, int, int, int, float, int, str]] = []
+        digests = set()
+
+        for name, kind in sources:
+            try:
+                if kind == "pdf":
+                    digest = self.library.get_reader(name).digest
+                else:
+                    digest = _file_digest(os.path.join(self.filings_dir, name))
+                # Одинаковые по содержимому файлы разбираются один раз
+                if digest in digests:
+                    continue
+                digests.add(digest)
+                ticker, period_end, facts = self._extract(name, kind)
+            except (FilingError, OSError, ValueError) as e:
+                logger.warning(f"Financial facts of {name} skipped: {str(e)}")
+                continue
+
+            filing_id = len(filings)
+            filings.append(name)
+            ticker_code = tickers.setdefault(ticker, len(tickers))
+            for concept, end, duration, value in _add_derived(facts):
+                rows.append((ticker_code, concepts[concept], duration, (end - _EPOCH).days,
+                             value, filing_id, period_end or ""))
+
+        if rows:
+            columns = list(zip(*rows))
+            keys = self._pack(np.array(columns[0]), np.array(columns[1]), np.array(columns[2]), np.array(columns[3]))
+            values = np.array(columns[4], dtype=np.float64)
+            filing_ids = np.array(columns[5], dtype=np.int32)
+            reported = np.array(columns[6])
+            # Сортировка по ключу, внутри ключа — от более позднего отчета; первая строка ключа остается
+            rank = np.unique(reported, return_inverse=True)[1]
+            order = np.lexsort((-rank, keys))
+            keys, values, filing_ids = keys[order], values[order], filing_ids[order]
+            first = np.ones(len(keys), dtype=bool)
+            first[1:] = keys[1:] != keys[:-1]
+            keys, values, filing_ids = keys[first], values[first], filing_ids[first]
+        else:
+            keys = np.empty(0, dtype=np.int64)
+            values = np.empty(0, dtype=np.float64)
+            filing_ids = np.empty(0, dtype=np.int32)
+
+        metrics.increment("financial_facts_built")
+        logger.info(f"Financial facts store built: {len(keys)} facts from {len(filings)} filings "
+                    f"in {(datetime.now() - started).total_seconds():.1f}s")
+        return {
+            "tickers": np.array(list(tickers), dtype=str),
+            "concepts": np.array(list(concepts), dtype=str),
+            "filings": np.array(filings, dtype=str),
+            "keys": keys,
+            "values": values,
+            "filing_ids": filing_ids,
+        }
+
+    def _save(self, path: str) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, tickers=np.array(self.tickers, dtype=str), concepts=np.array(self.concepts, dtype=str),
+                 filings=np.array(self.filings, dtype=str), keys=self.keys, values=self.values,
+                 filing_ids=self.filing_ids)
+        os.replace(temp_path, path)
+        # Файлы прежних наборов отчетов больше не нужны
+        for name in os.listdir(self.index_dir):
+            if name.startswith("facts-") and name.endswith(".npz") and os.path.join(self.index_dir, name) != path:
+                try:
+                    os.remove(os.path.join(self.index_dir, name))
+                except OSError:
+                    pass
+
+    def lookup(self, ticker: str, concepts: List[str], periods: List[Tuple[date, Optional[int]]]) -> np.ndarray:
+        """
+        Находит значения показателей за периоды одним векторным поиском.
+
+        Args:
+            ticker: Тикер компании
+            concepts: Ключи CONCEPTS
+            periods: Периоды из parse_period; для моментных показателей длительность
+                не учитывается, для остальных по умолчанию квартал
+
+        Returns:
+            Массив индексов строк формы (len(concepts), len(periods)); -1 — значения нет
+        """
+        ticker_code = self._ticker_codes.get(ticker.upper())
+        result = np.full((len(concepts), len(periods)), -1, dtype=np.int64)
+        if ticker_code is None or not len(self.keys):
+            return result
+
+        concept_codes = np.array([self._concept_codes.get(concept, -1) for concept in concepts])
+        instant = np.array([CONCEPTS[concept][1] for concept in concepts])
+        days = np.array([(end - _EPOCH).days for end, _ in periods])
+        durations = np.array([duration or 3 for _, duration in periods])
+
+        codes = np.repeat(concept_codes, len(periods))
+        day_grid = np.tile(days, len(concepts))
+        duration_grid = np.where(np.repeat(instant, len(periods)), 0, np.tile(durations, len(concepts)))
+        tickers = np.full(codes.shape, ticker_code)
+        tolerance = self.DATE_TOLERANCE_DAYS
+
+        low = np.searchsorted(self.keys, self._pack(tickers, codes, duration_grid, day_grid - tolerance), "left")
+        high = np.searchsorted(self.keys, self._pack(tickers, codes, duration_grid, day_grid + tolerance), "right")
+        found = (high > low) & (codes >= 0)
+        # Из нескольких дат в пределах допуска выбирается ближайшая
+        exact = np.searchsorted(self.keys, self._pack(tickers, codes, duration_grid, day_grid), "left")
+        nearest = np.clip(exact, low, np.maximum(low, high - 1))
+        previous = np.maximum(nearest - 1, low)
+        target = self._pack(tickers, codes, duration_grid, day_grid)
+        take_previous = np.abs(self.keys[np.minimum(previous, len(self.keys) - 1)] - target) < \
+            np.abs(self.keys[np.minimum(nearest, len(self.keys) - 1)] - target)
+        rows = np.where(take_previous, previous, nearest)
+        result.flat[:] = np.where(found, rows, -1)
+        return result
+
+    def available_periods(self, ticker: str, concept: str, limit: int = 8) -> List[Tuple[date, int]]:
+        """
+        Возвращает периоды, за которые есть значение показателя (новые первыми).
+        """
+        ticker_code = self._ticker_codes.get(ticker.upper())
+        concept_code = self._concept_codes.get(concept)
+        if ticker_code is None or concept_code is None:
+            return []
+        low = np.searchsorted(self.keys, self._pack(np.array(ticker_code), np.array(concept_code), np.array(0), np.array(0)))
+        high = np.searchsorted(self.keys, self._pack(np.array(ticker_code), np.array(concept_code + 1), np.array(0), np.array(0)))
+        rows = self.keys[low:high]
+        days = rows % 100000
+        durations = (rows // 100000) % 16
+        # Для потоковых показателей сначала кварталы
+        order = np.lexsort((-days, durations != 3))
+        return [self.row_period(int(low + i)) for i in order[:limit]]
+
+    def row(self, index: int) -> Tuple[float, str]:
+        """
+        Возвращает (значение, имя файла отчета) строки хранилища.
+        """
+        return float(self.values[index]), self.filings[int(self.filing_ids[index])]
+
+    def row_period(self, index: int) -> Tuple[date, int]:
+        key = int(self.keys[index])
+        return date.fromordinal(_EPOCH.toordinal() + key % 100000), (key // 100000) % 16
+
+
+# Синглтон хранилища создается при первом обращении
+_store: Optional[FactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_fact_store() -> FactStore:
+    """
+    Возвращает синглтон хранилища показателей, актуальный относительно каталога отчетов.
+
+    Returns:
+        Экземпляр FactStore
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FactStore()
+    _store.refresh()
+    return _store
@@ -0,0 +1,582 @@
+"""
+Чтение отчетов (10-Q/10-K) из каталога downloaded_filings по страницам и разделам.
+
+Для каждого PDF один раз строится постоянный индекс: текст страниц
+сохраняется в UTF-8 файл рядом с описанием (смещения страниц в байтах,
+разделы Part/Item с границами, метаданные отчета). Дальнейшие запросы
+не разбирают PDF: нужные страницы читаются из текстового файла через
+memory map, а декодированные страницы хранятся в общем LRU-кэше.
+
+Индекс привязан к хэшу содержимого файла, поэтому одинаковые файлы
+с разными именами используют один индекс.
+"""
+
+import os
+import re
+import json
+import mmap
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from config import FILINGS_DIR, FILINGS_INDEX_DIR, FILING_PAGE_CACHE
+from utils import metrics
+from utils.singleflight import SingleFlight
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Версия формата индекса; при изменении разбора индексы строятся заново
+INDEX_VERSION = 1
+
+# Стандартные разделы формы 10-Q: (часть, пункт) -> название
+FORM_10Q_ITEMS = {
+    ("I", "1"): "Financial Statements",
+    ("I", "2"): "Management's Discussion and Analysis of Financial Condition and Results of Operations",
+    ("I", "3"): "Quantitative and Qualitative Disclosures About Market Risk",
+    ("I", "4"): "Controls and Procedures",
+    ("II", "1"): "Legal Proceedings",
+    ("II", "1A"): "Risk Factors",
+    ("II", "2"): "Unregistered Sales of Equity Securities and Use of Proceeds",
+    ("II", "3"): "Defaults Upon Senior Securities",
+    ("II", "4"): "Mine Safety Disclosures",
+    ("II", "5"): "Other Information",
+    ("II", "6"): "Exhibits",
+}
+
+# Короткие названия разделов, которыми их обычно запрашивают
+SECTION_ALIASES = {
+    "financial statements": ("I", "1"),
+    "financials": ("I", "1"),
+    "mda": ("I", "2"),
+    "md&a": ("I", "2"),
+    "management discussion": ("I", "2"),
+    "market risk": ("I", "3"),
+    "controls": ("I", "4"),
+    "legal": ("II", "1"),
+    "legal proceedings": ("II", "1"),
+    "risk factors": ("II", "1A"),
+    "risks": ("II", "1A"),
+    "exhibits": ("II", "6"),
+}
+
+_PART_RE = re.compile(r"^PART\s+(I{1,2})\b\.?", re.IGNORECASE)
+_ITEM_RE = re.compile(r"^ITEM\s+(\d+[AB]?)\s*\.", re.IGNORECASE)
+# Строка оглавления заканчивается номером страницы
+_TOC_LINE_RE = re.compile(r"\s\d{1,3}$")
+_PERIOD_RE = re.compile(r"(?:quarterly|fiscal year|annual)\s+period\s+ended\s+([A-Z][a-z]+\s+\d{1,2},\s*\d{4})", re.IGNORECASE)
+_DOC_ID_RE = re.compile(r"^([a-z]{1,6})-(\d{8})$")
+
+
+class FilingError(Exception):
+    """Отчет не найден или не может быть прочитан."""
+
+
+def _normalize(text: str) -> str:
+    return text.replace("\xa0", " ").replace("’", "'").strip()
+
+
+def _file_digest(path: str) -> str:
+    """
+    Хэш содержимого файла (ключ индекса).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _filing_metadata(file_name: str, title: str, first_page: str) -> Dict[str, Any]:
+    """
+    Определяет компанию, форму и отчетный период.
+
+    Приоритет: идентификатор документа EDGAR в заголовке PDF (например,
+    tsla-20240930), затем текст титульной страницы и имя файла.
+    """
+    ticker = period_end = None
+    match = _DOC_ID_RE.match((title or "").strip().lower())
+    if match:
+        ticker = match.group(1).upper()
+        period_end = datetime.strptime(match.group(2), "%Y%m%d").date().isoformat()
+
+    if period_end is None:
+        match = _PERIOD_RE.search(_normalize(first_page))
+        if match:
+            try:
+                period_end = datetime.strptime(re.sub(r"\s+", " ", match.group(1)), "%B %d, %Y").date().isoformat()
+            except ValueError:
+                pass
+
+    if ticker is None:
+        ticker = re.split(r"[_\-]", file_name)[0].upper()
+
+    form = "10-K" if re.search(r"FORM\s+10-K", first_page) else "10-Q"
+    return {"ticker": ticker, "form": form, "period_end": period_end}
+
+
+def _item_part(item: str, title: str, current_part: str) -> str:
+    """
+    Определяет часть отчета по названию пункта: номера пунктов в частях I и II
+    повторяются, а заголовок части есть не во всех отчетах.
+    """
+    title = title.lower()
+    for part in ("I", "II"):
+        canonical = FORM_10Q_ITEMS.get((part, item))
+        if canonical and canonical.split()[0].lower() in title:
+            return part
+    return current_part
+
+
+def _find_sections(pages: List[str]) -> List[Dict[str, Any]]:
+    """
+    Находит заголовки Part/Item в тексте страниц.
+
+    Строки оглавления (с номером страницы в конце) пропускаются; если
+    заголовок встречается несколько раз, берется последнее вхождение
+    (оглавление предшествует тексту).
+
+    Args:
+        pages: Текст страниц
+
+    Returns:
+        Список разделов с полями part, item, title, page, char (в порядке следования)
+    """
+    found: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    part = "I"
+    for page_number, text in enumerate(pages):
+        position = 0
+        for raw_line in text.splitlines(keepends=True):
+            line = _normalize(raw_line)
+            char = position
+            position += len(raw_line)
+
+            match = _PART_RE.match(line)
+            if match:
+                part = match.group(1).upper()
+                continue
+            match = _ITEM_RE.match(line)
+            if not match or _TOC_LINE_RE.search(line):
+                continue
+            item = match.group(1).upper()
+            heading = line[match.end():].strip()
+            part = _item_part(item, heading, part)
+            found[(part, item)] = {
+                "part": part,
+                "item": item,
+                "title": FORM_10Q_ITEMS.get((part, item), heading[:120]),
+                "page": page_number,
+                "char": char,
+            }
+    return sorted(found.values(), key=lambda section: (section["page"], section["char"]))
+
+
+class _PageCache:
+    """Общий LRU-кэш декодированных страниц всех отчетов."""
+
+    def __init__(self, max_pages: int):
+        self._pages: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._max_pages = max_pages
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]) -> Optional[str]:
+        with self._lock:
+            text = self._pages.get(key)
+            if text is not None:
+                self._pages.move_to_end(key)
+            return text
+
+    def put(self, key: Tuple[str, int], text: str) -> None:
+        with self._lock:
+            self._pages[key] = text
+            self._pages.move_to_end(key)
+            while len(self._pages) > self._max_pages:
+                self._pages.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+_page_cache = _PageCache(FILING_PAGE_CACHE)
+
+
+class FilingReader:
+    """Доступ к страницам и разделам одного отчета по построенному индексу."""
+
+    def __init__(self, index: Dict[str, Any], text_path: str):
+        """
+        Открывает текст отчета.
+
+        Args:
+            index: Описание индекса
+            text_path: Путь к файлу с текстом страниц
+        """
+        self.index = index
+        self.digest = index["digest"]
+        # Закрытие (при замене отчета новой версией) не должно совпасть с чтением страницы
+        self._lock = threading.Lock()
+        self._closed = False
+        self._file = open(text_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    @property
+    def page_count(self) -> int:
+        return len(self.index["page_offsets"]) - 1
+
+    @property
+    def sections(self) -> List[Dict[str, Any]]:
+        return self.index["sections"]
+
+    def _slice(self, start: int, end: int) -> str:
+        with self._lock:
+            if self._closed:
+                raise FilingError(f"Отчет {self.index['file']} был обновлен, запросите его заново")
+            if self._map is None:
+                return ""
+            return self._map[start:end].decode("utf-8")
+
+    def get_page(self, page: int) -> str:
+        """
+        Возвращает текст страницы (нумерация с 0).
+
+        Args:
+            page: Номер страницы
+
+        Returns:
+            Текст страницы
+
+        Raises:
+            FilingError: Если страницы нет
+        """
+        if not 0 <= page < self.page_count:
+            raise FilingError(f"Страница {page} вне диапазона 0-{self.page_count - 1}")
+
+        key = (self.digest, page)
+        text = _page_cache.get(key)
+        metrics.record_cache("filing_pages", hit=text is not None)
+        if text is None:
+            offsets = self.index["page_offsets"]
+            text = self._slice(offsets[page], offsets[page + 1])
+            _page_cache.put(key, text)
+        return text
+
+    def get_pages(self, start: int, end: int) -> List[str]:
+        """
+        Возвращает текст диапазона страниц [start, end].
+        """
+        return [self.get_page(page) for page in range(start, end + 1)]
+
+    def find_section(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Находит раздел по номеру пункта ("1A", "Item 2", "II.1"), псевдониму ("mda",
+        "risk factors") или части названия.
+
+        Args:
+            name: Обозначение раздела
+
+        Returns:
+            Описание раздела или None
+        """
+        query = _normalize(name).lower()
+        key = SECTION_ALIASES.get(query)
+
+        if key is None:
+            match = re.match(r"^(?:part\s*)?(i{1,2})?[\s.,:-]*(?:item\s*)?(\d+[ab]?)$", query)
+            if match:
+                key = ((match.group(1) or "").upper(), match.group(2).upper())
+
+        for section in self.sections:
+            if key is not None:
+                part, item = key
+                if section["item"] == item and (not part or section["part"] == part):
+                    return section
+            elif query and query in section["title"].lower():
+                return section
+        return None
+
+    def section_text(self, section: Dict[str, Any]) -> str:
+        """
+        Возвращает текст раздела: от его заголовка до начала следующего.
+
+        Args:
+            section: Описание раздела из sections
+
+        Returns:
+            Текст раздела
+        """
+        # Декодированные страницы берутся из кэша; крайние страницы обрезаются по заголовкам
+        pages = self.get_pages(section["page"], section["end_page"])
+        if len(pages) == 1:
+            return pages[0][section["char"]:section["end_char"]]
+        return "".join([pages[0][section["char"]:]] + pages[1:-1] + [pages[-1][:section["end_char"]]])
+
+    def close(self) -> None:
+        """
+        Освобождает memory map и файл текста (повторный вызов ничего не делает).
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+
+
+class FilingLibrary:
+    """Каталог отчетов с постоянными индексами."""
+
+    def __init__(self, filings_dir: str = FILINGS_DIR, index_dir: str = FILINGS_INDEX_DIR):
+        """
+        Инициализирует каталог.
+
+        Args:
+            filings_dir: Каталог с PDF
+            index_dir: Каталог индексов
+        """
+        self.filings_dir = filings_dir
+        self.index_dir = index_dir
+        self._readers: Dict[str, FilingReader] = {}
+        # Файл -> (размер, mtime, хэш), чтобы не хэшировать PDF на каждом запросе
+        self._digests: Dict[str, Tuple[int, float, str]] = {}
+        self._lock = threading.Lock()
+        # Одновременные запросы к еще не проиндексированному отчету строят индекс один раз
+        self._flight = SingleFlight("filing_index")
+        os.makedirs(index_dir, exist_ok=True)
+
+    def list_files(self) -> List[str]:
+        """
+        Возвращает имена PDF в каталоге отчетов.
+        """
+        if not os.path.isdir(self.filings_dir):
+            return []
+        return sorted(name for name in os.listdir(self.filings_dir) if name.lower().endswith(".pdf"))
+
+    def resolve(self, name: str) -> str:
+        """
+        Находит файл отчета по имени (без учета регистра и расширения).
+
+        Args:
+            name: Имя файла
+
+        Returns:
+            Имя файла в каталоге
+
+        Raises:
+            FilingError: Если отчет не найден
+        """
+        files = self.list_files()
+        wanted = os.path.basename(name).lower()
+        for file_name in files:
+            if file_name.lower() in (wanted, f"{wanted}.pdf"):
+                return file_name
+        raise FilingError(f"Отчет '{name}' не найден. Доступные отчеты: {', '.join(files)}")
+
+    def _digest(self, file_name: str) -> str:
+        path = os.path.join(self.filings_dir, file_name)
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(file_name)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime):
+            return cached[2]
+
+        # Хэшируем вне блокировки: PDF может быть большим
+        digest = _file_digest(path)
+        with self._lock:
+            previous = self._digests.get(file_name)
+            self._digests[file_name] = (stat.st_size, stat.st_mtime, digest)
+            stale = self._evict_reader(previous[2]) if previous and previous[2] != digest else None
+
+        if stale is not None:
+            stale.close()
+            logger.info(f"Filing {file_name} changed: reader {stale.digest} closed")
+        return digest
+
+    def _evict_reader(self, digest: str) -> Optional[FilingReader]:
+        """
+        Убирает из кэша читатель версии отчета, на которую больше не ссылается ни один файл.
+
+        Вызывается под self._lock.
+
+        Args:
+            digest: Хэш прежней версии файла
+
+        Returns:
+            Читатель, который нужно закрыть, или None
+        """
+        if any(entry[2] == digest for entry in self._digests.values()):
+            return None
+        return self._readers.pop(digest, None)
+
+    def get_reader(self, name: str) -> FilingReader:
+        """
+        Возвращает читатель отчета, при необходимости построив индекс.
+
+        Args:
+            name: Имя файла отчета
+
+        Returns:
+            Экземпляр FilingReader
+
+        Raises:
+            FilingError: Если отчет не найден или не читается
+        """
+        file_name = self.resolve(name)
+        digest = self._digest(file_name)
+
+        with self._lock:
+            reader = self._readers.get(digest)
+        if reader is not None:
+            return reader
+
+        return self._flight.do(digest, self._open_reader, file_name, digest)
+
+    def _open_reader(self, file_name: str, digest: str) -> FilingReader:
+        with self._lock:
+            reader = self._readers.get(digest)
+            if reader is not None:
+                return reader
+
+        index_path = os.path.join(self.index_dir, f"{digest}.json")
+        text_path = os.path.join(self.index_dir, f"{digest}.txt")
+        index = self._load_index(index_path)
+        if index is None:
+            index = self._build_index(file_name, digest, index_path, text_path)
+
+        reader = FilingReader(index, text_path)
+        with self._lock:
+            # Файл мог измениться, пока строился индекс: такую версию не кэшируем
+            if any(entry[2] == digest for entry in self._digests.values()):
+                self._readers[digest] = reader
+        return reader
+
+    @staticmethod
+    def _load_index(index_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Filing index {index_path} is corrupted and will be rebuilt: {str(e)}")
+            return None
+        return index if index.get("version") == INDEX_VERSION else None
+
+    def _build_index(self, file_name: str, digest: str, index_path: str, text_path: str) -> Dict[str, Any]:
+        """
+        Разбирает PDF один раз: сохраняет текст страниц и описание разделов.
+        """
+        if PdfReader is None:
+            raise FilingError("Для индексации отчетов требуется пакет pypdf")
+
+        started = datetime.now()
+        try:
+            pdf = PdfReader(os.path.join(self.filings_dir, file_name))
+            pages = [page.extract_text() or "" for page in pdf.pages]
+            title = (pdf.metadata or {}).get("/Title", "") if pdf.metadata else ""
+        except Exception as e:
+            raise FilingError(f"Не удалось прочитать PDF {file_name}: {str(e)}")
+
+        # Текст страниц подряд; смещения в байтах для чтения через memory map
+        encoded = [text.encode("utf-8") for text in pages]
+        page_offsets = [0]
+        for data in encoded:
+            page_offsets.append(page_offsets[-1] + len(data))
+
+        sections = _find_sections(pages)
+        for number, section in enumerate(sections):
+            following = sections[number + 1] if number + 1 < len(sections) else None
+            section["end_page"] = following["page"] if following else len(pages) - 1
+            section["end_char"] = following["char"] if following else len(pages[-1])
+            # Следующий раздел начинается с начала страницы — текущий заканчивается на предыдущей
+            if following and following["char"] == 0 and following["page"] > section["page"]:
+                section["end_page"] = following["page"] - 1
+                section["end_char"] = len(pages[section["end_page"]])
+
+        index = {
+            "version": INDEX_VERSION,
+            "digest": digest,
+            "file": file_name,
+            **_filing_metadata(file_name, title, pages[0] if pages else ""),
+            "page_offsets": page_offsets,
+            "sections": sections,
+            "indexed_at": started.isoformat(timespec="seconds"),
+        }
+
+        temp_text = f"{text_path}.tmp"
+        with open(temp_text, "wb") as f:
+            for data in encoded:
+                f.write(data)
+        os.replace(temp_text, text_path)
+
+        temp_index = f"{index_path}.tmp"
+        with open(temp_index, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_index, index_path)
+
+        metrics.increment("filing_indexed")
+        logger.info(f"Filing {file_name} indexed: {len(pages)} pages, {len(sections)} sections "
+                    f"in {(datetime.now() - started).total_seconds():.1f}s")
+        return index
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает описание всех отчетов (строит недостающие индексы).
+
+        Одинаковые по содержимому файлы объединяются, остальные имена
+        перечисляются в поле aliases.
+
+        Returns:
+            Список отчетов с компанией, формой, периодом, числом страниц и разделами
+        """
+        filings: Dict[str, Dict[str, Any]] = {}
+        for file_name in self.list_files():
+            try:
+                reader = self.get_reader(file_name)
+            except FilingError as e:
+                logger.warning(str(e))
+                continue
+            if reader.digest in filings:
+                filings[reader.digest]["aliases"].append(file_name)
+                continue
+            filings[reader.digest] = {
+                "file": file_name,
+                "aliases": [],
+                "ticker": reader.index["ticker"],
+                "form": reader.index["form"],
+                "period_end": reader.index["period_end"],
+                "pages": reader.page_count,
+                "sections": [f"Part {section['part']} Item {section['item']}. {section['title']}"
+                             for section in reader.sections],
+            }
+        return list(filings.values())
+
+
+# Синглтон каталога создается при первом обращении
+_library: Optional[FilingLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_filing_library() -> FilingLibrary:
+    """
+    Возвращает синглтон каталога отчетов.
+
+    Returns:
+        Экземпляр FilingLibrary
+    """
+    global _library
+
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = FilingLibrary()
+    return _library
@@ -0,0 +1,441 @@
+"""
+Очередь фоновых задач мастер-агента.
+
+Тяжелые запросы (сравнение нескольких отчетов, большие выборки из базы бота)
+выполняются вне HTTP-запроса: задача сохраняется в локальную SQLite-очередь,
+пул рабочих потоков забирает ее, записывает события прогресса и результат.
+Незавершенные задачи переживают перезапуск процесса и возвращаются в очередь.
+
+Выполняемая задача принадлежит процессу (owner_pid) на время аренды
+(lease_until), которую рабочий поток продлевает, пока задача выполняется.
+В очередь возвращаются только задачи, чей процесс завершился или чья аренда
+истекла: при плавной замене процессов (USR2) задачи, которые дорабатывают
+старые процессы, повторно не запускаются.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Set, Any, Optional, Callable
+
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Статусы задач
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Интервал опроса очереди простаивающими рабочими (сек)
+POLL_INTERVAL = 1.0
+
+# Срок аренды выполняемой задачи по умолчанию (сек)
+DEFAULT_LEASE_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    query TEXT NOT NULL,
+    history TEXT NOT NULL,       -- JSON-список сообщений на момент постановки в очередь
+    session_id TEXT,
+    progress TEXT NOT NULL,      -- JSON-список событий прогресса
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner_pid INTEGER,           -- процесс, выполняющий задачу
+    lease_until REAL             -- время окончания аренды выполняемой задачи
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# Столбцы, добавленные после первой версии схемы: имя -> тип
+_ADDED_COLUMNS = {"owner_pid": "INTEGER", "lease_until": "REAL"}
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """
+    Проверяет, выполняется ли процесс с указанным PID на этой машине.
+
+    Args:
+        pid: Идентификатор процесса
+
+    Returns:
+        True, если процесс существует (на Windows проверка не выполняется)
+    """
+    if not pid:
+        return False
+    if os.name == "nt":
+        # os.kill на Windows завершает процесс; полагаемся только на аренду
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Хранилище задач в SQLite."""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """
+        Открывает (и при необходимости создает) базу задач.
+
+        Args:
+            path: Путь к файлу SQLite
+            lease_seconds: Срок аренды выполняемой задачи
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["history"] = json.loads(job["history"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def create(self, query: str, history: List[Dict[str, str]], session_id: Optional[str] = None) -> str:
+        """
+        Добавляет задачу в очередь.
+
+        Args:
+            query: Запрос пользователя
+            history: История разговора
+            session_id: Идентификатор сессии веб-интерфейса
+
+        Returns:
+            Идентификатор задачи
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, query, history, session_id, progress, created_at) "
+                "VALUES (?, ?, ?, ?, ?, '[]', ?)",
+                (job_id, STATUS_QUEUED, query, json.dumps(history, ensure_ascii=False), session_id, time.time())
+            )
+        return job_id
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Атомарно забирает самую старую задачу из очереди.
+
+        Returns:
+            Задача или None, если очередь пуста
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (STATUS_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, owner_pid = ?, lease_until = ? WHERE id = ?",
+                        (STATUS_RUNNING, now, os.getpid(), now + self.lease_seconds, row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._row_to_job(row) if row is not None else None
+
+    def add_progress(self, job_id: str, event: Dict[str, Any]) -> None:
+        """
+        Добавляет событие прогресса к задаче.
+
+        Args:
+            job_id: Идентификатор задачи
+            event: Событие прогресса
+        """
+        event = dict(event, time=time.time())
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = json_insert(progress, '$[#]', json(?)) WHERE id = ?",
+                (json.dumps(event, ensure_ascii=False), job_id)
+            )
+
+    def finish(self, job_id: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        """
+        Сохраняет результат или ошибку задачи.
+
+        Args:
+            job_id: Идентификатор задачи
+            result: Ответ мастер-агента
+            error: Текст ошибки
+        """
+        status = STATUS_FAILED if error is not None else STATUS_DONE
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает задачу по идентификатору.
+
+        Args:
+            job_id: Идентификатор задачи
+
+        Returns:
+            Задача или None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def count_by_status(self) -> Dict[str, int]:
+        """
+        Возвращает количество задач по статусам.
+
+        Returns:
+            Словарь статус -> количество
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def renew_leases(self, job_ids: List[str]) -> None:
+        """
+        Продлевает аренду задач, выполняемых текущим процессом.
+
+        Args:
+            job_ids: Идентификаторы выполняемых задач
+        """
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE status = ? AND owner_pid = ? AND id IN ({placeholders})",
+                (time.time() + self.lease_seconds, STATUS_RUNNING, os.getpid(), *job_ids)
+            )
+
+    def requeue_interrupted(self) -> int:
+        """
+        Возвращает в очередь задачи, прерванные остановкой или сбоем процесса.
+
+        Задача считается прерванной, если ее процесс завершился или аренда
+        истекла; задачи живых процессов с действующей арендой не трогаются.
+
+        Returns:
+            Количество возвращенных задач
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner_pid, lease_until FROM jobs WHERE status = ?", (STATUS_RUNNING,)
+            ).fetchall()
+            expired = [row["id"] for row in rows
+                       if row["lease_until"] is None or row["lease_until"] < now or not _pid_alive(row["owner_pid"])]
+            requeued = 0
+            for job_id in expired:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = NULL, owner_pid = NULL, lease_until = NULL "
+                    "WHERE id = ? AND status = ?",
+                    (STATUS_QUEUED, job_id, STATUS_RUNNING)
+                )
+                requeued += cursor.rowcount
+        return requeued
+
+
+class JobQueue:
+    """Пул рабочих потоков, обрабатывающих задачи из JobStore."""
+
+    def __init__(self, store: JobStore,
+                 handler: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], str],
+                 workers: int = 2,
+                 on_complete: Optional[Callable[[Dict[str, Any], Optional[str], Optional[str]], None]] = None):
+        """
+        Инициализирует очередь.
+
+        Args:
+            store: Хранилище задач
+            handler: Функция (задача, report_progress) -> результат
+            workers: Количество рабочих потоков
+            on_complete: Обработчик (задача, результат, ошибка) после завершения задачи
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.on_complete = on_complete
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        # Задачи, выполняемые потоками этого процесса (их аренда продлевается)
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self, requeue_interrupted: bool = True) -> None:
+        """
+        Запускает рабочие потоки (повторный вызов ничего не делает).
+
+        Args:
+            requeue_interrupted: Сразу вернуть в очередь задачи, прерванные прошлой
+                остановкой (в многопроцессном режиме это делает главный процесс).
+                Позже задачи с истекшей арендой возвращает поток продления аренды.
+        """
+        with self._start_lock:
+            if self._threads:
+                return
+            requeued = self.store.requeue_interrupted() if requeue_interrupted else 0
+            if requeued:
+                logger.info(f"Requeued {requeued} interrupted jobs")
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"zai-job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._lease_loop, name="zai-job-lease", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            metrics.register_gauge("jobs", self.store.count_by_status)
+            metrics.register_gauge("job_workers", lambda: {"busy": len(self._running), "capacity": self.workers})
+            logger.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает рабочие потоки после завершения текущих задач.
+
+        Args:
+            timeout: Максимальное время ожидания каждого потока
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, query: str, history: List[Dict[str, str]], session_id: Optional[str] = None) -> str:
+        """
+        Ставит запрос мастер-агенту в очередь.
+
+        Args:
+            query: Запрос пользователя
+            history: История разговора
+            session_id: Идентификатор сессии веб-интерфейса
+
+        Returns:
+            Идентификатор задачи
+        """
+        self.start()
+        job_id = self.store.create(query, history, session_id)
+        metrics.increment("jobs_submitted")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает задачу по идентификатору.
+
+        Args:
+            job_id: Идентификатор задачи
+
+        Returns:
+            Задача или None
+        """
+        return self.store.get(job_id)
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _lease_loop(self) -> None:
+        """
+        Продлевает аренду выполняемых задач и возвращает в очередь задачи упавших процессов.
+        """
+        while not self._stopping.wait(self.store.lease_seconds / 3):
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                self.store.renew_leases(running)
+                if self.store.requeue_interrupted():
+                    self._wakeup.set()
+            except Exception:
+                logger.exception("Job lease renewal failed")
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            self._execute(job)
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+
+        def report_progress(event: Dict[str, Any]) -> None:
+            self.store.add_progress(job_id, event)
+
+        started = time.perf_counter()
+        result, error = None, None
+        report_progress({"stage": "started"})
+        try:
+            result = self.handler(job, report_progress)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            error = str(e)
+
+        self.store.finish(job_id, result=result, error=error)
+        metrics.record_call("job:master_agent", time.perf_counter() - started, error=error is not None)
+
+        if self.on_complete is not None:
+            try:
+                self.on_complete(job, result, error)
+            except Exception:
+                logger.exception(f"Job {job_id} completion handler failed")
+
+
+def run_master_agent_job(job: Dict[str, Any], report_progress: Callable[[Dict[str, Any]], None]) -> str:
+    """
+    Выполняет задачу мастер-агентом с фоновым приоритетом обращений к модели.
+
+    Args:
+        job: Задача из очереди
+        report_progress: Функция записи событий прогресса
+
+    Returns:
+        Ответ мастер-агента
+
+    Raises:
+        Exception: Ошибка запуска агента (задача получает статус failed)
+    """
+    from master_agent import get_master_agent
+    from utils.rate_limiter import request_priority, PRIORITY_BACKGROUND
+
+    with request_priority(PRIORITY_BACKGROUND):
+        return get_master_agent().process_query(job["query"], job["history"], progress_callback=report_progress,
+                                                raise_errors=True)
@@ -0,0 +1,466 @@
+"""
+Локальная база знаний с векторным индексом.
+
+Документы (Markdown и текстовые файлы) читаются из каталога KB_DOCS_DIR
+и разбиваются на фрагменты по заголовкам. Каждый фрагмент один раз
+преобразуется в вектор (utils/embeddings.py); векторы хранятся на диске в формате NumPy и
+открываются через memory map. Поиск — косинусная близость: точный перебор
+для небольших баз и приближенный (кластеры IVF) для больших. Если векторный
+поиск не дал достаточно близких фрагментов, используется поиск по словам.
+
+Индекс обновляется инкрементально: заново обрабатываются только
+добавленные и измененные файлы.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, NamedTuple
+
+import numpy as np
+
+from config import (KB_DOCS_DIR, KB_INDEX_DIR, KB_REFRESH_INTERVAL, KB_MIN_SCORE,
+                    KB_ANN_MIN_ENTRIES, KB_ANN_PROBES)
+from utils import metrics
+from utils.embeddings import get_embedding_service
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Поддерживаемые расширения документов
+DOC_EXTENSIONS = (".md", ".txt")
+
+# Максимальная длина фрагмента в символах
+MAX_CHUNK_CHARS = 1200
+
+# Итерации k-means при обучении кластеров и размер обучающей выборки
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE = 20000
+
+# Слова, встречающиеся в большем числе фрагментов, не добавляют кандидатов приближенному поиску
+MAX_KEYWORD_POSTINGS = 4096
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбивает текст на слова в нижнем регистре.
+
+    Args:
+        text: Текст
+
+    Returns:
+        Список слов
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _stem(token: str) -> str:
+    """
+    Грубая основа слова: отбрасывает окончания русских и английских слов.
+    """
+    return token[:6]
+
+
+def split_document(text: str, title: str) -> List[Dict[str, str]]:
+    """
+    Разбивает документ на фрагменты по заголовкам Markdown.
+
+    Args:
+        text: Текст документа
+        title: Заголовок документа (по умолчанию — имя файла)
+
+    Returns:
+        Список фрагментов {title, text}
+    """
+    sections = []
+    heading, lines = None, []
+    for line in text.splitlines():
+        match = re.match(r"^#{1,6}\s+(.*)", line)
+        if match:
+            if lines or heading:
+                sections.append((heading, "\n".join(lines).strip()))
+            heading, lines = match.group(1).strip(), []
+        else:
+            lines.append(line)
+    sections.append((heading, "\n".join(lines).strip()))
+
+    # Заголовок первой секции — заголовок всего документа
+    doc_title = sections[0][0] if sections[0][0] else title
+
+    chunks = []
+    for heading, body in sections:
+        if not body:
+            continue
+        chunk_title = doc_title if heading in (None, doc_title) else f"{doc_title}: {heading}"
+        # Длинные секции делим по абзацам
+        part = ""
+        for paragraph in re.split(r"\n\s*\n", body):
+            if part and len(part) + len(paragraph) > MAX_CHUNK_CHARS:
+                chunks.append({"title": chunk_title, "text": part})
+                part = ""
+            part = f"{part}\n\n{paragraph}" if part else paragraph
+        if part:
+            chunks.append({"title": chunk_title, "text": part})
+    return chunks
+
+
+class _IndexState(NamedTuple):
+    """Загруженное состояние индекса (заменяется целиком при обновлении)."""
+
+    entries: List[Dict[str, Any]]      # Фрагменты: id, source, title, text
+    vectors: np.ndarray                # Векторы фрагментов (memory map)
+    centroids: Optional[np.ndarray]    # Центры кластеров IVF или None
+    order: Optional[np.ndarray]        # Номера фрагментов, упорядоченные по кластерам
+    offsets: Optional[np.ndarray]      # Границы кластеров в order
+    keywords: Dict[str, List[int]]     # Основа слова -> номера фрагментов
+
+
+def _empty_state(dim: int) -> _IndexState:
+    return _IndexState([], np.zeros((0, dim), dtype=np.float32), None, None, None, {})
+
+
+def _train_centroids(vectors: np.ndarray) -> np.ndarray:
+    """
+    Обучает центры кластеров сферическим k-means.
+
+    Args:
+        vectors: Нормированные векторы
+
+    Returns:
+        Матрица центров float32
+    """
+    count = len(vectors)
+    nlist = max(1, int(np.sqrt(count)))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(count, size=min(count, KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = sample[assignment == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Относит векторы к ближайшим кластерам (по частям, чтобы ограничить память).
+    """
+    clusters = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), 8192):
+        block = np.asarray(vectors[start:start + 8192])
+        clusters[start:start + 8192] = np.argmax(block @ centroids.T, axis=1)
+    return clusters
+
+
+class KnowledgeBase:
+    """База знаний с векторным индексом на диске."""
+
+    def __init__(self, docs_dir: str = KB_DOCS_DIR, index_dir: str = KB_INDEX_DIR):
+        """
+        Инициализирует базу знаний.
+
+        Args:
+            docs_dir: Каталог с документами
+            index_dir: Каталог индекса
+        """
+        self.docs_dir = docs_dir
+        self.index_dir = index_dir
+        self._meta_path = os.path.join(index_dir, "meta.json")
+        self._embeddings = get_embedding_service()
+        self._state = _empty_state(self._embeddings.dim)
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self._trained_size = 0
+        self._generation: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._state.entries)
+
+    # --- Загрузка и сохранение индекса ---
+
+    def _load(self) -> None:
+        """
+        Загружает индекс с диска, если он построен тем же способом.
+        """
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Knowledge base index is corrupted and will be rebuilt: {str(e)}")
+            return
+
+        if meta.get("model") != self._embeddings.model_id:
+            logger.info(f"Knowledge base index was built with {meta.get('model')}, rebuilding")
+            return
+
+        generation = meta["generation"]
+        try:
+            vectors = np.load(self._file(generation, "vectors"), mmap_mode="r")
+            centroids = clusters = None
+            if meta.get("ann"):
+                centroids = np.load(self._file(generation, "centroids"))
+                clusters = np.load(self._file(generation, "clusters"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Knowledge base vectors are missing and will be rebuilt: {str(e)}")
+            return
+
+        self._sources = meta["sources"]
+        self._trained_size = meta.get("trained_size", 0)
+        self._generation = generation
+        self._state = self._make_state(meta["entries"], vectors, centroids, clusters)
+        logger.info(f"Knowledge base loaded: {len(meta['entries'])} entries, generation {generation}")
+
+    def _file(self, generation: str, name: str) -> str:
+        return os.path.join(self.index_dir, f"{name}-{generation}.npy")
+
+    def _save(self, entries: List[Dict[str, Any]], vectors: np.ndarray,
+              centroids: Optional[np.ndarray], clusters: Optional[np.ndarray]) -> None:
+        """
+        Сохраняет новое поколение индекса; meta.json заменяется последним,
+        поэтому читатели видят либо старое, либо новое поколение целиком.
+        """
+        generation = uuid.uuid4().hex[:12]
+        np.save(self._file(generation, "vectors"), vectors)
+        if centroids is not None:
+            np.save(self._file(generation, "centroids"), centroids)
+            np.save(self._file(generation, "clusters"), clusters)
+
+        meta = {
+            "model": self._embeddings.model_id,
+            "generation": generation,
+            "ann": centroids is not None,
+            "trained_size": self._trained_size,
+            "sources": self._sources,
+            "entries": entries,
+        }
+        temp_path = f"{self._meta_path}.{generation}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, self._meta_path)
+
+        # Удаляем файлы прошлых поколений
+        for name in os.listdir(self.index_dir):
+            if name.endswith(".npy") and not name.endswith(f"-{generation}.npy"):
+                try:
+                    os.remove(os.path.join(self.index_dir, name))
+                except OSError:
+                    pass
+        self._generation = generation
+
+    def _make_state(self, entries: List[Dict[str, Any]], vectors: np.ndarray,
+                    centroids: Optional[np.ndarray], clusters: Optional[np.ndarray]) -> _IndexState:
+        """
+        Строит структуры поиска по фрагментам и векторам.
+        """
+        keywords: Dict[str, List[int]] = {}
+        for number, entry in enumerate(entries):
+            for stem in {_stem(token) for token in tokenize(f"{entry['title']} {entry['text']}")}:
+                keywords.setdefault(stem, []).append(number)
+
+        order = offsets = None
+        if centroids is not None:
+            order = np.argsort(clusters, kind="stable").astype(np.int32)
+            offsets = np.searchsorted(clusters[order], np.arange(len(centroids) + 1)).astype(np.int32)
+        return _IndexState(entries, vectors, centroids, order, offsets, keywords)
+
+    # --- Обновление ---
+
+    def _scan_sources(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Перечисляет документы каталога с размером и временем изменения.
+        """
+        sources = {}
+        for root, _, files in os.walk(self.docs_dir):
+            for name in files:
+                if name.endswith(DOC_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    sources[os.path.relpath(path, self.docs_dir)] = {"mtime": stat.st_mtime, "size": stat.st_size}
+        return sources
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        Инкрементально обновляет индекс по каталогу документов.
+
+        Args:
+            force: Проверить документы, даже если интервал проверки не истек
+
+        Returns:
+            Количество добавленных, обновленных и удаленных документов
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < KB_REFRESH_INTERVAL:
+            return {"added": 0, "updated": 0, "removed": 0}
+
+        with self._lock:
+            self._checked_at = now
+            scanned = self._scan_sources()
+
+            changed, added = {}, 0
+            for source, stat in scanned.items():
+                known = self._sources.get(source)
+                if known and known["mtime"] == stat["mtime"] and known["size"] == stat["size"]:
+                    continue
+                with open(os.path.join(self.docs_dir, source), "r", encoding="utf-8") as f:
+                    text = f.read()
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                if known and known.get("sha256") == digest:
+                    # Изменилось только время модификации
+                    known.update(stat)
+                    continue
+                changed[source] = (text, dict(stat, sha256=digest))
+                added += known is None
+
+            removed = [source for source in self._sources if source not in scanned]
+            stats = {"added": added, "updated": len(changed) - added, "removed": len(removed)}
+            if not changed and not removed:
+                return stats
+
+            self._apply(changed, set(removed) | set(changed))
+            logger.info(f"Knowledge base updated: {stats}, {len(self._state.entries)} entries")
+            return stats
+
+    def _apply(self, changed: Dict[str, Any], dropped: set) -> None:
+        """
+        Пересобирает индекс: сохраняет векторы неизмененных документов
+        и строит векторы только для новых фрагментов.
+        """
+        state = self._state
+        keep = [number for number, entry in enumerate(state.entries) if entry["source"] not in dropped]
+        entries = [state.entries[number] for number in keep]
+        kept_vectors = np.asarray(state.vectors[keep]) if keep else np.zeros((0, self._embeddings.dim), dtype=np.float32)
+
+        new_entries = []
+        for source, (text, stat) in sorted(changed.items()):
+            default_title = os.path.splitext(os.path.basename(source))[0]
+            for number, chunk in enumerate(split_document(text, default_title)):
+                new_entries.append({"id": f"{source}#{number}", "source": source, **chunk})
+        new_vectors = self._embeddings.embed([f"{entry['title']}\n{entry['text']}" for entry in new_entries])
+        metrics.increment("kb_embedded_chunks", len(new_entries))
+
+        entries.extend(new_entries)
+        vectors = np.vstack([kept_vectors, new_vectors]).astype(np.float32)
+
+        for source in dropped:
+            self._sources.pop(source, None)
+        for source, (_, stat) in changed.items():
+            self._sources[source] = stat
+
+        # Кластеры переобучаются, только если размер базы заметно изменился;
+        # иначе новые фрагменты относятся к существующим кластерам
+        centroids = clusters = None
+        if len(entries) >= KB_ANN_MIN_ENTRIES:
+            centroids = state.centroids
+            if centroids is None or not (0.5 * self._trained_size <= len(entries) <= 2 * self._trained_size):
+                centroids = _train_centroids(vectors)
+                self._trained_size = len(entries)
+            clusters = _assign(vectors, centroids)
+        else:
+            self._trained_size = 0
+
+        self._save(entries, vectors, centroids, clusters)
+        vectors = np.load(self._file(self._generation, "vectors"), mmap_mode="r")
+        self._state = self._make_state(entries, vectors, centroids, clusters)
+
+    # --- Поиск ---
+
+    def search(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Ищет фрагменты, близкие к запросу.
+
+        Args:
+            query: Текст запроса
+            limit: Максимальное количество результатов
+
+        Returns:
+            Список фрагментов с полями id, source, title, text, score и match
+        """
+        self.refresh()
+        state = self._state
+        if not state.entries:
+            return []
+
+        started = time.perf_counter()
+        results = [item for item in self._vector_search(state, query, limit) if item["score"] >= KB_MIN_SCORE]
+        if not results:
+            results = self._keyword_search(state, query, limit)
+        metrics.record_call("kb_search", time.perf_counter() - started)
+        return results
+
+    def _vector_search(self, state: _IndexState, query: str, limit: int) -> List[Dict[str, Any]]:
+        vector = self._embeddings.embed([query])[0]
+
+        if state.centroids is not None:
+            # Приближенный поиск: ближайшие кластеры плюс фрагменты с редкими словами запроса
+            probes = np.argsort(state.centroids @ vector)[::-1][:KB_ANN_PROBES]
+            parts = [state.order[state.offsets[c]:state.offsets[c + 1]] for c in probes]
+            for stem in {_stem(token) for token in tokenize(query)}:
+                postings = state.keywords.get(stem, ())
+                if 0 < len(postings) <= MAX_KEYWORD_POSTINGS:
+                    parts.append(np.asarray(postings, dtype=np.int32))
+            candidates = np.unique(np.concatenate(parts))
+        else:
+            candidates = np.arange(len(state.entries))
+        if not len(candidates):
+            return []
+
+        scores = np.asarray(state.vectors[candidates]) @ vector
+        top = np.argsort(scores)[::-1][:limit] if len(scores) <= limit else \
+            np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(scores[top])[::-1]]
+
+        return [dict(state.entries[int(candidates[i])], score=round(float(scores[i]), 4), match="vector")
+                for i in top if scores[i] > 0]
+
+    def _keyword_search(self, state: _IndexState, query: str, limit: int) -> List[Dict[str, Any]]:
+        stems = {_stem(token) for token in tokenize(query)}
+        counts: Dict[int, int] = {}
+        for stem in stems:
+            for number in state.keywords.get(stem, ()):
+                counts[number] = counts.get(number, 0) + 1
+        if not counts:
+            return []
+
+        best = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [dict(state.entries[number], score=round(count / len(stems), 4), match="keyword")
+                for number, count in best]
+
+
+# Синглтон базы знаний создается при первом обращении
+_knowledge_base: Optional[KnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """
+    Возвращает синглтон базы знаний, создавая и обновляя индекс при первом вызове.
+
+    Returns:
+        Экземпляр KnowledgeBase
+    """
+    global _knowledge_base
+
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                knowledge_base = KnowledgeBase()
+                knowledge_base.refresh(force=True)
+                _knowledge_base = knowledge_base
+    return _knowledge_base
@@ -5,32 +5,145 @@
 специализированных агентов и инструментов.
 """
 
+import sys
+import time
+import hashlib
 import logging
 import json
 import asyncio
-from typing import Optional, List, Dict, Any
+import inspect
+import importlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Callable
 
-from agents import Agent, Runner, RunConfig, set_default_openai_key, ModelSettings
-from utils.helpers import safe_parse_json
+from utils.helpers import safe_parse_json, log_event
+from utils.logging_config import setup_logging
+from utils import metrics
+from utils.singleflight import SingleFlight
+from utils.tool_cache import tool_cache_scope, current_cache, prefetch_tool
+from utils.rate_limiter import request_priority, PRIORITY_BACKGROUND
 
-from config import OPENAI_API_KEY, DEFAULT_MODEL, DEFAULT_TEMPERATURE
+from config import (DEFAULT_MODEL, DEFAULT_TEMPERATURE, COALESCE_WINDOW,
+                    PREFETCH_ENABLED, PREFETCH_SEARCH, validate_config)
 from prompts.master_prompt import MASTER_PROMPT
+from tools.registry import get_all_tools, get_tool_function, get_tool_info, reload_tools
 
-# Импортируем инструменты для регистрации
-from tools.registry import get_all_tools
-from tools.master_tools import get_available_tools, get_system_status, classify_user_query, lookup_information
-from tools.general_tools import chat_with_model
-from tools.search_tools import search_google  # Импортируем новый инструмент поиска
-from tools.agent_framework import ask_specialized_agent
-from tools.db_access_tools_ai import query_bot_database, execute_bot_database, get_bot_database_schema  # Добавляем инструменты для доступа к БД
+# Модули с инструментами; импортируются (и регистрируют инструменты) при создании мастер-агента
+TOOL_MODULES = [
+    "tools.master_tools",
+    "tools.general_tools",
+    "tools.search_tools",
+    "tools.agent_framework",
+    "tools.db_access_tools_ai",
+    "tools.db_query_templates",
+    "tools.filing_tools",
+    "tools.portfolio_tools",
+]
+
+# Модули, которые нельзя перезагружать, и причина
+NON_RELOADABLE_MODULES = {
+    "tools.agent_framework": "перезагрузка сбросила бы реестр агентов; перерегистрируйте агентов через agents",
+}
+
+# Упреждающие вызовы по категории классификатора: инструмент и построение аргументов.
+# Аргументы должны совпадать с тем, как модель обычно вызывает инструмент.
+# Схема базы бота подставляется в контекст (см. _context_messages), но модель часто
+# перепроверяет ее вызовом get_bot_database_schema: вызов идемпотентен и берет схему
+# из локального кэша, поэтому включен всегда. Поиск включается PREFETCH_SEARCH.
+PREFETCH_PLAN = {
+    "database": ("get_bot_database_schema", lambda query: {}),
+    "search": ("search_google", lambda query: {"query": query}),
+}
 
 # Настройка логирования
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger("zai_master_agent")
 
-# Устанавливаем API-ключ
-set_default_openai_key(OPENAI_API_KEY)
+_sdk_configured = False
+
+def configure_sdk():
+    """
+    Настраивает Agents SDK (один раз на процесс).
+    
+    Клиент OpenAI передается в каждый запуск через RunConfig (см. _run_query),
+    так как асинхронный клиент привязан к event loop потока.
+    """
+    global _sdk_configured
+    
+    if _sdk_configured:
+        return
+    
+    from agents import set_tracing_disabled
+    from utils import cassette
+    
+    if cassette.is_replay():
+        # Экспорт трассировок требует сети, при воспроизведении он не нужен
+        set_tracing_disabled(True)
+    
+    _sdk_configured = True
+
+def _imports_from(module: Any, source: str) -> bool:
+    """
+    Проверяет, держит ли модуль ссылки на объекты модуля source (from source import ...).
+    """
+    for value in vars(module).values():
+        if getattr(value, "__name__", None) == source and inspect.ismodule(value):
+            return True
+        if (inspect.isfunction(value) or inspect.isclass(value)) and value.__module__ == source:
+            return True
+    return False
+
+def reload_order(modules: List[str]) -> List[str]:
+    """
+    Дополняет список перезагружаемых модулей зависимыми от них модулями инструментов.
+    
+    Модуль, импортировавший функции перезагружаемого модуля, иначе продолжал бы
+    вызывать их старые версии (с отдельным состоянием, например кэшем схемы).
+    
+    Args:
+        modules: Запрошенные модули
+        
+    Returns:
+        Модули в порядке перезагрузки: сначала зависимости, затем зависимые
+    """
+    order = list(dict.fromkeys(modules))
+    # Список дополняется во время обхода, поэтому учитываются и транзитивные зависимости
+    for source in order:
+        for candidate in TOOL_MODULES:
+            module = sys.modules.get(candidate)
+            if candidate in order or module is None or candidate in NON_RELOADABLE_MODULES:
+                continue
+            if _imports_from(module, source):
+                order.append(candidate)
+    return order
+
+def load_tool_modules():
+    """
+    Импортирует модули с инструментами, регистрируя их в реестре.
+    """
+    for module_name in TOOL_MODULES:
+        importlib.import_module(module_name)
+
+class _ProgressListeners:
+    """
+    Получатели событий прогресса одного вычисления.
+    
+    Объединенные одинаковые запросы выполняет только первый из них, поэтому
+    остальные подписываются на события его запуска.
+    """
+    
+    def __init__(self):
+        self.callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self.users = 0
+    
+    def __call__(self, event: Dict[str, Any]) -> None:
+        for callback in list(self.callbacks):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {str(e)}")
 
 class MasterAgent:
     """
@@ -41,6 +154,11 @@ class MasterAgent:
         """
         Инициализация мастер-агента.
         """
+        from agents import Agent, ModelSettings
+        
+        configure_sdk()
+        load_tool_modules()
+        
         # Создаем экземпляр агента OpenAI
         self.agent = Agent(
             name="zAI Master Agent",
@@ -50,78 +168,387 @@ class MasterAgent:
             tools=get_all_tools()  # Получаем все инструменты из реестра
         )
         
+        # Группа объединения одинаковых одновременных запросов и получатели их прогресса
+        self._flight = SingleFlight("master_agent", COALESCE_WINDOW)
+        self._listeners: Dict[str, _ProgressListeners] = {}
+        self._listeners_lock = threading.Lock()
+        
+        # Перезагрузки инструментов и агентов выполняются по одной
+        self._reload_lock = threading.Lock()
+        
         logger.info(f"MasterAgent initialized with {len(get_all_tools())} tools")
     
     def update_tools(self):
         """
         Обновляет набор инструментов мастер-агента.
+        
+        Агент заменяется копией с новыми инструментами: выполняющиеся запросы
+        дорабатывают со старым агентом, новые получают обновленный.
         """
-        self.agent.tools = get_all_tools()
+        self.agent = self.agent.clone(tools=get_all_tools())
         logger.info(f"MasterAgent tools updated. New tool count: {len(self.agent.tools)}")
     
-    def process_query(self, query: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+    def reload(self, modules: Optional[List[str]] = None, agents: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Перезагружает модули с инструментами и специализированных агентов без перезапуска процесса.
+        
+        Перезагрузка действует только в текущем процессе (рабочие процессы
+        веб-сервера получают ее через журнал web/reload_log.py). Вместе с запрошенными
+        модулями перезагружаются модули, импортировавшие их функции (reload_order).
+        
+        Args:
+            modules: Модули с инструментами (по умолчанию все из TOOL_MODULES, кроме NON_RELOADABLE_MODULES)
+            agents: Имена агентов для перерегистрации (по умолчанию все)
+            
+        Returns:
+            Словарь с результатами перезагрузки инструментов и агентов
+            
+        Raises:
+            ValueError: Если модуль не входит в TOOL_MODULES или не может быть перезагружен
+        """
+        modules = modules or [name for name in TOOL_MODULES if name not in NON_RELOADABLE_MODULES]
+        unknown = [name for name in modules if name not in TOOL_MODULES]
+        if unknown:
+            raise ValueError(f"Неизвестные модули инструментов: {', '.join(unknown)}")
+        blocked = [f"{name} ({NON_RELOADABLE_MODULES[name]})" for name in modules if name in NON_RELOADABLE_MODULES]
+        if blocked:
+            raise ValueError(f"Модули нельзя перезагрузить: {'; '.join(blocked)}")
+        
+        with self._reload_lock:
+            tools_result = reload_tools(reload_order(modules))
+            
+            from tools import agent_framework
+            agents_result = agent_framework.reload_agents(agents)
+            
+            self.update_tools()
+        
+        return {"tools": tools_result, "agents": agents_result}
+    
+    def process_query(self, query: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                      progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      raise_errors: bool = False) -> str:
         """
         Обрабатывает запрос пользователя.
         
         Args:
             query: Запрос пользователя
             conversation_history: История разговора (опционально)
+            progress_callback: Получатель событий о вызовах модели и инструментов (опционально)
+            raise_errors: Пробрасывать ошибку запуска вместо текста ошибки в ответе
+                (фоновые задачи и пакеты должны отличать ошибку от ответа)
+            
+        Returns:
+            Ответ мастер-агента (при ошибке и raise_errors=False — сообщение об ошибке)
+            
+        Raises:
+            Exception: Ошибка запуска агента, если raise_errors=True
+        """
+        logger.debug("Processing query: %s", query)
+        
+        started = time.perf_counter()
+        key = self._coalescing_key(query, conversation_history)
+        listeners = self._subscribe(key, progress_callback)
+        failed = False
+        with metrics.track_in_flight("agent"):
+            try:
+                # Одинаковые одновременные запросы выполняются один раз; события прогресса
+                # запуска получают все присоединившиеся вызовы
+                return self._flight.do(key, self._run_query, query, conversation_history, listeners)
+            except Exception as e:
+                failed = True
+                if raise_errors:
+                    raise
+                logger.error(f"Error processing query: {str(e)}")
+                return f"Произошла ошибка при обработке запроса: {str(e)}"
+            finally:
+                self._unsubscribe(key, listeners, progress_callback)
+                duration = time.perf_counter() - started
+                metrics.record_request(duration, error=failed)
+                # Текст запроса в INFO не попадает: только его размер и длительность
+                log_event("query_processed", {"chars": len(query), "history": len(conversation_history or []),
+                                              "duration_ms": round(duration * 1000, 1)})
+    
+    def process_batch(self, queries: List[str], concurrency: int = 4,
+                      progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Обрабатывает пакет независимых запросов с ограниченным параллелизмом.
+        
+        Запросы пакета делят кэш результатов идемпотентных инструментов
+        (например, схема базы бота запрашивается один раз) и обращаются
+        к модели с фоновым приоритетом.
+        
+        Args:
+            queries: Список запросов
+            concurrency: Максимальное число одновременно обрабатываемых запросов
+            progress_callback: Функция (выполнено, всего, результат), вызываемая по завершении каждого запроса
+            
+        Returns:
+            Результаты в порядке запросов: словари с ключами index, query, response, error, duration
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        logger.info(f"Processing batch of {len(queries)} queries with concurrency {concurrency}")
+        
+        with tool_cache_scope("batch"), request_priority(PRIORITY_BACKGROUND):
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="zai-batch") as pool:
+                # Каждая задача получает свою копию контекста с общим кэшем и приоритетом
+                futures = {
+                    pool.submit(contextvars.copy_context().run, self._process_batch_item, index, query): index
+                    for index, query in enumerate(queries)
+                }
+                for completed, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    results[futures[future]] = result
+                    if progress_callback is not None:
+                        progress_callback(completed, len(queries), result)
+        
+        return results
+    
+    def _process_batch_item(self, index: int, query: str) -> Dict[str, Any]:
+        """
+        Обрабатывает один запрос пакета, не прерывая пакет при ошибке.
+        
+        Args:
+            index: Позиция запроса в пакете
+            query: Запрос пользователя
+            
+        Returns:
+            Результат обработки запроса
+        """
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = self.process_query(query, raise_errors=True)
+        except Exception as e:
+            logger.exception(f"Batch query {index} failed")
+            error = str(e)
+        return {
+            "index": index,
+            "query": query,
+            "response": response,
+            "error": error,
+            "duration": round(time.perf_counter() - started, 3)
+        }
+    
+    def _subscribe(self, key: str, progress_callback: Optional[Callable[[Dict[str, Any]], None]]) -> _ProgressListeners:
+        """
+        Подписывает получателя на события прогресса вычисления с ключом key.
+        
+        Args:
+            key: Ключ объединения запроса
+            progress_callback: Получатель событий (опционально)
+            
+        Returns:
+            Получатели событий вычисления
+        """
+        with self._listeners_lock:
+            listeners = self._listeners.get(key)
+            if listeners is None:
+                listeners = self._listeners[key] = _ProgressListeners()
+            listeners.users += 1
+            if progress_callback is not None:
+                listeners.callbacks.append(progress_callback)
+        return listeners
+    
+    def _unsubscribe(self, key: str, listeners: _ProgressListeners,
+                     progress_callback: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """
+        Отписывает получателя; последний вызов с ключом удаляет запись.
+        """
+        with self._listeners_lock:
+            listeners.users -= 1
+            if progress_callback is not None:
+                listeners.callbacks.remove(progress_callback)
+            if listeners.users == 0 and self._listeners.get(key) is listeners:
+                del self._listeners[key]
+    
+    @staticmethod
+    def _coalescing_key(query: str, conversation_history: Optional[List[Dict[str, str]]]) -> str:
+        """
+        Строит ключ объединения запроса с учетом всей истории разговора.
+        
+        Ответ лидера строится по его собственной истории, поэтому объединяются
+        только запросы с полностью совпадающей историей: иначе вызов из другой
+        сессии получил бы ответ, учитывающий чужой разговор.
+        
+        Args:
+            query: Запрос пользователя
+            conversation_history: История разговора (опционально)
+            
+        Returns:
+            Хэш нормализованного запроса и истории
+        """
+        payload = json.dumps([" ".join(query.lower().split()), conversation_history or []],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _run_query(self, query: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                   progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Выполняет запуск агента для запроса пользователя.
+        
+        Args:
+            query: Запрос пользователя
+            conversation_history: История разговора (опционально)
+            progress_callback: Получатель событий прогресса (опционально)
             
         Returns:
             Ответ мастер-агента
         """
-        logger.info(f"Processing query: {query}")
+        hooks = None
+        if progress_callback is not None:
+            # process_query передает получателей всегда: объединенные вызовы присоединяются во время запуска
+            from utils.progress_hooks import ProgressHooks
+            hooks = ProgressHooks(progress_callback)
+        
+        # Кэш инструментов на время запуска (внутри пакета используется кэш пакета)
+        if current_cache() is None:
+            with tool_cache_scope("run"):
+                return self._run_agent(query, conversation_history, hooks)
+        return self._run_agent(query, conversation_history, hooks)
+    
+    def _run_agent(self, query: str, conversation_history: Optional[List[Dict[str, str]]], hooks: Any) -> str:
+        """
+        Запускает агента в открытой области кэша инструментов.
         
-        # Создаем конфигурацию для запуска
+        Args:
+            query: Запрос пользователя
+            conversation_history: История разговора (опционально)
+            hooks: Хуки запуска Agents SDK или None
+            
+        Returns:
+            Ответ мастер-агента
+        """
+        from agents import Runner, RunConfig, OpenAIProvider
+        from utils.openai_client import get_async_openai_client
+        
+        from tools.master_tools import classify_query
+        
+        category = classify_query(query)["classification"]
+        
+        # Инструменты, которые модель скорее всего вызовет первым шагом,
+        # выполняются параллельно с первым обращением к модели
+        self._start_prefetch(category, query)
+        context_messages = self._context_messages(category)
+        
+        # Обеспечиваем наличие event loop в текущем потоке
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            # Если event loop не доступен в текущем потоке, создаем новый
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        
+        # Создаем конфигурацию для запуска с клиентом event loop этого потока
         run_config = RunConfig(
             workflow_name="zAI Master Agent Workflow",
+            model_provider=OpenAIProvider(openai_client=get_async_openai_client(loop)),
         )
         
-        try:
-            # Обеспечиваем наличие event loop в текущем потоке
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                # Если event loop не доступен в текущем потоке, создаем новый
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            # Если есть история разговора, используем ее
-            if conversation_history:
-                input_with_context = conversation_history + [{"role": "user", "content": query}]
-                response = Runner.run_sync(
-                    self.agent,
-                    input_with_context,
-                    run_config=run_config
-                )
-            else:
-                response = Runner.run_sync(
-                    self.agent,
-                    query,
-                    run_config=run_config
-                )
-            
-            output = response.final_output
-            logger.debug(f"Raw final output: {output[:200]}")  # Логирование для отладки
+        # Если есть история разговора или дополнительный контекст, передаем их списком сообщений.
+        # Контекст идет после истории, чтобы префикс запроса оставался неизменным между ходами.
+        if conversation_history or context_messages:
+            input_with_context = (conversation_history or []) + context_messages + [{"role": "user", "content": query}]
+            response = Runner.run_sync(
+                self.agent,
+                input_with_context,
+                run_config=run_config,
+                hooks=hooks
+            )
+        else:
+            response = Runner.run_sync(
+                self.agent,
+                query,
+                run_config=run_config,
+                hooks=hooks
+            )
+        
+        self._record_usage(response)
+        
+        output = response.final_output
+        logger.debug("Raw final output: %.200s", output)  # Логирование для отладки
+        
+        # Итоговый ответ — текст модели (результаты инструментов сериализуются при передаче ей).
+        # Модель могла повторить JSON инструмента: разбираем только строки вида {...}
+        json_response = safe_parse_json(output)
+        if isinstance(json_response, dict) and isinstance(json_response.get('response'), str):
+            output = json_response['response']
+            logger.debug("Extracted response from JSON output: %.100s...", output)
+        
+        return output
+    
+    @staticmethod
+    def _start_prefetch(category: str, query: str) -> None:
+        """
+        Упреждающе запускает инструмент, рекомендованный локальным классификатором.
+        
+        Args:
+            category: Категория запроса по classify_query
+            query: Запрос пользователя
+        """
+        if not PREFETCH_ENABLED:
+            return
+        
+        if category not in PREFETCH_PLAN or (category == "search" and not PREFETCH_SEARCH):
+            return
+        
+        tool_name, build_kwargs = PREFETCH_PLAN[category]
+        tool_func = get_tool_function(tool_name)
+        if tool_func is not None and prefetch_tool(tool_func, **build_kwargs(query)):
+            logger.debug("Prefetching %s for '%s' query", tool_name, category)
+    
+    @staticmethod
+    def _context_messages(category: str) -> List[Dict[str, str]]:
+        """
+        Формирует дополнительный контекст для запроса определенной категории.
+        
+        Для запросов к базе бота это компактная схема из локального кэша и
+        список шаблонных инструментов, чтобы модель не запрашивала схему сама.
+        
+        Args:
+            category: Категория запроса по classify_query
             
-            # Обработка потенциальных JSON-ответов от инструментов
-            try:
-                # Проверяем, является ли ответ JSON-строкой с полем 'response'
-                json_response = safe_parse_json(output)
-                if isinstance(json_response, dict) and 'response' in json_response:
-                    output = json_response['response']
-                    logger.info(f"Extracted response from JSON output: {output[:100]}...")
-            except:
-                # Если не можем разобрать как JSON или нет ключа 'response',
-                # оставляем оригинальный ответ
-                pass
-                    
-            logger.info("Query processed successfully")
-            return output
-                
+        Returns:
+            Список системных сообщений (пустой, если контекст не нужен)
+        """
+        if category != "database":
+            return []
+        
+        from tools.db_access_tools_ai import get_schema_snapshot, format_schema_compact
+        from tools.db_query_templates import available_template_tools
+        
+        try:
+            snapshot = get_schema_snapshot()
         except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
-            return f"Произошла ошибка при обработке запроса: {str(e)}"
+            logger.warning(f"Bot DB schema is unavailable for context: {str(e)}")
+            return []
+        
+        # Предлагаются только шаблоны, таблицы и колонки которых есть в схеме
+        template_tools = available_template_tools(snapshot)
+        guidance = (f"Для типовых вопросов используйте готовые инструменты {', '.join(template_tools)}; "
+                    "query_bot_database — для остальных SELECT-запросов." if template_tools
+                    else "Для запросов используйте query_bot_database.")
+        content = (
+            f"Схема базы данных бота (версия {snapshot['version']}):\n"
+            f"{format_schema_compact(snapshot)}\n"
+            f"{guidance}"
+        )
+        return [{"role": "system", "content": content}]
+    
+    @staticmethod
+    def _record_usage(response: Any) -> None:
+        """
+        Учитывает токены, израсходованные за запуск агента.
+        
+        Args:
+            response: Результат Runner.run_sync
+        """
+        for model_response in getattr(response, "raw_responses", None) or []:
+            usage = getattr(model_response, "usage", None)
+            if usage is None:
+                continue
+            metrics.increment("model_calls")
+            metrics.increment("tokens_input", getattr(usage, "input_tokens", 0) or 0)
+            metrics.increment("tokens_output", getattr(usage, "output_tokens", 0) or 0)
     
     def get_registered_tools_info(self) -> List[Dict[str, Any]]:
         """
@@ -130,18 +557,45 @@ class MasterAgent:
         Returns:
             Список словарей с информацией об инструментах
         """
-        tools = get_all_tools()
-        tools_info = []
+        return get_tool_info()
+
+# Синглтон мастер-агента создается при первом обращении
+_master_agent = None
+_master_agent_lock = threading.Lock()
+
+def get_master_agent() -> MasterAgent:
+    """
+    Возвращает синглтон мастер-агента, создавая его при первом вызове.
+    
+    Returns:
+        Экземпляр MasterAgent
         
-        for tool in tools:
-            tool_info = {
-                "name": tool.name,
-                "description": tool.description if hasattr(tool, "description") else "",
-                "parameters": tool.parameters if hasattr(tool, "parameters") else {}
-            }
-            tools_info.append(tool_info)
-            
-        return tools_info
+    Raises:
+        ValueError: Если конфигурация неполна или некорректна
+    """
+    global _master_agent
+    
+    if _master_agent is None:
+        with _master_agent_lock:
+            if _master_agent is None:
+                # CLI и пакетный режим должны падать сразу при неполной конфигурации
+                validate_config()
+                _master_agent = MasterAgent()
+    return _master_agent
+
+def is_master_agent_loaded() -> bool:
+    """
+    Проверяет, создан ли мастер-агент в этом процессе (без его создания).
+    
+    Returns:
+        True, если синглтон уже создан
+    """
+    return _master_agent is not None
 
-# Создаем синглтон мастер-агента
-master_agent = MasterAgent()
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    """
+    Сохраняет совместимость с `from master_agent import master_agent`.
+    """
+    if name == "master_agent":
+        return get_master_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
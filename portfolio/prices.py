@@ -0,0 +1,265 @@
+"""
+Источники цен для оценки открытых позиций.
+
+Основной источник — локальные снимки цен: файлы CSV (и Parquet, если
+установлен pyarrow) в каталоге PRICES_DIR. Каждый файл содержит строки
+instrument, price и необязательные timestamp и multiplier (размер
+контракта). Более поздний файл переопределяет цены предыдущих; при
+обновлении перечитываются только новые и измененные файлы.
+
+Источник выбирается параметром PRICE_FEED; дополнительные источники
+(например, котировки брокера) регистрируются через register_price_feed.
+"""
+
+import os
+import csv
+import logging
+import threading
+from typing import Dict, List, Optional, Callable, NamedTuple, Tuple
+
+from config import PRICES_DIR, PRICE_FEED
+from utils import metrics
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Допустимые названия столбцов снимков
+_INSTRUMENT_COLUMNS = ("instrument", "symbol", "ticker")
+_PRICE_COLUMNS = ("price", "last", "close")
+
+
+class PriceQuote(NamedTuple):
+    """Цена инструмента."""
+
+    price: float
+    timestamp: str = ""
+    multiplier: float = 1.0
+
+
+class PriceFeed:
+    """
+    Базовый источник цен.
+
+    version увеличивается при каждом изменении цен, поэтому потребители
+    могут не сравнивать цены, пока версия не изменилась.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.version = 0
+
+    def refresh(self) -> bool:
+        """
+        Обновляет цены из источника.
+
+        Returns:
+            True, если цены изменились
+        """
+        return False
+
+    def get_prices(self, instruments: List[str]) -> Dict[str, PriceQuote]:
+        """
+        Возвращает последние цены инструментов (инструменты без цены пропускаются).
+
+        Args:
+            instruments: Тикеры или названия инструментов
+
+        Returns:
+            Словарь инструмент -> PriceQuote
+        """
+        raise NotImplementedError
+
+
+class StaticPriceFeed(PriceFeed):
+    """Локальная заглушка: цены задаются вызовом set_prices (разработка и проверки)."""
+
+    name = "stub"
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self._quotes: Dict[str, PriceQuote] = {}
+        self._lock = threading.Lock()
+        if prices:
+            self.set_prices(prices)
+
+    def set_prices(self, prices: Dict[str, float], timestamp: str = "") -> None:
+        """
+        Устанавливает цены инструментов.
+
+        Args:
+            prices: Словарь инструмент -> цена
+            timestamp: Время котировки
+        """
+        with self._lock:
+            for instrument, price in prices.items():
+                self._quotes[instrument.upper()] = PriceQuote(float(price), timestamp)
+            self.version += 1
+
+    def get_prices(self, instruments: List[str]) -> Dict[str, PriceQuote]:
+        quotes = self._quotes
+        return {instrument: quotes[instrument.upper()] for instrument in instruments if instrument.upper() in quotes}
+
+
+class SnapshotPriceFeed(PriceFeed):
+    """Цены из файлов снимков в локальном каталоге."""
+
+    name = "snapshots"
+
+    def __init__(self, prices_dir: str = PRICES_DIR):
+        """
+        Инициализирует источник.
+
+        Args:
+            prices_dir: Каталог с файлами CSV/Parquet
+        """
+        super().__init__()
+        self.prices_dir = prices_dir
+        # Файл -> (mtime, размер, цены файла)
+        self._files: Dict[str, Tuple[float, int, Dict[str, PriceQuote]]] = {}
+        self._quotes: Dict[str, PriceQuote] = {}
+        self._lock = threading.Lock()
+
+    def _list_files(self) -> List[Tuple[str, float, int]]:
+        if not os.path.isdir(self.prices_dir):
+            return []
+        files = []
+        for name in os.listdir(self.prices_dir):
+            if not name.lower().endswith((".csv", ".parquet")):
+                continue
+            stat = os.stat(os.path.join(self.prices_dir, name))
+            files.append((name, stat.st_mtime, stat.st_size))
+        # Снимки применяются от старых к новым: по времени изменения, затем по имени
+        return sorted(files, key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def _column(fields: List[str], candidates: Tuple[str, ...]) -> Optional[str]:
+        lowered = {field.lower().strip(): field for field in fields}
+        for candidate in candidates:
+            if candidate in lowered:
+                return lowered[candidate]
+        return None
+
+    def _read_rows(self, path: str) -> List[Dict[str, object]]:
+        if path.lower().endswith(".parquet"):
+            if pq is None:
+                logger.warning(f"Price snapshot {path} skipped: pyarrow is not installed")
+                return []
+            return pq.read_table(path).to_pylist()
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
+
+    def _read_file(self, name: str) -> Dict[str, PriceQuote]:
+        """
+        Читает файл снимка; для инструмента остается строка с самым поздним timestamp.
+        """
+        rows = self._read_rows(os.path.join(self.prices_dir, name))
+        if not rows:
+            return {}
+        fields = list(rows[0].keys())
+        instrument_column = self._column(fields, _INSTRUMENT_COLUMNS)
+        price_column = self._column(fields, _PRICE_COLUMNS)
+        timestamp_column = self._column(fields, ("timestamp", "date", "time"))
+        multiplier_column = self._column(fields, ("multiplier",))
+        if instrument_column is None or price_column is None:
+            logger.warning(f"Price snapshot {name} skipped: no instrument/price columns")
+            return {}
+
+        quotes: Dict[str, PriceQuote] = {}
+        for row in rows:
+            try:
+                instrument = str(row[instrument_column]).strip().upper()
+                quote = PriceQuote(
+                    float(row[price_column]),
+                    str(row.get(timestamp_column) or "") if timestamp_column else "",
+                    float(row.get(multiplier_column) or 1) if multiplier_column else 1.0,
+                )
+            except (TypeError, ValueError):
+                continue
+            previous = quotes.get(instrument)
+            if previous is None or quote.timestamp >= previous.timestamp:
+                quotes[instrument] = quote
+        return quotes
+
+    def refresh(self) -> bool:
+        with self._lock:
+            files = self._list_files()
+            names = [name for name, _, _ in files]
+            changed = set(self._files) != set(names)
+            for name, mtime, size in files:
+                cached = self._files.get(name)
+                if cached and cached[:2] == (mtime, size):
+                    continue
+                try:
+                    self._files[name] = (mtime, size, self._read_file(name))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Price snapshot {name} could not be read: {str(e)}")
+                    self._files[name] = (mtime, size, {})
+                changed = True
+                metrics.increment("price_snapshots_loaded")
+
+            if not changed:
+                return False
+            for name in list(self._files):
+                if name not in names:
+                    del self._files[name]
+
+            quotes: Dict[str, PriceQuote] = {}
+            for name in names:
+                quotes.update(self._files[name][2])
+            if quotes != self._quotes:
+                self._quotes = quotes
+                self.version += 1
+                return True
+            return False
+
+    def get_prices(self, instruments: List[str]) -> Dict[str, PriceQuote]:
+        quotes = self._quotes
+        return {instrument: quotes[instrument.upper()] for instrument in instruments if instrument.upper() in quotes}
+
+
+# Доступные источники цен: имя -> фабрика
+_FEEDS: Dict[str, Callable[[], PriceFeed]] = {
+    SnapshotPriceFeed.name: SnapshotPriceFeed,
+    StaticPriceFeed.name: StaticPriceFeed,
+}
+
+# Синглтон источника создается при первом обращении
+_feed: Optional[PriceFeed] = None
+_feed_lock = threading.Lock()
+
+
+def register_price_feed(name: str, factory: Callable[[], PriceFeed]) -> None:
+    """
+    Регистрирует источник цен, который можно выбрать через PRICE_FEED.
+
+    Args:
+        name: Имя источника
+        factory: Функция без аргументов, создающая источник
+    """
+    _FEEDS[name] = factory
+
+
+def get_price_feed() -> PriceFeed:
+    """
+    Возвращает синглтон источника цен, выбранного в PRICE_FEED.
+
+    Returns:
+        Экземпляр PriceFeed
+    """
+    global _feed
+
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                factory = _FEEDS.get(PRICE_FEED)
+                if factory is None:
+                    logger.warning(f"Unknown PRICE_FEED '{PRICE_FEED}', using local snapshots")
+                    factory = SnapshotPriceFeed
+                _feed = factory()
+    return _feed
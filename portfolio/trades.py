@@ -0,0 +1,406 @@
+"""
+Запись сделок в trades.db и сводная статистика по стратегиям.
+
+Таблица strategy_stats хранит суммы по каждой стратегии (число сделок,
+прибыльные/убыточные, суммарный результат, суммарный срок удержания) и
+поддерживается триггерами на вставку, изменение и удаление сделок.
+Поэтому статистика читается за O(число стратегий) строк без просмотра
+истории сделок.
+
+Массовая загрузка выгрузок брокера идет пакетами в отдельных транзакциях
+(WAL, executemany): на время пакета триггеры снимаются, а вклад пакета в
+статистику добавляется одним агрегирующим запросом по вставленным строкам.
+
+Запуск из командной строки:
+    python -m portfolio.trades import broker_export.csv
+    python -m portfolio.trades stats
+"""
+
+import csv
+import sys
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from config import TRADES_DB_PATH, TRADES_IMPORT_BATCH
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Столбцы сделки в порядке вставки
+TRADE_COLUMNS = ("strategy", "trade_type", "instrument", "position_type", "quantity", "open_date",
+                 "open_price", "close_date", "close_price", "profit_percent", "profit_amount", "status")
+
+# Вклад одной строки сделки в статистику; {row} — NEW или OLD
+_CONTRIBUTION = {
+    "trades_total": "1",
+    "open_trades": "({row}.status = 'OPEN')",
+    "closed_trades": "({row}.status = 'CLOSED')",
+    "wins": "({row}.status = 'CLOSED' AND COALESCE({row}.profit_amount, 0) > 0)",
+    "losses": "({row}.status = 'CLOSED' AND COALESCE({row}.profit_amount, 0) < 0)",
+    "total_profit": "(CASE WHEN {row}.status = 'CLOSED' THEN COALESCE({row}.profit_amount, 0) ELSE 0 END)",
+    "total_profit_percent": "(CASE WHEN {row}.status = 'CLOSED' THEN COALESCE({row}.profit_percent, 0) ELSE 0 END)",
+    "holding_days": "(CASE WHEN {row}.status = 'CLOSED' AND {row}.close_date IS NOT NULL "
+                    "THEN COALESCE(julianday({row}.close_date) - julianday({row}.open_date), 0) ELSE 0 END)",
+    "holding_count": "({row}.status = 'CLOSED' AND {row}.close_date IS NOT NULL "
+                     "AND julianday({row}.close_date) IS NOT NULL AND julianday({row}.open_date) IS NOT NULL)",
+}
+
+_STATS_SCHEMA = ["""
+CREATE TABLE IF NOT EXISTS strategy_stats (
+    strategy TEXT PRIMARY KEY,
+    trades_total INTEGER NOT NULL DEFAULT 0,
+    open_trades INTEGER NOT NULL DEFAULT 0,
+    closed_trades INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    total_profit REAL NOT NULL DEFAULT 0,
+    total_profit_percent REAL NOT NULL DEFAULT 0,  -- сумма profit_percent закрытых сделок
+    holding_days REAL NOT NULL DEFAULT 0,          -- сумма сроков удержания закрытых сделок (дни)
+    holding_count INTEGER NOT NULL DEFAULT 0       -- закрытые сделки с известными датами
+)""", "CREATE INDEX IF NOT EXISTS idx_trades_strategy_status ON trades (strategy, status)"]
+
+_TRIGGER_NAMES = ("trades_stats_insert", "trades_stats_update", "trades_stats_delete")
+
+
+def _apply(row: str, sign: str) -> str:
+    """
+    SQL обновления строки статистики на вклад NEW/OLD со знаком.
+    """
+    assignments = ", ".join(f"{column} = {column} {sign} {expression.format(row=row)}"
+                            for column, expression in _CONTRIBUTION.items())
+    return f"UPDATE strategy_stats SET {assignments} WHERE strategy = {row}.strategy;"
+
+
+def _triggers_sql() -> List[str]:
+    """
+    Триггеры, поддерживающие strategy_stats (по одному оператору CREATE TRIGGER).
+    """
+    upsert = "INSERT OR IGNORE INTO strategy_stats (strategy) VALUES (NEW.strategy);"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trades_stats_insert AFTER INSERT ON trades
+BEGIN
+    {upsert}
+    {_apply("NEW", "+")}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trades_stats_update
+AFTER UPDATE OF strategy, status, profit_amount, profit_percent, open_date, close_date ON trades
+BEGIN
+    {_apply("OLD", "-")}
+    {upsert}
+    {_apply("NEW", "+")}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trades_stats_delete AFTER DELETE ON trades
+BEGIN
+    {_apply("OLD", "-")}
+END""",
+    ]
+
+
+def _aggregate_sql(where: str = "") -> str:
+    """
+    Запрос сумм статистики по стратегиям для строк trades (с условием where).
+    """
+    columns = ", ".join(f"SUM({expression.format(row='trades')}) AS {column}"
+                        for column, expression in _CONTRIBUTION.items())
+    return f"SELECT strategy, {columns} FROM trades {where} GROUP BY strategy"
+
+
+def _parse_float(value: Any) -> Optional[float]:
+    if value is None or str(value).strip() == "":
+        return None
+    return float(str(value).replace(",", "").replace(" ", ""))
+
+
+def _normalize_trade(trade: Dict[str, Any]) -> Tuple:
+    """
+    Приводит сделку к кортежу TRADE_COLUMNS.
+
+    Статус определяется по цене закрытия, если не указан; для закрытой сделки
+    без результата результат считается по ценам с учетом направления.
+
+    Raises:
+        ValueError: Если нет обязательных полей
+    """
+    fields = {key.strip().lower(): value for key, value in trade.items() if key}
+    missing = [name for name in ("strategy", "instrument", "quantity", "open_date", "open_price")
+               if fields.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Не заполнены поля: {', '.join(missing)}")
+
+    position_type = str(fields.get("position_type") or "LONG").strip().upper()
+    quantity = _parse_float(fields["quantity"])
+    open_price = _parse_float(fields["open_price"])
+    close_price = _parse_float(fields.get("close_price"))
+    status = str(fields.get("status") or ("CLOSED" if close_price is not None else "OPEN")).strip().upper()
+
+    profit_amount = _parse_float(fields.get("profit_amount"))
+    profit_percent = _parse_float(fields.get("profit_percent"))
+    if status == "CLOSED" and close_price is not None:
+        direction = -1.0 if position_type == "SHORT" else 1.0
+        if profit_amount is None:
+            profit_amount = direction * (close_price - open_price) * quantity
+        if profit_percent is None and open_price:
+            profit_percent = direction * (close_price / open_price - 1) * 100
+
+    return (str(fields["strategy"]).strip(), str(fields.get("trade_type") or "stock").strip(),
+            str(fields["instrument"]).strip().upper(), position_type, quantity, str(fields["open_date"]).strip(),
+            open_price, (str(fields.get("close_date")).strip() or None) if fields.get("close_date") else None,
+            close_price, profit_percent, profit_amount, status)
+
+
+class TradeStore:
+    """Сделки и поддерживаемая триггерами статистика стратегий."""
+
+    def __init__(self, path: str = TRADES_DB_PATH):
+        """
+        Открывает базу сделок и при необходимости создает таблицу статистики и триггеры.
+
+        Args:
+            path: Путь к файлу trades.db
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._ensure_schema()
+
+    def _ensure_schema(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                created = self._conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'strategy_stats'").fetchone() is None
+                # executescript завершает открытую транзакцию, поэтому операторы выполняются по одному
+                for statement in _STATS_SCHEMA + _triggers_sql():
+                    self._conn.execute(statement)
+                if created:
+                    # Таблица появилась впервые: заполняется по существующей истории один раз
+                    self._rebuild_stats()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _rebuild_stats(self) -> None:
+        columns = ", ".join(_CONTRIBUTION)
+        self._conn.execute("DELETE FROM strategy_stats")
+        self._conn.execute(f"INSERT INTO strategy_stats (strategy, {columns}) {_aggregate_sql()}")
+
+    def rebuild_stats(self) -> None:
+        """
+        Пересчитывает статистику полным просмотром сделок (проверка и восстановление).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._rebuild_stats()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_trade(self, trade: Dict[str, Any]) -> int:
+        """
+        Добавляет сделку.
+
+        Args:
+            trade: Поля сделки (названия как в таблице trades)
+
+        Returns:
+            id новой сделки
+        """
+        row = _normalize_trade(trade)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({', '.join('?' * len(TRADE_COLUMNS))})", row)
+            return cursor.lastrowid
+
+    def close_trade(self, trade_id: int, close_price: float, close_date: Optional[str] = None) -> bool:
+        """
+        Закрывает открытую сделку и рассчитывает ее результат.
+
+        Args:
+            trade_id: id сделки
+            close_price: Цена закрытия
+            close_date: Дата закрытия (по умолчанию сегодня)
+
+        Returns:
+            True, если открытая сделка найдена и закрыта
+        """
+        close_date = close_date or datetime.now().date().isoformat()
+        with self._lock:
+            cursor = self._conn.execute("""
+                UPDATE trades SET
+                    status = 'CLOSED',
+                    close_date = ?,
+                    close_price = ?,
+                    profit_amount = (CASE WHEN UPPER(position_type) = 'SHORT' THEN -1 ELSE 1 END)
+                                    * (? - open_price) * quantity,
+                    profit_percent = (CASE WHEN UPPER(position_type) = 'SHORT' THEN -1 ELSE 1 END)
+                                     * (? / NULLIF(open_price, 0) - 1) * 100
+                WHERE id = ? AND status = 'OPEN'
+            """, (close_date, close_price, close_price, close_price, trade_id))
+            return cursor.rowcount > 0
+
+    def import_trades(self, trades: Iterable[Dict[str, Any]], batch_size: int = TRADES_IMPORT_BATCH) -> Dict[str, Any]:
+        """
+        Загружает сделки пакетами.
+
+        Каждый пакет — одна транзакция: триггеры статистики снимаются,
+        строки вставляются через executemany, вклад пакета в статистику
+        добавляется одним GROUP BY по диапазону новых id, после чего
+        триггеры создаются снова. Другие подключения не видят состояние
+        без триггеров: изменения схемы публикуются вместе с пакетом.
+
+        Args:
+            trades: Сделки (словари с полями таблицы trades)
+            batch_size: Строк в транзакции
+
+        Returns:
+            Число загруженных и пропущенных строк и время загрузки
+        """
+        started = datetime.now()
+        imported, skipped, errors = 0, 0, []
+        batch: List[Tuple] = []
+
+        def flush():
+            nonlocal imported
+            if batch:
+                self._insert_batch(batch)
+                imported += len(batch)
+                batch.clear()
+
+        for number, trade in enumerate(trades, start=1):
+            try:
+                batch.append(_normalize_trade(trade))
+            except (ValueError, TypeError) as e:
+                skipped += 1
+                if len(errors) < 10:
+                    errors.append(f"строка {number}: {str(e)}")
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        seconds = (datetime.now() - started).total_seconds()
+        metrics.increment("trades_imported", imported)
+        logger.info(f"Imported {imported} trades into {self.path} in {seconds:.1f}s ({skipped} skipped)")
+        return {"imported": imported, "skipped": skipped, "errors": errors, "seconds": round(seconds, 3)}
+
+    def _insert_batch(self, rows: List[Tuple]) -> None:
+        columns = ", ".join(_CONTRIBUTION)
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in _CONTRIBUTION)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name in _TRIGGER_NAMES:
+                    self._conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                first_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM trades").fetchone()[0]
+                self._conn.executemany(
+                    f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({', '.join('?' * len(TRADE_COLUMNS))})",
+                    rows)
+                # WHERE true нужен SQLite, чтобы отличить ON CONFLICT от условия соединения
+                self._conn.execute(
+                    f"INSERT INTO strategy_stats (strategy, {columns}) "
+                    f"SELECT * FROM ({_aggregate_sql('WHERE id >= ?')}) WHERE true "
+                    f"ON CONFLICT(strategy) DO UPDATE SET {updates}", (first_id,))
+                for statement in _triggers_sql():
+                    self._conn.execute(statement)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def import_csv(self, path: str, batch_size: int = TRADES_IMPORT_BATCH) -> Dict[str, Any]:
+        """
+        Загружает сделки из CSV-выгрузки брокера (заголовок — названия столбцов trades).
+
+        Args:
+            path: Путь к CSV
+            batch_size: Строк в транзакции
+
+        Returns:
+            Результат import_trades
+        """
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return self.import_trades(csv.DictReader(f), batch_size=batch_size)
+
+    def strategy_stats(self, strategy: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Возвращает статистику стратегий из таблицы strategy_stats.
+
+        Args:
+            strategy: Только одна стратегия
+
+        Returns:
+            Список стратегий с числом сделок, долей прибыльных, суммарным и средним
+            результатом и средним сроком удержания
+        """
+        query = "SELECT * FROM strategy_stats WHERE trades_total > 0"
+        params: Tuple = ()
+        if strategy is not None:
+            query += " AND strategy = ?"
+            params = (strategy,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY total_profit DESC", params).fetchall()
+
+        stats = []
+        for row in rows:
+            closed = row["closed_trades"]
+            stats.append({
+                "strategy": row["strategy"],
+                "trades": row["trades_total"],
+                "open": row["open_trades"],
+                "closed": closed,
+                "wins": row["wins"],
+                "losses": row["losses"],
+                "win_rate": round(row["wins"] / closed * 100, 2) if closed else None,
+                "total_profit": round(row["total_profit"], 2),
+                "avg_profit": round(row["total_profit"] / closed, 2) if closed else None,
+                "avg_profit_percent": round(row["total_profit_percent"] / closed, 2) if closed else None,
+                "avg_holding_days": round(row["holding_days"] / row["holding_count"], 1) if row["holding_count"] else None,
+            })
+        return stats
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# Синглтон хранилища создается при первом обращении
+_store: Optional[TradeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_trade_store() -> TradeStore:
+    """
+    Возвращает синглтон хранилища сделок.
+
+    Returns:
+        Экземпляр TradeStore
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TradeStore()
+    return _store
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        result = get_trade_store().import_csv(sys.argv[2])
+    elif len(sys.argv) == 2 and sys.argv[1] == "stats":
+        result = get_trade_store().strategy_stats()
+    else:
+        print(__doc__)
+        sys.exit(1)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,300 @@
+"""
+Оценка открытых позиций из trades.db по рыночным ценам (mark-to-market).
+
+Открытые позиции (status = 'OPEN') загружаются в массивы numpy, инструменты
+и группы кодируются целыми числами. Нереализованный результат, рыночная
+стоимость и экспозиция считаются векторно; при обновлении цен пересчитываются
+только позиции инструментов, цена которых изменилась, а суммы по группам
+корректируются на разницу. Позиции перечитываются из базы только после
+записи в нее (PRAGMA data_version).
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from config import TRADES_DB_PATH
+from portfolio.prices import PriceFeed, get_price_feed
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Измерения, по которым поддерживаются суммы
+GROUP_DIMENSIONS = ("strategy", "position_type", "trade_type", "instrument")
+
+# Суммируемые по группам величины (в порядке столбцов массива сумм)
+_FIELDS = ("unrealized_pnl", "cost_basis", "market_value", "net_exposure", "gross_exposure",
+           "long_exposure", "short_exposure", "unpriced")
+
+_POSITIONS_QUERY = """
+SELECT id, strategy, trade_type, UPPER(TRIM(instrument)), UPPER(TRIM(position_type)), quantity, open_price, open_date
+FROM trades
+WHERE status = 'OPEN'
+"""
+
+
+class MarkToMarketEngine:
+    """Векторная оценка открытых позиций с инкрементальным пересчетом."""
+
+    def __init__(self, db_path: str = TRADES_DB_PATH, feed: Optional[PriceFeed] = None):
+        """
+        Инициализирует движок.
+
+        Args:
+            db_path: Путь к базе сделок
+            feed: Источник цен (по умолчанию выбранный в PRICE_FEED)
+        """
+        self.db_path = db_path
+        self._feed = feed
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._feed_version: Optional[int] = None
+        self._lock = threading.RLock()
+        self.priced_at: Optional[str] = None
+        self._load_positions([])
+
+    @property
+    def feed(self) -> PriceFeed:
+        if self._feed is None:
+            self._feed = get_price_feed()
+        return self._feed
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and os.path.exists(self.db_path):
+            # Только чтение: движок не меняет сделки
+            self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        return self._conn
+
+    def _load_positions(self, rows: List[tuple]) -> None:
+        """
+        Раскладывает открытые позиции по столбцам и сбрасывает цены.
+        """
+        columns = list(zip(*rows)) if rows else [()] * 8
+        self.ids = np.array(columns[0], dtype=np.int64)
+        self.quantity = np.array(columns[5], dtype=np.float64)
+        self.open_price = np.array(columns[6], dtype=np.float64)
+        self.open_date = list(columns[7])
+        self.side = np.where(np.array(columns[4], dtype=str) == "SHORT", -1.0, 1.0)
+
+        self.labels: Dict[str, List[str]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for dimension, values in zip(GROUP_DIMENSIONS, (columns[1], columns[4], columns[2], columns[3])):
+            labels, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+            self.labels[dimension] = [str(label) for label in labels]
+            self.codes[dimension] = codes.astype(np.int64)
+
+        instruments = len(self.labels["instrument"])
+        self.prices = np.full(instruments, np.nan)
+        self.multipliers = np.ones(instruments)
+        self.quote_times: List[str] = [""] * instruments
+
+        count = len(self.ids)
+        self.values = np.zeros((count, len(_FIELDS)))
+        self._position_values(np.arange(count), out=self.values)
+        self.totals = {dimension: self._group_sums(dimension, self.values) for dimension in GROUP_DIMENSIONS}
+        self._feed_version = None
+
+    def _position_values(self, positions: np.ndarray, out: np.ndarray) -> None:
+        """
+        Считает величины _FIELDS для указанных позиций по текущим ценам.
+
+        Позиция без цены оценивается по цене открытия и отмечается в unpriced.
+        """
+        instrument = self.codes["instrument"][positions]
+        price = self.prices[instrument]
+        multiplier = self.multipliers[instrument]
+        unpriced = np.isnan(price)
+        mark = np.where(unpriced, self.open_price[positions], price)
+        quantity = self.quantity[positions] * multiplier
+        side = self.side[positions]
+
+        market_value = quantity * mark
+        signed = side * market_value
+        out[positions, 0] = side * quantity * (mark - self.open_price[positions])
+        out[positions, 1] = quantity * self.open_price[positions]
+        out[positions, 2] = market_value
+        out[positions, 3] = signed
+        out[positions, 4] = np.abs(market_value)
+        out[positions, 5] = np.where(side > 0, market_value, 0.0)
+        out[positions, 6] = np.where(side < 0, market_value, 0.0)
+        out[positions, 7] = unpriced
+
+    def _group_sums(self, dimension: str, values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self.codes[dimension]
+        groups = len(self.labels[dimension])
+        if mask is not None:
+            codes, values = codes[mask], values[mask]
+        sums = np.zeros((groups, len(_FIELDS) + 1))
+        for column in range(len(_FIELDS)):
+            sums[:, column] = np.bincount(codes, weights=values[:, column], minlength=groups)
+        sums[:, -1] = np.bincount(codes, minlength=groups)
+        return sums
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Перечитывает позиции после изменений в базе и пересчитывает позиции с новыми ценами.
+
+        Returns:
+            Число позиций и пересчитанных позиций/инструментов
+        """
+        with self._lock:
+            reloaded = False
+            conn = self._connection()
+            if conn is not None:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if data_version != self._data_version:
+                    try:
+                        rows = conn.execute(_POSITIONS_QUERY).fetchall()
+                    except sqlite3.OperationalError as e:
+                        logger.warning(f"Open positions could not be loaded from {self.db_path}: {str(e)}")
+                        rows = []
+                    self._load_positions(rows)
+                    self._data_version = data_version
+                    reloaded = True
+                    metrics.increment("mtm_positions_loaded")
+
+            feed = self.feed
+            feed.refresh()
+            if feed.version == self._feed_version and not reloaded:
+                return {"positions": len(self.ids), "repriced_positions": 0, "repriced_instruments": 0}
+
+            instruments = self.labels["instrument"]
+            quotes = feed.get_prices(instruments)
+            prices = np.array([quotes[name].price if name in quotes else np.nan for name in instruments])
+            multipliers = np.array([quotes[name].multiplier if name in quotes else 1.0 for name in instruments])
+            self.quote_times = [quotes[name].timestamp if name in quotes else "" for name in instruments]
+
+            # Пересчитываются только позиции инструментов с изменившейся ценой
+            changed = ~((prices == self.prices) | (np.isnan(prices) & np.isnan(self.prices)))
+            changed |= multipliers != self.multipliers
+            positions = np.flatnonzero(changed[self.codes["instrument"]]) if len(self.ids) else np.empty(0, np.int64)
+            if len(positions):
+                before = self.values[positions].copy()
+                self.prices, self.multipliers = prices, multipliers
+                self._position_values(positions, out=self.values)
+                if len(positions) * 4 > len(self.ids):
+                    # Изменилась большая часть цен: суммы дешевле посчитать заново
+                    self.totals = {dimension: self._group_sums(dimension, self.values) for dimension in GROUP_DIMENSIONS}
+                else:
+                    delta = self.values[positions] - before
+                    for dimension in GROUP_DIMENSIONS:
+                        np.add.at(self.totals[dimension][:, :len(_FIELDS)], self.codes[dimension][positions], delta)
+            else:
+                self.prices, self.multipliers = prices, multipliers
+
+            self._feed_version = feed.version
+            self.priced_at = datetime.now().isoformat(timespec="seconds")
+            metrics.increment("mtm_repriced_positions", len(positions))
+            return {"positions": len(self.ids), "repriced_positions": int(len(positions)),
+                    "repriced_instruments": int(changed.sum())}
+
+    @staticmethod
+    def _summary(sums: np.ndarray) -> Dict[str, Any]:
+        summary = {field: round(float(value), 2) for field, value in zip(_FIELDS, sums)}
+        summary["unpriced"] = int(sums[_FIELDS.index("unpriced")])
+        summary["positions"] = int(sums[-1])
+        cost = sums[_FIELDS.index("cost_basis")]
+        summary["unrealized_pnl_pct"] = round(float(sums[0] / cost * 100), 2) if cost else None
+        return summary
+
+    def valuation(self, group_by: str = "strategy", strategy: Optional[str] = None,
+                  top: int = 10) -> Dict[str, Any]:
+        """
+        Возвращает оценку портфеля: итоги, суммы по группам и крупнейшие позиции.
+
+        Args:
+            group_by: Измерение группировки (strategy, position_type, trade_type, instrument)
+            strategy: Оценить только одну стратегию
+            top: Число позиций с наибольшим по модулю результатом
+
+        Returns:
+            Словарь с итогами, группами, позициями и показателями концентрации
+
+        Raises:
+            ValueError: Если измерение группировки неизвестно
+        """
+        if group_by not in GROUP_DIMENSIONS:
+            raise ValueError(f"Группировка '{group_by}' не поддерживается: {', '.join(GROUP_DIMENSIONS)}")
+
+        with self._lock:
+            self.refresh()
+            mask = None
+            if strategy is not None:
+                labels = self.labels["strategy"]
+                if strategy not in labels:
+                    return {"error": f"Стратегия '{strategy}' не найдена", "strategies": labels}
+                mask = self.codes["strategy"] == labels.index(strategy)
+
+            # Без фильтра используются поддерживаемые инкрементально суммы
+            groups = self.totals[group_by] if mask is None else self._group_sums(group_by, self.values, mask)
+            selected = np.arange(len(self.ids)) if mask is None else np.flatnonzero(mask)
+            totals = groups.sum(axis=0) if len(groups) else np.zeros(len(_FIELDS) + 1)
+
+            by_group = [dict(self._summary(groups[code]), **{group_by: label})
+                        for code, label in enumerate(self.labels[group_by]) if groups[code, -1]]
+            by_group.sort(key=lambda item: -item["gross_exposure"])
+
+            gross = totals[_FIELDS.index("gross_exposure")]
+            instrument_gross = np.bincount(self.codes["instrument"][selected],
+                                           weights=self.values[selected, _FIELDS.index("gross_exposure")],
+                                           minlength=len(self.labels["instrument"]))
+            order = np.argsort(-instrument_gross)[:5]
+            concentration = [{"instrument": self.labels["instrument"][code],
+                              "share_pct": round(float(instrument_gross[code] / gross * 100), 2)}
+                             for code in order if gross and instrument_gross[code]]
+
+            pnl = self.values[selected, 0]
+            largest = selected[np.argsort(-np.abs(pnl))[:max(0, int(top))]]
+            positions = []
+            for position in largest:
+                instrument = self.codes["instrument"][position]
+                price = self.prices[instrument]
+                positions.append({
+                    "id": int(self.ids[position]),
+                    "strategy": self.labels["strategy"][self.codes["strategy"][position]],
+                    "instrument": self.labels["instrument"][instrument],
+                    "position_type": self.labels["position_type"][self.codes["position_type"][position]],
+                    "quantity": float(self.quantity[position]),
+                    "open_price": float(self.open_price[position]),
+                    "open_date": self.open_date[position],
+                    "price": None if np.isnan(price) else float(price),
+                    "price_time": self.quote_times[instrument] or None,
+                    "unrealized_pnl": round(float(self.values[position, 0]), 2),
+                })
+
+            return {
+                "priced_at": self.priced_at,
+                "price_feed": self.feed.name,
+                "totals": self._summary(totals),
+                "group_by": group_by,
+                "groups": by_group,
+                "concentration": concentration,
+                "largest_positions": positions,
+            }
+
+
+# Синглтон движка создается при первом обращении
+_engine: Optional[MarkToMarketEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_mtm_engine() -> MarkToMarketEngine:
+    """
+    Возвращает синглтон движка оценки позиций.
+
+    Returns:
+        Экземпляр MarkToMarketEngine
+    """
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = MarkToMarketEngine()
+    return _engine
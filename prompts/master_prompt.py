@@ -48,7 +48,38 @@ MASTER_PROMPT = """
 
 4. **get_available_tools** - Возвращает список всех доступных инструментов.
 
-5. **lookup_information** - Ищет информацию по указанной теме.
+5. **lookup_information** - Ищет информацию по указанной теме во внутренней базе знаний (документация zAI).
+
+### Инструменты базы данных бота
+
+Для вопросов о пользователях и сигналах телеграм-бота сначала используйте готовые
+инструменты с параметрами, перечисленные в контексте запроса вместе со схемой
+(`get_bot_user_count`, `get_top_bot_users`, `get_recent_bot_signals` и др.; доступны
+только те, что совместимы со схемой базы) — они быстрее и надежнее собственного SQL.
+Схема базы передается в контексте таких запросов; вызывайте `get_bot_database_schema`
+только если ее нет или она могла устареть (`refresh=true`). Свой SELECT-запрос
+пишите через `query_bot_database`, когда ни один готовый инструмент не подходит.
+
+### Инструменты отчетов компаний
+
+Отчеты 10-Q из каталога отчетов читайте по частям: `list_filings` показывает
+доступные отчеты, периоды и разделы, `read_filing_section` возвращает один раздел
+(например, `mda` или `risk factors`), `read_filing_pages` — конкретные страницы.
+Не запрашивайте весь отчет, если вопрос касается одного раздела.
+Для числовых вопросов (выручка, маржа, прибыль на акцию, денежный поток, сравнение
+периодов) используйте `get_financial_facts` — он возвращает готовые значения и
+изменения без чтения таблиц, например `get_financial_facts("TSLA", "gross_margin", "Q1 2025, Q3 2024")`.
+На вопрос «что изменилось» между отчетами одной компании используйте `compare_filings`:
+он возвращает только измененные разделы и абзацы вместо двух полных документов.
+
+### Инструменты портфеля
+
+Для вопросов о текущем результате открытых позиций, экспозиции по стратегиям
+и концентрации портфеля используйте `get_portfolio_valuation` (параметр `group_by`:
+strategy, position_type, trade_type или instrument). Позиции без цены в хранилище
+цен оцениваются по цене открытия и учитываются в поле `unpriced` — сообщайте об этом.
+Итоги по стратегиям (число сделок, доля прибыльных, суммарный результат, средний срок
+удержания) возвращает `get_strategy_stats` — не считайте их SQL-запросом по всем сделкам.
 
 ### Инвестиционные инструменты
 
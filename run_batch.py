@@ -0,0 +1,111 @@
+"""
+Точка входа для пакетной обработки запросов мастер-агентом.
+
+Читает запросы из файла (по одному на строку: текст или JSON-объект
+с полями "query" и необязательным "id"), обрабатывает их параллельно
+через MasterAgent.process_batch и пишет результаты в JSONL по мере
+готовности. Ход выполнения выводится в stderr.
+
+Примеры запуска:
+    python run_batch.py reports/nightly.txt --output results.jsonl
+    python run_batch.py queries.jsonl --concurrency 8
+    cat queries.txt | python run_batch.py - > results.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Dict, Any, Optional
+
+# Добавляем родительский каталог в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def read_queries(path: str) -> List[Dict[str, Any]]:
+    """
+    Читает запросы из файла или stdin.
+
+    Args:
+        path: Путь к файлу или "-" для stdin
+
+    Returns:
+        Список словарей с полями id и query
+    """
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    items = []
+    try:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                items.append({"id": record.get("id", line_number), "query": record["query"]})
+            else:
+                items.append({"id": line_number, "query": line})
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return items
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Основная функция пакетной обработки.
+
+    Args:
+        argv: Аргументы командной строки
+
+    Returns:
+        Код возврата (1, если хотя бы один запрос завершился ошибкой)
+    """
+    parser = argparse.ArgumentParser(description="Пакетная обработка запросов мастер-агентом zAI")
+    parser.add_argument("input", help="Файл с запросами (текст или JSONL), '-' для stdin")
+    parser.add_argument("--output", "-o", default="-", help="Файл результатов JSONL ('-' для stdout)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Число одновременных запросов")
+    parser.add_argument("--log-level", default="WARNING", help="Уровень логирования")
+    args = parser.parse_args(argv)
+
+    from utils.logging_config import setup_logging
+    setup_logging(level=args.log_level, stream=sys.stderr, force=True)
+
+    items = read_queries(args.input)
+    if not items:
+        print("Нет запросов для обработки", file=sys.stderr)
+        return 0
+
+    from master_agent import get_master_agent
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    failed = 0
+
+    def on_progress(completed: int, total: int, result: Dict[str, Any]) -> None:
+        nonlocal failed
+        record = dict(result, id=items[result["index"]]["id"])
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        if record["error"]:
+            failed += 1
+        status = "ошибка" if record["error"] else "ok"
+        print(f"[{completed}/{total}] {record['id']}: {status} за {record['duration']:.1f} с", file=sys.stderr)
+
+    try:
+        get_master_agent().process_batch(
+            [item["query"] for item in items],
+            concurrency=args.concurrency,
+            progress_callback=on_progress
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Обработано {len(items)} запросов за {elapsed:.1f} с, ошибок: {failed}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,179 @@
 """
 Точка входа для запуска веб-интерфейса zAI.
 
-Этот скрипт запускает веб-сервер Flask для взаимодействия с мастер-агентом через браузер.
+Режимы (параметр --mode или SERVER_MODE):
+    dev         — сервер разработки Flask (один процесс)
+    production  — pre-fork сервер gunicorn с рабочими процессами gthread
+
+В режиме production приложение, реестр инструментов и агенты загружаются
+один раз в главном процессе (preload) и достаются рабочим процессам через
+copy-on-write; после fork каждый процесс открывает свои соединения с SQLite
+и пулы HTTP-клиентов. Ключ подписи сессий (SECRET_KEY) в режиме production
+обязателен: cookie сессии должна читаться любым рабочим процессом и после
+перезапуска. Перед запуском в обоих режимах выполняется самопроверка;
+с --check скрипт выполняет только ее.
+
+Сигналы главного процесса gunicorn:
+    HUP   — плавная замена рабочих процессов: текущие запросы дорабатывают
+            в течение WEB_GRACEFUL_TIMEOUT. Код при этом не перечитывается
+            (он загружен до fork); для обновления кода — USR2, затем TERM
+            старому главному процессу.
+    TERM  — плавная остановка
+
+Модули инструментов и агентов можно перезагрузить без перезапуска:
+POST /api/admin/reload выполняет перезагрузку в одном рабочем процессе
+и записывает ее в журнал (RELOAD_LOG_PATH), остальные процессы применяют
+ее перед следующим запросом.
+
+Примеры запуска:
+    python run_web.py
+    python run_web.py --mode production --workers 4 --threads 8
+    python run_web.py --check
 """
 
 import logging
 import os
 import sys
+import argparse
 
 # Добавляем родительский каталог в путь для импорта
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from web.app import run_server
-from config import LOG_LEVEL, LOG_FORMAT
+from config import (HOST, PORT, SERVER_MODE, SECRET_KEY, WEB_WORKERS, WEB_THREADS,
+                    WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT, WEB_KEEPALIVE, WEB_MAX_REQUESTS, LOG_LEVEL, validate_config)
+from utils.logging_config import setup_logging as setup_logging_pipeline
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn не установлен или Windows
+    BaseApplication = None
 
 def setup_logging():
     """
-    Настраивает систему логирования.
+    Настраивает систему логирования (очередь и фоновый поток вывода, см. utils/logging_config.py).
+    """
+    setup_logging_pipeline(stream=sys.stdout, force=True)
+
+def self_check(mode):
     """
-    logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL),
-        format=LOG_FORMAT,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    Проверяет конфигурацию и готовит приложение к обслуживанию запросов.
+
+    Проверяются настройки, доступность баз задач и сессий и сборка реестра
+    инструментов и агентов (в режиме production это и есть preload).
+
+    Args:
+        mode: Режим сервера
+
+    Returns:
+        Сводка проверки
+
+    Raises:
+        RuntimeError: Если сервер не может быть запущен
+    """
+    try:
+        validate_config()
+    except ValueError as e:
+        raise RuntimeError(str(e))
+    if mode == "production" and BaseApplication is None:
+        raise RuntimeError("Для режима production нужен gunicorn: pip install gunicorn")
+    if mode == "production" and not SECRET_KEY:
+        raise RuntimeError("Для режима production задайте SECRET_KEY: ключ подписи сессий "
+                           "должен быть общим для всех рабочих процессов и перезапусков")
+
+    try:
+        from web.app import preload
+        return preload()
+    except Exception as e:
+        raise RuntimeError(f"Приложение не загружено: {str(e)}")
+
+if BaseApplication is not None:
+    class ProductionServer(BaseApplication):
+        """Pre-fork сервер gunicorn с предзагруженным приложением."""
+
+        def __init__(self, workers, threads):
+            self.workers = workers
+            self.threads = threads
+            super().__init__()
+
+        def load_config(self):
+            workers, threads = self.workers, self.threads
+
+            def post_fork(server, worker):
+                from web.app import after_fork
+                after_fork(workers, threads)
+
+            def worker_exit(server, worker):
+                from web.app import shutdown
+                shutdown(WEB_GRACEFUL_TIMEOUT)
+
+            settings = {
+                "bind": f"{HOST}:{PORT}",
+                "workers": workers,
+                "worker_class": "gthread",
+                "threads": self.threads,
+                "preload_app": True,
+                "timeout": WEB_TIMEOUT,
+                "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+                "max_requests": WEB_MAX_REQUESTS,
+                "max_requests_jitter": WEB_MAX_REQUESTS // 10,
+                "post_fork": post_fork,
+                "worker_exit": worker_exit,
+                "loglevel": LOG_LEVEL.lower(),
+                "keepalive": WEB_KEEPALIVE,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from web.app import app
+            return app
 
 def main():
     """
     Основная функция для запуска веб-сервера.
     """
+    parser = argparse.ArgumentParser(description="Веб-интерфейс zAI")
+    parser.add_argument("--mode", choices=["dev", "production"], default=SERVER_MODE,
+                        help="Режим сервера (по умолчанию SERVER_MODE)")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS,
+                        help="Рабочие процессы в режиме production")
+    parser.add_argument("--threads", type=int, default=WEB_THREADS,
+                        help="Потоки на рабочий процесс в режиме production")
+    parser.add_argument("--check", action="store_true",
+                        help="Только выполнить самопроверку и выйти")
+    args = parser.parse_args()
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers и --threads должны быть не меньше 1")
+
     # Настраиваем логирование
     setup_logging()
     logger = logging.getLogger("zai_web")
-    
-    logger.info("Запуск веб-интерфейса zAI...")
-    
+
+    logger.info(f"Запуск веб-интерфейса zAI (режим {args.mode})...")
+
+    try:
+        summary = self_check(args.mode)
+    except RuntimeError as e:
+        logger.error(f"Самопроверка не пройдена: {str(e)}")
+        print(f"\nОшибка: {str(e)}\n")
+        sys.exit(1)
+    logger.info(f"Самопроверка пройдена: инструментов {summary['tools']}, "
+                f"возвращено в очередь задач {summary['requeued_jobs']}")
+    if args.check:
+        return
+
     try:
-        # Запускаем веб-сервер
-        run_server()
+        if args.mode == "production":
+            logger.info(f"Сервер gunicorn: {args.workers} процессов x {args.threads} потоков")
+            ProductionServer(args.workers, args.threads).run()
+        else:
+            from web.app import run_server
+            # Запускаем веб-сервер
+            run_server()
     except Exception as e:
         logger.exception("Ошибка при запуске веб-сервера")
         print(f"\nОшибка: {str(e)}\n")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,29 @@
+"""
+Общие настройки тестов.
+
+Тесты не обращаются к внешним API: ключей-заглушек достаточно для импорта
+config, а кэши, которые модули пишут на диск, перенаправляются во
+временный каталог.
+"""
+
+import os
+import sys
+import tempfile
+
+# Добавляем корень проекта в путь для импорта
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+_CACHE_DIR = tempfile.mkdtemp(prefix="zai-tests-")
+
+for key, value in {
+    "OPENAI_API_KEY": "test",
+    "SEC_API_KEY": "test",
+    "BOT_DB_API_KEY": "test",
+    "TOOL_MANIFEST_PATH": os.path.join(_CACHE_DIR, "tool_manifest.json"),
+    "BOT_DB_SCHEMA_CACHE_PATH": os.path.join(_CACHE_DIR, "bot_db_schema.json"),
+    "SESSION_STORE_PATH": os.path.join(_CACHE_DIR, "sessions.db"),
+    "JOBS_DB_PATH": os.path.join(_CACHE_DIR, "jobs.db"),
+    "RELOAD_LOG_PATH": os.path.join(_CACHE_DIR, "reloads.db"),
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,95 @@
+"""
+Тесты постраничной выдачи query_bot_database (tools/db_access_tools_ai.py).
+
+Запросы выполняются во встроенной SQLite вместо API базы бота: так
+проверяется, что обернутый _paginate запрос корректен и что курсоры
+проходят всю выборку без пропусков и повторов.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from tools import db_access_tools_ai as db
+from tools.db_access_tools_ai import query_bot_database, _paginate, _has_order_by
+
+ROWS = 25
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Подменяет API базы бота таблицей signals в памяти."""
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE signals (id INTEGER PRIMARY KEY, instrument TEXT)")
+    conn.executemany("INSERT INTO signals VALUES (?, ?)",
+                     [(index, f"TICKER{index % 4}") for index in range(1, ROWS + 1)])
+    queries = []
+
+    @contextmanager
+    def stream_rows(query):
+        queries.append(query)
+        yield iter([dict(row) for row in conn.execute(query)])
+
+    monkeypatch.setattr(db, "_stream_rows", stream_rows)
+    yield queries
+    conn.close()
+
+
+def _read_all_pages(query, page_size):
+    rows, pages = [], 0
+    cursor = None
+    while True:
+        page = query_bot_database(query, cursor=cursor, page_size=page_size).data
+        assert page.get("error") is None
+        rows.extend(page["results"])
+        pages += 1
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            return rows, pages
+        cursor = page["next_cursor"]
+
+
+def test_cursor_round_trip_covers_every_row_once(database):
+    query = "SELECT id, instrument FROM signals ORDER BY id -- последние сигналы"
+
+    rows, pages = _read_all_pages(query, page_size=10)
+
+    assert [row["id"] for row in rows] == list(range(1, ROWS + 1))
+    assert pages == 3
+    # LIMIT и OFFSET подставлены в текст запроса целыми числами
+    assert database[-1].endswith("LIMIT 11 OFFSET 20")
+
+
+def test_unordered_query_gets_no_cursor(database):
+    page = query_bot_database("SELECT * FROM signals;", page_size=10).data
+
+    assert page["has_more"] is True
+    assert page["next_cursor"] is None
+    assert "ORDER BY" in page["warning"]
+
+
+def test_cursor_is_bound_to_its_query(database):
+    page = query_bot_database("SELECT * FROM signals ORDER BY id", page_size=5).data
+
+    other = query_bot_database("SELECT * FROM signals ORDER BY instrument, id",
+                               cursor=page["next_cursor"], page_size=5).data
+
+    assert "другому запросу" in other["error"]
+    assert other["results"] == []
+
+
+def test_order_by_detection_ignores_nested_clauses():
+    assert _has_order_by("SELECT * FROM signals ORDER BY id")
+    assert _has_order_by("select * from signals order\n by id desc")
+    assert not _has_order_by("SELECT * FROM (SELECT * FROM signals ORDER BY id)")
+    assert not _has_order_by("SELECT ROW_NUMBER() OVER (ORDER BY id) FROM signals")
+    assert not _has_order_by("SELECT 'ORDER BY id' FROM signals -- ORDER BY id")
+
+
+def test_paginate_rejects_negative_bounds():
+    with pytest.raises(ValueError):
+        _paginate("SELECT 1", -1, 0)
+    with pytest.raises(ValueError):
+        _paginate("SELECT 1", 10, -5)
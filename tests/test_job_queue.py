@@ -0,0 +1,100 @@
+"""
+Тесты очереди фоновых задач (jobs/queue.py).
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from jobs.queue import JobStore, JobQueue, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), lease_seconds=60)
+
+
+def _dead_pid():
+    """Возвращает PID завершившегося процесса."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _set_owner(store, job_id, pid, lease_until):
+    store._conn.execute("UPDATE jobs SET owner_pid = ?, lease_until = ? WHERE id = ?", (pid, lease_until, job_id))
+
+
+def test_requeue_only_interrupted_jobs(store):
+    live = store.create("живой процесс", [])
+    expired = store.create("истекшая аренда", [])
+    dead = store.create("завершенный процесс", [])
+    for _ in range(3):
+        store.claim_next()
+
+    _set_owner(store, expired, os.getpid(), time.time() - 1)
+    _set_owner(store, dead, _dead_pid(), time.time() + 60)
+
+    assert store.requeue_interrupted() == 2
+    assert store.get(live)["status"] == STATUS_RUNNING
+    for job_id in (expired, dead):
+        job = store.get(job_id)
+        assert job["status"] == STATUS_QUEUED
+        assert job["owner_pid"] is None and job["lease_until"] is None
+
+
+def test_renew_leases_keeps_running_job(store):
+    job_id = store.create("долгая задача", [])
+    store.claim_next()
+    _set_owner(store, job_id, os.getpid(), time.time() - 1)
+
+    store.renew_leases([job_id])
+
+    assert store.get(job_id)["lease_until"] > time.time()
+    assert store.requeue_interrupted() == 0
+
+
+def test_legacy_database_is_migrated(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, query TEXT NOT NULL,
+                    history TEXT NOT NULL, session_id TEXT, progress TEXT NOT NULL, result TEXT,
+                    error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)""")
+    conn.execute("INSERT INTO jobs VALUES ('old', 'running', 'q', '[]', NULL, '[]', NULL, NULL, 0, 0, NULL)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+
+    # У задачи из старой версии нет владельца: она возвращается в очередь
+    assert store.requeue_interrupted() == 1
+    assert store.get("old")["status"] == STATUS_QUEUED
+
+
+def test_running_job_is_not_requeued_while_lease_is_renewed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), lease_seconds=0.3)
+    calls = []
+    finished = threading.Event()
+
+    def handler(job, report_progress):
+        calls.append(job["id"])
+        time.sleep(1.0)
+        return "готово"
+
+    queue = JobQueue(store, handler, workers=2, on_complete=lambda job, result, error: finished.set())
+    job_id = queue.submit("сравни отчеты", [])
+    try:
+        assert finished.wait(5)
+    finally:
+        queue.stop(timeout=5)
+
+    job = store.get(job_id)
+    assert job["status"] == STATUS_DONE
+    assert job["result"] == "готово"
+    assert calls == [job_id]
+    assert [event["stage"] for event in job["progress"]] == ["started"]
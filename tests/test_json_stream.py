@@ -0,0 +1,82 @@
+"""
+Тесты потокового разбора JSON-массивов (utils/json_stream.py).
+"""
+
+import json
+
+import pytest
+
+from utils import json_stream
+from utils.json_stream import iter_json_array, JSONStreamError
+
+DOCUMENT = {
+    "meta": {"results": "не массив", "note": "\"results\": ["},
+    "results": [
+        {"id": 1, "name": "Иван", "score": 12.5},
+        {"id": 2, "name": "строка с ] и , внутри", "tags": ["a", "b"]},
+        123456789,
+        -0.25,
+        True,
+        None,
+        "текст",
+        [1, [2, 3]],
+    ],
+    "count": 8,
+}
+
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.fixture(params=["ijson", "fallback"])
+def parser(request, monkeypatch):
+    """Проверяет и разбор через ijson, и встроенный разборщик."""
+    if request.param == "ijson":
+        if json_stream.ijson is None:
+            pytest.skip("ijson не установлен")
+    else:
+        monkeypatch.setattr(json_stream, "ijson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_items_survive_any_chunk_boundary(parser, size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+
+    assert list(iter_json_array(_chunks(data, size))) == DOCUMENT["results"]
+
+
+def test_number_split_across_chunks(parser):
+    data = b'{"results": [12345, 678]}'
+
+    assert list(iter_json_array([data[:16], data[16:]])) == [12345, 678]
+
+
+def test_multibyte_character_split_across_chunks(parser):
+    data = json.dumps({"results": ["ёжик"]}, ensure_ascii=False).encode("utf-8")
+    split = data.index("ё".encode("utf-8")) + 1
+
+    assert list(iter_json_array([data[:split], data[split:]])) == ["ёжик"]
+
+
+def test_empty_array(parser):
+    assert list(iter_json_array([b'{"results": []}'])) == []
+
+
+def test_missing_array_keeps_document(parser):
+    with pytest.raises(JSONStreamError) as error:
+        list(iter_json_array(_chunks(b'{"error": "no such table"}', 4)))
+
+    assert error.value.document == {"error": "no such table"}
+
+
+def test_truncated_array(parser):
+    with pytest.raises(JSONStreamError):
+        list(iter_json_array(_chunks(b'{"results": [1, 2, {"id": 3', 5)))
+
+
+def test_custom_key(parser):
+    data = b'{"results": [0], "rows": [1, 2]}'
+
+    assert list(iter_json_array(_chunks(data, 3), key="rows")) == [1, 2]
@@ -0,0 +1,91 @@
+"""
+Тесты горячей перезагрузки инструментов (tools/registry.py).
+"""
+
+import sys
+import importlib
+
+import pytest
+
+from tools import registry
+
+MODULE = "zai_reload_test_tools"
+
+TOOL_SOURCE = '''
+from tools.registry import register_tool
+
+
+@register_tool(category="system")
+def reload_probe(value: str) -> str:
+    """
+    Возвращает версию модуля.
+
+    Args:
+        value: Любая строка
+    """
+    return "{version}:" + value
+'''
+
+
+@pytest.fixture
+def tool_module(tmp_path, monkeypatch):
+    """Модуль с инструментом во временном каталоге; реестр восстанавливается после теста."""
+    saved = {name: getattr(registry, name) for name in ("TOOL_REGISTRY", "_CATEGORY_INDEX")}
+    registry.TOOL_REGISTRY = dict(saved["TOOL_REGISTRY"])
+    registry._CATEGORY_INDEX = {category: list(names) for category, names in saved["_CATEGORY_INDEX"].items()}
+    registry._invalidate()
+    monkeypatch.syspath_prepend(str(tmp_path))
+    path = tmp_path / f"{MODULE}.py"
+
+    def write(source):
+        path.write_text(source, encoding="utf-8")
+        importlib.invalidate_caches()
+
+    write(TOOL_SOURCE.format(version="v1"))
+    importlib.import_module(MODULE)
+    yield write
+
+    sys.modules.pop(MODULE, None)
+    for name, value in saved.items():
+        setattr(registry, name, value)
+    registry._invalidate()
+
+
+def test_reload_replaces_tool(tool_module):
+    assert registry.get_tool_function("reload_probe")("x") == "v1:x"
+    old_version = registry.get_tool_snapshot().version
+
+    tool_module(TOOL_SOURCE.format(version="v2-updated"))
+    result = registry.reload_tools([MODULE])
+
+    assert result["updated"] == ["reload_probe"]
+    assert result["old_version"] == old_version
+    assert registry.get_tool_function("reload_probe")("x") == "v2-updated:x"
+
+
+def test_failed_import_keeps_previous_registry(tool_module):
+    tools_before = registry.get_all_tools()
+    snapshot_before = registry.get_tool_snapshot()
+
+    tool_module(TOOL_SOURCE.format(version="v2") + "\nraise RuntimeError('broken module')\n")
+    with pytest.raises(RuntimeError, match="broken module"):
+        registry.reload_tools([MODULE])
+
+    assert registry.get_tool_function("reload_probe")("x") == "v1:x"
+    assert registry.get_all_tools() is tools_before
+    assert registry.get_tool_snapshot() is snapshot_before
+    assert registry._staging is None
+
+    # После исправления модуля перезагрузка снова проходит
+    tool_module(TOOL_SOURCE.format(version="v3-fixed"))
+    registry.reload_tools([MODULE])
+    assert registry.get_tool_function("reload_probe")("x") == "v3-fixed:x"
+
+
+def test_removed_tool_disappears(tool_module):
+    tool_module("from tools.registry import register_tool\n")
+
+    result = registry.reload_tools([MODULE])
+
+    assert result["removed"] == ["reload_probe"]
+    assert registry.get_tool_function("reload_probe") is None
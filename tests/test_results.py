@@ -0,0 +1,75 @@
+"""
+Тесты типизированных результатов инструментов (tools/results.py).
+"""
+
+import json
+
+import pytest
+
+from tools.results import ToolResult, to_model_output
+
+
+def test_data_is_read_only():
+    result = ToolResult({"ticker": "MSFT", "values": [1, 2]})
+
+    with pytest.raises(TypeError):
+        result.data["ticker"] = "AAPL"
+    with pytest.raises(TypeError):
+        del result.data["ticker"]
+    with pytest.raises(AttributeError):
+        result.extra = 1
+
+
+def test_source_dict_is_copied():
+    source = {"ticker": "MSFT"}
+    result = ToolResult(source)
+    serialized = result.to_json()
+
+    source["ticker"] = "AAPL"
+    source["added"] = True
+
+    assert result.data == {"ticker": "MSFT"}
+    assert result.to_json() == serialized
+
+
+def test_json_is_compact_and_cached():
+    result = ToolResult({"компания": "Microsoft", "items": [1, 2]})
+
+    serialized = result.to_json()
+
+    assert serialized == '{"компания":"Microsoft","items":[1,2]}'
+    assert result.to_json() is serialized
+    assert to_model_output(result) is serialized
+    assert to_model_output("text") == "text"
+
+
+def test_not_hashable_but_comparable():
+    assert ToolResult({"a": 1}) == ToolResult({"a": 1})
+    assert ToolResult({"a": 1}) != {"a": 1}
+    with pytest.raises(TypeError):
+        hash(ToolResult({"a": 1}))
+
+
+def test_failure_puts_error_first():
+    result = ToolResult.failure("нет соединения", results=[])
+
+    assert list(result.data) == ["error", "results"]
+    assert result.error == "нет соединения"
+    assert json.loads(result.to_json()) == {"error": "нет соединения", "results": []}
+
+
+@pytest.mark.parametrize("value, expected", [
+    ({"success": True}, {"success": True}),
+    ('{"response": "ok"}', {"response": "ok"}),
+    ("[1, 2]", {"success": True, "response": "[1, 2]"}),
+    ("просто текст", {"success": True, "response": "просто текст"}),
+    (42, {"success": True, "response": "42"}),
+])
+def test_coerce(value, expected):
+    assert ToolResult.coerce(value).data == expected
+
+
+def test_coerce_keeps_instance():
+    result = ToolResult({"a": 1})
+
+    assert ToolResult.coerce(result) is result
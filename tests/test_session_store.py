@@ -0,0 +1,90 @@
+"""
+Тесты хранилища историй чатов (web/session_store.py).
+"""
+
+import pytest
+
+from web.session_store import SessionStore
+
+
+def _exchange(index, size=400):
+    return [{"role": "user", "content": f"вопрос {index} " + "x" * size},
+            {"role": "assistant", "content": f"ответ {index} " + "y" * size}]
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        options = dict(path=str(tmp_path / "sessions.db"), max_messages=50, recent_messages=4,
+                       session_budget=1 << 20, memory_budget=1 << 24, disk_ttl=3600)
+        options.update(kwargs)
+        store = SessionStore(**options)
+        stores.append(store)
+        return store
+
+    return make
+
+
+def test_history_round_trip_with_compression(make_store):
+    store = make_store()
+    for index in range(5):
+        store.append("s", _exchange(index))
+
+    history = store.get_history("s")
+
+    assert history == [message for index in range(5) for message in _exchange(index)]
+    assert store.memory_report()["memory"]["compression_ratio"] > 1
+
+
+def test_max_messages_drops_oldest(make_store):
+    store = make_store(max_messages=6)
+    for index in range(5):
+        store.append("s", _exchange(index, size=10))
+
+    history = store.get_history("s")
+
+    assert len(history) == 6
+    assert history[0]["content"].startswith("вопрос 2")
+
+
+def test_session_budget_keeps_last_exchange(make_store):
+    budget = 4096
+    store = make_store(session_budget=budget)
+    for index in range(30):
+        store.append("s", _exchange(index, size=2000))
+
+    history = store.get_history("s")
+    report = store.memory_report()
+
+    assert report["memory"]["bytes"] <= budget
+    assert history[-2:] == _exchange(29, size=2000)
+    assert len(history) < 60
+
+
+def test_memory_budget_evicts_to_disk_and_restores(make_store):
+    store = make_store(memory_budget=8192)
+    for session in ("a", "b", "c", "d"):
+        store.append(session, _exchange(session, size=3000))
+
+    report = store.memory_report()
+    assert report["evictions"] > 0
+    assert report["memory"]["bytes"] <= 8192 or report["memory"]["sessions"] == 1
+    assert report["disk"]["sessions"] > 0
+
+    # Вытесненная сессия загружается с диска без потерь
+    assert store.get_history("a") == _exchange("a", size=3000)
+    assert store.memory_report()["restores"] > 0
+
+
+def test_clear_removes_memory_and_disk_copies(make_store):
+    store = make_store(memory_budget=4096)
+    store.append("a", _exchange(1, size=3000))
+    store.append("b", _exchange(2, size=3000))
+
+    store.clear("a")
+    store.clear("b")
+
+    assert "a" not in store and "b" not in store
+    assert store.get_history("a") == []
@@ -0,0 +1,114 @@
+"""
+Тесты объединения одновременных вычислений (utils/singleflight.py).
+"""
+
+import threading
+
+import pytest
+
+from utils.singleflight import SingleFlight, coalesce
+
+
+def _run_concurrently(count, target):
+    """Запускает target в count потоках одновременно и возвращает результаты или исключения."""
+    barrier = threading.Barrier(count)
+    outcomes = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            outcomes[index] = target()
+        except Exception as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test_shared")
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    outcomes = _run_concurrently(4, lambda: flight.do("key", compute))
+    timer.join()
+
+    assert outcomes == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_error_reaches_every_waiter_and_is_not_reused():
+    flight = SingleFlight("test_error", window=60)
+    release = threading.Event()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    outcomes = _run_concurrently(3, lambda: flight.do("key", fail))
+    timer.join()
+
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert len(calls) == 1
+    # Ошибка не раздается в окне: следующий вызов выполняется заново
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_window_reuses_result_unless_rejected():
+    flight = SingleFlight("test_window", window=60, reusable=lambda result: result != "error")
+
+    assert flight.do("ok", lambda: "first") == "first"
+    assert flight.do("ok", lambda: "second") == "first"
+
+    assert flight.do("bad", lambda: "error") == "error"
+    assert flight.do("bad", lambda: "fresh") == "fresh"
+
+
+def test_without_window_finished_result_is_not_reused():
+    flight = SingleFlight("test_no_window")
+
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_coalesce_key_scopes_calls():
+    calls = []
+
+    @coalesce(window=60, key=lambda session, query: (session, query))
+    def answer(session, query):
+        calls.append((session, query))
+        return f"{session}:{query}"
+
+    assert answer("a", "q") == "a:q"
+    assert answer("a", "q") == "a:q"
+    assert answer("b", "q") == "b:q"
+    assert calls == [("a", "q"), ("b", "q")]
+
+
+def test_master_agent_key_covers_whole_history():
+    master_agent = pytest.importorskip("master_agent")
+    key = master_agent.MasterAgent._coalescing_key
+
+    first = [{"role": "user", "content": "Привет"}, {"role": "assistant", "content": "Здравствуйте"}]
+    other = [{"role": "user", "content": "Расскажи про MSFT"}, {"role": "assistant", "content": "Здравствуйте"}]
+
+    # Регистр и пробелы запроса не различаются, история различается целиком
+    assert key("Статус  системы", first) == key("статус системы", first)
+    assert key("статус системы", first) != key("статус системы", other)
+    assert key("статус системы", None) == key("статус системы", [])
+    assert key("статус системы", None) != key("статус системы", first)
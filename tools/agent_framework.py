@@ -5,12 +5,15 @@
 и взаимодействия с различными специализированными агентами.
 """
 
-import json
+import sys
+import time
 import logging
 import importlib
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional
 
 from tools.registry import register_tool
+from tools.results import ToolResult
+from utils import metrics
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -44,7 +47,8 @@ class AgentInfo:
         self.error = None
 
 def register_agent(name: str, module_name: str, query_func: str, 
-                  description: str = "", categories: List[str] = None) -> bool:
+                  description: str = "", categories: List[str] = None,
+                  replace: bool = False) -> bool:
     """
     Регистрирует специализированного агента в системе.
     
@@ -54,13 +58,14 @@ def register_agent(name: str, module_name: str, query_func: str,
         query_func: Имя функции для выполнения запросов к агенту
         description: Описание агента
         categories: Список категорий, с которыми работает агент
+        replace: Заменить уже зарегистрированного агента, заново импортировав его модуль
         
     Returns:
         bool: True если регистрация успешна, иначе False
     """
     global AGENTS_REGISTRY
     
-    if name in AGENTS_REGISTRY:
+    if name in AGENTS_REGISTRY and not replace:
         logger.warning(f"Агент с именем '{name}' уже зарегистрирован")
         return False
     
@@ -69,8 +74,9 @@ def register_agent(name: str, module_name: str, query_func: str,
     
     # Пытаемся инициализировать агента
     try:
-        # Импортируем модуль
-        agent_info.module = importlib.import_module(module_name)
+        # Импортируем модуль (при замене — заново, чтобы подхватить новую версию)
+        module = sys.modules.get(module_name) if replace else None
+        agent_info.module = importlib.reload(module) if module is not None else importlib.import_module(module_name)
         
         # Проверяем наличие функции запроса
         if hasattr(agent_info.module, query_func):
@@ -87,11 +93,35 @@ def register_agent(name: str, module_name: str, query_func: str,
         agent_info.error = f"Ошибка при инициализации агента '{name}': {str(e)}"
         logger.error(agent_info.error)
     
-    # Регистрируем агента
+    # Регистрируем агента; выполняющиеся запросы продолжают работать с прежней функцией
     AGENTS_REGISTRY[name] = agent_info
     return agent_info.is_initialized
 
-def query_agent(agent_name: str, query: str) -> Dict[str, Any]:
+def reload_agents(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Перерегистрирует агентов, заново импортируя их модули.
+    
+    Args:
+        names: Имена агентов (по умолчанию все зарегистрированные)
+        
+    Returns:
+        Словарь имя агента -> {initialized, error}
+    """
+    results = {}
+    for name in names or list(AGENTS_REGISTRY.keys()):
+        info = AGENTS_REGISTRY.get(name)
+        if info is None:
+            results[name] = {"initialized": False, "error": f"Агент '{name}' не зарегистрирован"}
+            continue
+        
+        register_agent(info.name, info.module_name, info.query_func, info.description,
+                       info.categories, replace=True)
+        reloaded = AGENTS_REGISTRY[name]
+        results[name] = {"initialized": reloaded.is_initialized, "error": reloaded.error}
+        logger.info(f"Агент '{name}' перезагружен: {'успешно' if reloaded.is_initialized else reloaded.error}")
+    return results
+
+def query_agent(agent_name: str, query: str) -> ToolResult:
     """
     Отправляет запрос указанному агенту.
     
@@ -100,64 +130,50 @@ def query_agent(agent_name: str, query: str) -> Dict[str, Any]:
         query: Запрос для агента
         
     Returns:
-        Dict: Результат выполнения запроса
+        ToolResult: Результат выполнения запроса (ответ агента приводится к нему без повторной сериализации)
     """
     global AGENTS_REGISTRY
     
     # Проверяем наличие агента в реестре
     if agent_name not in AGENTS_REGISTRY:
-        return {
-            "success": False,
-            "error": f"Агент '{agent_name}' не зарегистрирован",
-            "response": f"Агент '{agent_name}' не найден. Зарегистрированные агенты: {', '.join(AGENTS_REGISTRY.keys())}"
-        }
+        return ToolResult.failure(
+            f"Агент '{agent_name}' не зарегистрирован",
+            success=False,
+            response=f"Агент '{agent_name}' не найден. Зарегистрированные агенты: {', '.join(AGENTS_REGISTRY.keys())}"
+        )
     
     agent_info = AGENTS_REGISTRY[agent_name]
     
     # Проверяем инициализацию агента
     if not agent_info.is_initialized:
-        return {
-            "success": False,
-            "error": agent_info.error or f"Агент '{agent_name}' не инициализирован",
-            "response": f"Невозможно выполнить запрос к агенту '{agent_name}': {agent_info.error or 'агент не инициализирован'}"
-        }
+        return ToolResult.failure(
+            agent_info.error or f"Агент '{agent_name}' не инициализирован",
+            success=False,
+            response=f"Невозможно выполнить запрос к агенту '{agent_name}': {agent_info.error or 'агент не инициализирован'}"
+        )
     
     # Выполняем запрос
+    started = time.perf_counter()
     try:
         # Вызываем функцию запроса
-        result = agent_info.func(query)
-        
-        # Если результат уже словарь, возвращаем его
-        if isinstance(result, dict):
-            return result
+        # ToolResult и словари передаются как есть; строка JSON разбирается один раз
+        result = ToolResult.coerce(agent_info.func(query))
+        # Ответ с полем error — неудачный вызов агента, даже если исключения не было
+        metrics.record_call(f"agent:{agent_name}", time.perf_counter() - started, error=result.error is not None)
         
-        # Если результат - строка JSON, парсим ее
-        if isinstance(result, str):
-            try:
-                return json.loads(result)
-            except json.JSONDecodeError:
-                # Если не можем распарсить как JSON, оборачиваем в словарь
-                return {
-                    "success": True,
-                    "response": result
-                }
-        
-        # Если неизвестный тип, оборачиваем в словарь
-        return {
-            "success": True,
-            "response": str(result)
-        }
+        return result
         
     except Exception as e:
+        metrics.record_call(f"agent:{agent_name}", time.perf_counter() - started, error=True)
         logger.error(f"Ошибка при выполнении запроса к агенту '{agent_name}': {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
         
-        return {
-            "success": False,
-            "error": str(e),
-            "response": f"Произошла ошибка при выполнении запроса к агенту '{agent_name}': {str(e)}"
-        }
+        return ToolResult.failure(
+            str(e),
+            success=False,
+            response=f"Произошла ошибка при выполнении запроса к агенту '{agent_name}': {str(e)}"
+        )
 
 def get_agents_info() -> List[Dict[str, Any]]:
     """
@@ -200,22 +216,22 @@ def get_agent_by_category(category: str) -> Optional[str]:
 
 # Инструменты для мастер-агента
 
-@register_tool
-def get_available_agents() -> str:
+@register_tool(category="agents")
+def get_available_agents() -> ToolResult:
     """
     Возвращает список всех доступных специализированных агентов.
     
     Returns:
-        Информация об агентах в формате JSON
+        Информация об агентах (сериализуется в JSON при передаче модели)
     """
     agents = get_agents_info()
-    return json.dumps({
+    return ToolResult({
         "count": len(agents),
         "agents": agents
-    }, indent=2)
+    })
 
-@register_tool
-def ask_specialized_agent(agent_name: str, query: str) -> str:
+@register_tool(category="agents")
+def ask_specialized_agent(agent_name: str, query: str) -> ToolResult:
     """
     Отправляет запрос указанному специализированному агенту.
     
@@ -224,10 +240,9 @@ def ask_specialized_agent(agent_name: str, query: str) -> str:
         query: Запрос для агента
         
     Returns:
-        Ответ агента в формате JSON
+        Ответ агента (сериализуется в JSON при передаче модели)
     """
-    result = query_agent(agent_name, query)
-    return json.dumps(result, indent=2)
+    return query_agent(agent_name, query)
 
 # Регистрируем инвестиционного агента при импорте модуля
 register_agent(
@@ -2,56 +2,491 @@
 Инструменты для взаимодействия с базой данных телеграм-бота.
 """
 
+import os
+import re
 import json
+import time
+import base64
+import hashlib
 import logging
-import requests
-from typing import Optional, Dict
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Iterator
 
 from tools.registry import register_tool
+from tools.results import ToolResult
+from config import (BOT_DB_API_URL, BOT_DB_API_KEY, REQUEST_TIMEOUT,
+                    BOT_DB_PAGE_SIZE, BOT_DB_MAX_BYTES, BOT_DB_AGGREGATE_MAX_ROWS,
+                    BOT_DB_SCHEMA_TTL, BOT_DB_SCHEMA_CACHE_PATH)
+from utils import metrics
+from utils.http_client import get_session
+from utils.json_stream import iter_json_array, JSONStreamError
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Конфигурация для доступа к API бота
-BOT_DB_API_URL = "http://194.87.250.225:5001/api"  
-BOT_DB_API_KEY = "yNkP8Qz2XbTr5Vw7JsLm3GfHd9AeC6B1"  # API-ключ
+# Кэш схемы базы бота: {"schema", "version", "fetched_at"}
+_schema_snapshot: Optional[Dict[str, Any]] = None
+_schema_lock = threading.Lock()
 
-@register_tool
-def query_bot_database(query: str) -> str:
+# Максимальная длина компактной схемы, если ее структуру не удалось разобрать
+COMPACT_SCHEMA_LIMIT = 4000
+
+def _schema_version(schema: Any) -> str:
+    """
+    Вычисляет версию схемы как хэш ее канонического JSON.
+    """
+    canonical = json.dumps(schema, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+def _load_schema_file() -> Optional[Dict[str, Any]]:
+    """
+    Загружает сохраненную схему с диска.
+    """
+    try:
+        with open(BOT_DB_SCHEMA_CACHE_PATH, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return snapshot if {"schema", "version", "fetched_at"} <= set(snapshot) else None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Bot DB schema cache is unreadable: {str(e)}")
+        return None
+
+def _save_schema_file(snapshot: Dict[str, Any]) -> None:
+    """
+    Атомарно сохраняет схему на диск.
+    """
+    directory = os.path.dirname(BOT_DB_SCHEMA_CACHE_PATH) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_path, BOT_DB_SCHEMA_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not save bot DB schema cache: {str(e)}")
+
+def get_schema_snapshot(force_refresh: bool = False) -> Dict[str, Any]:
+    """
+    Возвращает схему базы бота из кэша (память, затем диск), запрашивая API по истечении TTL.
+    
+    Если API недоступно, используется устаревшая копия.
+    
+    Args:
+        force_refresh: Запросить схему у API независимо от TTL
+    
+    Returns:
+        Словарь с ключами schema, version и fetched_at
+    
+    Raises:
+        Exception: Если API недоступно и сохраненной схемы нет
+    """
+    global _schema_snapshot
+    
+    with _schema_lock:
+        if _schema_snapshot is None:
+            _schema_snapshot = _load_schema_file()
+        
+        fresh = _schema_snapshot is not None and time.time() - _schema_snapshot["fetched_at"] < BOT_DB_SCHEMA_TTL
+        metrics.record_cache("bot_db_schema", hit=fresh and not force_refresh)
+        if fresh and not force_refresh:
+            return _schema_snapshot
+        
+        try:
+            response = get_session().get(
+                f"{BOT_DB_API_URL}/schema",
+                headers={"X-API-Key": BOT_DB_API_KEY},
+                timeout=REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+            schema = response.json()
+        except Exception as e:
+            if _schema_snapshot is None:
+                raise
+            logger.warning(f"Using stale bot DB schema {_schema_snapshot['version']}: {str(e)}")
+            return _schema_snapshot
+        
+        version = _schema_version(schema)
+        if _schema_snapshot is not None and _schema_snapshot["version"] != version:
+            logger.info(f"Bot DB schema changed: {_schema_snapshot['version']} -> {version}")
+        _schema_snapshot = {"schema": schema, "version": version, "fetched_at": time.time()}
+        _save_schema_file(_schema_snapshot)
+        return _schema_snapshot
+
+def schema_tables(schema: Any) -> Dict[str, List[str]]:
+    """
+    Извлекает таблицы и их колонки из ответа API схемы.
+    
+    Поддерживаются варианты {"tables": {...}} и {таблица: ...}, где колонки
+    заданы списком имен, списком объектов с полем name или словарем имя -> тип.
+    
+    Args:
+        schema: Ответ API схемы
+    
+    Returns:
+        Словарь таблица -> список колонок (пустой, если формат не распознан)
+    """
+    if not isinstance(schema, dict):
+        return {}
+    tables = schema.get("tables", schema)
+    if isinstance(tables, list):
+        tables = {table.get("name"): table.get("columns", []) for table in tables if isinstance(table, dict)}
+    if not isinstance(tables, dict):
+        return {}
+    
+    result = {}
+    for table, columns in tables.items():
+        if isinstance(columns, dict):
+            columns = columns.get("columns", columns)
+        if isinstance(columns, dict):
+            result[table] = list(columns)
+        elif isinstance(columns, list):
+            result[table] = [column.get("name") if isinstance(column, dict) else str(column) for column in columns]
+    return result
+
+def format_schema_compact(snapshot: Dict[str, Any]) -> str:
+    """
+    Формирует компактное текстовое описание схемы для контекста модели.
+    
+    Args:
+        snapshot: Результат get_schema_snapshot
+    
+    Returns:
+        Строки вида "таблица(колонка, ...)"
+    """
+    tables = schema_tables(snapshot["schema"])
+    if not tables:
+        return json.dumps(snapshot["schema"], ensure_ascii=False, separators=(",", ":"))[:COMPACT_SCHEMA_LIMIT]
+    return "\n".join(f"{table}({', '.join(columns)})" for table, columns in tables.items())
+
+# Размер фрагмента при потоковом чтении ответа базы (байт)
+STREAM_CHUNK_SIZE = 16384
+
+# Максимальный размер страницы, который может запросить модель
+MAX_PAGE_SIZE = 1000
+
+# Количество строк-примеров, возвращаемых вместе с агрегатами
+AGGREGATE_SAMPLE_ROWS = 3
+
+# Количество значений top-N по умолчанию
+DEFAULT_TOP_N = 10
+
+def _query_fingerprint(query: str) -> str:
+    """
+    Вычисляет отпечаток запроса, к которому привязан курсор страницы.
+    """
+    return hashlib.sha256(" ".join(query.split()).encode("utf-8")).hexdigest()[:16]
+
+def _encode_cursor(query: str, offset: int) -> str:
+    """
+    Формирует курсор следующей страницы: смещение и отпечаток запроса.
+    """
+    payload = json.dumps({"q": _query_fingerprint(query), "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, query: str) -> int:
+    """
+    Извлекает смещение из курсора, проверяя, что он выдан для этого же запроса.
+    
+    Raises:
+        ValueError: Если курсор поврежден или относится к другому запросу
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(payload["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Некорректный курсор страницы")
+    if payload.get("q") != _query_fingerprint(query) or offset < 0:
+        raise ValueError("Курсор относится к другому запросу; повторите запрос без cursor")
+    return offset
+
+def _strip_sql_comments(query: str) -> str:
+    """
+    Удаляет комментарии SQL (-- и /* */) вне строковых литералов и идентификаторов в кавычках.
+    """
+    result = []
+    quote = None
+    position, length = 0, len(query)
+    while position < length:
+        char = query[position]
+        if quote is not None:
+            # Удвоенная кавычка внутри литерала закрывает и сразу открывает его заново
+            if char == quote:
+                quote = None
+            result.append(char)
+            position += 1
+        elif char in ("'", '"', "`"):
+            quote = char
+            result.append(char)
+            position += 1
+        elif query.startswith("--", position):
+            end = query.find("\n", position)
+            position = length if end < 0 else end
+        elif query.startswith("/*", position):
+            end = query.find("*/", position + 2)
+            position = length if end < 0 else end + 2
+            result.append(" ")
+        else:
+            result.append(char)
+            position += 1
+    return "".join(result)
+
+def _top_level_sql(query: str) -> str:
+    """
+    Возвращает текст запроса без литералов в кавычках и содержимого скобок.
+    
+    По результату можно искать ключевые слова внешнего запроса: ORDER BY
+    оконной функции или подзапроса в него не попадает.
+    """
+    result = []
+    quote = None
+    depth = 0
+    for char in _strip_sql_comments(query):
+        if quote is not None:
+            if char == quote:
+                quote = None
+            result.append(" ")
+        elif char in ("'", '"', "`"):
+            quote = char
+            result.append(" ")
+        elif char == "(":
+            depth += 1
+            result.append(" ")
+        elif char == ")":
+            depth = max(0, depth - 1)
+            result.append(" ")
+        else:
+            result.append(char if depth == 0 else " ")
+    return "".join(result)
+
+def _has_order_by(query: str) -> bool:
+    """
+    Проверяет, задает ли внешний запрос порядок строк (ORDER BY).
+    """
+    return re.search(r"\bORDER\s+BY\b", _top_level_sql(query), re.IGNORECASE) is not None
+
+def _paginate(query: str, limit: int, offset: int) -> str:
+    """
+    Оборачивает SELECT в запрос с LIMIT/OFFSET, чтобы база отдавала только одну страницу.
+    
+    Комментарии и завершающие ";" удаляются: иначе "-- ..." в конце запроса
+    закомментировал бы закрывающую скобку подзапроса. LIMIT и OFFSET
+    подставляются в текст проверенными целыми числами: API базы вызывается
+    с пустым списком params, как и остальные запросы.
+    
+    Raises:
+        ValueError: Если limit или offset отрицательны
+    """
+    limit, offset = int(limit), int(offset)
+    if limit < 0 or offset < 0:
+        raise ValueError("LIMIT и OFFSET должны быть неотрицательными")
+    body = _strip_sql_comments(query).strip()
+    while body.endswith(";"):
+        body = body.rstrip(";").rstrip()
+    return f"SELECT * FROM (\n{body}\n) AS page LIMIT {limit} OFFSET {offset}"
+
+@contextmanager
+def _stream_rows(query: str) -> Iterator[Iterator[Any]]:
+    """
+    Выполняет запрос и перебирает строки ответа по мере получения.
+    
+    Соединение закрывается при выходе из контекста, поэтому непрочитанный
+    остаток ответа не загружается.
+    
+    Args:
+        query: SQL-запрос
+    
+    Yields:
+        Итератор строк из массива results
+    """
+    response = get_session().post(
+        f"{BOT_DB_API_URL}/query",
+        json={"query": query, "params": []},
+        headers={"X-API-Key": BOT_DB_API_KEY},
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    )
+    try:
+        response.raise_for_status()
+        yield iter_json_array(response.iter_content(STREAM_CHUNK_SIZE), "results")
+    finally:
+        response.close()
+
+class _Aggregator:
+    """Локальные агрегаты по потоку строк."""
+    
+    FUNCTIONS = ("count", "min", "max", "sum", "avg", "top")
+    
+    def __init__(self, spec: str):
+        """
+        Разбирает описание агрегатов.
+        
+        Args:
+            spec: Агрегаты через запятую: count, min:колонка, max:колонка, sum:колонка, avg:колонка, top:колонка[:N]
+        
+        Raises:
+            ValueError: Если описание некорректно
+        """
+        self.rows = 0
+        self.items = []
+        for part in (part.strip() for part in spec.split(",")):
+            if not part:
+                continue
+            function, _, rest = part.partition(":")
+            function = function.lower()
+            if function not in self.FUNCTIONS:
+                raise ValueError(f"Неизвестный агрегат '{function}', доступны: {', '.join(self.FUNCTIONS)}")
+            if function == "count":
+                continue
+            column, _, limit = rest.partition(":")
+            if not column:
+                raise ValueError(f"Для агрегата '{function}' нужно указать колонку: {function}:колонка")
+            state = Counter() if function == "top" else {"value": None, "count": 0, "sum": 0.0}
+            self.items.append((function, column, int(limit) if limit else DEFAULT_TOP_N, state))
+    
+    def add(self, row: Any) -> None:
+        """
+        Учитывает строку результата.
+        """
+        self.rows += 1
+        if not isinstance(row, dict):
+            return
+        for function, column, _, state in self.items:
+            value = row.get(column)
+            if value is None:
+                continue
+            if function == "top":
+                state[value if isinstance(value, (str, int, float, bool)) else json.dumps(value)] += 1
+            elif function in ("min", "max"):
+                try:
+                    if state["value"] is None or (value < state["value"] if function == "min" else value > state["value"]):
+                        state["value"] = value
+                except TypeError:
+                    pass
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                state["sum"] += value
+                state["count"] += 1
+    
+    def result(self) -> Dict[str, Any]:
+        """
+        Возвращает значения агрегатов.
+        """
+        result = {"count": self.rows}
+        for function, column, limit, state in self.items:
+            key = f"{function}:{column}"
+            if function == "top":
+                result[key] = [{"value": value, "count": count} for value, count in state.most_common(limit)]
+            elif function in ("min", "max"):
+                result[key] = state["value"]
+            elif function == "sum":
+                result[key] = state["sum"] if state["count"] else None
+            else:
+                result[key] = state["sum"] / state["count"] if state["count"] else None
+        return result
+
+def _db_error(e: Exception) -> ToolResult:
+    """
+    Формирует ответ с ошибкой, используя текст ошибки базы, если он есть.
+    """
+    message = str(e)
+    if isinstance(e, JSONStreamError) and e.document and "error" in e.document:
+        message = str(e.document["error"])
+    return ToolResult.failure(message, results=[])
+
+@register_tool(category="database", idempotent=True)
+def query_bot_database(query: str, cursor: Optional[str] = None, page_size: Optional[int] = None,
+                       aggregate: Optional[str] = None) -> ToolResult:
     """
     Выполняет SELECT-запрос к базе данных телеграм-бота.
     
+    Строки возвращаются страницами. Если в ответе has_more=true, передайте
+    next_cursor вместе с тем же запросом, чтобы получить следующую страницу.
+    Курсор выдается только для запросов с ORDER BY по уникальному ключу:
+    без него порядок строк между страницами не определен.
+    Для больших выборок укажите aggregate: база передаст строки потоком,
+    а вернутся только сводные значения и несколько строк-примеров.
+    
     Args:
         query: SQL-запрос (только SELECT)
+        cursor: Курсор следующей страницы из предыдущего ответа
+        page_size: Количество строк на странице
+        aggregate: Агрегаты через запятую: count, min:колонка, max:колонка, sum:колонка, avg:колонка, top:колонка[:N]
     
     Returns:
-        JSON-строка с результатами запроса
+        Результаты запроса
     """
     if not query.strip().upper().startswith('SELECT'):
-        return json.dumps({
-            "error": "Only SELECT queries are allowed with this function",
-            "results": []
-        }, ensure_ascii=False)
+        return ToolResult.failure("Only SELECT queries are allowed with this function", results=[])
     
     try:
-        response = requests.post(
-            f"{BOT_DB_API_URL}/query",
-            json={"query": query, "params": []},
-            headers={"X-API-Key": BOT_DB_API_KEY}
-        )
+        if aggregate:
+            aggregator = _Aggregator(aggregate)
+            sample = []
+            truncated = False
+            with _stream_rows(_paginate(query, BOT_DB_AGGREGATE_MAX_ROWS + 1, 0)) as rows:
+                for row in rows:
+                    if aggregator.rows >= BOT_DB_AGGREGATE_MAX_ROWS:
+                        truncated = True
+                        break
+                    aggregator.add(row)
+                    if len(sample) < AGGREGATE_SAMPLE_ROWS:
+                        sample.append(row)
+            metrics.increment("bot_db_rows_streamed", aggregator.rows)
+            return ToolResult({
+                "aggregates": aggregator.result(),
+                "sample": sample,
+                "rows_scanned": aggregator.rows,
+                "truncated": truncated
+            })
         
-        response.raise_for_status()
-        return json.dumps(response.json(), ensure_ascii=False, indent=2)
+        # Без ORDER BY база может отдавать строки в разном порядке, и страницы пропускали бы
+        # или повторяли строки: курсор выдается только для упорядоченных запросов
+        ordered = _has_order_by(query)
+        offset = _decode_cursor(cursor, query) if cursor else 0
+        if offset and not ordered:
+            raise ValueError("Курсор страницы требует ORDER BY в запросе")
+        size = max(1, min(int(page_size or BOT_DB_PAGE_SIZE), MAX_PAGE_SIZE))
+        
+        results = []
+        used_bytes = 0
+        has_more = False
+        truncated_by_bytes = False
+        # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+        with _stream_rows(_paginate(query, size + 1, offset)) as rows:
+            for row in rows:
+                if len(results) == size:
+                    has_more = True
+                    break
+                row_bytes = len(json.dumps(row, ensure_ascii=False))
+                if results and used_bytes + row_bytes > BOT_DB_MAX_BYTES:
+                    has_more = truncated_by_bytes = True
+                    break
+                results.append(row)
+                used_bytes += row_bytes
+        
+        metrics.increment("bot_db_rows_streamed", len(results))
+        page = {
+            "results": results,
+            "row_count": len(results),
+            "offset": offset,
+            "has_more": has_more,
+            "next_cursor": _encode_cursor(query, offset + len(results)) if has_more and ordered else None,
+            "truncated_by_bytes": truncated_by_bytes
+        }
+        if has_more and not ordered:
+            page["warning"] = ("Запрос без ORDER BY: порядок строк между страницами не определен, "
+                               "поэтому курсор не выдан. Добавьте ORDER BY с уникальным ключом.")
+        return ToolResult(page)
     
     except Exception as e:
         logger.error(f"Error querying bot database: {str(e)}")
-        return json.dumps({
-            "error": str(e),
-            "results": []
-        }, ensure_ascii=False)
+        return _db_error(e)
 
-@register_tool
-def execute_bot_database(query: str) -> str:
+@register_tool(category="database")
+def execute_bot_database(query: str) -> ToolResult:
     """
     Выполняет модифицирующий запрос (INSERT, UPDATE, DELETE) к базе данных телеграм-бота.
     
@@ -59,54 +494,48 @@ def execute_bot_database(query: str) -> str:
         query: SQL-запрос (INSERT, UPDATE, DELETE)
     
     Returns:
-        JSON-строка с результатом выполнения запроса
+        Результат выполнения запроса
     """
     if query.strip().upper().startswith('SELECT'):
-        return json.dumps({
-            "error": "SELECT queries should use query_bot_database function",
-            "success": False
-        }, ensure_ascii=False)
+        return ToolResult.failure("SELECT queries should use query_bot_database function", success=False)
     
     try:
-        response = requests.post(
+        response = get_session().post(
             f"{BOT_DB_API_URL}/execute",
             json={"query": query, "params": []},
-            headers={"X-API-Key": BOT_DB_API_KEY}
+            headers={"X-API-Key": BOT_DB_API_KEY},
+            timeout=REQUEST_TIMEOUT
         )
         
         response.raise_for_status()
-        return json.dumps(response.json(), ensure_ascii=False, indent=2)
+        result = response.json()
+        return ToolResult(result if isinstance(result, dict) else {"result": result})
     
     except Exception as e:
         logger.error(f"Error executing command on bot database: {str(e)}")
-        return json.dumps({
-            "error": str(e),
-            "success": False
-        }, ensure_ascii=False)
+        return ToolResult.failure(str(e), success=False)
 
-@register_tool
-def get_bot_database_schema() -> str:
+@register_tool(category="database", idempotent=True)
+def get_bot_database_schema(refresh: bool = False) -> ToolResult:
     """
-    Получает схему базы данных телеграм-бота.
+    Получает схему базы данных телеграм-бота (из локального кэша, если он свежий).
+    
+    Args:
+        refresh: Запросить схему у базы заново, если кэшированная могла устареть
     
     Returns:
-        JSON-строка со схемой базы данных
+        Схема базы данных и ее версия
     """
     try:
-        response = requests.get(
-            f"{BOT_DB_API_URL}/schema",
-            headers={"X-API-Key": BOT_DB_API_KEY}
-        )
-        
-        response.raise_for_status()
-        return json.dumps(response.json(), ensure_ascii=False, indent=2)
+        snapshot = get_schema_snapshot(force_refresh=refresh)
+        schema = snapshot["schema"]
+        if isinstance(schema, dict):
+            return ToolResult(dict(schema, schema_version=snapshot["version"]))
+        return ToolResult({"schema": schema, "schema_version": snapshot["version"]})
     
     except Exception as e:
         logger.error(f"Error getting bot database schema: {str(e)}")
-        return json.dumps({
-            "error": str(e),
-            "schema": {}
-        }, ensure_ascii=False)
+        return ToolResult.failure(str(e), schema={})
 
 # Прямые функции для тестирования (без декораторов)
 def direct_query_bot_database(query: str):
@@ -114,10 +543,11 @@ def direct_query_bot_database(query: str):
     Прямая функция для тестирования запросов.
     """
     try:
-        response = requests.post(
+        response = get_session().post(
             f"{BOT_DB_API_URL}/query",
             json={"query": query, "params": []},
-            headers={"X-API-Key": BOT_DB_API_KEY}
+            headers={"X-API-Key": BOT_DB_API_KEY},
+            timeout=REQUEST_TIMEOUT
         )
         
         response.raise_for_status()
@@ -131,9 +561,10 @@ def direct_get_schema():
     Прямая функция для тестирования получения схемы.
     """
     try:
-        response = requests.get(
+        response = get_session().get(
             f"{BOT_DB_API_URL}/schema",
-            headers={"X-API-Key": BOT_DB_API_KEY}
+            headers={"X-API-Key": BOT_DB_API_KEY},
+            timeout=REQUEST_TIMEOUT
         )
         
         response.raise_for_status()
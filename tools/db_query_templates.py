@@ -0,0 +1,254 @@
+"""
+Параметризованные шаблоны запросов к базе данных телеграм-бота.
+
+Частые вопросы (число пользователей, самые активные пользователи, последние
+сигналы) обслуживаются готовыми запросами с привязкой параметров вместо
+SQL, который модель пишет заново: текст запроса не меняется между вызовами.
+
+Каждый шаблон объявляет таблицы и колонки, на которые опирается, и
+выполняется только если они есть в кэшированной схеме базы; модели
+предлагаются лишь шаблоны, совместимые с текущей схемой (available_template_tools).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Any
+
+from tools.registry import register_tool
+from tools.results import ToolResult
+from tools.db_access_tools_ai import get_schema_snapshot, schema_tables
+from config import BOT_DB_API_URL, BOT_DB_API_KEY, REQUEST_TIMEOUT
+from utils.http_client import get_session
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Максимальное число строк, которое можно запросить через шаблон
+MAX_TEMPLATE_LIMIT = 500
+
+# Шаблоны запросов: инструмент, SQL с плейсхолдерами, порядок параметров и используемые колонки
+QUERY_TEMPLATES = {
+    "user_count": {
+        "tool": "get_bot_user_count",
+        "description": "Общее число пользователей",
+        "sql": "SELECT COUNT(*) AS total FROM users",
+        "params": [],
+        "requires": {"users": []},
+    },
+    "new_users": {
+        "tool": "get_bot_new_users",
+        "description": "Число новых пользователей по дням начиная с даты",
+        "sql": ("SELECT DATE(created_at) AS day, COUNT(*) AS users FROM users "
+                "WHERE created_at >= ? GROUP BY DATE(created_at) ORDER BY day"),
+        "params": ["since"],
+        "requires": {"users": ["created_at"]},
+    },
+    "top_users_by_signals": {
+        "tool": "get_top_bot_users",
+        "description": "Пользователи с наибольшим числом сигналов начиная с даты",
+        "sql": ("SELECT u.id, u.username, COUNT(s.id) AS signals FROM users u "
+                "JOIN signals s ON s.user_id = u.id WHERE s.created_at >= ? "
+                "GROUP BY u.id, u.username ORDER BY signals DESC LIMIT ?"),
+        "params": ["since", "limit"],
+        "requires": {"users": ["id", "username"], "signals": ["id", "user_id", "created_at"]},
+    },
+    "recent_signals": {
+        "tool": "get_recent_bot_signals",
+        "description": "Последние сигналы, опционально по инструменту",
+        "sql": ("SELECT id, user_id, instrument, direction, created_at FROM signals "
+                "WHERE (? IS NULL OR instrument = ?) ORDER BY created_at DESC LIMIT ?"),
+        "params": ["instrument", "instrument", "limit"],
+        "requires": {"signals": ["id", "user_id", "instrument", "direction", "created_at"]},
+    },
+    "signals_by_instrument": {
+        "tool": "get_bot_signals_by_instrument",
+        "description": "Число сигналов по инструментам начиная с даты",
+        "sql": ("SELECT instrument, COUNT(*) AS signals FROM signals WHERE created_at >= ? "
+                "GROUP BY instrument ORDER BY signals DESC LIMIT ?"),
+        "params": ["since", "limit"],
+        "requires": {"signals": ["instrument", "created_at"]},
+    },
+}
+
+# Результаты проверки шаблонов для версии схемы: версия -> {шаблон: ошибка или None}
+_validation_cache: Dict[str, Dict[str, Optional[str]]] = {}
+
+
+def _template_error(template: Dict[str, Any], tables: Dict[str, set]) -> Optional[str]:
+    """
+    Возвращает причину, по которой шаблон несовместим со схемой, или None.
+    """
+    if not tables:
+        return "структура схемы не распознана"
+    for table, columns in template["requires"].items():
+        if table not in tables:
+            return f"таблица {table} отсутствует в схеме"
+        missing = [column for column in columns if column not in tables[table]]
+        if missing:
+            return f"в таблице {table} нет колонок {', '.join(missing)}"
+    return None
+
+
+def validate_templates(snapshot: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Проверяет, что таблицы и колонки шаблонов есть в схеме базы.
+
+    Результат кэшируется по версии схемы. Если структуру схемы разобрать
+    не удалось, шаблоны недоступны: их таблицы нельзя подтвердить.
+
+    Args:
+        snapshot: Результат get_schema_snapshot
+
+    Returns:
+        Словарь имя шаблона -> описание ошибки или None
+    """
+    version = snapshot["version"]
+    if version in _validation_cache:
+        return _validation_cache[version]
+
+    tables = {table: set(columns) for table, columns in schema_tables(snapshot["schema"]).items()}
+    results = {}
+    for name, template in QUERY_TEMPLATES.items():
+        error = _template_error(template, tables)
+        if error:
+            logger.warning(f"Query template '{name}' is unavailable for schema {version}: {error}")
+        results[name] = error
+
+    _validation_cache[version] = results
+    return results
+
+
+def run_query_template(name: str, values: Dict[str, Any]) -> ToolResult:
+    """
+    Выполняет шаблон запроса с привязкой параметров.
+
+    Args:
+        name: Имя шаблона
+        values: Значения параметров по именам
+
+    Returns:
+        Результаты запроса
+    """
+    template = QUERY_TEMPLATES[name]
+    try:
+        snapshot = get_schema_snapshot()
+        error = validate_templates(snapshot).get(name)
+        if error:
+            return ToolResult.failure(
+                f"Шаблон {name} несовместим со схемой {snapshot['version']}: {error}. "
+                f"Используйте query_bot_database.",
+                results=[]
+            )
+
+        params = [values[param] for param in template["params"]]
+        response = get_session().post(
+            f"{BOT_DB_API_URL}/query",
+            json={"query": template["sql"], "params": params},
+            headers={"X-API-Key": BOT_DB_API_KEY},
+            timeout=REQUEST_TIMEOUT
+        )
+
+        response.raise_for_status()
+        result = response.json()
+        if not isinstance(result, dict):
+            result = {"results": result}
+        return ToolResult(dict(result, template=name, schema_version=snapshot["version"]))
+
+    except Exception as e:
+        logger.error(f"Error running query template {name}: {str(e)}")
+        return ToolResult.failure(str(e), results=[])
+
+
+def _since(days: int) -> str:
+    """
+    Возвращает начало периода в формате, сравнимом с текстовыми датами SQLite.
+    """
+    return (datetime.now(timezone.utc) - timedelta(days=max(0, days))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _limit(limit: int) -> int:
+    return max(1, min(int(limit), MAX_TEMPLATE_LIMIT))
+
+
+def available_template_tools(snapshot: Dict[str, Any]) -> List[str]:
+    """
+    Возвращает инструменты шаблонов, совместимых со схемой базы.
+
+    Args:
+        snapshot: Результат get_schema_snapshot
+
+    Returns:
+        Имена инструментов в порядке объявления шаблонов
+    """
+    errors = validate_templates(snapshot)
+    return [template["tool"] for name, template in QUERY_TEMPLATES.items() if not errors.get(name)]
+
+
+@register_tool(category="database", idempotent=True)
+def get_bot_user_count() -> ToolResult:
+    """
+    Возвращает общее число пользователей телеграм-бота.
+
+    Returns:
+        Результат с полем total
+    """
+    return run_query_template("user_count", {})
+
+
+@register_tool(category="database", idempotent=True)
+def get_bot_new_users(days: int = 30) -> ToolResult:
+    """
+    Возвращает число новых пользователей бота по дням за последние дни.
+
+    Args:
+        days: Длина периода в днях
+
+    Returns:
+        Результат с количеством пользователей по дням
+    """
+    return run_query_template("new_users", {"since": _since(days)})
+
+
+@register_tool(category="database", idempotent=True)
+def get_top_bot_users(days: int = 30, limit: int = 10) -> ToolResult:
+    """
+    Возвращает пользователей бота с наибольшим числом сигналов за период.
+
+    Args:
+        days: Длина периода в днях
+        limit: Количество пользователей
+
+    Returns:
+        Результат со списком пользователей и числом их сигналов
+    """
+    return run_query_template("top_users_by_signals", {"since": _since(days), "limit": _limit(limit)})
+
+
+@register_tool(category="database", idempotent=True)
+def get_recent_bot_signals(limit: int = 20, instrument: Optional[str] = None) -> ToolResult:
+    """
+    Возвращает последние сигналы бота, опционально по одному инструменту.
+
+    Args:
+        limit: Количество сигналов
+        instrument: Тикер инструмента (например, AAPL)
+
+    Returns:
+        Результат со списком сигналов
+    """
+    return run_query_template("recent_signals", {"instrument": instrument, "limit": _limit(limit)})
+
+
+@register_tool(category="database", idempotent=True)
+def get_bot_signals_by_instrument(days: int = 30, limit: int = 10) -> ToolResult:
+    """
+    Возвращает инструменты с наибольшим числом сигналов за период.
+
+    Args:
+        days: Длина периода в днях
+        limit: Количество инструментов
+
+    Returns:
+        Результат с числом сигналов по инструментам
+    """
+    return run_query_template("signals_by_instrument", {"since": _since(days), "limit": _limit(limit)})
@@ -0,0 +1,232 @@
+"""
+Инструменты для чтения финансовых отчетов компаний.
+
+Отчеты берутся из каталога downloaded_filings; текст читается по
+разделам и страницам через постоянный индекс (filings/reader.py),
+без разбора всего PDF на каждый вопрос. Числовые показатели отчетности
+берутся из хранилища filings/facts.py без чтения таблиц моделью.
+"""
+
+import logging
+from typing import Optional
+
+from tools.registry import register_tool
+from tools.results import ToolResult
+from filings.reader import get_filing_library, FilingError
+from filings.facts import get_fact_store, parse_period, resolve_concept, CONCEPTS
+from filings.diff import diff_filings
+from config import FILING_MAX_CHARS
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+@register_tool(category="filings", idempotent=True)
+def list_filings() -> ToolResult:
+    """
+    Возвращает список доступных отчетов компаний с отчетными периодами и разделами.
+
+    Returns:
+        Результат со списком отчетов
+    """
+    try:
+        filings = get_filing_library().describe()
+        return ToolResult({"count": len(filings), "filings": filings})
+    except Exception as e:
+        logger.error(f"Error listing filings: {str(e)}")
+        return ToolResult.failure(str(e), filings=[])
+
+
+@register_tool(category="filings", idempotent=True)
+def read_filing_section(filing: str, section: str, offset: int = 0) -> ToolResult:
+    """
+    Возвращает текст раздела отчета (например, MD&A или Risk Factors).
+
+    Args:
+        filing: Имя файла отчета из list_filings
+        section: Раздел: номер пункта ("2", "1A", "Part II Item 1"), псевдоним
+            ("mda", "risk factors", "financial statements") или часть названия
+        offset: Смещение в символах для чтения длинного раздела по частям
+
+    Returns:
+        Результат с текстом раздела и смещением следующей части
+    """
+    try:
+        reader = get_filing_library().get_reader(filing)
+        found = reader.find_section(section)
+        if found is None:
+            return ToolResult.failure(
+                f"Раздел '{section}' не найден",
+                sections=[f"Part {item['part']} Item {item['item']}. {item['title']}" for item in reader.sections]
+            )
+
+        text = reader.section_text(found)
+        offset = max(0, int(offset))
+        part = text[offset:offset + FILING_MAX_CHARS]
+        next_offset = offset + len(part)
+
+        return ToolResult({
+            "file": reader.index["file"],
+            "ticker": reader.index["ticker"],
+            "period_end": reader.index["period_end"],
+            "section": f"Part {found['part']} Item {found['item']}. {found['title']}",
+            "pages": [found["page"] + 1, found["end_page"] + 1],
+            "offset": offset,
+            "total_chars": len(text),
+            "next_offset": next_offset if next_offset < len(text) else None,
+            "text": part
+        })
+
+    except FilingError as e:
+        return ToolResult.failure(str(e))
+    except Exception as e:
+        logger.error(f"Error reading filing section: {str(e)}")
+        return ToolResult.failure(str(e))
+
+
+@register_tool(category="filings", idempotent=True)
+def read_filing_pages(filing: str, start_page: int, end_page: Optional[int] = None) -> ToolResult:
+    """
+    Возвращает текст страниц отчета.
+
+    Args:
+        filing: Имя файла отчета из list_filings
+        start_page: Первая страница (нумерация с 1)
+        end_page: Последняя страница включительно (по умолчанию равна start_page)
+
+    Returns:
+        Результат с текстом страниц
+    """
+    try:
+        reader = get_filing_library().get_reader(filing)
+        start = int(start_page) - 1
+        end = min(int(end_page or start_page) - 1, reader.page_count - 1)
+
+        pages, total = [], 0
+        for number in range(start, end + 1):
+            text = reader.get_page(number)
+            if pages and total + len(text) > FILING_MAX_CHARS:
+                break
+            pages.append({"page": number + 1, "text": text[:FILING_MAX_CHARS]})
+            total += len(text)
+
+        return ToolResult({
+            "file": reader.index["file"],
+            "page_count": reader.page_count,
+            "pages": pages,
+            "truncated": bool(pages) and pages[-1]["page"] - 1 < end
+        })
+
+    except FilingError as e:
+        return ToolResult.failure(str(e))
+    except Exception as e:
+        logger.error(f"Error reading filing pages: {str(e)}")
+        return ToolResult.failure(str(e))
+
+
+@register_tool(category="filings", idempotent=True)
+def compare_filings(filing_a: str, filing_b: str, section: Optional[str] = None) -> ToolResult:
+    """
+    Показывает, что изменилось между двумя отчетами одной компании.
+
+    Возвращает только измененные разделы: добавленные и удаленные абзацы
+    (от более раннего отчета к более позднему) и число абзацев, где
+    обновились лишь цифры. Полный текст раздела можно прочитать через
+    read_filing_section.
+
+    Args:
+        filing_a: Имя файла одного отчета из list_filings
+        filing_b: Имя файла другого отчета той же компании
+        section: Сравнить только один раздел (например, "risk factors" или "mda")
+
+    Returns:
+        Результат со сводкой изменений по разделам
+    """
+    try:
+        return ToolResult(diff_filings(filing_a, filing_b, section))
+    except FilingError as e:
+        return ToolResult.failure(str(e))
+    except Exception as e:
+        logger.error(f"Error comparing filings: {str(e)}")
+        return ToolResult.failure(str(e))
+
+
+def _format_period(end, duration: int) -> str:
+    if duration == 0:
+        return end.isoformat()
+    if duration == 3 and end.month % 3 == 0:
+        return f"Q{end.month // 3} {end.year}"
+    calendar = {(6, 6): "H1", (6, 12): "H2", (9, 9): "9M", (12, 12): "FY"}.get((duration, end.month))
+    return f"{calendar} {end.year}" if calendar else f"{duration}M {end.isoformat()}"
+
+
+@register_tool(category="filings", idempotent=True)
+def get_financial_facts(ticker: str, concepts: str, periods: Optional[str] = None) -> ToolResult:
+    """
+    Возвращает показатели финансовой отчетности компании и их изменение между периодами.
+
+    Args:
+        ticker: Тикер компании (например, TSLA)
+        concepts: Показатели через запятую: revenue, cost_of_revenue, gross_profit,
+            operating_income, net_income, eps_basic, eps_diluted, cash, total_assets,
+            total_liabilities, total_equity, operating_cash_flow, investing_cash_flow,
+            financing_cash_flow, capex, free_cash_flow, gross_margin, operating_margin, net_margin
+        periods: Периоды через запятую: "Q1 2025", "9M 2024", "H1 2024", "FY 2024" или дата
+            "2024-09-30" (календарные кварталы; баланс — на дату окончания периода).
+            Если не указаны, возвращаются последние доступные периоды
+
+    Returns:
+        Результат со значениями по периодам; изменение считается для первого
+        периода относительно остальных периодов той же длительности
+    """
+    try:
+        store = get_fact_store()
+        names = [resolve_concept(name) for name in concepts.split(",") if name.strip()]
+        if not names:
+            return ToolResult.failure("Не указаны показатели", concepts=list(CONCEPTS))
+        if ticker.upper() not in store.tickers:
+            return ToolResult.failure(f"Нет показателей для {ticker}", tickers=store.tickers)
+
+        specs = [spec.strip() for spec in (periods or "").split(",") if spec.strip()]
+        parsed = [parse_period(spec) for spec in specs]
+
+        results = {}
+        for number, concept in enumerate(names):
+            concept_periods = parsed or store.available_periods(ticker, concept, limit=4)
+            labels = specs or [_format_period(end, duration) for end, duration in concept_periods]
+            rows = store.lookup(ticker, [concept], concept_periods)[0] if concept_periods else []
+
+            values = []
+            for label, row in zip(labels, rows):
+                if row < 0:
+                    values.append({"period": label, "value": None})
+                    continue
+                value, filing = store.row(row)
+                end, duration = store.row_period(row)
+                values.append({"period": label, "period_end": end.isoformat(), "months": duration,
+                               "value": round(value, 4), "filing": filing})
+
+            unit = CONCEPTS[concept][0]
+            entry = {"unit": unit, "values": values}
+            base = values[0]["value"] if values else None
+            if base is not None and len(values) > 1:
+                entry["changes"] = []
+                for other in values[1:]:
+                    # Квартал с девятью месяцами не сравнивается
+                    if other["value"] is None or other["months"] != values[0]["months"]:
+                        continue
+                    change = {"vs": other["period"], "change": round(base - other["value"], 4)}
+                    if unit == "ratio":
+                        change["change_pp"] = round((base - other["value"]) * 100, 2)
+                    elif other["value"]:
+                        change["change_pct"] = round((base - other["value"]) / abs(other["value"]) * 100, 2)
+                    entry["changes"].append(change)
+            results[concept] = entry
+
+        return ToolResult({"ticker": ticker.upper(), "facts": results})
+
+    except ValueError as e:
+        return ToolResult.failure(str(e))
+    except Exception as e:
+        logger.error(f"Error getting financial facts: {str(e)}")
+        return ToolResult.failure(str(e))
@@ -4,26 +4,18 @@
 Этот модуль содержит инструменты для прямого взаимодействия с моделями OpenAI.
 """
 
-import json
 import logging
 from typing import Optional, List, Dict, Any
 
 from tools.registry import register_tool
-from config import OPENAI_API_KEY
+from tools.results import ToolResult
+from utils.openai_client import get_openai_client
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Инициализация клиента OpenAI
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-except ImportError:
-    logger.error("OpenAI package not installed. Please install it with pip install openai")
-    raise
-
-@register_tool
-def chat_with_model(query: str, model: Optional[str] = None, temperature: Optional[float] = None) -> str:
+@register_tool(category="general")
+def chat_with_model(query: str, model: Optional[str] = None, temperature: Optional[float] = None) -> ToolResult:
     """
     Отправляет запрос непосредственно языковой модели и возвращает её ответ.
     
@@ -33,14 +25,14 @@ def chat_with_model(query: str, model: Optional[str] = None, temperature: Option
         temperature: Температура генерации (от 0 до 1, по умолчанию 0.7)
     
     Returns:
-        JSON-строка с ответом модели
+        Ответ модели (сериализуется в JSON при передаче модели)
     """
     try:
         # Устанавливаем значения по умолчанию
         model = "gpt-4o" if model is None else model
         temperature = 0.7 if temperature is None else temperature
         
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": "Вы - полезный ассистент, который дает точные и информативные ответы."},
@@ -49,7 +41,7 @@ def chat_with_model(query: str, model: Optional[str] = None, temperature: Option
             temperature=temperature
         )
         
-        result = {
+        return ToolResult({
             "model": model,
             "response": response.choices[0].message.content,
             "usage": {
@@ -57,16 +49,13 @@ def chat_with_model(query: str, model: Optional[str] = None, temperature: Option
                 "prompt_tokens": response.usage.prompt_tokens,
                 "completion_tokens": response.usage.completion_tokens
             }
-        }
-        
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        })
     
     except Exception as e:
         logger.error(f"Error communicating with OpenAI API: {str(e)}")
-        error_result = {
-            "error": str(e),
-            "model": model,
-            "query": query,
-            "response": f"Произошла ошибка при обращении к API OpenAI: {str(e)}. Пожалуйста, проверьте API-ключ и подключение к интернету."
-        }
-        return json.dumps(error_result, ensure_ascii=False, indent=2)
\ No newline at end of file
+        return ToolResult.failure(
+            str(e),
+            model=model,
+            query=query,
+            response=f"Произошла ошибка при обращении к API OpenAI: {str(e)}. Пожалуйста, проверьте API-ключ и подключение к интернету."
+        )
\ No newline at end of file
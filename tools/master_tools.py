@@ -4,84 +4,224 @@
 Этот модуль содержит инструменты, специфичные для мастер-агента.
 """
 
+import re
+import sys
 import json
 import logging
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 
-from tools.registry import register_tool, get_all_tools, get_tool_info
+from tools.registry import register_tool, get_all_tools, get_tool_snapshot, TOOL_CATEGORIES
+from tools.agent_framework import get_agents_info
+from tools.results import ToolResult
+from utils import metrics
+from config import STATUS_ERROR_RATE, STATUS_MIN_CALLS, STATUS_SATURATION, STATUS_QUEUE_DEPTH, STATUS_LAG_MS
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-@register_tool
+# Короткие ключевые слова классификатора, которые засчитываются только целым словом
+# ("бд", но не "обдумать")
+_WHOLE_WORD_KEYWORDS = {word: re.compile(rf"\b{word}\b") for word in ("бд",)}
+
+@register_tool(category="system")
 def get_available_tools(category: Optional[str] = None) -> str:
     """
     Получает список всех доступных инструментов в системе.
     
     Args:
         category: Опциональная категория для фильтрации инструментов
+            (system, general, search, database, agents, knowledge)
     
     Returns:
         JSON-строка со списком инструментов и их описаниями
     """
-    tools = get_tool_info()
+    snapshot = get_tool_snapshot()
+    
+    # Без фильтра возвращаем готовый JSON снимка
+    if not category:
+        return snapshot.json_text
     
-    # Фильтрация по категории, если указана
-    if category:
-        tools = [tool for tool in tools if category.lower() in tool['name'].lower()]
+    category = category.lower()
+    if category in TOOL_CATEGORIES:
+        tools = [tool for tool in snapshot.tools if tool["category"] == category]
+    else:
+        # Неизвестная категория — ищем по подстроке в имени инструмента
+        tools = [tool for tool in snapshot.tools if category in tool['name'].lower()]
     
     result = {
         "count": len(tools),
+        "version": snapshot.version,
         "tools": tools
     }
     
-    return json.dumps(result, indent=2)
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+def _error_status(calls: int, error_rate: float) -> str:
+    """
+    Определяет состояние компонента по доле ошибок за окно последних вызовов.
+    """
+    return "degraded" if calls >= STATUS_MIN_CALLS and error_rate >= STATUS_ERROR_RATE else "active"
+
+def _utilization(busy: Any, capacity: Any) -> Optional[float]:
+    """
+    Возвращает долю занятой емкости или None, если емкость не ограничена.
+    """
+    return round(busy / capacity, 3) if busy is not None and capacity else None
+
+def _agent_health(agent: Dict[str, Any], call_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Определяет состояние специализированного агента по реестру и статистике вызовов.
+    
+    Args:
+        agent: Информация об агенте из реестра
+        call_stats: Статистика вызовов из модуля метрик
+    
+    Returns:
+        Словарь с состоянием агента
+    """
+    stats = call_stats.get(f"agent:{agent['name']}", {})
+    
+    if not agent["is_initialized"]:
+        status = "unavailable"
+    else:
+        status = _error_status(stats.get("calls", 0), stats.get("error_rate", 0.0))
+    
+    health = {"status": status}
+    if agent.get("error"):
+        health["error"] = agent["error"]
+    if stats:
+        health["calls"] = stats["calls"]
+        health["error_rate"] = stats["error_rate"]
+        health["p95_ms"] = stats["p95_ms"]
+    return health
 
-@register_tool
-def get_system_status() -> str:
+@register_tool(category="system")
+def get_system_status() -> ToolResult:
     """
     Получает текущий статус системы zAI.
     
+    Состояние компонентов вычисляется по метрикам процесса: загружен ли
+    мастер-агент, доля ошибок запросов, агентов и инструментов, глубина
+    очереди задач и загрузка потоков (HTTP, фоновые задачи, пул потоков
+    инструментов и event loop).
+    
     Returns:
-        JSON-строка с информацией о статусе системы
+        Информация о статусе системы
     """
-    # В реальной системе здесь будет более сложная логика
-    # для проверки статуса различных компонентов
+    snapshot = metrics.get_metrics_snapshot()
+    call_stats = snapshot["calls"]
+    gauges = snapshot["gauges"]
+    in_flight = snapshot["in_flight"]
+    latencies = snapshot["latencies"]
+    requests = snapshot["requests"]
     
-    now = datetime.now()
+    agents = {agent["name"]: _agent_health(agent, call_stats) for agent in get_agents_info()}
+    tool_stats = {name: stats for name, stats in call_stats.items() if not name.startswith("agent:")}
+    failing_tools = sorted(name for name, stats in tool_stats.items()
+                           if _error_status(stats["calls"], stats["error_rate"]) != "active")
     
-    status = {
-        "status": "online",
-        "timestamp": now.isoformat(),
-        "components": {
-            "master_agent": "active",
-            "investment_agent": "active",
-            "tools_registry": {
-                "status": "active",
-                "tool_count": len(get_all_tools())
-            },
-            "web_interface": "active"
+    # Модуль мастер-агента не импортируется здесь: статус не должен создавать агента
+    master_module = sys.modules.get("master_agent")
+    loaded = master_module is not None and master_module.is_master_agent_loaded()
+    agent_in_flight = in_flight.get("agent", {"current": 0, "peak": 0})
+    components = {
+        "master_agent": {
+            "status": _error_status(requests["recent"], requests["error_rate"]) if loaded else "unavailable",
+            "loaded": loaded,
+            "in_flight_requests": agent_in_flight["current"],
+            "peak_in_flight_requests": agent_in_flight["peak"],
+            "latency": requests
         },
-        "system_load": {
-            "cpu": "25%",
-            "memory": "40%"
+        "specialized_agents": agents,
+        "tools_registry": {
+            "status": "degraded" if failing_tools else "active",
+            "tool_count": len(get_all_tools()),
+            "failing_tools": failing_tools
+        }
+    }
+    
+    # Пул потоков инструментов и event loop: ожидание свободного потока и задержка
+    # возврата в цикл после завершения инструмента
+    dispatch = latencies.get("tool_dispatch", {})
+    loop_lag = latencies.get("event_loop_lag", {})
+    lagging = max(dispatch.get("p95_ms", 0.0), loop_lag.get("p95_ms", 0.0)) >= STATUS_LAG_MS
+    components["tool_execution"] = {
+        "status": "saturated" if lagging else "active",
+        "thread_wait_p95_ms": dispatch.get("p95_ms", 0.0),
+        "event_loop_lag_p95_ms": loop_lag.get("p95_ms", 0.0),
+        "openai_queue_length": gauges.get("openai_queue_length")
+    }
+    
+    # Веб-интерфейс регистрирует свои показатели только если он запущен
+    if "chat_sessions" in gauges:
+        http_in_flight = in_flight.get("http", {"current": 0, "peak": 0})
+        # В режиме dev число потоков не ограничено, и загрузка не вычисляется
+        utilization = _utilization(http_in_flight["current"], gauges.get("http_threads"))
+        components["web_interface"] = {
+            "status": "saturated" if utilization is not None and utilization >= STATUS_SATURATION else "active",
+            "open_sessions": gauges["chat_sessions"],
+            "in_flight_requests": http_in_flight["current"],
+            "peak_in_flight_requests": http_in_flight["peak"],
+            "threads": gauges.get("http_threads"),
+            "utilization": utilization
         }
+    else:
+        components["web_interface"] = {"status": "not_running"}
+    
+    # Очередь фоновых задач запускается при первой задаче
+    if gauges.get("job_workers"):
+        jobs = gauges.get("jobs") or {}
+        workers = gauges["job_workers"]
+        queued = jobs.get("queued", 0)
+        utilization = _utilization(workers["busy"], workers["capacity"])
+        if queued >= STATUS_QUEUE_DEPTH:
+            queue_status = "backlogged"
+        elif utilization is not None and utilization >= STATUS_SATURATION:
+            queue_status = "saturated"
+        else:
+            queue_status = "active"
+        components["job_queue"] = {
+            "status": queue_status,
+            "queued": queued,
+            "running": workers["busy"],
+            "workers": workers["capacity"],
+            "utilization": utilization,
+            "jobs": jobs
+        }
+    else:
+        components["job_queue"] = {"status": "not_running"}
+    
+    problems = [f"{name}: {component['status']}" for name, component in components.items()
+                if name != "specialized_agents" and component["status"] not in ("active", "not_running")]
+    problems += [f"agent {name}: {agent['status']}" for name, agent in agents.items() if agent["status"] != "active"]
+    
+    status = {
+        "status": "degraded" if problems else "online",
+        "problems": problems,
+        "timestamp": datetime.now().isoformat(),
+        "components": components,
+        "system_load": snapshot["process"],
+        "tools": tool_stats,
+        "caches": snapshot["caches"],
+        "counters": snapshot["counters"]
     }
     
-    return json.dumps(status, indent=2)
+    return ToolResult(status)
 
 
-@register_tool
-def classify_user_query(query: str) -> str:
+def classify_query(query: str) -> Dict[str, Any]:
     """
-    Классифицирует запрос пользователя для определения нужного специализированного агента.
+    Классифицирует запрос пользователя по ключевым словам.
+    
+    Используется инструментом classify_user_query и мастер-агентом для
+    упреждающего запуска инструментов.
     
     Args:
-        query: Запрос пользователя для классификации
+        query: Запрос пользователя
     
     Returns:
-        JSON-строка с результатами классификации
+        Словарь с категорией, уверенностью, оценками и рекомендуемым инструментом
     """
     # В реальной системе здесь будет более сложная логика,
     # возможно с использованием NLP или ML
@@ -94,6 +234,8 @@ def classify_user_query(query: str) -> str:
                     "что такое", "как сделать", "почему", "когда", "где", "кто", "зачем"],
         "search": ["найди", "поиск", "поищи", "загугли", "найти информацию", "информация о", "данные о",
                    "посмотри в интернете", "что говорит гугл", "найти в интернете"],
+        "database": ["база данных", "базе данных", "базы данных", "в базе", "бд", "sql", "таблиц",
+                     "пользовател", "записей", "подписчик"],
         "direct_model": ["думаешь", "считаешь", "напиши", "сгенерируй", "придумай", "сочини", "создай текст", 
                          "твое мнение", "твоя оценка", "творческий", "креативный", "история", "стихотворение"],
         "system": ["статус", "инструменты", "функции", "возможности", "агенты", "система", "настройки"]
@@ -103,7 +245,7 @@ def classify_user_query(query: str) -> str:
     scores = {}
     
     for category, words in keywords.items():
-        score = sum(1 for word in words if word in query_lower)
+        score = sum(1 for word in words if _keyword_matches(word, query_lower))
         scores[category] = score
     
     # Определяем категорию с наивысшим счетом
@@ -114,82 +256,91 @@ def classify_user_query(query: str) -> str:
     if max_score == 0:
         max_category = "direct_model"
     
+    result = {
+        "query": query,
+        "classification": max_category,
+        "confidence": min(max_score / 3, 1.0),  # Нормализуем уверенность
+        "scores": scores,
+        "recommended_tool": None
+    }
+    
     # Рекомендуемый инструмент на основе классификации
-    recommended_tool = None
     if max_category == "direct_model" or max_category == "general":
-        recommended_tool = "chat_with_model"
+        result["recommended_tool"] = "chat_with_model"
     elif max_category == "search":
-        recommended_tool = "search_google"
+        result["recommended_tool"] = "search_google"
+    elif max_category == "database":
+        result["recommended_tool"] = "query_bot_database"
     elif max_category == "system":
         if "статус" in query_lower:
-            recommended_tool = "get_system_status"
+            result["recommended_tool"] = "get_system_status"
         elif "инструменты" in query_lower or "функции" in query_lower:
-            recommended_tool = "get_available_tools"
+            result["recommended_tool"] = "get_available_tools"
         else:
-            recommended_tool = "lookup_information"
+            result["recommended_tool"] = "lookup_information"
     elif max_category == "investment":
-        recommended_tool = "ask_specialized_agent"
+        result["recommended_tool"] = "ask_specialized_agent"
         result["recommended_agent"] = "investment_agent"
     
-    result = {
-        "query": query,
-        "classification": max_category,
-        "confidence": min(max_score / 3, 1.0),  # Нормализуем уверенность
-        "scores": scores,
-        "recommended_tool": recommended_tool
-    }
-    
-    return json.dumps(result, indent=2)
+    return result
 
 
-@register_tool
-def lookup_information(topic: str) -> str:
+def _keyword_matches(word: str, text: str) -> bool:
     """
-    Ищет информацию по указанной теме.
+    Проверяет вхождение ключевого слова; короткие слова — только целиком.
+    """
+    pattern = _WHOLE_WORD_KEYWORDS.get(word)
+    return pattern.search(text) is not None if pattern is not None else word in text
+
+@register_tool(category="system", idempotent=True)
+def classify_user_query(query: str) -> ToolResult:
+    """
+    Классифицирует запрос пользователя для определения нужного специализированного агента.
     
     Args:
-        topic: Тема для поиска информации
+        query: Запрос пользователя для классификации
     
     Returns:
-        JSON-строка с найденной информацией
+        Результаты классификации
     """
-    # В реальной системе здесь будет интеграция с базой знаний или API
+    return ToolResult(classify_query(query))
+
+
+@register_tool(category="knowledge", idempotent=True)
+def lookup_information(topic: str, limit: int = 3) -> ToolResult:
+    """
+    Ищет информацию по указанной теме во внутренней базе знаний.
     
-    # Пример данных
-    knowledge_base = {
-        "zai": {
-            "title": "zAI",
-            "description": "zAI - это система мастер-агента, координирующая работу специализированных AI-агентов.",
-            "capabilities": ["Координация агентов", "Маршрутизация запросов", "Управление инструментами"]
-        },
-        "master_agent": {
-            "title": "Мастер-агент",
-            "description": "Мастер-агент - это центральный компонент системы zAI, который обрабатывает запросы и делегирует задачи.",
-            "responsibilities": ["Анализ запросов", "Выбор инструментов", "Координация работы подчиненных агентов"]
-        },
-        "investment": {
-            "title": "Инвестиционный анализ",
-            "description": "zAI предоставляет возможности для анализа инвестиций через специализированного агента.",
-            "features": ["Анализ отчетов", "Управление портфелем", "Мониторинг рынка"]
-        }
-    }
+    Args:
+        topic: Тема для поиска информации
+        limit: Максимальное количество найденных фрагментов
     
-    topic_lower = topic.lower()
-    results = {}
+    Returns:
+        Найденная информация
+    """
+    from knowledge.store import get_knowledge_base
     
-    for key, data in knowledge_base.items():
-        if topic_lower in key or any(topic_lower in str(value).lower() for value in data.values()):
-            results[key] = data
+    try:
+        results = get_knowledge_base().search(topic, limit=max(1, min(int(limit), 10)))
+    except Exception as e:
+        logger.error(f"Ошибка при поиске в базе знаний: {str(e)}")
+        return ToolResult.failure(str(e), topic=topic, found=False)
     
     if not results:
-        return json.dumps({
+        return ToolResult({
             "topic": topic,
             "found": False,
             "message": "Информация по указанной теме не найдена."
         })
     
-    return json.dumps({
+    return ToolResult({
         "topic": topic,
         "found": True,
-        "results": results
-    }, indent=2)
\ No newline at end of file
+        "results": [{
+            "title": item["title"],
+            "text": item["text"],
+            "source": item["source"],
+            "score": item["score"],
+            "match": item["match"]
+        } for item in results]
+    })
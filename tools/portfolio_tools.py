@@ -0,0 +1,64 @@
+"""
+Инструменты для оценки открытых позиций из базы сделок (trades.db).
+
+Позиции оцениваются по локальному хранилищу цен (portfolio/prices.py)
+движком portfolio/valuation.py; повторные вызовы пересчитывают только
+позиции инструментов, цена которых изменилась. Статистика стратегий
+читается из таблицы strategy_stats, которую поддерживают триггеры
+(portfolio/trades.py).
+"""
+
+import logging
+from typing import Optional
+
+from tools.registry import register_tool
+from tools.results import ToolResult
+from portfolio.valuation import get_mtm_engine
+from portfolio.trades import get_trade_store
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+@register_tool(category="portfolio", idempotent=True)
+def get_portfolio_valuation(group_by: str = "strategy", strategy: Optional[str] = None, top: int = 10) -> ToolResult:
+    """
+    Оценивает открытые позиции по текущим ценам: нереализованный результат,
+    экспозиция и концентрация портфеля.
+
+    Args:
+        group_by: Группировка итогов: strategy, position_type, trade_type или instrument
+        strategy: Оценить только одну стратегию
+        top: Число позиций с наибольшим по модулю нереализованным результатом
+
+    Returns:
+        Результат с итогами, суммами по группам и крупнейшими позициями
+    """
+    try:
+        result = get_mtm_engine().valuation(group_by=group_by, strategy=strategy, top=top)
+        return ToolResult(result)
+    except ValueError as e:
+        return ToolResult.failure(str(e))
+    except Exception as e:
+        logger.error(f"Error valuing portfolio: {str(e)}")
+        return ToolResult.failure(str(e))
+
+
+@register_tool(category="portfolio", idempotent=True)
+def get_strategy_stats(strategy: Optional[str] = None) -> ToolResult:
+    """
+    Возвращает статистику торговых стратегий: число сделок, долю прибыльных,
+    суммарный и средний результат закрытых сделок и средний срок удержания.
+
+    Args:
+        strategy: Только одна стратегия (по умолчанию все)
+
+    Returns:
+        Результат со статистикой стратегий
+    """
+    try:
+        stats = get_trade_store().strategy_stats(strategy)
+        return ToolResult({"count": len(stats), "strategies": stats})
+    except Exception as e:
+        logger.error(f"Error getting strategy stats: {str(e)}")
+        return ToolResult.failure(str(e), strategies=[])
@@ -5,37 +5,334 @@
 регистрировать и обнаруживать функции, доступные для использования агентами.
 """
 
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
 import inspect
 import logging
-from typing import List, Callable, Any, Dict
-from agents import function_tool  # Изменяем импорт с my_agents на agents
+import tempfile
+import importlib
+import functools
+import threading
+from typing import List, Callable, Any, Dict, Optional, NamedTuple, Tuple
+
+from config import TOOL_MANIFEST_PATH
+from utils import metrics
+from utils.helpers import log_event
+from utils.tool_cache import call_cached
+from tools.results import ToolResult, to_model_output
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Глобальный реестр инструментов
-TOOL_REGISTRY = []
+# Категории инструментов и их описания
+TOOL_CATEGORIES = {
+    "system": "Состояние системы, список инструментов и маршрутизация запросов",
+    "general": "Общие вопросы и прямое обращение к модели",
+    "search": "Поиск информации в интернете",
+    "database": "База данных телеграм-бота",
+    "agents": "Специализированные агенты",
+    "knowledge": "Справочная информация о системе",
+    "filings": "Финансовые отчеты компаний (10-Q, 10-K)",
+    "portfolio": "Открытые позиции и их рыночная оценка",
+}
+
+# Версия формата записей манифеста схем; при изменении формата манифест перестраивается
+MANIFEST_FORMAT_VERSION = 2
+
+# Категория инструментов, зарегистрированных без явного указания
+DEFAULT_CATEGORY = "general"
+
+# Глобальный реестр инструментов: имя -> функция (в порядке регистрации)
+TOOL_REGISTRY: Dict[str, Callable] = {}
+
+# Индекс категорий: категория -> имена инструментов
+_CATEGORY_INDEX: Dict[str, List[str]] = {}
+
+# Инструменты SDK и снимок схем, построенные по реестру; None — требуется перестроение
+_tool_objects: Optional[List] = None
+_snapshot: Optional["ToolSnapshot"] = None
+_tool_objects_lock = threading.Lock()
+
+# Реестр, собираемый во время перезагрузки модулей; None — регистрация идет в TOOL_REGISTRY
+_staging: Optional[Dict[str, Callable]] = None
+_reload_lock = threading.Lock()
+
+
+class ToolSnapshot(NamedTuple):
+    """Неизменяемый снимок набора инструментов для API и интерфейса."""
+    
+    version: str                    # Хэш содержимого снимка
+    etag: str                       # Значение заголовка ETag
+    tools: Tuple[Dict[str, Any], ...]
+    by_name: Dict[str, Dict[str, Any]]
+    json_text: str                  # Готовый JSON {"count", "tools", "version"}
+    json_blob: bytes                # json_text в UTF-8 для HTTP-ответов
+
+def _is_error_result(result: Any) -> bool:
+    """
+    Дешево определяет, вернул ли инструмент ошибку.
+    
+    У ToolResult проверяется поле error. Инструменты, возвращающие строки,
+    перехватывают исключения и возвращают JSON с ключом "error" первым
+    полем, поэтому достаточно проверить начало строки.
+    
+    Args:
+        result: Результат вызова инструмента
+        
+    Returns:
+        True, если результат похож на ответ с ошибкой
+    """
+    if isinstance(result, ToolResult):
+        return result.error is not None
+    return isinstance(result, str) and result.startswith("{") and '"error":' in result[:256]
+
+def _is_cacheable_result(result: Any) -> bool:
+    """
+    Определяет, можно ли переиспользовать результат инструмента (ошибки не кэшируются).
+    """
+    return not _is_error_result(result)
+
+def _instrument(func: Callable, idempotent: bool = False) -> Callable:
+    """
+    Оборачивает функцию инструмента сбором метрик (длительность, ошибки).
+    
+    Args:
+        func: Функция инструмента
+        idempotent: Результат можно переиспользовать в пределах области кэша (utils/tool_cache.py)
+        
+    Returns:
+        Обернутая функция с той же сигнатурой и документацией
+    """
+    name = func.__name__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        error = False
+        try:
+            if idempotent:
+                result = call_cached(name, func, args, kwargs, cacheable=_is_cacheable_result)
+            else:
+                result = func(*args, **kwargs)
+            error = _is_error_result(result)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            metrics.record_call(name, duration, error)
+            log_event("tool_call", {"tool": name, "duration_ms": round(duration * 1000, 1), "error": error})
+    
+    return wrapper
+
+def _invalidate() -> None:
+    """
+    Сбрасывает построенные по реестру инструменты SDK и снимок схем.
+    """
+    global _tool_objects, _snapshot
+    
+    with _tool_objects_lock:
+        _tool_objects = None
+        _snapshot = None
 
-def register_tool(func: Callable) -> Callable:
+def register_tool(func: Optional[Callable] = None, *, idempotent: bool = False,
+                  category: str = DEFAULT_CATEGORY) -> Callable:
     """
     Декоратор для регистрации функции как инструмента в реестре.
     
+    Объект инструмента SDK строится лениво при первом вызове get_all_tools(),
+    поэтому импорт модулей с инструментами не требует импорта SDK.
+    Используется как `@register_tool` или `@register_tool(category="database", idempotent=True)`.
+    
     Args:
         func: Функция для регистрации
+        idempotent: Инструмент только читает данные, и его результат можно
+            переиспользовать внутри пакета запросов
+        category: Категория инструмента (ключ TOOL_CATEGORIES)
         
     Returns:
-        Функция-инструмент, обернутая в function_tool
+        Функция-инструмент с учетом метрик вызовов
     """
-    # Создаем инструмент с помощью SDK
-    tool_func = function_tool(func)
+    if func is None:
+        return functools.partial(register_tool, idempotent=idempotent, category=category)
+    
+    if category not in TOOL_CATEGORIES:
+        logger.warning(f"Неизвестная категория инструмента {func.__name__}: {category}")
+    
+    tool_func = _instrument(func, idempotent)
+    tool_func.idempotent = idempotent
+    tool_func.category = category
+    
+    # Во время перезагрузки модулей новые версии инструментов собираются отдельно
+    if _staging is not None:
+        _staging[func.__name__] = tool_func
+        return tool_func
     
     # Регистрируем в глобальном реестре
-    if tool_func not in TOOL_REGISTRY:
-        TOOL_REGISTRY.append(tool_func)
+    if func.__name__ not in TOOL_REGISTRY:
+        TOOL_REGISTRY[func.__name__] = tool_func
+        _CATEGORY_INDEX.setdefault(category, []).append(func.__name__)
+        _invalidate()
         logger.info(f"Инструмент зарегистрирован: {func.__name__}")
     
     return tool_func
 
+def _fingerprint(func: Callable) -> str:
+    """
+    Вычисляет отпечаток функции, от которого зависит схема инструмента.
+    
+    Схема генерируется SDK, поэтому в отпечаток входят версия openai-agents
+    и версия формата манифеста: после их обновления схемы перестраиваются.
+    
+    Args:
+        func: Функция инструмента
+        
+    Returns:
+        Хэш сигнатуры и документации функции
+    """
+    from agents import __version__ as sdk_version
+    
+    source = (f"{MANIFEST_FORMAT_VERSION}|{sdk_version}|{func.__module__}.{func.__qualname__}|"
+              f"{inspect.signature(func)}|{inspect.getdoc(func)}")
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def _load_manifest() -> Dict[str, Dict[str, Any]]:
+    """
+    Загружает манифест схем инструментов с диска.
+    
+    Returns:
+        Словарь имя инструмента -> запись манифеста
+    """
+    try:
+        with open(TOOL_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Манифест инструментов поврежден и будет перестроен: {str(e)}")
+        return {}
+
+def _save_manifest(manifest: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Атомарно сохраняет манифест схем инструментов.
+    
+    Args:
+        manifest: Словарь имя инструмента -> запись манифеста
+    """
+    directory = os.path.dirname(TOOL_MANIFEST_PATH) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temp_path, TOOL_MANIFEST_PATH)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить манифест инструментов: {str(e)}")
+
+def _make_invoker(func: Callable) -> Callable:
+    """
+    Создает обработчик вызова инструмента моделью.
+    
+    Args:
+        func: Функция инструмента
+        
+    Returns:
+        Асинхронная функция (context, input_json) -> результат
+    """
+    # Модель параметров строится при первом вызове: на старте схема берется из манифеста
+    schema = None
+    
+    async def on_invoke_tool(context: Any, input_json: str) -> Any:
+        nonlocal schema
+        
+        try:
+            if schema is None:
+                from agents.function_schema import function_schema
+                schema = function_schema(func, use_docstring_info=False)
+            # Аргументы проверяются и приводятся к типам так же, как в function_tool
+            parsed = schema.params_pydantic_model.model_validate(json.loads(input_json) if input_json else {})
+            args, kwargs = schema.to_call_args(parsed)
+        except ValueError as e:
+            return json.dumps({"error": f"Некорректные аргументы инструмента: {str(e)}"}, ensure_ascii=False)
+        
+        scheduled = time.perf_counter()
+        finished = []
+        
+        def run():
+            # Ожидание свободного потока — признак насыщения пула потоков инструментов
+            metrics.record_latency("tool_dispatch", time.perf_counter() - scheduled)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finished.append(time.perf_counter())
+        
+        try:
+            # Синхронные инструменты выполняются вне event loop, чтобы не блокировать
+            # параллельные вызовы инструментов; ToolResult сериализуется здесь, один раз
+            result = await asyncio.to_thread(run)
+            # Время от завершения потока до продолжения корутины — задержка event loop
+            metrics.record_latency("event_loop_lag", time.perf_counter() - finished[0])
+            return to_model_output(result)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении инструмента {func.__name__}: {str(e)}")
+            return json.dumps({"error": str(e)}, ensure_ascii=False)
+    
+    return on_invoke_tool
+
+def _build_tools(registry: Optional[Dict[str, Callable]] = None) -> List:
+    """
+    Строит объекты инструментов SDK по реестру.
+    
+    Схемы параметров берутся из манифеста, если отпечаток функции не изменился;
+    иначе схема генерируется через function_tool и манифест обновляется.
+    
+    Args:
+        registry: Реестр для построения (по умолчанию TOOL_REGISTRY)
+    
+    Returns:
+        Список объектов FunctionTool
+    """
+    from agents import FunctionTool, function_tool
+    
+    manifest = _load_manifest()
+    changed = False
+    tools = []
+    
+    for func in (TOOL_REGISTRY if registry is None else registry).values():
+        fingerprint = _fingerprint(func)
+        entry = manifest.get(func.__name__)
+        
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            sdk_tool = function_tool(func)
+            entry = {
+                "fingerprint": fingerprint,
+                "name": sdk_tool.name,
+                "description": sdk_tool.description,
+                "params_json_schema": sdk_tool.params_json_schema,
+                "strict_json_schema": sdk_tool.strict_json_schema
+            }
+            manifest[func.__name__] = entry
+            changed = True
+        
+        tools.append(FunctionTool(
+            name=entry["name"],
+            description=entry["description"],
+            params_json_schema=entry["params_json_schema"],
+            on_invoke_tool=_make_invoker(func),
+            strict_json_schema=entry["strict_json_schema"]
+        ))
+    
+    if changed:
+        _save_manifest(manifest)
+        logger.info(f"Манифест инструментов обновлен: {TOOL_MANIFEST_PATH}")
+    
+    return tools
+
 def get_all_tools() -> List:
     """
     Возвращает все зарегистрированные инструменты.
@@ -43,26 +340,117 @@ def get_all_tools() -> List:
     Returns:
         Список всех зарегистрированных инструментов
     """
-    return TOOL_REGISTRY
+    global _tool_objects
+    
+    tools = _tool_objects
+    if tools is None:
+        with _tool_objects_lock:
+            if _tool_objects is None:
+                _tool_objects = _build_tools()
+            tools = _tool_objects
+    return tools
+
+def get_tool_function(name: str) -> Optional[Callable]:
+    """
+    Возвращает зарегистрированную функцию инструмента по имени.
+    
+    Args:
+        name: Имя инструмента
+        
+    Returns:
+        Функция-инструмент или None
+    """
+    return TOOL_REGISTRY.get(name)
 
-def get_tool_info() -> List[Dict]:
+def _tool_parameters(schema: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     """
-    Возвращает информацию о всех инструментах в удобочитаемом формате.
+    Преобразует JSON-схему параметров в описание для интерфейса.
     
+    Args:
+        schema: params_json_schema инструмента
+        
     Returns:
-        Список словарей с информацией об инструментах
+        Словарь имя параметра -> {type, description}
+    """
+    parameters = {}
+    for name, prop in (schema.get("properties") or {}).items():
+        types = prop.get("type") or [option.get("type") for option in prop.get("anyOf", []) if option.get("type")]
+        if isinstance(types, list):
+            types = [t for t in types if t != "null"]
+            types = types[0] if len(types) == 1 else types
+        parameters[name] = {
+            "type": types,
+            "description": prop.get("description") or prop.get("title", "")
+        }
+    return parameters
+
+def _build_snapshot(tools: List, registry: Optional[Dict[str, Callable]] = None) -> ToolSnapshot:
     """
-    tools_info = []
+    Строит неизменяемый снимок схем инструментов.
     
-    for tool in TOOL_REGISTRY:
-        tool_info = {
+    Args:
+        tools: Объекты FunctionTool
+        registry: Реестр, по которому построены инструменты (по умолчанию TOOL_REGISTRY)
+        
+    Returns:
+        Снимок с готовым JSON и ETag
+    """
+    registry = TOOL_REGISTRY if registry is None else registry
+    infos = []
+    for tool in tools:
+        func = registry.get(tool.name)
+        infos.append({
             "name": tool.name,
             "description": tool.description,
-            "parameters": tool.parameters if hasattr(tool, "parameters") else {}
-        }
-        tools_info.append(tool_info)
+            "category": getattr(func, "category", DEFAULT_CATEGORY),
+            "parameters": _tool_parameters(tool.params_json_schema),
+            "required": list(tool.params_json_schema.get("required") or [])
+        })
+    
+    content = json.dumps(infos, ensure_ascii=False, sort_keys=True)
+    version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    json_text = json.dumps({"count": len(infos), "version": version, "tools": infos}, ensure_ascii=False, indent=2)
     
-    return tools_info
+    return ToolSnapshot(
+        version=version,
+        etag=version,
+        tools=tuple(infos),
+        by_name={info["name"]: info for info in infos},
+        json_text=json_text,
+        json_blob=json_text.encode("utf-8")
+    )
+
+def get_tool_snapshot() -> ToolSnapshot:
+    """
+    Возвращает снимок схем инструментов, перестраивая его только при изменении реестра.
+    
+    Версия снимка — хэш его содержимого, поэтому она совпадает во всех
+    процессах с одинаковым набором инструментов.
+    
+    Returns:
+        Снимок инструментов
+    """
+    global _tool_objects, _snapshot
+    
+    snapshot = _snapshot
+    if snapshot is None:
+        with _tool_objects_lock:
+            if _snapshot is None:
+                if _tool_objects is None:
+                    _tool_objects = _build_tools()
+                _snapshot = _build_snapshot(_tool_objects)
+                logger.info(f"Снимок инструментов построен: версия {_snapshot.version}, инструментов {len(_tool_objects)}")
+            snapshot = _snapshot
+    return snapshot
+
+def get_tool_info() -> List[Dict]:
+    """
+    Возвращает информацию о всех инструментах в удобочитаемом формате.
+    
+    Returns:
+        Список словарей с информацией об инструментах (общие для всех вызовов, не изменять)
+    """
+    return list(get_tool_snapshot().tools)
 
 def discover_tools_from_module(module: Any) -> None:
     """
@@ -88,11 +476,11 @@ def get_tools_by_prefix(prefix: str) -> List:
     Returns:
         Список инструментов с указанным префиксом
     """
-    return [tool for tool in TOOL_REGISTRY if tool.name.startswith(prefix)]
+    return [tool for tool in get_all_tools() if tool.name.startswith(prefix)]
 
 def get_tools_by_category(category: str) -> List:
     """
-    Возвращает инструменты по категории (предполагается, что категория указана в метаданных).
+    Возвращает инструменты указанной категории.
     
     Args:
         category: Категория для фильтрации инструментов
@@ -100,4 +488,80 @@ def get_tools_by_category(category: str) -> List:
     Returns:
         Список инструментов в указанной категории
     """
-    return [tool for tool in TOOL_REGISTRY if getattr(tool, "category", None) == category]
\ No newline at end of file
+    names = set(_CATEGORY_INDEX.get(category, ()))
+    return [tool for tool in get_all_tools() if tool.name in names]
+
+def reload_tools(module_names: List[str]) -> Dict[str, Any]:
+    """
+    Перезагружает модули с инструментами и атомарно заменяет реестр.
+    
+    Модули импортируются заново, их декораторы register_tool собирают новые
+    версии инструментов в отдельный реестр; инструменты остальных модулей
+    сохраняются. Объекты SDK и снимок строятся до замены, поэтому
+    параллельные запросы видят либо старый, либо новый набор целиком.
+    Если импорт завершился ошибкой, реестр не меняется.
+    
+    Args:
+        module_names: Имена модулей с инструментами
+        
+    Returns:
+        Словарь с версиями снимка и списками добавленных, удаленных и обновленных инструментов
+        
+    Raises:
+        Exception: Ошибка импорта модуля
+    """
+    global TOOL_REGISTRY, _CATEGORY_INDEX, _tool_objects, _snapshot, _staging
+    
+    with _reload_lock:
+        old_version = get_tool_snapshot().version
+        staged: Dict[str, Callable] = {}
+        
+        _staging = staged
+        try:
+            for module_name in module_names:
+                module = sys.modules.get(module_name)
+                if module is not None:
+                    importlib.reload(module)
+                else:
+                    importlib.import_module(module_name)
+        finally:
+            _staging = None
+        
+        # Новый реестр: прежний порядок, замененные версии, затем новые инструменты
+        reloaded = set(module_names)
+        registry: Dict[str, Callable] = {}
+        for name, func in TOOL_REGISTRY.items():
+            if name in staged:
+                registry[name] = staged[name]
+            elif func.__module__ not in reloaded:
+                registry[name] = func
+        for name, func in staged.items():
+            registry.setdefault(name, func)
+        
+        category_index: Dict[str, List[str]] = {}
+        for name, func in registry.items():
+            category_index.setdefault(getattr(func, "category", DEFAULT_CATEGORY), []).append(name)
+        
+        tools = _build_tools(registry)
+        snapshot = _build_snapshot(tools, registry)
+        
+        with _tool_objects_lock:
+            previous = TOOL_REGISTRY
+            TOOL_REGISTRY, _CATEGORY_INDEX = registry, category_index
+            _tool_objects, _snapshot = tools, snapshot
+    
+    result = {
+        "old_version": old_version,
+        "version": snapshot.version,
+        "modules": list(module_names),
+        "added": [name for name in registry if name not in previous],
+        "removed": [name for name in previous if name not in registry],
+        "updated": [name for name in staged if name in previous],
+        "schema_changed": [name for name in staged if name in previous and
+                           _fingerprint(staged[name]) != _fingerprint(previous[name])],
+        "count": len(registry)
+    }
+    logger.info(f"Инструменты перезагружены: версия {old_version} -> {snapshot.version}, "
+                f"добавлено {len(result['added'])}, удалено {len(result['removed'])}, "
+                f"обновлено {len(result['updated'])}, схема изменена у {len(result['schema_changed'])}")
+    return result
@@ -0,0 +1,132 @@
+"""
+Типизированные результаты инструментов.
+
+Внутри процесса инструменты и агенты передают друг другу ToolResult, а не
+JSON-строку: промежуточные слои (фреймворк агентов, метрики, кэш
+инструментов) читают поля напрямую, без json.loads/json.dumps. В JSON
+результат сериализуется один раз — компактно — на границе с моделью
+(обработчик вызова инструмента в tools/registry.py).
+"""
+
+import json
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+# Компактная сериализация: без отступов и пробелов, кириллица без \u-экранирования
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ToolResult:
+    """
+    Результат вызова инструмента или специализированного агента.
+
+    Поля верхнего уровня неизменяемы (data — представление только для
+    чтения копии словаря), поэтому сериализованная строка кэшируется.
+    """
+
+    __slots__ = ("_data", "_json")
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Инициализирует результат.
+
+        Args:
+            data: Поля результата; при ошибке — ключ "error"
+        """
+        self._data = dict(data)
+        self._json: Optional[str] = None
+
+    @property
+    def data(self) -> Mapping[str, Any]:
+        """Поля результата (только для чтения)."""
+        return MappingProxyType(self._data)
+
+    @classmethod
+    def failure(cls, error: str, **fields: Any) -> "ToolResult":
+        """
+        Создает результат с ошибкой ("error" — первое поле, как в остальных инструментах).
+
+        Args:
+            error: Текст ошибки
+            **fields: Дополнительные поля
+
+        Returns:
+            Результат с ошибкой
+        """
+        return cls({"error": error, **fields})
+
+    @classmethod
+    def coerce(cls, value: Any) -> "ToolResult":
+        """
+        Приводит ответ агента или инструмента к ToolResult.
+
+        Строка JSON-объекта разбирается (так отвечают инструменты, еще
+        возвращающие строки), остальной текст становится полем "response".
+
+        Args:
+            value: ToolResult, словарь, строка или другое значение
+
+        Returns:
+            Результат
+        """
+        if isinstance(value, ToolResult):
+            return value
+        if isinstance(value, dict):
+            return cls(value)
+        if isinstance(value, str):
+            if value.lstrip()[:1] == "{":
+                try:
+                    parsed = json.loads(value)
+                except ValueError:
+                    parsed = None
+                if isinstance(parsed, dict):
+                    return cls(parsed)
+            return cls({"success": True, "response": value})
+        return cls({"success": True, "response": str(value)})
+
+    @property
+    def error(self) -> Optional[str]:
+        """Текст ошибки или None."""
+        error = self._data.get("error")
+        return str(error) if error else None
+
+    @property
+    def text(self) -> Optional[str]:
+        """Текстовый ответ (поле "response") или None."""
+        response = self._data.get("response")
+        return response if isinstance(response, str) else None
+
+    def to_json(self) -> str:
+        """
+        Сериализует результат для модели (один раз; повторные вызовы берут готовую строку).
+
+        Returns:
+            Компактная JSON-строка
+        """
+        if self._json is None:
+            self._json = _encoder.encode(self._data)
+        return self._json
+
+    def __str__(self) -> str:
+        return self.to_json()
+
+    def __repr__(self) -> str:
+        return f"ToolResult({self._data!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ToolResult) and self._data == other._data
+
+    __hash__ = None
+
+
+def to_model_output(result: Any) -> Any:
+    """
+    Готовит результат инструмента к передаче модели.
+
+    Args:
+        result: Возвращенное инструментом значение
+
+    Returns:
+        JSON-строка для ToolResult, иначе значение без изменений
+    """
+    return result.to_json() if isinstance(result, ToolResult) else result
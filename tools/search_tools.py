@@ -4,19 +4,36 @@
 Этот модуль содержит инструменты для поиска информации в сети через различные API.
 """
 
-import json
 import logging
-import requests
 from typing import Optional
 
-from tools.registry import register_tool
-from config import SERPAPI_KEY
+from tools.registry import register_tool, _is_error_result
+from tools.results import ToolResult
+from config import SERPAPI_KEY, SERPAPI_URL, REQUEST_TIMEOUT, TOOL_COALESCE_WINDOW
+from utils.http_client import get_session
+from utils.singleflight import coalesce
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-@register_tool
-def search_google(query: str, num_results: int = None) -> str:
+def _search_key(query: str, num_results: int = None) -> tuple:
+    """
+    Ключ объединения одинаковых поисковых запросов.
+    
+    Ключ не зависит от сессии: результаты публичного поиска в течение
+    TOOL_COALESCE_WINDOW получают запросы всех пользователей процесса.
+    """
+    return " ".join(query.lower().split()), num_results
+
+def _is_reusable_result(result: ToolResult) -> bool:
+    """
+    Ошибки SerpAPI (квота, сбой сети) не раздаются в окне объединения.
+    """
+    return not _is_error_result(result)
+
+@register_tool(category="search", idempotent=True)
+@coalesce(window=TOOL_COALESCE_WINDOW, key=_search_key, reusable=_is_reusable_result)
+def search_google(query: str, num_results: int = None) -> ToolResult:
     """
     Выполняет поиск в Google и возвращает результаты.
     
@@ -25,7 +42,7 @@ def search_google(query: str, num_results: int = None) -> str:
         num_results: Количество результатов для возврата (не обязательно)
     
     Returns:
-        JSON-строка с результатами поиска
+        Результаты поиска
     """
     try:
         # Установка значения по умолчанию внутри функции, а не в сигнатуре
@@ -44,10 +61,8 @@ def search_google(query: str, num_results: int = None) -> str:
             "num": num_results
         }
         
-        url = "https://serpapi.com/search"
-        
         # Выполняем запрос
-        response = requests.get(url, params=params)
+        response = get_session().get(SERPAPI_URL, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Проверяем на ошибки HTTP
         
         # Получаем результаты
@@ -79,13 +94,12 @@ def search_google(query: str, num_results: int = None) -> str:
                 "description": results["knowledge_graph"].get("description", "")
             }
         
-        return json.dumps(simplified_results, ensure_ascii=False, indent=2)
+        return ToolResult(simplified_results)
     
     except Exception as e:
         logger.error(f"Error during Google search: {str(e)}")
-        error_result = {
-            "error": str(e),
-            "query": query,
-            "message": "Не удалось выполнить поиск в Google. Пожалуйста, проверьте подключение к интернету и API-ключ."
-        }
-        return json.dumps(error_result, ensure_ascii=False, indent=2)
\ No newline at end of file
+        return ToolResult.failure(
+            str(e),
+            query=query,
+            message="Не удалось выполнить поиск в Google. Пожалуйста, проверьте подключение к интернету и API-ключ."
+        )
\ No newline at end of file
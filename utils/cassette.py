@@ -0,0 +1,336 @@
+"""
+Слой записи и воспроизведения (кассеты) для обращений к OpenAI API и HTTP-API инструментов.
+
+Режим задается переменной окружения CASSETTE_MODE:
+    off     — обычная работа (по умолчанию);
+    record  — запросы выполняются по сети, ответы сохраняются в кассеты;
+    replay  — ответы отдаются из кассет, сеть не используется.
+
+Каждый ответ хранится в отдельном сжатом файле, имя которого — хэш
+содержимого запроса (метод, URL без ключей API, тело). В режиме replay можно
+имитировать сетевую задержку через CASSETTE_LATENCY:
+    recorded              — записанная длительность запроса;
+    fixed:50              — фиксированные 50 мс;
+    uniform:20,80         — равномерно от 20 до 80 мс;
+    lognormal:40,0.5      — логнормально с медианой 40 мс и sigma 0.5.
+"""
+
+import io
+import os
+import gzip
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cassettes"))
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "")
+CASSETTE_SEED = int(os.getenv("CASSETTE_SEED", "0"))
+
+# Параметры URL, которые не должны влиять на ключ кассеты и попадать на диск
+_SECRET_PARAMS = {"api_key", "key", "apikey", "token"}
+
+# Заголовки ответа, которые сохраняются в кассете
+_KEPT_HEADERS = ("content-type",)
+
+_random = random.Random(CASSETTE_SEED)
+_random_lock = threading.Lock()
+
+
+class CassetteMissError(LookupError):
+    """Запрос не найден в кассетах в режиме replay."""
+
+
+def is_active() -> bool:
+    """
+    Проверяет, включен ли слой кассет.
+
+    Returns:
+        True в режимах record и replay
+    """
+    return CASSETTE_MODE in ("record", "replay")
+
+
+def is_replay() -> bool:
+    """
+    Проверяет, работает ли слой в режиме воспроизведения.
+
+    Returns:
+        True в режиме replay
+    """
+    return CASSETTE_MODE == "replay"
+
+
+def _normalize_url(url: str) -> str:
+    """
+    Удаляет секреты и упорядочивает параметры URL.
+
+    Args:
+        url: Исходный URL
+
+    Returns:
+        Нормализованный URL
+    """
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                    if k.lower() not in _SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(params), ""))
+
+
+def _normalize_body(body: Optional[bytes]) -> bytes:
+    """
+    Приводит JSON-тело запроса к каноническому виду.
+
+    Args:
+        body: Тело запроса
+
+    Returns:
+        Каноническое представление тела
+    """
+    if not body:
+        return b""
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return body
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> Tuple[str, str]:
+    """
+    Вычисляет ключ кассеты для запроса.
+
+    Args:
+        method: HTTP-метод
+        url: URL запроса
+        body: Тело запроса
+
+    Returns:
+        Кортеж (хэш содержимого, нормализованный URL)
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    normalized_url = _normalize_url(url)
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode("ascii"))
+    digest.update(b"\n")
+    digest.update(normalized_url.encode("utf-8"))
+    digest.update(b"\n")
+    digest.update(_normalize_body(body))
+    return digest.hexdigest(), normalized_url
+
+
+def _cassette_path(key: str) -> str:
+    return os.path.join(CASSETTE_DIR, key[:2], f"{key}.json.gz")
+
+
+def save(key: str, method: str, url: str, status: int, headers: Dict[str, str],
+         content: bytes, elapsed: float) -> None:
+    """
+    Сохраняет ответ в кассету (атомарно).
+
+    Args:
+        key: Ключ кассеты
+        method: HTTP-метод
+        url: Нормализованный URL
+        status: HTTP-статус ответа
+        headers: Заголовки ответа
+        content: Тело ответа
+        elapsed: Длительность запроса в секундах
+    """
+    entry = {
+        "method": method,
+        "url": url,
+        "status": status,
+        "headers": {name: headers[name] for name in _KEPT_HEADERS if name in headers},
+        "body": base64.b64encode(content).decode("ascii"),
+        "elapsed": round(elapsed, 4),
+    }
+    path = _cassette_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(gzip.compress(json.dumps(entry, separators=(",", ":")).encode("utf-8")))
+    os.replace(temp_path, path)
+    logger.debug(f"Cassette recorded: {method} {url} -> {key[:12]}")
+
+
+def load(key: str, method: str, url: str) -> Dict[str, Any]:
+    """
+    Загружает ответ из кассеты.
+
+    Args:
+        key: Ключ кассеты
+        method: HTTP-метод (для сообщения об ошибке)
+        url: Нормализованный URL (для сообщения об ошибке)
+
+    Returns:
+        Запись кассеты с декодированным телом в поле "content"
+
+    Raises:
+        CassetteMissError: Если кассета не найдена
+    """
+    try:
+        with open(_cassette_path(key), "rb") as f:
+            entry = json.loads(gzip.decompress(f.read()))
+    except FileNotFoundError:
+        raise CassetteMissError(f"Кассета не найдена для {method} {url} ({key[:12]})")
+    entry["content"] = base64.b64decode(entry.pop("body"))
+    return entry
+
+
+def replay_delay(entry: Dict[str, Any]) -> float:
+    """
+    Вычисляет имитируемую задержку ответа по CASSETTE_LATENCY.
+
+    Args:
+        entry: Запись кассеты
+
+    Returns:
+        Задержка в секундах
+    """
+    spec = CASSETTE_LATENCY
+    if not spec:
+        return 0.0
+    if spec == "recorded":
+        return float(entry.get("elapsed", 0.0))
+
+    kind, _, raw_args = spec.partition(":")
+    args = [float(value) for value in raw_args.split(",") if value]
+    with _random_lock:
+        if kind == "fixed":
+            ms = args[0]
+        elif kind == "uniform":
+            ms = _random.uniform(args[0], args[1])
+        elif kind == "lognormal":
+            ms = args[0] * _random.lognormvariate(0.0, args[1])
+        else:
+            logger.warning(f"Unknown CASSETTE_LATENCY spec: {spec}")
+            return 0.0
+    return ms / 1000.0
+
+
+# Транспорты httpx для клиентов OpenAI
+
+def _decoded_headers(headers: "httpx.Headers") -> Dict[str, str]:
+    """
+    Убирает заголовки, которые не соответствуют уже декодированному телу ответа.
+
+    Args:
+        headers: Заголовки исходного ответа
+
+    Returns:
+        Заголовки для ответа с декодированным телом
+    """
+    return {name: value for name, value in headers.items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Синхронный транспорт httpx с записью и воспроизведением ответов."""
+
+    def __init__(self, wrapped: Optional[httpx.BaseTransport] = None):
+        self._wrapped = wrapped or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, url = request_key(request.method, str(request.url), request.read())
+
+        if is_replay():
+            entry = load(key, request.method, url)
+            delay = replay_delay(entry)
+            if delay:
+                time.sleep(delay)
+            return httpx.Response(entry["status"], headers=entry["headers"],
+                                  content=entry["content"], request=request)
+
+        started = time.perf_counter()
+        response = self._wrapped.handle_request(request)
+        content = response.read()
+        save(key, request.method, url, response.status_code, response.headers,
+             content, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=_decoded_headers(response.headers),
+                              content=content, request=request)
+
+    def close(self) -> None:
+        self._wrapped.close()
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Асинхронный транспорт httpx с записью и воспроизведением ответов."""
+
+    def __init__(self, wrapped: Optional[httpx.AsyncBaseTransport] = None):
+        self._wrapped = wrapped or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key, url = request_key(request.method, str(request.url), await request.aread())
+
+        if is_replay():
+            entry = load(key, request.method, url)
+            delay = replay_delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return httpx.Response(entry["status"], headers=entry["headers"],
+                                  content=entry["content"], request=request)
+
+        started = time.perf_counter()
+        response = await self._wrapped.handle_async_request(request)
+        content = await response.aread()
+        save(key, request.method, url, response.status_code, response.headers,
+             content, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=_decoded_headers(response.headers),
+                              content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._wrapped.aclose()
+
+
+# Адаптер requests для HTTP-API инструментов
+
+class CassetteAdapter(HTTPAdapter):
+    """Адаптер requests с записью и воспроизведением ответов."""
+
+    def send(self, request, **kwargs):
+        key, url = request_key(request.method, request.url, request.body)
+
+        if is_replay():
+            entry = load(key, request.method, url)
+            delay = replay_delay(entry)
+            if delay:
+                time.sleep(delay)
+
+            response = requests.Response()
+            response.status_code = entry["status"]
+            response.headers = CaseInsensitiveDict(entry["headers"])
+            # Тело уже прочитано: iter_content() и close() работают и для stream=True
+            response._content = entry["content"]
+            response._content_consumed = True
+            response.raw = io.BytesIO(entry["content"])
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            return response
+
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        save(key, request.method, url, response.status_code,
+             {name.lower(): value for name, value in response.headers.items()},
+             response.content, time.perf_counter() - started)
+        return response
@@ -0,0 +1,393 @@
+"""
+Локальный сервис векторных представлений текста.
+
+Вычисляет векторы на CPU без обращения к внешним API: моделью
+sentence-transformers, если пакет установлен и модель доступна, иначе
+хэшированием слов и триграмм символов. Одновременные небольшие запросы
+собираются фоновым потоком в пакеты в пределах короткого окна; готовые
+векторы кэшируются в памяти и на диске (SQLite) по хэшу текста и модели,
+поэтому повторные тексты не пересчитываются даже после перезапуска.
+
+Пример:
+    vectors = embed_texts(["первый текст", "второй текст"])
+    vector = await aembed_text("запрос")
+"""
+
+import os
+import re
+import time
+import queue
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_SIZE,
+                    EMBEDDING_CACHE_PATH, EMBEDDING_MEMORY_CACHE)
+from utils import metrics
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размерность хэширующего представления
+HASHING_DIM = 512
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _token_features(token: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """
+    Позиции и веса признаков слова в хэширующем векторе: само слово и его
+    триграммы символов (сглаживают различия словоформ).
+    """
+    padded = f"^{token}$"
+    features = [(token, 1.0)] + [(padded[i:i + 3], 0.5) for i in range(len(padded) - 2)]
+    slots, weights = [], []
+    for feature, weight in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        slots.append(digest % HASHING_DIM)
+        weights.append(weight if (digest >> 63) else -weight)
+    return tuple(slots), tuple(weights)
+
+
+class HashingBackend:
+    """Представление хэшированием слов и триграмм символов (не требует модели и сети)."""
+
+    name = f"hashing-{HASHING_DIM}"
+    dim = HASHING_DIM
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Строит нормированные векторы текстов.
+
+        Args:
+            texts: Тексты
+
+        Returns:
+            Матрица float32 размера len(texts) x dim
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            slots, weights = [], []
+            for token in _TOKEN_RE.findall(text.lower()):
+                token_slots, token_weights = _token_features(token)
+                slots.extend(token_slots)
+                weights.extend(token_weights)
+            if slots:
+                vectors[row] = np.bincount(slots, weights=weights, minlength=self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerBackend:
+    """Модель sentence-transformers на CPU."""
+
+    def __init__(self, model_name: str):
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"st-{model_name}"
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                                     convert_to_numpy=True, show_progress_bar=False)
+        return vectors.astype(np.float32)
+
+
+def _create_backend():
+    """
+    Выбирает способ вычисления векторов по настройкам.
+    """
+    if EMBEDDING_BACKEND != "hashing" and SentenceTransformer is not None:
+        try:
+            backend = SentenceTransformerBackend(EMBEDDING_MODEL)
+            logger.info(f"Embedding model loaded: {EMBEDDING_MODEL} ({backend.dim} dims)")
+            return backend
+        except Exception as e:
+            logger.warning(f"Embedding model {EMBEDDING_MODEL} is unavailable, using hashing: {str(e)}")
+    elif EMBEDDING_BACKEND == "model":
+        logger.warning("sentence-transformers is not installed, using hashing embeddings")
+    return HashingBackend()
+
+
+class EmbeddingCache:
+    """Кэш векторов в памяти (LRU) и в SQLite."""
+
+    def __init__(self, path: str, memory_size: int):
+        """
+        Открывает (и при необходимости создает) кэш.
+
+        Args:
+            path: Путь к файлу SQLite
+            memory_size: Количество векторов в памяти
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_size = memory_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Возвращает сохраненные векторы.
+
+        Args:
+            keys: Ключи текстов
+
+        Returns:
+            Словарь ключ -> вектор (только найденные)
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            missing = [key for key in keys if key not in found]
+            for start in range(0, len(missing), 500):
+                part = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, found[key])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """
+        Сохраняет векторы.
+
+        Args:
+            items: Словарь ключ -> вектор
+        """
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+
+class EmbeddingService:
+    """Сервис векторов с пакетной обработкой одновременных запросов."""
+
+    def __init__(self, backend=None, cache: Optional[EmbeddingCache] = None,
+                 batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS, batch_size: int = EMBEDDING_BATCH_SIZE):
+        """
+        Инициализирует сервис.
+
+        Args:
+            backend: Способ вычисления векторов (по умолчанию — по настройкам)
+            cache: Кэш векторов (по умолчанию — SQLite по EMBEDDING_CACHE_PATH)
+            batch_window_ms: Сколько ждать других запросов перед вычислением пакета
+            batch_size: Максимальный размер пакета
+        """
+        self.backend = backend or _create_backend()
+        self.cache = cache or EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MEMORY_CACHE)
+        self.batch_window = batch_window_ms / 1000.0
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Tuple[str, str, Future]]" = queue.Queue()
+        # Количество вызовов embed, ожидающих фоновый поток
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._worker_loop, name="zai-embeddings", daemon=True)
+        self._worker.start()
+
+    @property
+    def model_id(self) -> str:
+        """Идентификатор модели; векторы разных моделей несовместимы."""
+        return self.backend.name
+
+    @property
+    def dim(self) -> int:
+        return self.backend.dim
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\n{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Возвращает нормированные векторы текстов.
+
+        Args:
+            texts: Тексты
+
+        Returns:
+            Матрица float32 размера len(texts) x dim
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        keys = [self._key(text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        metrics.record_cache("embeddings", hit=not missing)
+
+        if len(missing) >= self.batch_size:
+            # Большой объем (например, индексация документов) считаем сразу, без окна ожидания
+            for start in range(0, len(missing), self.batch_size):
+                part = dict(list(missing.items())[start:start + self.batch_size])
+                found.update(self._compute(part))
+        elif missing:
+            with self._waiting_lock:
+                self._waiting += 1
+            try:
+                futures = []
+                for key, text in missing.items():
+                    future = Future()
+                    self._queue.put((key, text, future))
+                    futures.append((key, future))
+                for key, future in futures:
+                    found[key] = future.result()
+            finally:
+                with self._waiting_lock:
+                    self._waiting -= 1
+
+        return np.vstack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Асинхронно возвращает нормированные векторы текстов, не блокируя event loop.
+
+        Args:
+            texts: Тексты
+
+        Returns:
+            Матрица float32 размера len(texts) x dim
+        """
+        return await asyncio.to_thread(self.embed, texts)
+
+    def _compute(self, items: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """
+        Вычисляет векторы одного пакета и сохраняет их в кэш.
+        """
+        started = time.perf_counter()
+        vectors = self.backend.encode(list(items.values()))
+        metrics.record_call("embedding_batch", time.perf_counter() - started)
+        metrics.increment("embedding_batches")
+        metrics.increment("embedded_texts", len(items))
+
+        result = dict(zip(items.keys(), vectors))
+        self.cache.put_many(result)
+        return result
+
+    def _worker_loop(self) -> None:
+        """
+        Собирает запросы в пакеты: после первого запроса забирает уже ожидающие
+        и, если векторы ждут и другие вызовы, ждет окно batch_window или пока
+        пакет не заполнится; затем вычисляет векторы одним вызовом. Одиночный
+        запрос обрабатывается без задержки.
+        """
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic() if self._waiting > 1 else 0
+                if remaining <= 0:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except queue.Empty:
+                        break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Одинаковые тексты из разных запросов считаются один раз
+            items = {key: text for key, text, _ in batch}
+            try:
+                vectors = self._compute(items)
+            except Exception as e:
+                logger.error(f"Embedding batch failed: {str(e)}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for key, _, future in batch:
+                future.set_result(vectors[key])
+
+
+# Синглтон сервиса создается при первом обращении
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Возвращает синглтон сервиса векторов, создавая его при первом вызове.
+
+    Returns:
+        Экземпляр EmbeddingService
+    """
+    global _service
+
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Возвращает нормированные векторы текстов.
+
+    Args:
+        texts: Тексты
+
+    Returns:
+        Матрица float32 размера len(texts) x dim
+    """
+    return get_embedding_service().embed(texts)
+
+
+def embed_text(text: str) -> np.ndarray:
+    """
+    Возвращает нормированный вектор текста.
+
+    Args:
+        text: Текст
+
+    Returns:
+        Вектор float32
+    """
+    return get_embedding_service().embed([text])[0]
+
+
+async def aembed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Асинхронная версия embed_texts.
+    """
+    return await get_embedding_service().aembed(texts)
+
+
+async def aembed_text(text: str) -> np.ndarray:
+    """
+    Асинхронная версия embed_text.
+    """
+    return (await get_embedding_service().aembed([text]))[0]
@@ -5,10 +5,14 @@
 import logging
 import json
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+
+from utils.logging_config import sample
 
 logger = logging.getLogger(__name__)
 
+# Логгер событий log_event
+events_logger = logging.getLogger("zai_events")
+
 def format_json_response(data: Dict) -> str:
     """
     Форматирует словарь в красивую JSON-строку.
@@ -21,21 +25,29 @@ def format_json_response(data: Dict) -> str:
     """
     return json.dumps(data, ensure_ascii=False, indent=2)
 
-def log_event(event_type: str, details: Optional[Dict] = None) -> None:
+def log_event(event_type: str, details: Optional[Dict] = None, level: int = logging.INFO) -> None:
     """
     Логирует событие с деталями.
     
+    Детали передаются полями записи и сериализуются фоновым потоком
+    логирования; события ниже WARNING прореживаются по LOG_SAMPLE_RATES.
+    
     Args:
         event_type: Тип события
         details: Детали события (опционально)
+        level: Уровень записи
     """
-    log_data = {
-        "event_type": event_type,
-        "timestamp": datetime.now().isoformat(),
-        "details": details or {}
-    }
-    
-    logger.info(f"Event: {event_type} | {format_json_response(log_data)}")
+    if not events_logger.isEnabledFor(level):
+        return
+    sample_rate = 1.0
+    if level < logging.WARNING:
+        kept, sample_rate = sample(event_type)
+        if not kept:
+            return
+    extra = {"event": event_type, "details": details or {}}
+    if sample_rate < 1.0:
+        extra["sample_rate"] = sample_rate
+    events_logger.log(level, "Event: %s", event_type, extra=extra)
 
 def extract_parameters_from_query(query: str, parameter_names: List[str]) -> Dict[str, Any]:
     """
@@ -84,10 +96,13 @@ def safe_parse_json(json_str: str) -> Dict:
     Returns:
         Словарь с данными из JSON или пустой словарь в случае ошибки
     """
+    if not json_str or not isinstance(json_str, str):
+        return {}
+    # Обычный текстовый ответ не разбирается: JSON начинается с { или [
+    if json_str.lstrip()[:1] not in ("{", "["):
+        return {}
     try:
-        if not json_str or not isinstance(json_str, str):
-            return {}
         return json.loads(json_str)
-    except Exception as e:
-        logger.error(f"Error parsing JSON: {str(e)}")
+    except ValueError as e:
+        logger.debug("Error parsing JSON: %s", e)
         return {}
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Общая HTTP-сессия для инструментов, обращающихся к внешним API.
+
+Одна сессия requests на процесс переиспользует соединения между вызовами
+инструментов и подключает слой кассет (utils/cassette.py), если он включен.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import cassette
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размер пула соединений на один хост
+POOL_SIZE = 16
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Возвращает общую HTTP-сессию процесса.
+
+    Returns:
+        Сессия requests с пулом соединений (и кассетами, если они включены)
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter_class = cassette.CassetteAdapter if cassette.is_active() else HTTPAdapter
+                adapter = adapter_class(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+                logger.debug(f"HTTP session created (cassette mode: {cassette.CASSETTE_MODE})")
+
+    return _session
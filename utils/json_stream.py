@@ -0,0 +1,184 @@
+"""
+Потоковый разбор JSON-ответов.
+
+Позволяет перебирать элементы массива внутри большого JSON-документа
+(например, {"results": [...]}) по мере получения данных, не загружая
+весь ответ в память. Использует ijson, если он установлен, иначе
+встроенный инкрементальный разборщик на json.JSONDecoder.raw_decode.
+"""
+
+import json
+import codecs
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+
+
+class JSONStreamError(ValueError):
+    """Ответ не содержит ожидаемого массива."""
+
+    def __init__(self, message: str, document: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        # Разобранный документ без массива (например, ответ с ошибкой), если он доступен
+        self.document = document
+
+
+# Сколько начальных байтов ответа сохраняется, чтобы разобрать документ без массива (ijson)
+DOCUMENT_PREVIEW_BYTES = 65536
+
+
+class _ChunkReader:
+    """Файлоподобная обертка над итератором байтовых фрагментов (для ijson)."""
+
+    def __init__(self, chunks: Iterable[bytes], keep: int = 0):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        # Начало документа (не больше keep байт) и признак, что он не поместился
+        self.head = bytearray()
+        self.keep = keep
+        self.truncated = False
+
+    def _remember(self, data: bytes) -> None:
+        if self.truncated or not data:
+            return
+        if len(self.head) + len(data) > self.keep:
+            self.truncated = True
+            self.head.clear()
+        else:
+            self.head += data
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._remember(data)
+        return data
+
+
+def _iter_items_fallback(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    Перебирает элементы массива по ключу key верхнего уровня без ijson.
+
+    Массив находится по первому вхождению '"key": [' в тексте документа,
+    поэтому вложенный массив с тем же ключом перед ним будет принят за искомый.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    marker = json.dumps(key)
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    exhausted = False
+
+    def read_more() -> bool:
+        nonlocal buffer, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+            return False
+        buffer += text_decoder.decode(chunk)
+        return True
+
+    # Ищем начало массива: ключ, за которым следуют ":" и "["
+    search_from = 0
+    while True:
+        index = buffer.find(marker, search_from)
+        if index >= 0:
+            rest = buffer[index + len(marker):].lstrip(_WHITESPACE)
+            value = rest[1:].lstrip(_WHITESPACE) if rest.startswith(":") else rest
+            if rest.startswith(":") and value.startswith("["):
+                position = len(buffer) - len(value) + 1
+                break
+            if value:
+                # Совпадение внутри строкового значения или ключ с другим типом значения
+                search_from = index + 1
+                continue
+        else:
+            search_from = max(search_from, len(buffer) - len(marker))
+        if not read_more():
+            try:
+                document = json.loads(buffer)
+            except ValueError:
+                document = None
+            raise JSONStreamError(f"Массив '{key}' не найден в ответе", document if isinstance(document, dict) else None)
+
+    # Перебираем элементы
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+            position += 1
+        if position >= len(buffer):
+            if not read_more():
+                raise JSONStreamError(f"Ответ оборвался внутри массива '{key}'")
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            # Элемент получен не полностью
+            if exhausted or not read_more():
+                raise JSONStreamError(f"Некорректный элемент массива '{key}'")
+            continue
+        # Число или литерал может быть оборван на границе фрагмента: ждем разделитель
+        if not exhausted and not isinstance(item, (dict, list, str)) and buffer[end:end + 1] not in tuple(_WHITESPACE + ",]"):
+            read_more()
+            continue
+        yield item
+        buffer = buffer[end:]
+        position = 0
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = "results") -> Iterator[Any]:
+    """
+    Перебирает элементы массива по ключу верхнего уровня потокового JSON-документа.
+
+    Args:
+        chunks: Итератор байтовых фрагментов ответа
+        key: Ключ массива в корневом объекте
+
+    Returns:
+        Итератор элементов массива
+
+    Raises:
+        JSONStreamError: Если массив не найден или документ поврежден
+    """
+    if ijson is None:
+        return _iter_items_fallback(chunks, key)
+
+    def generate() -> Iterator[Any]:
+        reader = _ChunkReader(chunks, keep=DOCUMENT_PREVIEW_BYTES)
+        found = False
+        try:
+            for item in ijson.items(reader, f"{key}.item", use_float=True):
+                found = True
+                yield item
+        except ijson.JSONError as e:
+            raise JSONStreamError(f"Некорректный JSON в ответе: {str(e)}")
+        # ijson не отличает отсутствующий массив от пустого: небольшой документ
+        # без элементов проверяется целиком, как во встроенном разборщике
+        if not found and not reader.truncated:
+            try:
+                document = json.loads(bytes(reader.head))
+            except ValueError:
+                document = None
+            if not isinstance(document, dict) or not isinstance(document.get(key), list):
+                raise JSONStreamError(f"Массив '{key}' не найден в ответе",
+                                      document if isinstance(document, dict) else None)
+
+    return generate()
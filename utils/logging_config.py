@@ -0,0 +1,215 @@
+"""
+Неблокирующая настройка логирования для всей системы zAI.
+
+Логгеры пишут записи в ограниченную очередь (QueueHandler), а форматирование
+и вывод выполняет фоновый поток (QueueListener). В потоке запроса остается
+только подстановка аргументов сообщения; JSON строится уже в фоне. Если
+очередь переполнена, запись отбрасывается и учитывается в метриках —
+поток запроса никогда не ждет вывода.
+
+Формат вывода (LOG_STYLE): "json" — одна компактная JSON-строка на запись,
+"text" — строка по шаблону LOG_FORMAT. Записи уровня ниже WARNING от
+многословных логгеров и событий log_event прореживаются по LOG_SAMPLE_RATES.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+from typing import Dict, Optional, TextIO, Tuple
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_STYLE, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+from utils import metrics
+
+# Атрибуты LogRecord, которые не относятся к полям события
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    """
+    Разбирает строку вида "httpx=0.1,tool_call=0.2".
+
+    Args:
+        spec: Значение LOG_SAMPLE_RATES
+
+    Returns:
+        Словарь событие или логгер -> доля сохраняемых записей
+    """
+    rates = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+# Доли сохраняемых записей по событию или имени логгера
+sample_rates = _parse_rates(LOG_SAMPLE_RATES)
+
+
+def sample(key: str) -> Tuple[bool, float]:
+    """
+    Решает, сохранять ли запись события или логгера.
+
+    Args:
+        key: Имя события или логгера
+
+    Returns:
+        (сохранять ли запись, доля сохраняемых записей)
+    """
+    rate = sample_rates.get(key, 1.0)
+    if rate >= 1.0:
+        return True, 1.0
+    kept = random.random() < rate
+    if not kept:
+        metrics.increment("log_records_sampled_out")
+    return kept, rate
+
+
+def _event_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """Компактная JSON-строка на запись; поля из extra добавляются как есть."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        entry.update(_event_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Строка по шаблону LOG_FORMAT; поля из extra дописываются компактным JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = _event_fields(record)
+        if fields:
+            text += " | " + json.dumps(fields, ensure_ascii=False, separators=(",", ":"), default=str)
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживает записи уровня ниже WARNING от логгеров из LOG_SAMPLE_RATES."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or record.name not in sample_rates:
+            return True
+        kept, rate = sample(record.name)
+        if kept:
+            record.sample_rate = rate
+        return kept
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Обработчик, помещающий записи в очередь без ожидания."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются сразу: объекты могут измениться после возврата из вызова логгера.
+        # Форматирование в JSON и трассировки исключений выполняет фоновый поток
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_records_dropped")
+
+
+# Состояние конвейера: обработчик очереди, фоновый слушатель и конечный обработчик
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_output_handler: Optional[logging.Handler] = None
+_setup_lock = threading.Lock()
+
+
+def _start_listener() -> None:
+    global _listener
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, _output_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    global _listener
+
+    if _listener is not None:
+        # stop() дожидается вывода всех записей, уже попавших в очередь
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    """
+    Запускает новый фоновый поток в дочернем процессе (поток родителя после fork не существует).
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+
+def setup_logging(level: str = LOG_LEVEL, style: str = LOG_STYLE, stream: Optional[TextIO] = None,
+                  force: bool = False) -> None:
+    """
+    Настраивает корневой логгер на вывод через очередь и фоновый поток.
+
+    Повторный вызов без force ничего не делает, поэтому модули могут
+    вызывать функцию при импорте, а точки входа — с собственными параметрами.
+
+    Args:
+        level: Уровень логирования
+        style: "json" или "text"
+        stream: Поток вывода (по умолчанию stderr)
+        force: Перенастроить, даже если логирование уже настроено
+    """
+    global _queue_handler, _output_handler
+
+    with _setup_lock:
+        if _queue_handler is not None and not force:
+            return
+        _stop_listener()
+
+        _output_handler = logging.StreamHandler(stream or sys.stderr)
+        _output_handler.setFormatter(TextFormatter(LOG_FORMAT) if style == "text" else JsonFormatter())
+        _queue_handler = NonBlockingQueueHandler(None)
+        _queue_handler.addFilter(SamplingFilter())
+        _start_listener()
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(_queue_handler)
+        root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,355 @@
+"""
+Метрики времени выполнения для системы zAI.
+
+Счетчики обновляются на горячем пути (вызовы инструментов, обработка запросов,
+обращения к кэшам), а отчет собирается из уже накопленных значений,
+без сканирования данных по требованию.
+"""
+
+import os
+import time
+import logging
+import resource
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Optional
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размер окна последних измерений для расчета перцентилей
+LATENCY_WINDOW = 512
+
+_lock = threading.Lock()
+_started_at = time.time()
+
+
+class _CallStats:
+    """Накопительная статистика вызовов одного инструмента или агента."""
+
+    __slots__ = ("calls", "errors", "total_time", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+
+# Статистика вызовов по имени инструмента / агента
+CALL_STATS: Dict[str, _CallStats] = {}
+
+# Попадания и промахи по имени кэша: [hits, misses]
+CACHE_STATS: Dict[str, List[int]] = {}
+
+# Произвольные счетчики (объединенные запросы, предзагрузки и т.д.)
+COUNTERS: Dict[str, int] = {}
+
+# Количество выполняющихся сейчас операций и пиковое значение: [current, peak]
+IN_FLIGHT: Dict[str, List[int]] = {}
+
+# Ленивые показатели, которые вычисляются только при сборе отчета
+GAUGES: Dict[str, Callable[[], Any]] = {}
+
+# Последние длительности обработки запросов мастер-агентом и их исходы (True — ошибка)
+REQUEST_LATENCIES = deque(maxlen=LATENCY_WINDOW)
+REQUEST_ERRORS = deque(maxlen=LATENCY_WINDOW)
+
+# Окна последних значений прочих задержек (ожидание потока инструмента, задержка event loop)
+LATENCIES: Dict[str, deque] = {}
+
+# Состояние для расчета загрузки CPU между двумя снимками
+_last_cpu_sample = {"wall": time.monotonic(), "cpu": time.process_time()}
+
+
+def record_call(name: str, duration: float, error: bool = False) -> None:
+    """
+    Регистрирует завершенный вызов инструмента или агента.
+
+    Args:
+        name: Имя инструмента или агента
+        duration: Длительность вызова в секундах
+        error: True, если вызов завершился ошибкой
+    """
+    with _lock:
+        stats = CALL_STATS.get(name)
+        if stats is None:
+            stats = CALL_STATS[name] = _CallStats()
+        stats.calls += 1
+        stats.total_time += duration
+        stats.latencies.append(duration)
+        if error:
+            stats.errors += 1
+
+
+def record_cache(name: str, hit: bool) -> None:
+    """
+    Регистрирует обращение к кэшу.
+
+    Args:
+        name: Имя кэша
+        hit: True при попадании, False при промахе
+    """
+    with _lock:
+        stats = CACHE_STATS.get(name)
+        if stats is None:
+            stats = CACHE_STATS[name] = [0, 0]
+        stats[0 if hit else 1] += 1
+
+
+def increment(name: str, value: int = 1) -> None:
+    """
+    Увеличивает именованный счетчик.
+
+    Args:
+        name: Имя счетчика
+        value: Величина приращения
+    """
+    with _lock:
+        COUNTERS[name] = COUNTERS.get(name, 0) + value
+
+
+def register_gauge(name: str, func: Callable[[], Any]) -> None:
+    """
+    Регистрирует показатель, значение которого вычисляется при сборе отчета.
+
+    Функция должна быть дешевой (например, len() словаря), так как
+    вызывается при каждом запросе статуса.
+
+    Args:
+        name: Имя показателя
+        func: Функция без аргументов, возвращающая значение
+    """
+    GAUGES[name] = func
+
+
+def in_flight_started(name: str) -> None:
+    """
+    Учитывает начало выполнения операции.
+
+    Args:
+        name: Имя группы операций (например, "agent" или "http")
+    """
+    with _lock:
+        counter = IN_FLIGHT.get(name)
+        if counter is None:
+            counter = IN_FLIGHT[name] = [0, 0]
+        counter[0] += 1
+        if counter[0] > counter[1]:
+            counter[1] = counter[0]
+
+
+def in_flight_finished(name: str) -> None:
+    """
+    Учитывает завершение выполнения операции.
+
+    Args:
+        name: Имя группы операций
+    """
+    with _lock:
+        IN_FLIGHT[name][0] -= 1
+
+
+@contextmanager
+def track_in_flight(name: str):
+    """
+    Контекстный менеджер для учета выполняющихся операций.
+
+    Args:
+        name: Имя группы операций (например, "agent" или "http")
+    """
+    in_flight_started(name)
+    try:
+        yield
+    finally:
+        in_flight_finished(name)
+
+
+def record_request(duration: float, error: bool = False) -> None:
+    """
+    Регистрирует длительность обработки запроса мастер-агентом.
+
+    Args:
+        duration: Длительность в секундах
+        error: True, если запрос завершился ошибкой
+    """
+    with _lock:
+        REQUEST_LATENCIES.append(duration)
+        REQUEST_ERRORS.append(error)
+
+
+def record_latency(name: str, duration: float) -> None:
+    """
+    Добавляет значение в окно именованной задержки.
+
+    Args:
+        name: Имя задержки
+        duration: Значение в секундах
+    """
+    with _lock:
+        window = LATENCIES.get(name)
+        if window is None:
+            window = LATENCIES[name] = deque(maxlen=LATENCY_WINDOW)
+        window.append(duration)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Вычисляет p50/p95/p99 в миллисекундах.
+
+    Args:
+        values: Список длительностей в секундах
+
+    Returns:
+        Словарь с перцентилями
+    """
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def pick(p: float) -> float:
+        return round(ordered[min(last, int(p * len(ordered)))] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """
+    Возвращает текущий RSS процесса (только Linux, через /proc).
+
+    Returns:
+        Размер резидентной памяти в байтах или None
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_process_stats() -> Dict[str, Any]:
+    """
+    Возвращает показатели ресурсов процесса.
+
+    Returns:
+        Словарь с памятью, CPU и потоками процесса
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss измеряется в килобайтах на Linux и в байтах на macOS
+    peak_rss = usage.ru_maxrss if os.uname().sysname == "Darwin" else usage.ru_maxrss * 1024
+    rss = _current_rss_bytes() or peak_rss
+    peak_rss = max(peak_rss, rss)
+
+    now_wall = time.monotonic()
+    now_cpu = time.process_time()
+    with _lock:
+        wall_delta = now_wall - _last_cpu_sample["wall"]
+        cpu_delta = now_cpu - _last_cpu_sample["cpu"]
+        _last_cpu_sample["wall"] = now_wall
+        _last_cpu_sample["cpu"] = now_cpu
+    cpu_percent = round(100.0 * cpu_delta / wall_delta, 1) if wall_delta > 0 else 0.0
+
+    return {
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - _started_at, 1),
+        "rss_mb": round(rss / (1024 * 1024), 1),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "cpu_percent": cpu_percent,
+        "cpu_time_seconds": round(now_cpu, 2),
+        "threads": threading.active_count(),
+    }
+
+
+def get_call_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Возвращает статистику вызовов по инструментам и агентам.
+
+    Returns:
+        Словарь имя -> показатели (вызовы, ошибки, задержки)
+    """
+    with _lock:
+        items = [(name, s.calls, s.errors, s.total_time, list(s.latencies))
+                 for name, s in CALL_STATS.items()]
+
+    result = {}
+    for name, calls, errors, total_time, latencies in items:
+        stats = {
+            "calls": calls,
+            "errors": errors,
+            "error_rate": round(errors / calls, 3) if calls else 0.0,
+            "avg_ms": round(total_time / calls * 1000, 2) if calls else 0.0,
+        }
+        stats.update(_percentiles(latencies))
+        result[name] = stats
+    return result
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Возвращает коэффициенты попадания в кэши.
+
+    Returns:
+        Словарь имя кэша -> попадания, промахи, доля попаданий
+    """
+    with _lock:
+        items = [(name, hits, misses) for name, (hits, misses) in CACHE_STATS.items()]
+
+    return {
+        name: {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+        for name, hits, misses in items
+    }
+
+
+def get_gauges() -> Dict[str, Any]:
+    """
+    Вычисляет зарегистрированные показатели.
+
+    Returns:
+        Словарь имя -> значение
+    """
+    result = {}
+    for name, func in list(GAUGES.items()):
+        try:
+            result[name] = func()
+        except Exception as e:
+            logger.debug(f"Gauge '{name}' failed: {str(e)}")
+            result[name] = None
+    return result
+
+
+def get_metrics_snapshot() -> Dict[str, Any]:
+    """
+    Собирает полный снимок метрик.
+
+    Returns:
+        Словарь со всеми метриками процесса
+    """
+    with _lock:
+        in_flight = {name: {"current": c, "peak": p} for name, (c, p) in IN_FLIGHT.items()}
+        counters = dict(COUNTERS)
+        request_latencies = list(REQUEST_LATENCIES)
+        request_errors = sum(REQUEST_ERRORS)
+        latencies = {name: list(window) for name, window in LATENCIES.items()}
+
+    requests_stats = {"recent": len(request_latencies),
+                      "error_rate": round(request_errors / len(request_latencies), 3) if request_latencies else 0.0}
+    requests_stats.update(_percentiles(request_latencies))
+
+    return {
+        "process": get_process_stats(),
+        "in_flight": in_flight,
+        "requests": requests_stats,
+        "calls": get_call_stats(),
+        "caches": get_cache_stats(),
+        "counters": counters,
+        "latencies": {name: dict(_percentiles(values), recent=len(values)) for name, values in latencies.items()},
+        "gauges": get_gauges(),
+    }
@@ -0,0 +1,275 @@
+"""
+Общая фабрика клиентов OpenAI для всей системы zAI.
+
+Все обращения к OpenAI (инструменты, голосовой интерфейс, Agents SDK) идут
+через общий синхронный клиент с настроенным пулом соединений и асинхронные
+клиенты (по одному на event loop) с общим ограничителем RPM/TPM
+(utils/rate_limiter.py).
+"""
+
+import json
+import asyncio
+import logging
+import weakref
+import threading
+from typing import Optional
+
+import httpx
+
+from config import (OPENAI_API_KEY, OPENAI_TIMEOUT, MAX_RETRIES, RATE_LIMIT_DELAY,
+                    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_KEEPALIVE_EXPIRY,
+                    OPENAI_RPM, OPENAI_TPM)
+from utils import cassette, metrics
+from utils.rate_limiter import RateLimiter
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Общий ограничитель для всех клиентов процесса
+limiter = RateLimiter(requests_per_minute=OPENAI_RPM, tokens_per_minute=OPENAI_TPM)
+metrics.register_gauge("openai_queue_length", lambda: limiter.queue_length)
+
+_client = None
+# Асинхронные клиенты по event loop: пул соединений httpx привязан к циклу
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """
+    Оценивает количество токенов запроса к модели.
+
+    Учитываются только JSON-запросы: ≈4 байта на входной токен плюс
+    запрошенный лимит выходных токенов.
+
+    Args:
+        request: HTTP-запрос к API
+
+    Returns:
+        Оценка количества токенов
+    """
+    if "json" not in request.headers.get("content-type", ""):
+        return 0
+    body = request.content
+    estimate = len(body) // 4
+    try:
+        payload = json.loads(body)
+        estimate += int(payload.get("max_output_tokens") or payload.get("max_tokens")
+                        or payload.get("max_completion_tokens") or 0)
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return estimate
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """
+    Извлекает паузу из заголовков ответа 429.
+
+    Args:
+        response: Ответ API
+
+    Returns:
+        Пауза в секундах
+    """
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in response.headers:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return float(RATE_LIMIT_DELAY)
+
+
+def _actual_tokens(response: httpx.Response) -> Optional[int]:
+    """
+    Извлекает фактический расход токенов из JSON-ответа.
+
+    Args:
+        response: Прочитанный ответ API
+
+    Returns:
+        Количество токенов или None, если usage отсутствует
+    """
+    if "json" not in response.headers.get("content-type", ""):
+        return None
+    try:
+        usage = response.json().get("usage") or {}
+        return int(usage["total_tokens"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _after_response(response: httpx.Response, estimated: int) -> None:
+    """
+    Учитывает ответ API в ограничителе и метриках.
+
+    Args:
+        response: Прочитанный ответ API
+        estimated: Оценка токенов, списанная при отправке
+    """
+    if response.status_code == 429:
+        pause = _retry_after(response)
+        limiter.block_for(pause)
+        metrics.increment("openai_429")
+        logger.warning(f"OpenAI rate limit hit, pausing all callers for {pause:.1f}s")
+        return
+    actual = _actual_tokens(response)
+    if actual is not None:
+        limiter.reconcile(estimated, actual)
+
+
+def _is_streaming(response: httpx.Response) -> bool:
+    return "text/event-stream" in response.headers.get("content-type", "")
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Синхронный транспорт, ожидающий емкость ограничителя перед отправкой."""
+
+    def __init__(self, wrapped: httpx.BaseTransport):
+        self._wrapped = wrapped
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = estimate_tokens(request)
+        waited = limiter.acquire(estimated)
+        if waited:
+            metrics.increment("openai_throttled")
+            metrics.increment("openai_wait_ms", int(waited * 1000))
+        response = self._wrapped.handle_request(request)
+        if not _is_streaming(response):
+            response.read()
+            _after_response(response, estimated)
+        return response
+
+    def close(self) -> None:
+        self._wrapped.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Асинхронный транспорт, ожидающий емкость ограничителя перед отправкой."""
+
+    def __init__(self, wrapped: httpx.AsyncBaseTransport):
+        self._wrapped = wrapped
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = estimate_tokens(request)
+        waited = await limiter.acquire_async(estimated)
+        if waited:
+            metrics.increment("openai_throttled")
+            metrics.increment("openai_wait_ms", int(waited * 1000))
+        response = await self._wrapped.handle_async_request(request)
+        if not _is_streaming(response):
+            await response.aread()
+            _after_response(response, estimated)
+        return response
+
+    async def aclose(self) -> None:
+        await self._wrapped.aclose()
+
+
+def _build_transport() -> httpx.BaseTransport:
+    transport = httpx.HTTPTransport(limits=_pool_limits())
+    if cassette.is_active():
+        transport = cassette.CassetteTransport(transport)
+    return RateLimitedTransport(transport)
+
+
+def _build_async_transport() -> httpx.AsyncBaseTransport:
+    transport = httpx.AsyncHTTPTransport(limits=_pool_limits())
+    if cassette.is_active():
+        transport = cassette.AsyncCassetteTransport(transport)
+    return AsyncRateLimitedTransport(transport)
+
+
+def get_openai_client():
+    """
+    Возвращает общий синхронный клиент OpenAI.
+
+    Returns:
+        Экземпляр OpenAI
+    """
+    global _client
+
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=MAX_RETRIES,
+                    http_client=httpx.Client(transport=_build_transport(), timeout=OPENAI_TIMEOUT),
+                )
+                logger.info("Shared OpenAI client created")
+    return _client
+
+
+def _current_loop() -> asyncio.AbstractEventLoop:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.get_event_loop_policy().get_event_loop()
+
+
+def get_async_openai_client(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """
+    Возвращает асинхронный клиент OpenAI для event loop (используется Agents SDK).
+    
+    Соединения асинхронного пула нельзя использовать из другого event loop,
+    поэтому каждый поток со своим циклом (веб-запросы, фоновые задачи, пакеты)
+    получает отдельный клиент; ограничитель запросов у всех клиентов общий.
+
+    Args:
+        loop: Event loop (по умолчанию — цикл текущего потока)
+
+    Returns:
+        Экземпляр AsyncOpenAI
+    """
+    if loop is None:
+        loop = _current_loop()
+
+    client = _async_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(
+                    api_key=OPENAI_API_KEY,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=MAX_RETRIES,
+                    http_client=httpx.AsyncClient(transport=_build_async_transport(), timeout=OPENAI_TIMEOUT),
+                )
+                _async_clients[loop] = client
+                logger.info(f"Async OpenAI client created ({len(_async_clients)} event loops)")
+    return client
+
+
+def reset_after_fork(process_share: int = 1) -> None:
+    """
+    Сбрасывает клиенты, унаследованные от родительского процесса.
+
+    Вызывается в рабочем процессе сервера сразу после fork: соединения пула
+    родителя нельзя использовать в дочернем процессе, поэтому клиенты
+    создаются заново при первом обращении. Лимиты RPM/TPM делятся поровну
+    между process_share процессами.
+
+    Args:
+        process_share: Количество процессов, между которыми делятся лимиты
+    """
+    global _client, _async_clients, limiter
+
+    # Клиенты родителя не закрываются: их сокеты по-прежнему принадлежат родителю
+    _client = None
+    _async_clients = weakref.WeakKeyDictionary()
+    share = max(1, process_share)
+    limiter = RateLimiter(requests_per_minute=max(1, OPENAI_RPM // share) if OPENAI_RPM else 0,
+                          tokens_per_minute=max(1, OPENAI_TPM // share) if OPENAI_TPM else 0)
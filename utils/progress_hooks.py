@@ -0,0 +1,47 @@
+"""
+Хуки Agents SDK, передающие ход выполнения запуска агента во внешний обработчик.
+
+Используются фоновыми задачами (jobs/queue.py), чтобы клиент видел,
+какие инструменты вызывает мастер-агент, пока ответ еще не готов.
+"""
+
+import logging
+from typing import Dict, Any, Callable
+
+from agents import RunHooks
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class ProgressHooks(RunHooks):
+    """Хуки запуска, сообщающие о вызовах модели и инструментов."""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Инициализирует хуки.
+
+        Args:
+            callback: Функция, принимающая событие прогресса
+        """
+        self.callback = callback
+        self.model_calls = 0
+        self.tool_calls = 0
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        # Ошибка получателя событий не должна прерывать запуск агента
+        try:
+            self.callback(event)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {str(e)}")
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        self.model_calls += 1
+        self._emit({"stage": "thinking", "agent": agent.name, "step": self.model_calls})
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self.tool_calls += 1
+        self._emit({"stage": "tool_start", "tool": tool.name, "step": self.tool_calls})
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        self._emit({"stage": "tool_end", "tool": tool.name, "step": self.tool_calls})
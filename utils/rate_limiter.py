@@ -0,0 +1,220 @@
+"""
+Ограничитель частоты запросов к OpenAI API (RPM/TPM) с приоритетами.
+
+Два ведра токенов — по запросам и по токенам модели — пополняются
+непрерывно. Ожидающие вызовы выстраиваются в очередь по приоритету:
+интерактивный чат обслуживается раньше фоновых задач, а при ответе 429
+все вызывающие ждут указанное сервером время вместо повторных попыток.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+# Приоритеты запросов (меньше — важнее)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Приоритет текущего контекста выполнения (потока или задачи asyncio)
+_current_priority = contextvars.ContextVar("openai_request_priority", default=PRIORITY_INTERACTIVE)
+
+# Интервал повторной проверки очереди асинхронными ожидающими (сек)
+_ASYNC_POLL_INTERVAL = 0.05
+
+
+def current_priority() -> int:
+    """
+    Возвращает приоритет запросов текущего контекста.
+
+    Returns:
+        Значение приоритета
+    """
+    return _current_priority.get()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    Устанавливает приоритет запросов к модели для текущего контекста.
+
+    Args:
+        priority: PRIORITY_INTERACTIVE или PRIORITY_BACKGROUND
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class RateLimiter:
+    """Ограничитель запросов и токенов в минуту с очередью по приоритету."""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """
+        Инициализирует ограничитель.
+
+        Args:
+            requests_per_minute: Лимит запросов в минуту (0 — без ограничения)
+            tokens_per_minute: Лимит токенов в минуту (0 — без ограничения)
+        """
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    @property
+    def queue_length(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    def _delay(self, tokens: int, now: float) -> float:
+        """
+        Вычисляет, сколько нужно ждать до появления емкости (под блокировкой).
+        """
+        delay = max(0.0, self._blocked_until - now)
+        if self.rpm and self._requests < 1:
+            delay = max(delay, (1 - self._requests) * 60.0 / self.rpm)
+        if self.tpm and self._tokens < tokens:
+            delay = max(delay, (tokens - self._tokens) * 60.0 / self.tpm)
+        return delay
+
+    def _try_take(self, ticket, tokens: int) -> float:
+        """
+        Пытается занять емкость для билета в голове очереди (под блокировкой).
+
+        Returns:
+            0, если емкость занята, иначе рекомендуемое время ожидания
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if self._waiters[0] is not ticket:
+            return _ASYNC_POLL_INTERVAL
+        delay = self._delay(tokens, now)
+        if delay > 0:
+            return delay
+        heapq.heappop(self._waiters)
+        if self.rpm:
+            self._requests -= 1
+        if self.tpm:
+            self._tokens -= tokens
+        self._condition.notify_all()
+        return 0.0
+
+    def _enqueue(self, priority: int):
+        ticket = [priority, next(self._sequence)]
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket) -> None:
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._condition.notify_all()
+
+    def acquire(self, tokens: int = 0, priority: Optional[int] = None) -> float:
+        """
+        Блокирующе ждет емкость для одного запроса.
+
+        Args:
+            tokens: Оценка количества токенов запроса
+            priority: Приоритет (по умолчанию — приоритет текущего контекста)
+
+        Returns:
+            Время ожидания в секундах
+        """
+        if not self.enabled and time.monotonic() >= self._blocked_until:
+            return 0.0
+
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+
+        with self._condition:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    delay = self._try_take(ticket, tokens)
+                    if delay == 0:
+                        return time.monotonic() - started
+                    self._condition.wait(delay)
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+
+    async def acquire_async(self, tokens: int = 0, priority: Optional[int] = None) -> float:
+        """
+        Асинхронно ждет емкость для одного запроса, не блокируя event loop.
+
+        Args:
+            tokens: Оценка количества токенов запроса
+            priority: Приоритет (по умолчанию — приоритет текущего контекста)
+
+        Returns:
+            Время ожидания в секундах
+        """
+        if not self.enabled and time.monotonic() >= self._blocked_until:
+            return 0.0
+
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+
+        with self._condition:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._condition:
+                    delay = self._try_take(ticket, tokens)
+                if delay == 0:
+                    return time.monotonic() - started
+                await asyncio.sleep(min(delay, _ASYNC_POLL_INTERVAL))
+        except BaseException:
+            with self._condition:
+                self._dequeue(ticket)
+            raise
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """
+        Корректирует ведро токенов по фактическому расходу из ответа API.
+
+        Args:
+            estimated: Токены, списанные при acquire
+            actual: Фактическое количество токенов
+        """
+        if not self.tpm or actual == estimated:
+            return
+        with self._condition:
+            self._tokens = max(-float(self.tpm), min(float(self.tpm), self._tokens + estimated - actual))
+            self._condition.notify_all()
+
+    def block_for(self, seconds: float) -> None:
+        """
+        Приостанавливает выдачу емкости всем вызывающим (после ответа 429).
+
+        Args:
+            seconds: Длительность паузы
+        """
+        with self._condition:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
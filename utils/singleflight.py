@@ -0,0 +1,143 @@
+"""
+Объединение одинаковых одновременных вычислений (single-flight).
+
+Если вычисление с тем же ключом уже выполняется, новые вызовы ждут его
+завершения и получают тот же результат. Дополнительно результат можно
+раздавать в течение окна объединения после завершения, чтобы запросы,
+пришедшие с небольшим опозданием, тоже не запускали повторную работу.
+"""
+
+import time
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from utils import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Состояние одного вычисления."""
+
+    __slots__ = ("event", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """Группа объединяемых вычислений с общим пространством ключей."""
+
+    def __init__(self, name: str, window: float = 0.0, reusable: Optional[Callable[[Any], bool]] = None):
+        """
+        Инициализирует группу.
+
+        Args:
+            name: Имя группы (используется в метриках)
+            window: Сколько секунд после завершения раздавать готовый результат
+            reusable: Проверка, можно ли раздавать результат в окне (например, не ошибка ли это)
+        """
+        self.name = name
+        self.window = window
+        self.reusable = reusable
+        self._calls: "OrderedDict[Hashable, _Call]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """
+        Удаляет завершенные вычисления с истекшим окном (под блокировкой).
+        """
+        while self._calls:
+            key, call = next(iter(self._calls.items()))
+            if call.finished_at is None or now - call.finished_at <= self.window:
+                break
+            del self._calls[key]
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполняет func или присоединяется к уже идущему вычислению с тем же ключом.
+
+        Args:
+            key: Ключ объединения
+            func: Функция для вычисления
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат вычисления
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            call = self._calls.get(key)
+            if call is not None and call.finished_at is not None and now - call.finished_at > self.window:
+                call = None
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        metrics.record_cache(f"singleflight:{self.name}", hit=not leader)
+
+        if not leader:
+            metrics.increment("coalesced_requests")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                # Ошибки и результаты без окна не переиспользуются после завершения
+                if (call.error is not None or self.window <= 0
+                        or (self.reusable is not None and not self.reusable(call.result))):
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                else:
+                    self._calls.move_to_end(key)
+            call.event.set()
+
+
+def coalesce(name: Optional[str] = None, window: float = 0.0,
+             key: Optional[Callable[..., Hashable]] = None,
+             reusable: Optional[Callable[[Any], bool]] = None) -> Callable:
+    """
+    Декоратор, объединяющий одновременные вызовы функции с одинаковыми аргументами.
+
+    Ключи общие для всего процесса: результат получают вызовы из любых сессий.
+
+    Args:
+        name: Имя группы (по умолчанию — имя функции)
+        window: Окно переиспользования результата после завершения (сек)
+        key: Функция построения ключа из аргументов (по умолчанию — сами аргументы)
+        reusable: Проверка, можно ли раздавать результат в окне
+
+    Returns:
+        Декоратор
+    """
+    def decorator(func: Callable) -> Callable:
+        group = SingleFlight(name or func.__name__, window, reusable)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            call_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return group.do(call_key, func, *args, **kwargs)
+
+        wrapper.single_flight = group
+        return wrapper
+
+    return decorator
@@ -0,0 +1,262 @@
+"""
+Кэш результатов инструментов в пределах области (например, пакета запросов).
+
+Область задается контекстной переменной: все запуски мастер-агента внутри
+`tool_cache_scope()` (включая потоки, запущенные с копией контекста) делят
+результаты идемпотентных инструментов — например, схема базы бота
+запрашивается один раз на весь пакет. Вне области кэш не используется.
+
+В область можно заранее запустить вызов инструмента (prefetch): если модель
+затем запросит тот же вызов, она получит готовый или уже выполняющийся
+результат. Невостребованные упреждающие вызовы учитываются в метриках.
+"""
+
+import json
+import inspect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils import metrics
+from utils.singleflight import SingleFlight
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Кэш текущей области; None — вызовы не кэшируются
+_current_cache = contextvars.ContextVar("tool_result_cache", default=None)
+
+# Потоки для упреждающих вызовов инструментов (создаются при первом prefetch)
+PREFETCH_WORKERS = 4
+_prefetch_pool: Optional[ThreadPoolExecutor] = None
+_prefetch_pool_lock = threading.Lock()
+
+
+def _get_prefetch_pool() -> ThreadPoolExecutor:
+    global _prefetch_pool
+
+    if _prefetch_pool is None:
+        with _prefetch_pool_lock:
+            if _prefetch_pool is None:
+                _prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="zai-prefetch")
+    return _prefetch_pool
+
+
+# Сигнатуры функций инструментов для нормализации ключей кэша
+_signatures: Dict[Callable, Optional[inspect.Signature]] = {}
+
+
+def _signature(func: Callable) -> Optional[inspect.Signature]:
+    signature = _signatures.get(func, False)
+    if signature is False:
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = None
+        _signatures[func] = signature
+    return signature
+
+
+def cache_key(tool_name: str, args: tuple, kwargs: Dict[str, Any], func: Optional[Callable] = None) -> Hashable:
+    """
+    Строит ключ кэша вызова инструмента.
+
+    Если известна функция, аргументы связываются с ее сигнатурой и дополняются
+    значениями по умолчанию: вызов модели со строгой схемой (num_results=None)
+    и вызов без необязательного аргумента получают один ключ.
+
+    Args:
+        tool_name: Имя инструмента
+        args: Позиционные аргументы
+        kwargs: Именованные аргументы
+        func: Функция инструмента (опционально)
+
+    Returns:
+        Ключ кэша
+    """
+    signature = _signature(func) if func is not None else None
+    if signature is not None:
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            pass
+        else:
+            bound.apply_defaults()
+            args, kwargs = (), bound.arguments
+    return (tool_name, json.dumps([list(args), kwargs], ensure_ascii=False, sort_keys=True, default=str))
+
+
+class ToolResultCache:
+    """Кэш результатов инструментов одной области."""
+
+    def __init__(self, name: str = "batch"):
+        """
+        Инициализирует кэш.
+
+        Args:
+            name: Имя области (используется в метриках)
+        """
+        self.name = name
+        self._results: Dict[Hashable, Any] = {}
+        self._prefetches: Dict[Hashable, Future] = {}
+        self._prefetch_used = set()
+        self._lock = threading.Lock()
+        # Одновременные промахи по одному ключу выполняют инструмент один раз
+        self._flight = SingleFlight(f"tool_cache:{name}")
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get_or_call(self, key: Hashable, func: Callable, *args,
+                    cacheable: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        Возвращает сохраненный результат или вызывает функцию.
+
+        Args:
+            key: Ключ кэша
+            func: Функция инструмента
+            *args: Позиционные аргументы функции
+            cacheable: Проверка, можно ли сохранить результат (по умолчанию — любой)
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат вызова
+        """
+        with self._lock:
+            if key in self._results:
+                metrics.record_cache("tool_cache", hit=True)
+                return self._results[key]
+            future = self._prefetches.get(key)
+            first_use = future is not None and key not in self._prefetch_used
+            if first_use:
+                self._prefetch_used.add(key)
+
+        if future is not None:
+            if first_use:
+                metrics.record_cache("prefetch", hit=True)
+            try:
+                result = future.result()
+            except Exception as e:
+                # Упреждающий вызов не удался — выполняем инструмент обычным образом
+                logger.warning(f"Prefetch failed, calling tool directly: {str(e)}")
+            else:
+                if cacheable is None or cacheable(result):
+                    with self._lock:
+                        self._results[key] = result
+                return result
+
+        metrics.record_cache("tool_cache", hit=False)
+        result = self._flight.do(key, func, *args, **kwargs)
+        if cacheable is None or cacheable(result):
+            with self._lock:
+                self._results[key] = result
+        return result
+
+    def prefetch(self, key: Hashable, func: Callable, *args, **kwargs) -> bool:
+        """
+        Запускает вызов инструмента в фоне, не дожидаясь результата.
+
+        Args:
+            key: Ключ кэша
+            func: Функция инструмента (без обертки кэша)
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            True, если вызов запущен (False — результат уже есть или запрошен)
+        """
+        with self._lock:
+            if key in self._results or key in self._prefetches:
+                return False
+            context = contextvars.copy_context()
+            self._prefetches[key] = _get_prefetch_pool().submit(context.run, func, *args, **kwargs)
+        metrics.increment("prefetch_started")
+        return True
+
+    def close(self) -> None:
+        """
+        Учитывает упреждающие вызовы, результат которых так и не понадобился.
+        """
+        with self._lock:
+            discarded = [key for key in self._prefetches if key not in self._prefetch_used]
+        for key in discarded:
+            metrics.record_cache("prefetch", hit=False)
+            metrics.increment("prefetch_discarded")
+            logger.debug("Prefetch discarded: %s", key[0])
+
+
+@contextmanager
+def tool_cache_scope(name: str = "batch"):
+    """
+    Открывает область кэширования результатов инструментов.
+
+    Args:
+        name: Имя области
+
+    Yields:
+        Кэш области
+    """
+    cache = ToolResultCache(name)
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
+        cache.close()
+        logger.debug("Tool cache scope '%s' closed with %d cached results", name, len(cache))
+
+
+def current_cache() -> Optional[ToolResultCache]:
+    """
+    Возвращает кэш текущей области.
+
+    Returns:
+        Кэш или None вне области
+    """
+    return _current_cache.get()
+
+
+def call_cached(tool_name: str, func: Callable, args: tuple, kwargs: Dict[str, Any],
+                cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+    """
+    Вызывает инструмент через кэш текущей области, если она открыта.
+
+    Args:
+        tool_name: Имя инструмента
+        func: Функция инструмента
+        args: Позиционные аргументы
+        kwargs: Именованные аргументы
+        cacheable: Проверка, можно ли сохранить результат
+
+    Returns:
+        Результат вызова
+    """
+    cache = _current_cache.get()
+    if cache is None:
+        return func(*args, **kwargs)
+    return cache.get_or_call(cache_key(tool_name, args, kwargs, func), func, *args, cacheable=cacheable, **kwargs)
+
+
+def prefetch_tool(tool_func: Callable, **kwargs) -> bool:
+    """
+    Упреждающе запускает идемпотентный инструмент в кэше текущей области.
+
+    Ключ совпадает с вызовом инструмента моделью с теми же аргументами
+    (с учетом значений по умолчанию), поэтому такой вызов получит результат prefetch.
+
+    Args:
+        tool_func: Зарегистрированная функция инструмента
+        **kwargs: Аргументы вызова
+
+    Returns:
+        True, если вызов запущен
+    """
+    cache = _current_cache.get()
+    if cache is None or not getattr(tool_func, "idempotent", False):
+        return False
+    # Вызываем исходную функцию: обертка реестра сама обратилась бы к этому же ключу кэша
+    func = getattr(tool_func, "__wrapped__", tool_func)
+    return cache.prefetch(cache_key(tool_func.__name__, (), kwargs, func), func, **kwargs)
@@ -6,34 +6,280 @@
 
 import logging
 import json
+import time
 import uuid
 import os
+import sys
 import tempfile
 import base64
-from flask import Flask, render_template, request, jsonify, session, send_file
+import hmac
+import threading
+from flask import Flask, render_template, request, jsonify, session, g, Response
 from datetime import datetime
-from openai import OpenAI
 
-from master_agent import master_agent
-from config import PORT, HOST, DEBUG, OPENAI_API_KEY
+from master_agent import get_master_agent
+from config import (PORT, HOST, DEBUG, SECRET_KEY, JOBS_DB_PATH, JOB_WORKERS, JOB_LEASE_SECONDS,
+                    JOB_STREAM_MAX_SECONDS, ADMIN_TOKEN,
+                    RELOAD_LOG_PATH, RELOAD_CHECK_INTERVAL,
+                    COMPRESS_MIN_BYTES, STATIC_MAX_AGE)
+from jobs.queue import JobStore, JobQueue, run_master_agent_job, STATUS_DONE, STATUS_FAILED
+from utils import metrics
+from utils.logging_config import setup_logging
+from utils.openai_client import get_openai_client, reset_after_fork
+from tools.registry import get_tool_snapshot
+from web.session_store import get_session_store
+from web.reload_log import ReloadLog, merge_entries
+from web.assets import StaticAssets
+from web.compression import COMPRESSIBLE_MIMETYPES, choose_encoding, compress
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # Настройка логирования
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger("zai_web")
 
-# Создаем клиента OpenAI для работы с API
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 # Создание Flask-приложения
 app = Flask(__name__, static_folder='static', template_folder='templates')
-app.secret_key = str(uuid.uuid4())  # Для работы с сессиями
+# Ключ подписи сессий; без SECRET_KEY (только режим dev) сессии действуют до перезапуска процесса
+app.secret_key = SECRET_KEY or str(uuid.uuid4())
+
+# Статические файлы с отпечатками содержимого и заранее сжатыми вариантами
+static_assets = StaticAssets(app.static_folder)
+
+# Сжатые тела ответов со строгим ETag (снимок /api/tools): (ETag, кодировка) -> тело
+_compressed_bodies = {}
+_compressed_bodies_lock = threading.Lock()
+COMPRESSED_BODIES_CACHE_SIZE = 32
+
+# Хранилище истории чатов (сжатие, бюджет памяти и вытеснение на диск)
+chat_histories = get_session_store()
+
+# Потоки обработки запросов рабочего процесса (известны только в режиме production)
+_http_threads = None
+
+# Показатели веб-интерфейса для get_system_status
+metrics.register_gauge("chat_sessions", lambda: len(chat_histories))
+metrics.register_gauge("http_threads", lambda: _http_threads)
+
+# Очередь фоновых задач создается при первом обращении
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+# Возвращать ли в очередь прерванные задачи при запуске очереди (в многопроцессном режиме
+# это делается один раз в главном процессе до fork; задачи живых процессов с действующей
+# арендой не возвращаются)
+_requeue_jobs_on_start = True
+
+# Журнал горячих перезагрузок, общий для рабочих процессов (открывается в каждом процессе)
+_reload_log = None
+# Последняя примененная процессом запись журнала (None — еще не известна)
+_reload_version = None
+_reload_checked_at = 0.0
+_reload_sync_lock = threading.Lock()
+_reload_log_lock = threading.Lock()
+
+# Интервал проверки состояния задачи в SSE-потоке (сек)
+JOB_STREAM_POLL_INTERVAL = 0.5
+
+def _on_job_complete(job, result, error):
+    """
+    Добавляет результат фоновой задачи в историю чата ее сессии.
+    """
+    if error is not None or job["session_id"] not in chat_histories:
+        return
+    chat_histories.append(job["session_id"], [
+        {"role": "user", "content": job["query"]},
+        {"role": "assistant", "content": result}
+    ])
+
+def get_job_queue() -> JobQueue:
+    """
+    Возвращает очередь фоновых задач, запуская рабочие потоки при первом вызове.
+    """
+    global _job_queue
+    
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                queue = JobQueue(JobStore(JOBS_DB_PATH, JOB_LEASE_SECONDS), run_master_agent_job,
+                                 workers=JOB_WORKERS, on_complete=_on_job_complete)
+                queue.start(requeue_interrupted=_requeue_jobs_on_start)
+                _job_queue = queue
+    return _job_queue
+
+def _job_view(job):
+    """
+    Формирует публичное представление задачи для API.
+    """
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'response': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+
+def get_reload_log() -> ReloadLog:
+    """
+    Возвращает журнал перезагрузок текущего процесса, открывая его при первом вызове.
+    """
+    global _reload_log
+    
+    if _reload_log is None:
+        with _reload_log_lock:
+            if _reload_log is None:
+                _reload_log = ReloadLog(RELOAD_LOG_PATH)
+    return _reload_log
+
+def _sync_reloads():
+    """
+    Применяет перезагрузки, выполненные другими процессами сервера.
+    
+    Процесс, загрузивший код при запуске, уже содержит все прежние
+    перезагрузки, поэтому первый вызов только запоминает текущую версию
+    журнала. Вызывается под _reload_sync_lock.
+    """
+    global _reload_version
+    
+    log = get_reload_log()
+    latest = log.latest()
+    if _reload_version is None:
+        _reload_version = latest
+        return
+    if latest <= _reload_version:
+        return
+    
+    pending = merge_entries(log.since(_reload_version))
+    try:
+        get_master_agent().reload(pending['modules'], pending['agents'])
+        logger.info(f"Применены перезагрузки {_reload_version + 1}..{latest} из журнала")
+    except Exception as e:
+        # Повторять неудачную перезагрузку на каждом запросе бессмысленно: прежние инструменты сохранены
+        logger.error(f"Перезагрузки {_reload_version + 1}..{latest} из журнала не применены: {str(e)}")
+        metrics.increment("reload_sync_failures")
+    _reload_version = latest
 
-# Хранилище истории чатов
-chat_histories = {}
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-# Настройки голосовых ответов для пользователей
-voice_responses_enabled = {}  # Словарь для хранения настроек пользователей
+@app.before_request
+def track_request_start():
+    """
+    Учитывает начало обработки HTTP-запроса.
+    """
+    metrics.in_flight_started("http")
+    g.tracked_in_flight = True
+
+@app.teardown_request
+def track_request_end(exc):
+    """
+    Учитывает завершение обработки HTTP-запроса.
+    """
+    if g.pop('tracked_in_flight', False):
+        metrics.in_flight_finished("http")
+
+@app.before_request
+def apply_pending_reloads():
+    """
+    Применяет перезагрузки инструментов, выполненные в других рабочих процессах.
+    
+    Журнал проверяется не чаще раза в RELOAD_CHECK_INTERVAL секунд.
+    """
+    global _reload_checked_at
+    
+    now = time.monotonic()
+    if now - _reload_checked_at < RELOAD_CHECK_INTERVAL:
+        return
+    with _reload_sync_lock:
+        if now - _reload_checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        _reload_checked_at = now
+        _sync_reloads()
+
+@app.after_request
+def compress_response(response):
+    """
+    Сжимает ответ gzip/brotli, если клиент это поддерживает и ответ достаточно велик.
+    
+    Потоковые ответы (SSE) и уже сжатые ответы не изменяются. Строгий
+    ETag сжатого ответа становится слабым: тело отличается байтами, но
+    не содержанием, и If-None-Match по-прежнему совпадает.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    
+    etag, weak = response.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    compressed = _compressed_bodies.get(key) if key is not None else None
+    if compressed is None:
+        compressed = compress(data, encoding)
+        if key is not None:
+            with _compressed_bodies_lock:
+                if len(_compressed_bodies) >= COMPRESSED_BODIES_CACHE_SIZE:
+                    _compressed_bodies.pop(next(iter(_compressed_bodies)))
+                _compressed_bodies[key] = compressed
+    if len(compressed) >= len(data):
+        return response
+    
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+    metrics.increment("http_compressed_responses")
+    metrics.increment("http_compression_saved_bytes", len(data) - len(compressed))
+    return response
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """
+    Подставляет в ссылки на статические файлы имена с отпечатком содержимого.
+    """
+    if endpoint == 'static' and 'filename' in values:
+        if DEBUG:
+            static_assets.refresh()
+        values['filename'] = static_assets.url_path(values['filename'])
+
+def serve_static(filename):
+    """
+    Отдает статический файл в заранее сжатом варианте.
+    
+    Адреса с актуальным отпечатком кэшируются браузером на STATIC_MAX_AGE;
+    исходные имена и устаревшие отпечатки перепроверяются по ETag.
+    """
+    asset = static_assets.lookup(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+    
+    encodings = tuple(encoding for encoding in asset.variants if encoding != 'identity')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), encodings)
+    response = Response(asset.variants[encoding or 'identity'], mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(f"{asset.digest}-{encoding}" if encoding else asset.digest)
+    if filename == asset.url_path:
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Встроенный обработчик static заменяется: ссылки url_for('static', ...) остаются прежними
+app.view_functions['static'] = serve_static
 
 @app.route('/')
 def index():
@@ -43,8 +289,7 @@ def index():
     # Создаем уникальный ID сессии, если его нет
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
-        chat_histories[session['session_id']] = []
-        voice_responses_enabled[session['session_id']] = False
+        chat_histories.create(session['session_id'])
     
     return render_template('index.html')
 
@@ -63,14 +308,13 @@ def chat():
     session_id = session.get('session_id')
     if not session_id or session_id not in chat_histories:
         session['session_id'] = str(uuid.uuid4())
-        chat_histories[session['session_id']] = []
-        voice_responses_enabled[session['session_id']] = False
+        chat_histories.create(session['session_id'])
     
-    history = chat_histories[session['session_id']]
+    history = chat_histories.get_history(session['session_id'])
     
     try:
         # Обрабатываем запрос
-        response = master_agent.process_query(query, history)
+        response = get_master_agent().process_query(query, history)
         
         result = {
             'response': response,
@@ -78,9 +322,9 @@ def chat():
         }
         
         # Проверяем, нужно ли создавать голосовой ответ
-        if voice_responses_enabled.get(session_id, False):
+        if session.get('voice_responses', False):
             try:
-                audio_response = openai_client.audio.speech.create(
+                audio_response = get_openai_client().audio.speech.create(
                     model="tts-1",
                     voice="alloy",
                     input=response
@@ -105,16 +349,11 @@ def chat():
                 logger.error(f"Error generating speech: {str(e)}")
                 # Продолжаем без аудио в случае ошибки
         
-        # Добавляем сообщения в историю
-        history.append({"role": "user", "content": query})
-        history.append({"role": "assistant", "content": response})
-        
-        # Ограничиваем историю до 50 сообщений
-        if len(history) > 50:
-            history = history[-50:]
-        
-        # Сохраняем обновленную историю
-        chat_histories[session['session_id']] = history
+        # Добавляем сообщения в историю (хранилище само ограничивает ее длину и объем)
+        chat_histories.append(session['session_id'], [
+            {"role": "user", "content": query},
+            {"role": "assistant", "content": response}
+        ])
         
         return jsonify(result)
     
@@ -125,6 +364,80 @@ def chat():
             'response': "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз."
         }), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    API-эндпоинт для постановки долгого запроса к мастер-агенту в фоновую очередь.
+    """
+    data = request.json
+    query = data.get('message', '')
+    
+    if not query:
+        return jsonify({'error': 'Сообщение не может быть пустым'}), 400
+    
+    session_id = session.get('session_id')
+    if not session_id or session_id not in chat_histories:
+        session['session_id'] = str(uuid.uuid4())
+        chat_histories.create(session['session_id'])
+    
+    session_id = session['session_id']
+    job_id = get_job_queue().submit(query, chat_histories.get_history(session_id), session_id)
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    API-эндпоинт для получения состояния фоновой задачи.
+    
+    С параметром ?stream=1 (или Accept: text/event-stream) возвращает
+    SSE-поток событий progress, завершающийся событием done или failed,
+    либо событием timeout через JOB_STREAM_MAX_SECONDS (дальше клиент опрашивает).
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None or job['session_id'] != session.get('session_id'):
+        return jsonify({'error': 'Задача не найдена'}), 404
+    
+    stream = request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+    if not stream:
+        return jsonify(_job_view(job))
+    
+    def generate():
+        # Поток занимает рабочий поток сервера, поэтому его длительность ограничена:
+        # по событию timeout браузер продолжает опрашивать состояние задачи
+        deadline = time.monotonic() + JOB_STREAM_MAX_SECONDS
+        sent = 0
+        current = job
+        while True:
+            for event in current['progress'][sent:]:
+                yield _sse('progress', event)
+            sent = len(current['progress'])
+            
+            if current['status'] == STATUS_DONE:
+                yield _sse('done', {'response': current['result'], 'timestamp': datetime.now().isoformat()})
+                return
+            if current['status'] == STATUS_FAILED:
+                yield _sse('failed', {'error': current['error']})
+                return
+            if time.monotonic() >= deadline:
+                yield _sse('timeout', {'status': current['status']})
+                return
+            
+            time.sleep(JOB_STREAM_POLL_INTERVAL)
+            current = queue.get(job_id)
+            if current is None:
+                # Задача удалена во время потока
+                yield _sse('failed', {'error': 'Задача не найдена'})
+                return
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/voice-chat', methods=['POST'])
 def voice_chat():
     """
@@ -138,7 +451,7 @@ def voice_chat():
     
     # Получаем информацию о формате файла
     content_type = audio_file.content_type or 'audio/webm'
-    logger.info(f"Получен аудиофайл типа: {content_type}")
+    logger.debug("Получен аудиофайл типа: %s", content_type)
     
     # Сохраняем временный файл сначала с временным расширением
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.tmp')
@@ -148,7 +461,7 @@ def voice_chat():
     try:
         # Проверяем размер файла
         file_size = os.path.getsize(temp_file.name)
-        logger.info(f"Размер аудиофайла: {file_size} байт")
+        logger.debug("Размер аудиофайла: %d байт", file_size)
         
         if file_size == 0:
             os.unlink(temp_file.name)
@@ -157,13 +470,13 @@ def voice_chat():
         # Выводим информацию о заголовках файла (первые 20 байт)
         with open(temp_file.name, 'rb') as f:
             header_bytes = f.read(20)
-            logger.info(f"Заголовок файла (hex): {header_bytes.hex()}")
+            logger.debug("Заголовок файла (hex): %s", header_bytes.hex())
         
         # Определяем тип файла системой
         import subprocess
         try:
             file_type = subprocess.check_output(['file', '-b', '--mime-type', temp_file.name]).decode('utf-8').strip()
-            logger.info(f"Определенный системой тип файла: {file_type}")
+            logger.debug("Определенный системой тип файла: %s", file_type)
             
             # Выбираем правильное расширение на основе определенного типа
             correct_ext = '.tmp'  # По умолчанию
@@ -182,15 +495,15 @@ def voice_chat():
             correct_temp_file = temp_file.name.replace('.tmp', correct_ext)
             os.rename(temp_file.name, correct_temp_file)
             temp_file_name = correct_temp_file
-            logger.info(f"Файл сохранен с расширением: {correct_ext}")
+            logger.debug("Файл сохранен с расширением: %s", correct_ext)
         except Exception as e:
-            logger.info(f"Не удалось определить тип файла: {str(e)}")
+            logger.info("Не удалось определить тип файла: %s", e)
             temp_file_name = temp_file.name
         
         # Транскрибируем аудио в текст
         with open(temp_file_name, 'rb') as audio:
             try:
-                transcript = openai_client.audio.transcriptions.create(
+                transcript = get_openai_client().audio.transcriptions.create(
                     file=audio,
                     model="whisper-1"
                 )
@@ -200,7 +513,7 @@ def voice_chat():
                 # Пробуем указать формат файла явно
                 try:
                     with open(temp_file_name, 'rb') as audio:
-                        transcript = openai_client.audio.transcriptions.create(
+                        transcript = get_openai_client().audio.transcriptions.create(
                             file=audio,
                             model="whisper-1",
                             response_format="text"
@@ -211,19 +524,18 @@ def voice_chat():
                     raise e2
         
         query = transcript.text
-        logger.info(f"Транскрибированный текст: {query}")
+        logger.debug("Транскрибированный текст: %s", query)
         
         # Получаем историю чата для этой сессии
         session_id = session.get('session_id')
         if not session_id or session_id not in chat_histories:
             session['session_id'] = str(uuid.uuid4())
-            chat_histories[session['session_id']] = []
-            voice_responses_enabled[session['session_id']] = False
-        
-        history = chat_histories[session['session_id']]
+            chat_histories.create(session['session_id'])
+            
+        history = chat_histories.get_history(session['session_id'])
         
         # Обрабатываем запрос через мастер-агента
-        response_text = master_agent.process_query(query, history)
+        response_text = get_master_agent().process_query(query, history)
         
         result = {
             'text': query,
@@ -232,8 +544,8 @@ def voice_chat():
         }
         
         # Проверяем, нужно ли создавать голосовой ответ
-        if voice_responses_enabled.get(session_id, False):
-            audio_response = openai_client.audio.speech.create(
+        if session.get('voice_responses', False):
+            audio_response = get_openai_client().audio.speech.create(
                 model="tts-1",
                 voice="alloy",
                 input=response_text
@@ -255,16 +567,11 @@ def voice_chat():
             # Удаляем временный файл
             os.unlink(audio_temp.name)
         
-        # Добавляем сообщения в историю
-        history.append({"role": "user", "content": query})
-        history.append({"role": "assistant", "content": response_text})
-        
-        # Ограничиваем историю до 50 сообщений
-        if len(history) > 50:
-            history = history[-50:]
-        
-        # Сохраняем обновленную историю
-        chat_histories[session['session_id']] = history
+        # Добавляем сообщения в историю (хранилище само ограничивает ее длину и объем)
+        chat_histories.append(session['session_id'], [
+            {"role": "user", "content": query},
+            {"role": "assistant", "content": response_text}
+        ])
         
         # Удаляем временный файл
         if os.path.exists(temp_file_name):
@@ -293,12 +600,8 @@ def toggle_voice_response():
     data = request.json
     enabled = data.get('enabled', False)
     
-    session_id = session.get('session_id')
-    if not session_id:
-        session['session_id'] = str(uuid.uuid4())
-        session_id = session['session_id']
-    
-    voice_responses_enabled[session_id] = enabled
+    # Настройка хранится в подписанной cookie сессии, поэтому действует во всех рабочих процессах
+    session['voice_responses'] = bool(enabled)
     
     return jsonify({
         'status': 'success', 
@@ -312,7 +615,7 @@ def clear_history():
     """
     session_id = session.get('session_id')
     if session_id and session_id in chat_histories:
-        chat_histories[session_id] = []
+        chat_histories.create(session_id)
     
     return jsonify({'status': 'success', 'message': 'История чата очищена'})
 
@@ -320,13 +623,145 @@ def clear_history():
 def get_tools():
     """
     API-эндпоинт для получения списка доступных инструментов.
+    
+    Отдает готовый JSON снимка реестра с ETag; при совпадении
+    If-None-Match возвращает 304 без тела.
+    """
+    get_master_agent()  # Регистрирует инструменты всех модулей
+    snapshot = get_tool_snapshot()
+    response = Response(snapshot.json_blob, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def _is_admin_request() -> bool:
+    """
+    Проверяет доступ к административным эндпоинтам.
+    
+    Без ADMIN_TOKEN доступ закрыт для всех: за локальным обратным прокси
+    любой клиент выглядел бы как loopback.
+    """
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_tools():
+    """
+    API-эндпоинт для перезагрузки модулей инструментов и агентов без перезапуска сервера.
+    
+    Перезагрузка выполняется в процессе, обработавшем запрос, и записывается
+    в журнал перезагрузок; остальные рабочие процессы применяют ее перед
+    обработкой следующего запроса (не позднее RELOAD_CHECK_INTERVAL после него).
+    Фоновые задачи процесса получают новый код вместе с его HTTP-запросами.
+    
+    Тело запроса (необязательно): {"modules": [...], "agents": [...]}.
+    """
+    global _reload_version
+    
+    if not _is_admin_request():
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    modules, agents = data.get('modules') or None, data.get('agents') or None
+    with _reload_sync_lock:
+        # Сначала догоняем перезагрузки других процессов, чтобы не отметить их примененными
+        _sync_reloads()
+        try:
+            result = get_master_agent().reload(modules, agents)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Ошибка при перезагрузке инструментов: {str(e)}")
+            return jsonify({'error': f'Перезагрузка не выполнена, прежние инструменты сохранены: {str(e)}'}), 500
+        
+        version = get_reload_log().publish(modules, agents)
+        # Запись другого процесса, сделанная между догоном и публикацией, применится при следующей проверке
+        if version == _reload_version + 1:
+            _reload_version = version
+    
+    return jsonify({'status': 'success', 'version': version, **result})
+
+def _process_rss_bytes():
+    """
+    Возвращает текущий резидентный размер процесса (на Linux) или пиковый.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return None
+        # ru_maxrss: килобайты на Linux, байты на macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+@app.route('/api/debug/memory', methods=['GET'])
+def debug_memory():
+    """
+    API-эндпоинт с отчетом о памяти, занятой историями чатов.
+    """
+    if not _is_admin_request():
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    report = chat_histories.memory_report(request.args.get('top', 10, type=int))
+    report['process_rss_bytes'] = _process_rss_bytes()
+    return jsonify(report)
+
+def preload():
+    """
+    Готовит приложение в главном процессе многопроцессного сервера до fork.
+    
+    Реестр инструментов, агенты и снимок инструментов строятся один раз
+    и достаются рабочим процессам через copy-on-write; прерванные фоновые
+    задачи возвращаются в очередь здесь, а не в каждом рабочем процессе.
+    
+    Returns:
+        Сводка: количество инструментов и возвращенных в очередь задач
+    """
+    global _requeue_jobs_on_start, _reload_log
+    
+    get_master_agent()
+    snapshot = get_tool_snapshot()
+    # Код загружен только что: рабочие процессы наследуют текущую версию журнала перезагрузок
+    with _reload_sync_lock:
+        _sync_reloads()
+        _reload_log.close()
+        _reload_log = None
+    requeued = JobStore(JOBS_DB_PATH, JOB_LEASE_SECONDS).requeue_interrupted()
+    _requeue_jobs_on_start = False
+    return {'tools': len(snapshot.tools), 'requeued_jobs': requeued}
+
+def after_fork(workers, threads=None):
+    """
+    Переоткрывает ресурсы процесса в рабочем процессе сразу после fork.
+    
+    Args:
+        workers: Количество рабочих процессов сервера
+        threads: Потоки обработки запросов рабочего процесса
+    """
+    global _reload_log, _http_threads
+    
+    _http_threads = threads
+    
+    # Соединение SQLite не переживает fork: журнал перезагрузок открывается заново
+    _reload_log = None
+    chat_histories.reopen(shared=workers > 1)
+    reset_after_fork(workers)
+
+def shutdown(timeout=None):
+    """
+    Останавливает фоновые задачи процесса перед его завершением.
+    
+    Args:
+        timeout: Максимальное время ожидания текущих задач (сек)
     """
-    tools = master_agent.get_registered_tools_info()
-    return jsonify({'tools': tools, 'count': len(tools)})
+    if _job_queue is not None:
+        _job_queue.stop(timeout)
 
 def run_server():
     """
-    Запускает веб-сервер.
+    Запускает веб-сервер разработки Flask.
     """
     app.run(host=HOST, port=PORT, debug=DEBUG)
 
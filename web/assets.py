@@ -0,0 +1,137 @@
+"""
+Статические файлы веб-интерфейса с отпечатками содержимого.
+
+При запуске для каждого файла из каталога static вычисляется хэш
+содержимого и готовятся сжатые варианты (gzip и, если доступен, brotli).
+Шаблоны ссылаются на файлы через url_for('static', ...), и ссылка
+получает имя с отпечатком (css/style.3f2a9c1b7d4e.css). Такие адреса
+неизменяемы и кэшируются браузером на год; после изменения файла меняется
+и адрес. Запросы по исходному имени по-прежнему обслуживаются, но с
+обязательной перепроверкой по ETag.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import mimetypes
+import threading
+from typing import Dict, Optional, NamedTuple
+
+from web.compression import ENCODINGS, COMPRESSIBLE_MIMETYPES, compress
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Длина отпечатка в имени файла (символов hex)
+FINGERPRINT_LENGTH = 12
+
+# Сжатые варианты меньше этого размера не хранятся
+_MIN_COMPRESS_BYTES = 256
+
+_FINGERPRINTED_RE = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<suffix>\.[^./]+)$" % FINGERPRINT_LENGTH)
+
+
+class StaticAsset(NamedTuple):
+    """Статический файл с отпечатком и сжатыми вариантами."""
+
+    path: str                       # Путь относительно каталога static
+    url_path: str                   # Путь с отпечатком
+    digest: str
+    mimetype: str
+    mtime: float
+    variants: Dict[str, bytes]      # Кодировка ("identity", "gzip", "br") -> содержимое
+
+
+class StaticAssets:
+    """Реестр статических файлов с отпечатками и предварительно сжатыми вариантами."""
+
+    def __init__(self, static_dir: str):
+        """
+        Инициализирует реестр и обрабатывает все файлы каталога.
+
+        Args:
+            static_dir: Каталог статических файлов
+        """
+        self.static_dir = static_dir
+        self._by_path: Dict[str, StaticAsset] = {}
+        self._by_url: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _load(self, path: str, mtime: float) -> StaticAsset:
+        with open(os.path.join(self.static_dir, path), "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+        stem, suffix = os.path.splitext(path)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        variants = {"identity": data}
+        if mimetype in COMPRESSIBLE_MIMETYPES and len(data) >= _MIN_COMPRESS_BYTES:
+            for encoding in ENCODINGS:
+                # Статика сжимается один раз, поэтому используется максимальный уровень
+                compressed = compress(data, encoding, level=9)
+                if len(compressed) < len(data):
+                    variants[encoding] = compressed
+        return StaticAsset(path, f"{stem}.{digest}{suffix}", digest, mimetype, mtime, variants)
+
+    def refresh(self) -> int:
+        """
+        Перечитывает новые и измененные файлы каталога.
+
+        Returns:
+            Количество перечитанных файлов
+        """
+        with self._lock:
+            found = {}
+            for root, _, files in os.walk(self.static_dir):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    found[os.path.relpath(full_path, self.static_dir).replace(os.sep, "/")] = os.path.getmtime(full_path)
+
+            loaded = 0
+            by_path = {}
+            for path, mtime in found.items():
+                asset = self._by_path.get(path)
+                if asset is None or asset.mtime != mtime:
+                    asset = self._load(path, mtime)
+                    loaded += 1
+                by_path[path] = asset
+            self._by_path = by_path
+            self._by_url = {asset.url_path: asset for asset in by_path.values()}
+
+        if loaded:
+            sizes = sum(len(asset.variants["identity"]) for asset in by_path.values())
+            logger.info(f"Static assets prepared: {loaded} loaded, {len(by_path)} total, {sizes} bytes")
+        return loaded
+
+    def url_path(self, path: str) -> str:
+        """
+        Возвращает путь файла с отпечатком (неизвестные файлы — без изменений).
+
+        Args:
+            path: Путь относительно каталога static
+
+        Returns:
+            Путь для ссылки в шаблоне
+        """
+        asset = self._by_path.get(path)
+        return asset.url_path if asset is not None else path
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        """
+        Находит файл по пути с отпечатком или по исходному пути.
+
+        Args:
+            path: Путь из URL
+
+        Returns:
+            Файл или None; признак отпечатка — совпадение url_path с запрошенным путем
+        """
+        asset = self._by_url.get(path)
+        if asset is not None:
+            return asset
+        match = _FINGERPRINTED_RE.match(path)
+        if match is not None:
+            # Устаревший отпечаток: отдается текущая версия, но без долгого кэширования
+            return self._by_path.get(f"{match.group('stem')}{match.group('suffix')}")
+        return self._by_path.get(path)
@@ -0,0 +1,85 @@
+"""
+Сжатие HTTP-ответов веб-интерфейса.
+
+Поддерживаются gzip и brotli (если установлен пакет brotli). Кодировка
+выбирается по заголовку Accept-Encoding с учетом q-значений; при равном
+предпочтении клиента brotli выбирается раньше gzip.
+"""
+
+import gzip
+import logging
+from typing import Optional, Tuple
+
+from config import COMPRESS_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Поддерживаемые кодировки в порядке предпочтения сервера
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_MIMETYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+    "image/svg+xml",
+})
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """
+    Выбирает кодировку ответа по заголовку Accept-Encoding.
+
+    Args:
+        accept_encoding: Значение заголовка Accept-Encoding
+        available: Кодировки, которые может отдать сервер
+
+    Returns:
+        Выбранная кодировка или None (ответ без сжатия)
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        weights[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = COMPRESS_LEVEL) -> bytes:
+    """
+    Сжимает данные выбранной кодировкой.
+
+    Args:
+        data: Исходные данные
+        encoding: "br" или "gzip"
+        level: Уровень сжатия gzip (1-9); для brotli пересчитывается в quality 0-11
+
+    Returns:
+        Сжатые данные
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=min(11, round(level * 11 / 9)))
+    # mtime=0: одинаковые данные дают одинаковые байты (стабильные ETag и кэши)
+    return gzip.compress(data, compresslevel=level, mtime=0)
@@ -0,0 +1,136 @@
+"""
+Журнал горячих перезагрузок инструментов для многопроцессного сервера.
+
+Перезагрузка модулей (POST /api/admin/reload) меняет код только в процессе,
+обработавшем запрос. Чтобы ее получили все рабочие процессы, она записывается
+в общий SQLite-журнал с возрастающим номером версии; каждый процесс помнит
+номер последней примененной записи и перед обработкой запроса применяет
+новые (см. web/app.py, apply_pending_reloads).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько последних записей хранить; процесс, отставший сильнее, перезагружает все модули
+RETAINED_ENTRIES = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reloads (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    modules TEXT,                -- JSON-список модулей или NULL (все модули)
+    agents TEXT,                 -- JSON-список агентов или NULL (все агенты)
+    pid INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class ReloadLog:
+    """Журнал перезагрузок в SQLite, общий для процессов сервера."""
+
+    def __init__(self, path: str):
+        """
+        Открывает (и при необходимости создает) журнал.
+
+        Args:
+            path: Путь к файлу SQLite
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def publish(self, modules: Optional[List[str]], agents: Optional[List[str]]) -> int:
+        """
+        Записывает выполненную перезагрузку.
+
+        Args:
+            modules: Перезагруженные модули (None — все)
+            agents: Перерегистрированные агенты (None — все)
+
+        Returns:
+            Номер версии записи
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO reloads (modules, agents, pid, created_at) VALUES (?, ?, ?, ?)",
+                (json.dumps(modules) if modules is not None else None,
+                 json.dumps(agents) if agents is not None else None, os.getpid(), time.time())
+            )
+            version = cursor.lastrowid
+            self._conn.execute("DELETE FROM reloads WHERE version <= ?", (version - RETAINED_ENTRIES,))
+        return version
+
+    def latest(self) -> int:
+        """
+        Возвращает номер последней записи.
+
+        Returns:
+            Номер версии (0, если перезагрузок не было)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(version) FROM reloads").fetchone()
+        return row[0] or 0
+
+    def since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Возвращает записи новее указанной версии.
+
+        Args:
+            version: Последняя примененная версия
+
+        Returns:
+            Записи по возрастанию версии или None, если часть из них уже удалена
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, modules, agents FROM reloads WHERE version > ? ORDER BY version", (version,)
+            ).fetchall()
+        if rows and rows[0]["version"] != version + 1:
+            return None
+        return [{
+            "version": row["version"],
+            "modules": json.loads(row["modules"]) if row["modules"] is not None else None,
+            "agents": json.loads(row["agents"]) if row["agents"] is not None else None,
+        } for row in rows]
+
+    def close(self) -> None:
+        """
+        Закрывает соединение с базой.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+def merge_entries(entries: Optional[List[Dict[str, Any]]]) -> Dict[str, Optional[List[str]]]:
+    """
+    Объединяет несколько записей журнала в одну перезагрузку.
+
+    Args:
+        entries: Записи журнала (None — журнал неполон)
+
+    Returns:
+        Словарь modules/agents для MasterAgent.reload (None — все)
+    """
+    if entries is None:
+        return {"modules": None, "agents": None}
+    merged: Dict[str, Optional[List[str]]] = {}
+    for field in ("modules", "agents"):
+        values = [entry[field] for entry in entries]
+        if any(value is None for value in values):
+            merged[field] = None
+        else:
+            merged[field] = sorted({name for value in values for name in value})
+    return merged
@@ -0,0 +1,438 @@
+"""
+Хранилище историй чатов веб-интерфейса с учетом занимаемой памяти.
+
+История сессии хранится компактно: последние сообщения — объектами со
+__slots__ и интернированными ролями, более старые — сжатыми (zstd, если
+установлен пакет zstandard, иначе zlib). Для каждой сессии и для всех
+сессий вместе заданы бюджеты в байтах: при превышении бюджета сессии
+сжимаются и ее последние сообщения, а затем отбрасываются самые старые;
+при превышении общего бюджета давно не использованные сессии
+вытесняются на диск (SQLite) и загружаются обратно при следующем запросе.
+
+Когда запросы обслуживают несколько процессов (SERVER_MODE=production),
+хранилище работает в общем режиме: каждое изменение сразу записывается
+в SQLite, а копия в памяти используется, пока запись на диске не новее ее.
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+from config import (SESSION_STORE_PATH, SESSION_MAX_MESSAGES, SESSION_RECENT_MESSAGES,
+                    SESSION_MAX_BYTES, SESSION_MEMORY_BUDGET, SESSION_DISK_TTL)
+from utils import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Коды ролей в сжатом представлении
+_ROLES = ("user", "assistant", "system", "tool")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+# Тексты короче этого порога хранятся без сжатия
+_MIN_COMPRESS_BYTES = 128
+
+# Заголовок сжатого сообщения: код роли, кодек, длина данных
+_HEADER = struct.Struct("<BcI")
+
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=6)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def _compress(text: str) -> Tuple[bytes, bytes]:
+    data = text.encode("utf-8")
+    if len(data) < _MIN_COMPRESS_BYTES:
+        return b"r", data
+    if zstandard is not None:
+        return b"s", _zstd_compressor.compress(data)
+    return b"d", zlib.compress(data, 6)
+
+
+def _decompress(codec: bytes, data: bytes) -> str:
+    if codec == b"s":
+        if zstandard is None:
+            raise RuntimeError("История сжата zstd, но пакет zstandard не установлен")
+        data = _zstd_decompressor.decompress(data)
+    elif codec == b"d":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+class Message:
+    """Несжатое сообщение истории."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
+
+
+class PackedMessage:
+    """Сжатое сообщение истории."""
+
+    __slots__ = ("role", "codec", "data", "raw_size")
+
+    def __init__(self, message: Message):
+        self.role = message.role
+        self.codec, self.data = _compress(message.content)
+        self.raw_size = message.nbytes()
+
+    def unpack(self) -> Message:
+        return Message(self.role, _decompress(self.codec, self.data))
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.data)
+
+
+class SessionHistory:
+    """История одной сессии: сжатая старая часть и несжатые последние сообщения."""
+
+    __slots__ = ("packed", "recent", "nbytes", "raw_bytes", "last_access", "synced_at")
+
+    def __init__(self):
+        self.packed: List[PackedMessage] = []
+        self.recent: List[Message] = []
+        self.nbytes = sys.getsizeof(self)
+        self.raw_bytes = 0
+        self.last_access = time.time()
+        # Время записи на диске, с которой совпадает копия в памяти (общий режим)
+        self.synced_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.packed) + len(self.recent)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Возвращает историю в виде списка словарей role/content.
+        """
+        unpacked = [item.unpack() for item in self.packed] + self.recent
+        return [{"role": item.role, "content": item.content} for item in unpacked]
+
+    def append(self, role: str, content: str) -> None:
+        message = Message(role, content)
+        self.recent.append(message)
+        self.nbytes += message.nbytes()
+        self.raw_bytes += message.nbytes()
+
+    def pack(self, keep_recent: int) -> None:
+        """
+        Сжимает сообщения, кроме последних keep_recent.
+        """
+        while len(self.recent) > keep_recent:
+            message = self.recent.pop(0)
+            packed = PackedMessage(message)
+            self.packed.append(packed)
+            self.nbytes += packed.nbytes() - message.nbytes()
+
+    def trim(self, max_messages: int) -> None:
+        """
+        Отбрасывает самые старые сообщения сверх max_messages.
+        """
+        while len(self) > max_messages:
+            if self.packed:
+                item = self.packed.pop(0)
+                self.raw_bytes -= item.raw_size
+            else:
+                item = self.recent.pop(0)
+                self.raw_bytes -= item.nbytes()
+            self.nbytes -= item.nbytes()
+
+    def serialize(self) -> bytes:
+        """
+        Упаковывает историю для дискового уровня.
+        """
+        chunks = []
+        for item in self.packed + [PackedMessage(message) for message in self.recent]:
+            chunks.append(_HEADER.pack(_ROLE_CODES.get(item.role, 0), item.codec, len(item.data)))
+            chunks.append(item.data)
+        return b"".join(chunks)
+
+    @classmethod
+    def deserialize(cls, blob: bytes, keep_recent: int) -> "SessionHistory":
+        history = cls()
+        offset = 0
+        while offset < len(blob):
+            role_code, codec, size = _HEADER.unpack_from(blob, offset)
+            offset += _HEADER.size
+            history.append(_ROLES[role_code], _decompress(codec, blob[offset:offset + size]))
+            offset += size
+        history.pack(keep_recent)
+        return history
+
+
+class SessionStore:
+    """
+    Истории чатов всех сессий с бюджетами памяти и дисковым уровнем.
+
+    Сессии в памяти упорядочены по последнему обращению (LRU).
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, max_messages: int = SESSION_MAX_MESSAGES,
+                 recent_messages: int = SESSION_RECENT_MESSAGES, session_budget: int = SESSION_MAX_BYTES,
+                 memory_budget: int = SESSION_MEMORY_BUDGET, disk_ttl: float = SESSION_DISK_TTL,
+                 shared: bool = False):
+        """
+        Инициализирует хранилище.
+
+        Args:
+            path: Файл SQLite дискового уровня
+            max_messages: Максимум сообщений в истории сессии
+            recent_messages: Число последних сообщений, хранимых без сжатия
+            session_budget: Бюджет памяти одной сессии (байт)
+            memory_budget: Бюджет памяти всех сессий (байт)
+            disk_ttl: Срок хранения вытесненных сессий на диске (сек)
+            shared: Общий режим для нескольких процессов (запись каждого изменения на диск)
+        """
+        self.max_messages = max_messages
+        self.recent_messages = recent_messages
+        self.session_budget = session_budget
+        self.memory_budget = memory_budget
+        self.disk_ttl = disk_ttl
+        self.path = path
+        self.shared = shared
+        self._sessions: "OrderedDict[str, SessionHistory]" = OrderedDict()
+        self._nbytes = 0
+        self._evictions = 0
+        self._restores = 0
+        self._lock = threading.RLock()
+        self._inherited: List[sqlite3.Connection] = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            updated_at REAL NOT NULL)""")
+        self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - disk_ttl,))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def reopen(self, shared: Optional[bool] = None) -> None:
+        """
+        Открывает новое соединение с базой в дочернем процессе после fork.
+
+        Args:
+            shared: Включить или выключить общий режим (None — оставить как есть)
+        """
+        with self._lock:
+            # Соединение родителя не закрывается: его состояние принадлежит родительскому процессу
+            self._inherited.append(self._conn)
+            self._conn = self._connect()
+            if shared is not None:
+                self.shared = shared
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        if session_id in self._sessions:
+            return True
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?",
+                                      (session_id,)).fetchone() is not None
+
+    def _get(self, session_id: str, create: bool = False) -> Optional[SessionHistory]:
+        """
+        Возвращает историю сессии из памяти или с диска (вызывается под блокировкой).
+        """
+        history = self._sessions.get(session_id)
+        if history is not None and self.shared:
+            # Копия в памяти устарела, если сессию изменил или очистил другой процесс
+            row = self._conn.execute("SELECT updated_at FROM sessions WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+            if row is None or row[0] > history.synced_at:
+                del self._sessions[session_id]
+                self._nbytes -= history.nbytes
+                history = None
+        if history is None:
+            row = self._conn.execute("SELECT data, updated_at FROM sessions WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+            if row is not None:
+                history = SessionHistory.deserialize(row[0], self.recent_messages)
+                if self.shared:
+                    history.synced_at = row[1]
+                else:
+                    self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._restores += 1
+                metrics.increment("session_restores")
+            elif create:
+                history = SessionHistory()
+            else:
+                return None
+            self._sessions[session_id] = history
+            self._nbytes += history.nbytes
+        self._sessions.move_to_end(session_id)
+        history.last_access = time.time()
+        return history
+
+    def create(self, session_id: str) -> None:
+        """
+        Создает пустую историю сессии (существующая очищается).
+        """
+        self.clear(session_id)
+        with self._lock:
+            history = self._get(session_id, create=True)
+            if self.shared:
+                self._write(session_id, history)
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Возвращает историю сессии (пустой список для неизвестной сессии).
+
+        Args:
+            session_id: Идентификатор сессии
+
+        Returns:
+            Список сообщений role/content
+        """
+        with self._lock:
+            history = self._get(session_id)
+            return history.messages() if history is not None else []
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        """
+        Добавляет сообщения в историю сессии и соблюдает бюджеты памяти.
+
+        Args:
+            session_id: Идентификатор сессии
+            messages: Сообщения role/content
+        """
+        with self._lock:
+            history = self._get(session_id, create=True)
+            before = history.nbytes
+            for message in messages:
+                history.append(message["role"], message["content"])
+            history.trim(self.max_messages)
+            history.pack(self.recent_messages)
+
+            # Бюджет сессии: сжимается все, кроме последнего обмена, затем отбрасываются старые сообщения
+            if history.nbytes > self.session_budget:
+                history.pack(min(2, self.recent_messages))
+                while history.nbytes > self.session_budget and len(history) > 2:
+                    history.trim(len(history) - 1)
+                # Последний обмен сам превышает бюджет: сжимается и он
+                if history.nbytes > self.session_budget:
+                    history.pack(0)
+                metrics.increment("session_budget_trims")
+
+            self._nbytes += history.nbytes - before
+            if self.shared:
+                self._write(session_id, history)
+            self._enforce_memory_budget()
+
+    def _write(self, session_id: str, history: SessionHistory) -> None:
+        """
+        Записывает историю сессии на диск (общий режим, вызывается под блокировкой).
+        """
+        now = time.time()
+        self._conn.execute("INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                           (session_id, history.serialize(), now))
+        history.synced_at = now
+
+    def clear(self, session_id: str) -> None:
+        """
+        Удаляет историю сессии из памяти и с диска.
+        """
+        with self._lock:
+            history = self._sessions.pop(session_id, None)
+            if history is not None:
+                self._nbytes -= history.nbytes
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _enforce_memory_budget(self) -> None:
+        """
+        Вытесняет на диск давно не использованные сессии, пока память не уложится в бюджет.
+        """
+        while self._nbytes > self.memory_budget and len(self._sessions) > 1:
+            session_id, history = self._sessions.popitem(last=False)
+            self._nbytes -= history.nbytes
+            if not self.shared:
+                # В общем режиме на диске уже лежит актуальная копия
+                self._conn.execute("INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                                   (session_id, history.serialize(), history.last_access))
+            self._evictions += 1
+            metrics.increment("session_evictions")
+
+    def memory_report(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Возвращает отчет об использовании памяти историями сессий.
+
+        Args:
+            top: Число самых больших сессий в отчете
+
+        Returns:
+            Словарь с итогами по памяти, диску, сжатию и крупнейшими сессиями
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+            disk_sessions, disk_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+            raw_bytes = sum(history.raw_bytes for _, history in sessions)
+            largest = sorted(sessions, key=lambda item: -item[1].nbytes)[:top]
+            return {
+                "codec": "zstd" if zstandard is not None else "zlib",
+                "shared": self.shared,
+                "memory": {
+                    "sessions": len(sessions),
+                    "messages": sum(len(history) for _, history in sessions),
+                    "bytes": self._nbytes,
+                    "budget_bytes": self.memory_budget,
+                    "uncompressed_bytes": raw_bytes,
+                    "compression_ratio": round(raw_bytes / self._nbytes, 2) if self._nbytes else None,
+                },
+                "disk": {"sessions": disk_sessions, "bytes": disk_bytes, "ttl_seconds": self.disk_ttl},
+                "limits": {
+                    "session_budget_bytes": self.session_budget,
+                    "max_messages": self.max_messages,
+                    "recent_messages": self.recent_messages,
+                },
+                "evictions": self._evictions,
+                "restores": self._restores,
+                "largest_sessions": [{
+                    "session_id": session_id[:8],
+                    "messages": len(history),
+                    "bytes": history.nbytes,
+                    "idle_seconds": round(time.time() - history.last_access, 1),
+                } for session_id, history in largest],
+            }
+
+
+# Синглтон хранилища создается при первом обращении
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Возвращает синглтон хранилища историй чатов.
+
+    Returns:
+        Экземпляр SessionStore
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
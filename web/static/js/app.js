@@ -16,6 +16,14 @@ let mediaRecorder = null;
 let audioChunks = [];
 let isRecording = false;
 
+// Long-running queries are processed as background jobs
+const LONG_QUERY_LENGTH = 400;
+const LONG_QUERY_PATTERNS = [
+    /сравн/i, /сопостав/i, /10-?[KQ]\b/i, /отч[её]т/i, /филинг/i, /filing/i,
+    /все сделки/i, /статистик/i, /за (весь|все) (период|время)/i, /проанализир/i
+];
+const JOB_POLL_INTERVAL_MS = 2000;
+
 // Event Listeners
 document.addEventListener('DOMContentLoaded', () => {
     // Auto-resize textarea as content grows
@@ -94,6 +102,12 @@ function sendMessage() {
     chatInput.disabled = true;
     sendBtn.disabled = true;
     
+    // Long analyses run as background jobs so the request does not time out
+    if (isLongQuery(message)) {
+        sendJobMessage(message);
+        return;
+    }
+    
     // Send message to backend
     fetch('/api/chat', {
         method: 'POST',
@@ -126,19 +140,128 @@ function sendMessage() {
         // Add error message
         addMessageToChat('system', `Произошла ошибка при отправке сообщения: ${error.message}`);
     })
-    .finally(() => {
-        // Reset waiting flag
-        isWaitingForResponse = false;
-        
-        // Enable input
-        chatInput.disabled = false;
-        sendBtn.disabled = false;
+    .finally(finishWaiting);
+}
+
+function finishWaiting() {
+    // Reset waiting flag
+    isWaitingForResponse = false;
+    
+    // Enable input
+    chatInput.disabled = false;
+    sendBtn.disabled = false;
+    
+    // Focus input
+    chatInput.focus();
+}
+
+function isLongQuery(message) {
+    return message.length > LONG_QUERY_LENGTH || LONG_QUERY_PATTERNS.some(pattern => pattern.test(message));
+}
+
+function sendJobMessage(message) {
+    fetch('/api/jobs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ message })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        updateTypingStatus('В очереди...');
         
-        // Focus input
-        chatInput.focus();
+        if (window.EventSource) {
+            streamJob(data.job_id);
+        } else {
+            pollJob(data.job_id);
+        }
+    })
+    .catch(error => {
+        removeTypingIndicator();
+        addMessageToChat('system', `Произошла ошибка при отправке сообщения: ${error.message}`);
+        finishWaiting();
     });
 }
 
+function streamJob(jobId) {
+    const source = new EventSource(`/api/jobs/${jobId}?stream=1`);
+    
+    source.addEventListener('progress', (e) => {
+        updateTypingStatus(describeProgress(JSON.parse(e.data)));
+    });
+    
+    source.addEventListener('done', (e) => {
+        source.close();
+        completeJob({ status: 'done', response: JSON.parse(e.data).response });
+    });
+    
+    source.addEventListener('failed', (e) => {
+        source.close();
+        completeJob({ status: 'failed', error: JSON.parse(e.data).error });
+    });
+    
+    // The server limits how long a stream is held open: continue by polling
+    source.addEventListener('timeout', () => {
+        source.close();
+        pollJob(jobId);
+    });
+    
+    // Connection dropped (proxy timeout, server restart): fall back to polling
+    source.onerror = () => {
+        source.close();
+        pollJob(jobId);
+    };
+}
+
+function pollJob(jobId) {
+    fetch(`/api/jobs/${jobId}`)
+    .then(response => response.json())
+    .then(job => {
+        if (job.status === 'done' || job.status === 'failed') {
+            completeJob(job);
+            return;
+        }
+        if (job.progress && job.progress.length > 0) {
+            updateTypingStatus(describeProgress(job.progress[job.progress.length - 1]));
+        }
+        setTimeout(() => pollJob(jobId), JOB_POLL_INTERVAL_MS);
+    })
+    .catch(error => {
+        completeJob({ status: 'failed', error: error.message });
+    });
+}
+
+function completeJob(job) {
+    removeTypingIndicator();
+    
+    if (job.status === 'done') {
+        addMessageToChat('assistant', job.response);
+    } else {
+        addMessageToChat('system', `Произошла ошибка: ${job.error}`);
+    }
+    
+    finishWaiting();
+}
+
+function describeProgress(event) {
+    switch (event.stage) {
+        case 'started':
+            return 'Анализ запущен...';
+        case 'thinking':
+            return `Анализ (шаг ${event.step})...`;
+        case 'tool_start':
+            return `Вызов инструмента ${event.tool}...`;
+        case 'tool_end':
+            return `Инструмент ${event.tool} завершен`;
+        default:
+            return 'Обработка...';
+    }
+}
+
 function addMessageToChat(role, content) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${role}`;
@@ -178,6 +301,20 @@ function showTypingIndicator() {
     scrollToBottom();
 }
 
+function updateTypingStatus(text) {
+    const typingIndicator = document.getElementById('typing-indicator');
+    if (!typingIndicator) return;
+    
+    let status = typingIndicator.querySelector('.typing-status');
+    if (!status) {
+        status = document.createElement('span');
+        status.className = 'typing-status';
+        typingIndicator.appendChild(status);
+    }
+    status.textContent = text;
+    scrollToBottom();
+}
+
 function removeTypingIndicator() {
     const typingIndicator = document.getElementById('typing-indicator');
     if (typingIndicator) {